@@ -15,7 +15,7 @@ from concierge.utils.firestore_client import (
     create_property, delete_property, update_user,
     create_knowledge_source, list_knowledge_sources,
     create_knowledge_item, list_knowledge_items_by_property, list_knowledge_items_by_source,
-    get_knowledge_item, update_knowledge_item, update_knowledge_item_status,
+    list_knowledge_items_page, get_knowledge_item, update_knowledge_item, update_knowledge_item_status,
     delete_knowledge_item, find_similar_knowledge_items, generate_embedding,
     list_property_reservations, update_reservation_phone,
     create_magic_link, list_magic_links_by_reservation, revoke_magic_link,
@@ -36,6 +36,10 @@ from concierge.config import LAMBDA_CLIENT
 # Import Gemini variables from utils.gemini_config
 from concierge.utils.gemini_config import genai_enabled, gemini_model
 from concierge.utils.rate_limiter import get_gemini_rate_limiter
+from concierge.utils.import_jobs import (
+    create_import_job, get_import_job, submit_import_job, request_cancel,
+    resume_import_job_if_stale, serialize_import_job
+)
 
 def normalize_airbnb_url_for_duplicate_check(url: str) -> str:
     """
@@ -118,10 +122,6 @@ def generate_qna(knowledge_base_text):
 # Create Blueprint
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
-# In-memory tracking for long-running import jobs that can be canceled from the UI
-# Structure: { job_id: { 'canceled': bool, 'started_at': datetime } }
-IMPORT_JOBS = {}
-
 @api_bp.route('/gemini-voice-config', methods=['GET'])
 def get_gemini_voice_config():
     """Provides configuration needed for Gemini Voice frontend, including the API key."""
@@ -950,8 +950,8 @@ def generate_all_embeddings(property_id):
         if property_data.get('hostId') != user_id:
             return jsonify({'error': 'You do not have permission to manage this property'}), 403
 
-        # Get all knowledge items for this property
-        all_items = list_knowledge_items_by_property(property_id)
+        # Get all knowledge items for this property (embeddings are needed to check their status)
+        all_items = list_knowledge_items_by_property(property_id, include_embeddings=True)
 
         if not all_items:
             return jsonify({
@@ -2306,37 +2306,36 @@ def get_knowledge_items():
     """
     Get knowledge items for a property.
 
+    Embedding vectors are never returned.
+
     Query parameters:
     - propertyId: ID of the property to get knowledge items for
     - status: (optional) Filter by status (e.g., 'approved')
+    - limit: (optional) Page size; the response then includes next_cursor
+    - cursor: (optional) next_cursor of the previous page
     """
     property_id = request.args.get('propertyId')
-    status = request.args.get('status')
+    status = request.args.get('status') or None
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor') or None
 
     if not property_id:
         return jsonify({"error": "Property ID is required"}), 400
 
     try:
-        # Get knowledge items from Firestore
-        if status:
-            items = list_knowledge_items_by_property(property_id, status)
+        # Get knowledge items from Firestore (projected, without embeddings)
+        response = {"success": True}
+        if limit:
+            page = list_knowledge_items_page(property_id, status, page_size=min(max(limit, 1), 500), cursor=cursor)
+            items = page['items']
+            response["next_cursor"] = page['next_cursor']
         else:
-            items = list_knowledge_items_by_property(property_id)
-
-        # Filter out items without embeddings if needed for RAG
-        items_with_embeddings = [item for item in items if item.get('embedding')]
+            items = list_knowledge_items_by_property(property_id, status)
 
-        # Log the results
         print(f"Found {len(items)} knowledge items for property {property_id}")
-        print(f"{len(items_with_embeddings)} items have embeddings")
 
-        # Return the items
-        return jsonify({
-            "success": True,
-            "items": items,
-            "total": len(items),
-            "with_embeddings": len(items_with_embeddings)
-        })
+        response.update({"items": items, "total": len(items)})
+        return jsonify(response)
 
     except Exception as e:
         print(f"Error getting knowledge items: {e}")
@@ -3003,7 +3002,7 @@ def get_property_conversations(property_id):
     """Get all conversations (text chat and voice calls) for a property."""
     try:
         # Import required functions
-        from concierge.utils.dynamodb_client import list_property_conversations_all
+        from concierge.utils.dynamodb_client import list_property_conversations_page
         from concierge.utils.firestore_client import get_property
 
         # Verify property ownership
@@ -3012,9 +3011,11 @@ def get_property_conversations(property_id):
         if not property_data or property_data.get('hostId') != user_id:
             return jsonify({"error": "Unauthorized access to property"}), 403
 
-        # Get pagination parameters
-        limit = int(request.args.get('limit', 50))
+        # Get pagination parameters: cursor is the next_cursor of the previous
+        # page; offset is still accepted for older clients
+        limit = min(max(int(request.args.get('limit', 50)), 1), 200)
         offset = int(request.args.get('offset', 0))
+        cursor = request.args.get('cursor') or None
 
         # Get filter parameters
         channel_filter = request.args.get('channel')  # 'text_chat', 'voice_call', or None for all
@@ -3022,18 +3023,21 @@ def get_property_conversations(property_id):
         date_to = request.args.get('date_to')
         guest_name_filter = request.args.get('guest_name')
 
-        # Get all conversations for the property
-        conversations = list_property_conversations_all(
-            property_id=property_id,
-            limit=limit + offset,  # Get more to handle offset
-            channel_filter=channel_filter,
-            date_from=date_from,
-            date_to=date_to,
-            guest_name_filter=guest_name_filter
-        )
-
-        # Apply offset and limit
-        paginated_conversations = conversations[offset:offset + limit]
+        try:
+            page = list_property_conversations_page(
+                property_id=property_id,
+                limit=limit if cursor else limit + offset,
+                cursor=cursor,
+                channel_filter=channel_filter,
+                date_from=date_from,
+                date_to=date_to,
+                guest_name_filter=guest_name_filter
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        conversations = page['items']
+        paginated_conversations = conversations if cursor else conversations[offset:offset + limit]
 
         # Do NOT generate summaries inline. If missing, return immediately and let
         # background jobs or explicit bulk-generation fill them asynchronously.
@@ -3050,7 +3054,8 @@ def get_property_conversations(property_id):
             "total": len(conversations),
             "limit": limit,
             "offset": offset,
-            "has_more": len(conversations) > offset + limit
+            "next_cursor": page['next_cursor'],
+            "has_more": page['next_cursor'] is not None
         })
 
     except Exception as e:
@@ -3207,7 +3212,7 @@ def format_conversation_for_list(conversation):
             'duration': conversation.get('Duration'),
             'status': status,
             'channel': 'voice_call',
-            'message_count': len(conversation.get('Transcripts', [])),
+            'message_count': int(conversation.get('TranscriptCount', len(conversation.get('Transcripts', [])))),
             'summary': ai_summary if ai_summary else 'Summary for this conversation is coming soon.',
             'reservation_id': conversation.get('ReservationId'),
             'property_id': conversation.get('PropertyId')
@@ -3226,7 +3231,7 @@ def format_conversation_for_list(conversation):
             'duration': None,
             'status': status,
             'channel': 'text_chat',
-            'message_count': len(messages),
+            'message_count': int(conversation.get('MessageCount', len(messages))),
             'summary': ai_summary if ai_summary else 'Summary for this conversation is coming soon.',
             'reservation_id': conversation.get('ReservationId'),
             'property_id': conversation.get('PropertyId')
@@ -3611,7 +3616,7 @@ def manual_system_cleanup():
 def get_cleanup_status():
     """Get status of items that would be cleaned up."""
     try:
-        from concierge.utils.firestore_client import initialize_firebase, get_firestore_client
+        from concierge.utils.firestore_client import initialize_firebase, get_firestore_client, count_query
         from datetime import datetime, timezone
         
         if not initialize_firebase():
@@ -3622,11 +3627,11 @@ def get_cleanup_status():
         
         # Count expired magic links
         expired_magic_links_query = db.collection('magic_links').where('expires_at', '<', now).where('is_active', '==', True)
-        expired_magic_links_count = len(list(expired_magic_links_query.stream()))
+        expired_magic_links_count = count_query(expired_magic_links_query)
         
         # Count expired temporary users
         expired_temp_users_query = db.collection('users').where('isTemporary', '==', True).where('expiresAt', '<', now)
-        expired_temp_users_count = len(list(expired_temp_users_query.stream()))
+        expired_temp_users_count = count_query(expired_temp_users_query)
         
         return jsonify({
             "success": True,
@@ -3641,6 +3646,27 @@ def get_cleanup_status():
         current_app.logger.error(f"Error getting cleanup status: {e}")
         return jsonify({"error": "An error occurred while getting cleanup status."}), 500
 
+@api_bp.route('/system/scheduler/runs', methods=['GET'])
+@login_required
+def get_scheduler_runs():
+    """Get recent background scheduler runs (optionally for one job)."""
+    try:
+        from concierge.utils.scheduler import get_recent_runs
+
+        job_id = request.args.get('job_id')
+        limit = min(int(request.args.get('limit', 20)), 100)
+        runs = get_recent_runs(job_id=job_id, limit=limit)
+        for run in runs:
+            for key in ('startedAt', 'finishedAt'):
+                if hasattr(run.get(key), 'isoformat'):
+                    run[key] = run[key].isoformat()
+
+        return jsonify({"success": True, "runs": runs})
+
+    except Exception as e:
+        current_app.logger.error(f"Error getting scheduler runs: {e}")
+        return jsonify({"error": "An error occurred while getting scheduler runs."}), 500
+
 # === End Magic Link Management Endpoints ===
 
 
@@ -4004,7 +4030,11 @@ def get_airbnb_listings():
 @api_bp.route('/property-setup/import-properties', methods=['POST'])
 def import_selected_properties():
     """
-    Import selected Airbnb listings as properties.
+    Start a background job that imports selected Airbnb listings as properties.
+
+    The job runs on the import worker pool; progress is streamed over Socket.IO
+    ('import_job_progress' events in the job's room) and can be polled via
+    /property-setup/import-jobs/<job_id>.
     """
     try:
         # Get current user
@@ -4023,117 +4053,60 @@ def import_selected_properties():
         if not user_url:
             return jsonify({"success": False, "error": "User URL is required"}), 400
 
-        # Save user_url to user profile and extract host info if not already saved
-        user_data = get_user(user_id)
-        update_data = {}
-
-        if not user_data.get('airbnbUserLink'):
-            update_data['airbnbUserLink'] = user_url
-
-            # Extract host information
-            try:
-                host_info = scraper.extract_host_info(user_url)
-                if host_info.get('name'):
-                    update_data['displayName'] = host_info['name']
-                    current_app.logger.info(f"Extracted host name: {host_info['name']}")
-                if host_info.get('location'):
-                    update_data['hostLocation'] = host_info['location']
-            except Exception as e:
-                current_app.logger.error(f"Error extracting host info: {e}")
-
-        # Update user profile if we have data to update
-        if update_data:
-            try:
-                update_user(user_id, update_data)
-                current_app.logger.info(f"Updated user profile with: {update_data}")
-            except Exception as e:
-                current_app.logger.error(f"Error updating user profile: {e}")
-
-        # Initialize (or reinitialize) the job state if job_id provided
         if job_id:
-            IMPORT_JOBS[job_id] = {
-                'canceled': False,
-                'started_at': datetime.now(timezone.utc)
-            }
-
-        created_properties = []
-        scraper = AirbnbScraper(use_selenium=False)
-
-        for listing_url in selected_listings:
-            # Check for client-requested cancellation between items
-            if job_id and IMPORT_JOBS.get(job_id, {}).get('canceled'):
-                current_app.logger.info(f"Import job {job_id} was canceled by client; returning partial results")
-                break
-            try:
-                # Get basic listing information
-                listing_details = scraper.extract_listing_details(listing_url)
+            existing_job = get_import_job(job_id)
+            if existing_job:
+                if existing_job.get('userId') != user_id:
+                    return jsonify({"success": False, "error": "Job not found"}), 404
+                # Re-posting an existing job resumes it if its worker went away
+                resume_import_job_if_stale(existing_job)
+                return jsonify({"success": True, "job": serialize_import_job(existing_job)}), 202
+
+        job_id = create_import_job(user_id, user_url, selected_listings, job_id=job_id)
+        if not job_id:
+            return jsonify({"success": False, "error": "Failed to start import"}), 500
 
-                if not listing_details:
-                    current_app.logger.warning(f"Could not extract basic details for listing: {listing_url}")
-                    continue
+        submit_import_job(job_id)
 
-                # Perform deep extraction using integrated scraper methods
-                current_app.logger.info(f"Starting deep extraction for: {listing_url}")
-                try:
-                    extracted_data = scraper.extract_deep_property_data(listing_url)
-                except Exception as e:
-                    # Normalize known transient failures (e.g., 503) into a clear JSON error
-                    current_app.logger.error(f"Deep extraction failed for {listing_url}: {e}")
-                    return jsonify({
-                        "success": False,
-                        "error": f"Deep extraction failed for {listing_url}: {str(e)}"
-                    }), 502
+        return jsonify({
+            "success": True,
+            "job": serialize_import_job(get_import_job(job_id) or {'id': job_id, 'status': 'queued'})
+        }), 202
 
-                # Create property with extracted data using integrated scraper method
-                property_id = scraper.create_property_from_extraction(
-                    user_id, listing_details, extracted_data
-                )
+    except Exception as e:
+        current_app.logger.error(f"Error importing properties: {e}")
+        return jsonify({"success": False, "error": "Failed to import properties"}), 500
 
-                if property_id:
-                    created_properties.append({
-                        'id': property_id,
-                        'name': listing_details.get('title', 'Imported Property'),
-                        'address': listing_details.get('location', ''),
-                        'status': 'inactive',  # New properties start inactive
-                        'new': True  # Flag for setup requirement
-                    })
-                    current_app.logger.info(f"Successfully imported property with deep extraction: {property_id}")
-                else:
-                    current_app.logger.error(f"Failed to create property for listing: {listing_url}")
 
-            except Exception as e:
-                current_app.logger.error(f"Error importing listing {listing_url}: {e}")
-                continue
+@api_bp.route('/property-setup/import-jobs/<job_id>', methods=['GET'])
+def get_import_job_status(job_id):
+    """
+    Get the progress of a property import job (polling fallback for Socket.IO events).
+    """
+    try:
+        user_id = session.get('user_id')
+        if not user_id:
+            return jsonify({"success": False, "error": "Authentication required"}), 401
 
-        # Cleanup job tracking if present
-        if job_id and job_id in IMPORT_JOBS:
-            # Keep the canceled flag to let client know; remove later if desired
-            canceled = IMPORT_JOBS[job_id].get('canceled', False)
-            # Remove tracking entry to prevent buildup
-            try:
-                del IMPORT_JOBS[job_id]
-            except Exception:
-                pass
-        else:
-            canceled = False
+        job = get_import_job(job_id)
+        if not job or job.get('userId') != user_id:
+            return jsonify({"success": False, "error": "Job not found"}), 404
 
-        return jsonify({
-            "success": True,
-            "created_properties": created_properties,
-            "total_imported": len(created_properties),
-            "canceled": canceled
-        })
+        # Resume from the last checkpoint if the worker running the job went away
+        resume_import_job_if_stale(job)
 
+        return jsonify({"success": True, "job": serialize_import_job(job)})
     except Exception as e:
-        current_app.logger.error(f"Error importing properties: {e}")
-        return jsonify({"success": False, "error": "Failed to import properties"}), 500
+        current_app.logger.error(f"Error getting import job {job_id}: {e}")
+        return jsonify({"success": False, "error": "Failed to get import status"}), 500
 
 
 @api_bp.route('/property-setup/import-properties/cancel', methods=['POST'])
 def cancel_import_properties():
     """
     Cancel a running property import job. The client should pass the job_id it started.
-    The import loop checks this flag between items and returns early with partial results.
+    The flag is stored on the job record, so the worker running the job sees it before
+    the next listing regardless of which process handles this request.
     """
     try:
         user_id = session.get('user_id')
@@ -4145,11 +4118,10 @@ def cancel_import_properties():
         if not job_id:
             return jsonify({"success": False, "error": "job_id required"}), 400
 
-        if job_id not in IMPORT_JOBS:
-            # If the job is already finished or unknown, treat as no-op success
+        if not request_cancel(job_id, user_id):
+            # If the job is unknown, treat as no-op success
             return jsonify({"success": True, "message": "No active job found; nothing to cancel."})
 
-        IMPORT_JOBS[job_id]['canceled'] = True
         current_app.logger.info(f"Marked import job {job_id} as canceled")
         return jsonify({"success": True})
     except Exception as e:
@@ -1,16 +1,23 @@
 import google.generativeai as genai
+import os
 import json
 import traceback # For error logging
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from google.cloud import firestore
 from google.cloud.firestore_v1.base_query import FieldFilter
 from datetime import datetime
 from concierge.utils.gemini_config import genai_enabled, gemini_model
+from concierge.utils.rate_limiter import rate_limited_gemini_call
+from concierge.utils.file_helpers import split_text_into_chunks
 from concierge.lambda_src.firebase_admin_config import get_firestore_client
 
 # Get the initialized Firestore client
 db = get_firestore_client()
 
+# Model behind gemini_config.gemini_model, used to pick the rate limit bucket
+KNOWLEDGE_MODEL = 'gemini-2.0-flash'
+
 # This is a simplification; dependency injection or a config object would be better.
 def generate_qna_with_gemini(text_content: str, property_details: dict) -> list[dict]:
     """Generates Q&A pairs from text content using Google Gemini.
@@ -117,13 +124,16 @@ def generate_qna_with_gemini(text_content: str, property_details: dict) -> list[
 
     return generated_qna
 
-def generate_knowledge_items_with_gemini(text_content: str, property_details: dict) -> list[dict]:
+def generate_knowledge_items_with_gemini(text_content: str, property_details: dict,
+                                        document_part: str = None) -> list[dict]:
     """Generates knowledge items from text content using Google Gemini with the new schema.
 
     Args:
-        text_content: The extracted text from the knowledge source (up to ~1M tokens for Flash).
+        text_content: The extracted text from the knowledge source. Long documents should go
+                      through generate_knowledge_items_for_document, which splits them first.
         property_details: A dictionary containing details about the property
                           (e.g., name, address) for context.
+        document_part: Position of text_content in a split document (e.g. "part 2 of 5").
 
     Returns:
         A list of dictionaries, where each dictionary represents a knowledge item
@@ -143,6 +153,9 @@ def generate_knowledge_items_with_gemini(text_content: str, property_details: di
     property_address = property_details.get('address', '')
     context_prompt = f"You are creating a knowledge base for guests staying at {property_name}" \
                      f"{(' located at ' + property_address) if property_address else ''}.\n\n"
+    if document_part:
+        context_prompt += f"The text below is {document_part} of a longer document; " \
+                          "create knowledge items only for the information in this part.\n\n"
 
     instruction_prompt = (
         "Read the following text provided by the property host. "
@@ -174,7 +187,7 @@ def generate_knowledge_items_with_gemini(text_content: str, property_details: di
     generated_items = []
     try:
         print(f"Sending prompt to Gemini (length: {len(full_prompt)} chars) for property {property_details.get('id', 'N/A')}...")
-        response = gemini_model.generate_content(full_prompt)
+        response = rate_limited_gemini_call(gemini_model.generate_content, full_prompt, model=KNOWLEDGE_MODEL)
 
         # --- Basic Response Validation ---
         if not response.parts:
@@ -244,4 +257,84 @@ def generate_knowledge_items_with_gemini(text_content: str, property_details: di
         import traceback
         traceback.print_exc()
 
-    return generated_items
\ No newline at end of file
+    return generated_items
+
+
+# Number of document chunks sent to Gemini at the same time (calls still pass the rate limiter)
+KNOWLEDGE_GENERATION_WORKERS = int(os.getenv('KNOWLEDGE_GENERATION_WORKERS', '4'))
+
+
+def _normalize_content(content: str) -> str:
+    return ' '.join(content.lower().split())
+
+
+def merge_knowledge_items(item_lists: list[list[dict]]) -> list[dict]:
+    """Merges knowledge items generated from the chunks of one document.
+
+    Items of the same type whose content is identical (ignoring case and
+    whitespace) or contained in another item's content are collapsed into the
+    longer item, which keeps the tags of both.
+
+    Args:
+        item_lists: Knowledge item lists in document order.
+
+    Returns:
+        The merged list of knowledge items, in document order.
+    """
+    merged = []
+    for items in item_lists:
+        for item in items:
+            normalized = _normalize_content(item['content'])
+            duplicate_of = next(
+                (index for index, (kept_normalized, kept) in enumerate(merged)
+                 if kept['type'] == item['type'] and (normalized in kept_normalized or kept_normalized in normalized)),
+                None
+            )
+            if duplicate_of is None:
+                merged.append((normalized, dict(item, tags=list(item['tags']))))
+                continue
+
+            kept_normalized, kept = merged[duplicate_of]
+            tags = kept['tags'] + [tag for tag in item['tags'] if tag not in kept['tags']]
+            if len(normalized) > len(kept_normalized):
+                kept_normalized, kept = normalized, dict(item)
+            kept['tags'] = tags
+            merged[duplicate_of] = (kept_normalized, kept)
+    return [item for _, item in merged]
+
+
+def generate_knowledge_items_for_document(text_content: str, property_details: dict) -> list[dict]:
+    """Generates knowledge items for a document of any length.
+
+    Short texts are sent to Gemini in one prompt. Longer ones are split into
+    paragraph-bounded chunks (see split_text_into_chunks) that are processed
+    concurrently, so large manuals finish faster and no single JSON answer
+    runs into the output token limit. The per-chunk results are merged and
+    deduplicated.
+
+    Args:
+        text_content: The extracted text from the knowledge source.
+        property_details: A dictionary containing details about the property.
+
+    Returns:
+        A list of knowledge item dictionaries with 'type', 'tags', and 'content' keys.
+    """
+    chunks = split_text_into_chunks(text_content)
+    if len(chunks) <= 1:
+        return generate_knowledge_items_with_gemini(text_content, property_details)
+
+    print(f"Generating knowledge items for property {property_details.get('id', 'N/A')} "
+          f"from {len(chunks)} chunks ({len(text_content)} chars)")
+
+    def generate_for_chunk(numbered_chunk):
+        number, chunk = numbered_chunk
+        return generate_knowledge_items_with_gemini(
+            chunk, property_details, document_part=f"part {number} of {len(chunks)}"
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, min(KNOWLEDGE_GENERATION_WORKERS, len(chunks)))) as executor:
+        item_lists = list(executor.map(generate_for_chunk, enumerate(chunks, start=1)))
+
+    merged = merge_knowledge_items(item_lists)
+    print(f"Merged {sum(len(items) for items in item_lists)} chunk items into {len(merged)} knowledge items")
+    return merged
@@ -23,7 +23,6 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from concierge.auth.utils import login_required
 
 # --- NEW: APScheduler Imports & Setup ---
-from apscheduler.schedulers.background import BackgroundScheduler
 from concierge.utils.reservations import update_all_reservations
 import atexit
 # --- End APScheduler Imports & Setup ---
@@ -98,11 +97,12 @@ app.register_blueprint(search_bp, url_prefix='/api/search')
 app.register_blueprint(profile_bp, url_prefix='/api/profile')
 app.register_blueprint(magic_bp) # No prefix needed for magic link routes
 
-# Initialize SocketIO with threading mode for both development and production
-# Threading mode is reliable across all platforms and sufficient for micro instance performance
+# Initialize SocketIO in the configured worker mode (threading by default; gevent/eventlet
+# for async workers, with an optional message queue for multi-worker deployments)
+from concierge.utils.async_runtime import get_socketio_options
 socketio = SocketIO(
     app, 
-    async_mode='threading', 
+    **get_socketio_options(),
     manage_session=True, 
     cors_allowed_origins="*", 
     logger=True, 
@@ -299,71 +299,12 @@ if not os.path.exists(UPLOAD_FOLDER):
 # Import the allowed_file function from the utils module
 from concierge.utils.file_helpers import allowed_file
 
-# --- NEW: Initialize Scheduler ---
-scheduler = BackgroundScheduler(daemon=True)
-
-# --- Start Scheduler with Firestore DB check ---
-try:
-    # Test Firestore connection by trying to initialize it
-    from concierge.utils.firestore_client import initialize_firebase
-    if initialize_firebase():
-        print("Firestore connection successful, starting background scheduler...")
-        # Schedule the job to run on a regular interval and once on startup
-
-        # Run every 6 hours
-        scheduler.add_job(
-            func=update_all_reservations,
-            trigger='interval',
-            hours=6,
-            id='update_reservations_job',
-            name='Update Reservations Every 6 Hours',
-            replace_existing=True
-        )
-
-        # Schedule magic link expiration cleanup (run daily)
-        from concierge.utils.firestore_client import expire_old_magic_links
-        scheduler.add_job(
-            func=expire_old_magic_links,
-            trigger='interval',
-            hours=24,
-            id='expire_magic_links_job',
-            name='Expire Old Magic Links Daily',
-            replace_existing=True
-        )
-
-        # === NEW: Hourly missing conversation summaries job ===
-        from concierge.utils.dynamodb_client import run_missing_conversation_summaries_job
-        scheduler.add_job(
-            func=lambda: run_missing_conversation_summaries_job(max_items=60),
-            trigger='interval',
-            hours=1,
-            id='generate_missing_conversation_summaries_job',
-            name='Generate Missing Conversation Summaries Hourly',
-            replace_existing=True
-        )
-
-        # TEMPORARILY DISABLED: Run once immediately on startup with a 10-second delay to ensure DB connections are ready
-        # This was causing worker timeouts during development
-        # scheduler.add_job(
-        #     func=update_all_reservations,
-        #     trigger='date',
-        #     run_date=datetime.now() + timedelta(seconds=10),
-        #     id='update_reservations_startup_job',
-        #     name='Update Reservations on Startup',
-        #     replace_existing=True
-        # )
-
-        # Start the scheduler
-        scheduler.start()
-
-        # Shut down the scheduler when exiting the app
-        atexit.register(lambda: scheduler.shutdown())
-        print("Background scheduler started with reservation sync jobs.")
-    else:
-        print("WARNING: Firestore initialization failed. Background scheduler (e.g., for reservations) will NOT run.")
-except Exception as e:
-    print(f"ERROR: Could not initialize Firestore for scheduler: {e}")
-    print("WARNING: Background scheduler (e.g., for reservations) will NOT run.")
+# --- Background Scheduler ---
+# Jobs run only on the process holding the Firestore leader lease (see
+# concierge/utils/scheduler.py). With SCHEDULER_MODE=external the web workers skip
+# this and the jobs run in the standalone scheduler process instead.
+from concierge.utils.scheduler import start_embedded_scheduler
+scheduler = start_embedded_scheduler()
 # --- End Conditional Scheduler Start ---
 
 # Configure logging
@@ -435,11 +376,15 @@ def update_property_amenities(property_id):
 @login_required
 def api_run_missing_summaries():
     try:
-        from concierge.utils.dynamodb_client import run_missing_conversation_summaries_job
+        from concierge.utils.dynamodb_client import run_missing_conversation_summaries_job, enqueue_missing_summaries_backfill
         payload = request.get_json() or {}
         max_items = int(payload.get('max_items', 40))
+        queued = None
+        # One-off: queue conversations created before the pending-summary queue existed
+        if payload.get('backfill'):
+            queued = enqueue_missing_summaries_backfill()
         results = run_missing_conversation_summaries_job(max_items=max_items)
-        return jsonify({"success": True, "results": results})
+        return jsonify({"success": True, "results": results, "queued": queued})
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -914,8 +859,8 @@ if __name__ == '__main__':
     debug_mode = os.getenv('FLASK_ENV') == 'development'
     port = int(os.getenv('PORT', 8081))  # Default to 8081 instead of 8082
     print(f"Using port: {port}")
-    print("Using threading mode for reliable cross-platform compatibility")
+    print(f"Using {socketio.async_mode} mode")
     
     socketio.run(app, host='0.0.0.0', port=port, debug=debug_mode, allow_unsafe_werkzeug=True)
-    # For production deployment, you'd typically use Gunicorn with threading workers:
-    # gunicorn --worker-class gevent -w 1 concierge.app:app
+    # For production deployment, run gunicorn; set SOCKETIO_ASYNC_MODE=gevent for async workers:
+    # SOCKETIO_ASYNC_MODE=gevent gunicorn -c gunicorn.conf.py concierge.app:app
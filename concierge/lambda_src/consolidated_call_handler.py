@@ -1,13 +1,12 @@
+import time
+_INIT_STARTED_AT = time.perf_counter()
+
 import json
 import os
-import telnyx
 import traceback
-import google.generativeai as genai
 # import lancedb  # Removed - migrated to Firestore for vector search
-import boto3
 import asyncio
 import base64
-import time
 import logging
 import sys
 from datetime import datetime, timezone
@@ -20,23 +19,91 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Import RAG functionality with fallback
-rag_available = False
+# Module-scoped AWS clients and event loop, reused by warm invocations
 try:
-    # Try to import the RAG functions from utils.ai_helpers
-    from utils.ai_helpers import process_query_with_rag, get_relevant_context, create_base_prompt
-    rag_available = True
-    logger.info("Successfully imported RAG utilities from utils.ai_helpers")
+    from utils.lambda_runtime import (
+        get_dynamodb_resource, get_table, get_apigw_management_client, run_async, record_invocation
+    )
 except ImportError:
-    # Try relative import
+    from concierge.utils.lambda_runtime import (
+        get_dynamodb_resource, get_table, get_apigw_management_client, run_async, record_invocation
+    )
+
+# Chat replies are posted to the connection as they are generated
+try:
+    from utils.apigw_streaming import ConnectionStreamer, stream_requested
+except ImportError:
+    from concierge.utils.apigw_streaming import ConnectionStreamer, stream_requested
+
+# Heavy SDKs are imported on the routes that need them rather than during init:
+# telnyx by configure_telnyx() for Telnyx webhooks, and google-generativeai,
+# firebase_admin and ai_helpers (numpy) by load_ai_modules() for chat messages.
+telnyx = None
+genai = None
+rag_available = False
+context_bundle_available = False
+_ai_modules_loaded = False
+
+def load_ai_modules():
+    """Import the AI, Firestore and history modules on first use (once per environment)."""
+    global rag_available, context_bundle_available, _ai_modules_loaded
+    global process_query_with_rag, stream_text_query_with_tools, get_relevant_context, create_base_prompt
+    global get_context_bundle
+    global compact_history, split_history, SUMMARY_ROLE
+    if _ai_modules_loaded:
+        return
+    started_at = time.perf_counter()
+
+    # Import RAG functionality with fallback
+    rag_available = False
     try:
-        from concierge.utils.ai_helpers import process_query_with_rag, get_relevant_context, create_base_prompt
+        # Try to import the RAG functions from utils.ai_helpers
+        from utils.ai_helpers import (
+            process_query_with_rag, stream_text_query_with_tools, get_relevant_context, create_base_prompt
+        )
         rag_available = True
-        logger.info("Successfully imported RAG utilities via relative path")
-    except ImportError as e:
-        logger.error(f"Failed to import RAG utilities: {e}")
-        logger.error("RAG functionality will be disabled")
-        rag_available = False
+        logger.info("Successfully imported RAG utilities from utils.ai_helpers")
+    except ImportError:
+        # Try relative import
+        try:
+            from concierge.utils.ai_helpers import (
+                process_query_with_rag, stream_text_query_with_tools, get_relevant_context, create_base_prompt
+            )
+            rag_available = True
+            logger.info("Successfully imported RAG utilities via relative path")
+        except ImportError as e:
+            logger.error(f"Failed to import RAG utilities: {e}")
+            logger.error("RAG functionality will be disabled")
+            rag_available = False
+
+    # Import precomputed property context bundles with fallback
+    context_bundle_available = False
+    try:
+        from utils.async_firestore_client import get_context_bundle
+        context_bundle_available = True
+        logger.info("Successfully imported context bundles from utils.async_firestore_client")
+    except ImportError:
+        try:
+            from concierge.utils.async_firestore_client import get_context_bundle
+            context_bundle_available = True
+            logger.info("Successfully imported context bundles via relative path")
+        except ImportError as e:
+            logger.info(f"Context bundles unavailable, property info will be read from DynamoDB: {e}")
+            context_bundle_available = False
+
+    # Import conversation history compaction with fallback
+    try:
+        from utils.conversation_history import compact_history, split_history, SUMMARY_ROLE
+        logger.info("Successfully imported history compaction from utils.conversation_history")
+    except ImportError:
+        from concierge.utils.conversation_history import compact_history, split_history, SUMMARY_ROLE
+        logger.info("Successfully imported history compaction via relative path")
+
+    configure_gemini()
+    initialize_firebase()
+
+    _ai_modules_loaded = True
+    logger.info(f"Loaded AI modules in {(time.perf_counter() - started_at) * 1000:.0f} ms")
 
 # --- Global State Management ---
 # DynamoDB tables
@@ -59,8 +126,10 @@ active_calls = {}  # Key: connection_id/stream_id -> Value: call state
 
 # --- Telnyx Configuration ---
 def configure_telnyx():
+    global telnyx
     api_key = os.environ.get('TELNYX_API_KEY')
     if api_key:
+        import telnyx
         telnyx.api_key = api_key
         logger.info("Telnyx API Key configured.")
         return True
@@ -70,10 +139,11 @@ def configure_telnyx():
 
 # --- Gemini Configuration ---
 def configure_gemini():
-    global gemini_initialized
+    global gemini_initialized, genai
     gemini_api_key = os.environ.get('GEMINI_API_KEY')
     if gemini_api_key:
         try:
+            import google.generativeai as genai
             genai.configure(api_key=gemini_api_key)
             logger.info("Gemini API Key configured.")
             gemini_initialized = True
@@ -101,7 +171,7 @@ def initialize_dynamodb():
                 return False
 
             # Initialize DynamoDB client
-            dynamodb_client = boto3.resource('dynamodb')
+            dynamodb_client = get_dynamodb_resource()
             logger.info(f"Successfully initialized DynamoDB client for table: {table_name}")
             dynamodb_initialized = True
             return True
@@ -115,7 +185,7 @@ def initialize_dynamodb():
         # If already initialized, ensure dynamodb_client is set
         if not dynamodb_client:
             try:
-                dynamodb_client = boto3.resource('dynamodb')
+                dynamodb_client = get_dynamodb_resource()
                 logger.info("Re-initialized DynamoDB client on warm start.")
                 return True
             except Exception as e:
@@ -130,10 +200,9 @@ def initialize_connections_table():
     global connections_table
     if connections_table_name:
         try:
-            connections_table = boto3.resource('dynamodb').Table(connections_table_name)
-            # Optional: Make a simple call to check if table exists/is accessible
-            connections_table.load()
-            logger.info(f"Successfully connected to DynamoDB connections table: {connections_table_name}")
+            # No DescribeTable round trip; access errors surface on the first read or write
+            connections_table = get_table(connections_table_name)
+            logger.info(f"Using DynamoDB connections table: {connections_table_name}")
             return True
         except Exception as e:
             logger.error(f"Failed to connect to DynamoDB connections table '{connections_table_name}': {e}")
@@ -146,17 +215,25 @@ def initialize_connections_table():
 
 # --- Initialize All Resources ---
 def initialize_resources():
-    # Initialize Gemini
-    configure_gemini()
-
+    """Set up the DynamoDB resources every route uses (once per environment)."""
     # Initialize DynamoDB
     initialize_dynamodb()
 
     # Initialize WebSocket connections table
-    initialize_connections_table()
+    if connections_table is None:
+        initialize_connections_table()
 
-    # Initialize Firebase
-    initialize_firebase()
+def initialize_firebase():
+    """Initialize Firebase for the RAG utilities, if they are available."""
+    try:
+        from utils.firestore_client import initialize_firebase as initialize_firestore
+    except ImportError:
+        try:
+            from concierge.utils.firestore_client import initialize_firebase as initialize_firestore
+        except ImportError as e:
+            logger.error(f"Failed to import Firebase utilities: {e}")
+            return False
+    return initialize_firestore()
 
 # --- Event Type Detection ---
 def detect_event_type(event):
@@ -197,6 +274,8 @@ def lambda_handler(event, context):
     # Detect event type
     event_type = detect_event_type(event)
     logger.info(f"Detected event type: {event_type}")
+    record_invocation('consolidated_call_handler',
+                      event.get('requestContext', {}).get('routeKey') or event_type, _INIT_STARTED_AT)
 
     if event_type == 'telnyx':
         return handle_telnyx_event(event, context)
@@ -376,8 +455,8 @@ def handle_websocket_event(event, context):
         status_code = 200 if route_key == '$disconnect' else 500
         return {'statusCode': status_code, 'body': 'Internal server configuration error.'}
 
-    # Use asyncio.run to handle the async logic
-    return asyncio.run(_process_websocket_event(event, context))
+    # Run the async logic on the environment's long-lived event loop
+    return run_async(_process_websocket_event(event, context))
 
 async def _process_websocket_event(event, _):
     """Asynchronous handler for processing WebSocket events."""
@@ -444,8 +523,8 @@ async def _process_websocket_event(event, _):
                 message_type = message_data.get('type', '')
                 payload = message_data.get('payload', {})
 
-                # Create API Gateway management client for responses
-                apigw_management = boto3.client('apigatewaymanagementapi', endpoint_url=endpoint_url)
+                # API Gateway management client for responses (created once per endpoint)
+                apigw_management = get_apigw_management_client(endpoint_url)
 
                 # Handle different message types
                 if message_type == 'auth':
@@ -550,7 +629,7 @@ async def handle_websocket_auth(connection_id, payload, apigw_management, messag
 
 async def fetch_property_info(property_id):
     """
-    Fetch property information from DynamoDB.
+    Fetch property information from the context bundle, falling back to DynamoDB.
 
     Args:
         property_id (str): The ID of the property
@@ -564,15 +643,24 @@ async def fetch_property_info(property_id):
             logger.error("No property_id provided to fetch_property_info")
             return None
 
+        # Serve the precomputed context bundle when there is one
+        if context_bundle_available:
+            try:
+                bundle = await get_context_bundle(property_id)
+                if bundle and bundle.get('propertyContext'):
+                    logger.info(f"Using context bundle {bundle.get('version')} for property {property_id}")
+                    return dict(bundle['propertyContext'])
+            except Exception as bundle_err:
+                logger.warning(f"Error loading context bundle for property {property_id}: {bundle_err}")
+
         # Get the DynamoDB table name from environment variable
         table_name = os.environ.get('DYNAMODB_TABLE_NAME')
         if not table_name:
             logger.error("DYNAMODB_TABLE_NAME environment variable not set. Cannot fetch property info.")
             return None
 
-        # Initialize DynamoDB resource and table
-        dynamodb_resource = boto3.resource('dynamodb')
-        properties_table = dynamodb_resource.Table(table_name)
+        # Reuse the module-scoped DynamoDB resource and table
+        properties_table = get_table(table_name)
 
         # Query DynamoDB for property info using the correct composite key structure
         try:
@@ -616,7 +704,7 @@ async def fetch_property_info(property_id):
             try:
                 # Get the users table name from environment variable or use the same table
                 users_table_name = os.environ.get('USERS_TABLE_NAME', table_name)
-                users_table = dynamodb_resource.Table(users_table_name)
+                users_table = get_table(users_table_name)
 
                 # Query for the user with this ID
                 user_response = users_table.get_item(
@@ -696,6 +784,9 @@ async def get_conversation_history(connection_id):
     """
     Retrieve conversation history for a connection from DynamoDB.
 
+    Older messages are kept compacted in `history_summary` (see
+    compact_stored_history), which is returned as a leading summary entry.
+
     Args:
         connection_id (str): The WebSocket connection ID
 
@@ -706,21 +797,58 @@ async def get_conversation_history(connection_id):
         # Get conversation history from DynamoDB
         response = connections_table.get_item(
             Key={'connectionId': connection_id},
-            ProjectionExpression="conversation_history"
+            ProjectionExpression="conversation_history, history_summary"
         )
 
         # Check if conversation history exists
-        if 'Item' in response and 'conversation_history' in response['Item']:
-            history = response['Item']['conversation_history']
+        item = response.get('Item') or {}
+        history = list(item.get('conversation_history') or [])
+        if item.get('history_summary'):
+            history.insert(0, {'role': SUMMARY_ROLE, 'text': item['history_summary']})
+        if history:
             logger.info(f"Retrieved {len(history)} conversation history entries for {connection_id}")
-            return history
         else:
             logger.info(f"No conversation history found for {connection_id}")
-            return []
+        return history
     except Exception as e:
         logger.error(f"Error retrieving conversation history: {e}")
         return []
 
+async def compact_stored_history(connection_id, history):
+    """
+    Fold older stored messages into the connection's history summary.
+
+    The write is conditional on the stored list length, so a message appended
+    concurrently is never lost; compaction is retried on a later turn.
+
+    Args:
+        connection_id (str): The WebSocket connection ID
+        history (list): The stored history including the latest messages
+    """
+    summary, messages = split_history(history)
+    compacted_summary, recent = split_history(compact_history(history, connection_id))
+    if compacted_summary == summary and len(recent) == len(messages):
+        return
+
+    try:
+        connections_table.update_item(
+            Key={'connectionId': connection_id},
+            UpdateExpression="SET conversation_history = :recent, history_summary = :summary",
+            ConditionExpression="size(conversation_history) = :stored_count",
+            ExpressionAttributeValues={
+                ':recent': recent,
+                ':summary': compacted_summary,
+                ':stored_count': len(messages)
+            }
+        )
+        logger.info(f"Compacted conversation history for {connection_id}: "
+                    f"{len(messages)} messages -> summary + {len(recent)}")
+    except Exception as e:
+        if 'ConditionalCheckFailed' in str(e):
+            logger.info(f"Conversation history for {connection_id} changed during compaction, will retry later")
+        else:
+            logger.error(f"Error compacting conversation history: {e}")
+
 async def store_conversation_entry(connection_id, role, text, timestamp):
     """
     Store a new conversation entry in DynamoDB.
@@ -755,6 +883,9 @@ async def store_conversation_entry(connection_id, role, text, timestamp):
 
 async def handle_websocket_message(connection_id, payload, apigw_management, message_data):
     """Handle text messages from WebSocket clients."""
+    # Chat messages are the only WebSocket route that needs the AI modules
+    load_ai_modules()
+
     user_message = payload.get('message', '')
     property_id = payload.get('property_id', '')
     logger.info(f"Message from client: {user_message}, property_id from payload: {property_id}")
@@ -788,6 +919,16 @@ async def handle_websocket_message(connection_id, payload, apigw_management, mes
         except Exception as e:
             logger.error(f"Error retrieving data from connections table: {e}")
 
+    # Post the reply as it is generated (or only the final message for non-streaming clients)
+    streaming = stream_requested(payload)
+    streamer = ConnectionStreamer(
+        apigw_management,
+        connection_id,
+        connections_table,
+        timestamp=message_data.get('timestamp', 0),
+        stream=streaming
+    )
+
     # Process the message with RAG if available
     if not property_id:
         response_message = "I don't have any specific information about this property yet. It seems we're missing the property ID. Please try reconnecting or contact support."
@@ -813,14 +954,25 @@ async def handle_websocket_message(connection_id, payload, apigw_management, mes
             conversation_history = await get_conversation_history(connection_id)
             logger.info(f"Retrieved {len(conversation_history)} previous messages for connection {connection_id}")
 
-            # Process with RAG
-            logger.info(f"Processing message with RAG for property_id={property_id}")
-            result = process_query_with_rag(user_message, property_id, property_info, conversation_history)
+            if streaming:
+                # Streamed text chat reply; chunks are posted while Gemini generates, and
+                # streamer.add returning False (connection gone) stops the generation
+                logger.info(f"Streaming reply for property_id={property_id}")
+                result = stream_text_query_with_tools(
+                    user_message,
+                    property_context=property_info,
+                    conversation_history=conversation_history,
+                    on_chunk=lambda text, _: streamer.add(text)
+                )
+            else:
+                # Process with RAG
+                logger.info(f"Processing message with RAG for property_id={property_id}")
+                result = process_query_with_rag(user_message, property_id, property_info, conversation_history)
 
             # Extract the response
             if result and 'response' in result:
                 response_message = result['response']
-                logger.info(f"Successfully processed query with RAG: {len(response_message)} chars")
+                logger.info(f"Successfully generated response: {len(response_message)} chars")
 
                 # Log if we used context
                 if result.get('has_context'):
@@ -828,12 +980,19 @@ async def handle_websocket_message(connection_id, payload, apigw_management, mes
                 else:
                     logger.info("No context items were used from knowledge base")
             else:
-                logger.warning("process_query_with_rag returned no response, using fallback")
+                logger.warning("No response generated, using fallback")
                 response_message = f"I received your message about {property_info.get('name', 'this property')}, but I'm having trouble finding specific information. How else can I assist you?"
 
             # Store the conversation entries
             await store_conversation_entry(connection_id, "user", user_message, timestamp)
-            await store_conversation_entry(connection_id, "assistant", response_message, datetime.now().isoformat())
+            assistant_timestamp = datetime.now().isoformat()
+            await store_conversation_entry(connection_id, "assistant", response_message, assistant_timestamp)
+
+            # Keep the stored history bounded for long chats
+            await compact_stored_history(connection_id, conversation_history + [
+                {'role': 'user', 'text': user_message, 'timestamp': timestamp},
+                {'role': 'assistant', 'text': response_message, 'timestamp': assistant_timestamp}
+            ])
 
         except Exception as e:
             logger.error(f"Error processing message with RAG: {e}")
@@ -847,16 +1006,9 @@ async def handle_websocket_message(connection_id, payload, apigw_management, mes
         # Neither RAG nor Gemini available
         response_message = "I received your message, but I'm not able to process it at the moment. Please try again later."
 
-    # Send response back to client
-    apigw_management.post_to_connection(
-        ConnectionId=connection_id,
-        Data=json.dumps({
-            "type": "message",
-            "payload": {"message": response_message},
-            "timestamp": message_data.get('timestamp', 0)
-        }).encode('utf-8')
-    )
-    logger.info(f"Sent AI response to {connection_id}")
+    # Send the final response (any remaining streamed text first); a gone
+    # connection is removed from the table by the streamer
+    streamer.finish(response_message)
 
     return {'statusCode': 200, 'body': 'Message processed.'}
 
@@ -932,7 +1084,7 @@ def handle_call_initiated(call_control_id, payload):
             try:
                 # Get the table name from environment variable
                 table_name = os.environ.get('DYNAMODB_TABLE_NAME')
-                table = dynamodb_client.Table(table_name)
+                table = get_table(table_name)
 
                 # Get current time for active reservation check
                 now_utc = datetime.now(timezone.utc).isoformat()
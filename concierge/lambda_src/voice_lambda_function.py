@@ -36,12 +36,32 @@ def configure_telnyx():
         return False
 
 # --- Gemini Configuration ---
+# Shared pooled client from the gemini_clients registry, so warm invocations reuse its HTTP connection
+try:
+    from utils.gemini_clients import get_genai_client as _get_shared_genai_client
+except ImportError:
+    try:
+        from concierge.utils.gemini_clients import get_genai_client as _get_shared_genai_client
+    except ImportError:
+        print("Warning: Could not import gemini_clients. Using a module-scoped Gemini client.")
+        _get_shared_genai_client = None
+
+_genai_client = None
+
+def get_genai_client():
+    global _genai_client
+    if _get_shared_genai_client is not None:
+        return _get_shared_genai_client(os.environ.get('GEMINI_API_KEY'))
+    if _genai_client is None:
+        _genai_client = genai.Client(api_key=os.environ.get('GEMINI_API_KEY'))
+    return _genai_client
+
 def configure_gemini():
     gemini_api_key = os.environ.get('GEMINI_API_KEY')
     if gemini_api_key:
         try:
-            # Test creating a client with the new SDK
-            client = genai.Client(api_key=gemini_api_key)
+            # Create the shared client with the new SDK
+            client = get_genai_client()
             print("Gemini API Key configured with new SDK.")
             return True
         except Exception as e:
@@ -204,11 +224,11 @@ def calculate_cosine_similarity(vec1, vec2):
 def get_gemini_greeting():
     """Generates a welcome greeting using the Gemini API."""
     try:
-        # Use the specific stable model name
-        model = genai.GenerativeModel('gemini-2.0-flash')
+        # Use the specific stable model name on the shared client
+        client = get_genai_client()
         prompt = "Generate a short, friendly, and professional welcome message for someone calling a premium concierge phone service. Start with a greeting like Hello or Welcome."
         print(f"Generating Gemini response with prompt: '{prompt}'")
-        response = model.generate_content(prompt)
+        response = client.models.generate_content(model='gemini-2.0-flash', contents=prompt)
         # Basic check for response content
         if response.text:
             print(f"Gemini generated greeting: '{response.text}'")
@@ -301,7 +321,7 @@ def lambda_handler(event, context):
 
             # 2. Generate Embedding using Gemini
             print(f"Generating embedding for QnA item: {qna_id}")
-            client = genai.Client(api_key=os.environ.get('GEMINI_API_KEY'))
+            client = get_genai_client()
             embedding_result = client.models.embed_content(
                 model=GEMINI_EMBEDDING_MODEL,
                 contents=[text_to_embed], # API expects a list
@@ -568,7 +588,7 @@ def lambda_handler(event, context):
                                 try:
                                     print(f"Generating query vector using Gemini ({GEMINI_EMBEDDING_MODEL}) for: '{message_text[:50]}...' ")
                                     # Embed the incoming message text using the Gemini API
-                                    client = genai.Client(api_key=os.environ.get('GEMINI_API_KEY'))
+                                    client = get_genai_client()
                                     embedding_result = client.models.embed_content(
                                         model=GEMINI_EMBEDDING_MODEL,
                                         contents=[message_text], # API expects a list of texts
@@ -716,9 +736,9 @@ Answer:"""
                     # Call LLM (Gemini)
                     print("Generating response with RAG context using Gemini...")
                     # Ensure Gemini is configured before trying to use the model object
-                    if genai.GenerativeModel: # Check if genai was configured successfully
-                        llm = genai.GenerativeModel('gemini-2.0-flash')
-                        llm_response = llm.generate_content(rag_prompt)
+                    client = get_genai_client()
+                    if client: # Check if genai was configured successfully
+                        llm_response = client.models.generate_content(model='gemini-2.0-flash', contents=rag_prompt)
 
                         # Add more robust response handling
                         try:
@@ -1,13 +1,12 @@
-import boto3
+import time
+_INIT_STARTED_AT = time.perf_counter()
+
 import os
 import json
 import logging
-import google.genai as genai
-# Keep legacy import for backward compatibility
-import google.generativeai as legacy_genai
 import traceback
 import sys
-import time
+import asyncio
 from datetime import datetime
 
 # Add multiple potential paths to find utils
@@ -22,82 +21,144 @@ parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
-# Import RAG functionality with fallback
-rag_available = False
+# Module-scoped AWS clients and event loop, reused by warm invocations
+try:
+    from utils.lambda_runtime import (
+        get_dynamodb_resource, get_table, get_apigw_management_client, run_async, record_invocation
+    )
+except ImportError:
+    from concierge.utils.lambda_runtime import (
+        get_dynamodb_resource, get_table, get_apigw_management_client, run_async, record_invocation
+    )
+
+# Chat replies are posted to the connection as they are generated
 try:
-    # First try direct import (might work if utils is at same level as lambda_src)
-    from utils.ai_helpers import process_query_with_rag, generate_embedding, format_prompt_with_rag
-    rag_available = True
-    print("Successfully imported RAG utilities from utils.ai_helpers")
+    from utils.apigw_streaming import ConnectionStreamer, stream_requested
 except ImportError:
-    # Try relative import (for when lambda_src and utils are siblings)
+    from concierge.utils.apigw_streaming import ConnectionStreamer, stream_requested
+
+# google-genai, firebase_admin and ai_helpers (numpy) are only needed to answer chat
+# messages; they are imported by load_ai_modules() on the first message instead of
+# during init, so $connect, $disconnect, auth and ping stay fast on a cold start.
+genai = None
+rag_available = False
+firebase_available = False
+context_bundle_available = False
+_ai_modules_loaded = False
+
+def load_ai_modules():
+    """Import the AI, Firestore and history modules on first use (once per environment)."""
+    global genai, rag_available, firebase_available, context_bundle_available, _ai_modules_loaded
+    global process_query_with_rag, generate_embedding, format_prompt_with_rag
+    global initialize_firebase, get_firestore_client, get_context_bundle
+    global compact_history, format_history_lines, split_history, SUMMARY_ROLE
+    if _ai_modules_loaded:
+        return
+    started_at = time.perf_counter()
+
+    import google.genai as genai
+
+    # Import RAG functionality with fallback
+    rag_available = False
     try:
-        import sys
-        sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+        # First try direct import (might work if utils is at same level as lambda_src)
         from utils.ai_helpers import process_query_with_rag, generate_embedding, format_prompt_with_rag
         rag_available = True
-        print("Successfully imported RAG utilities via relative path")
-    except ImportError as e:
-        # Try alternative import path for both Lambda handler paths
+        print("Successfully imported RAG utilities from utils.ai_helpers")
+    except ImportError:
+        # Try relative import (for when lambda_src and utils are siblings)
         try:
-            # Try as if the handler is: lambda_src.websocket_lambda_function.lambda_handler
-            import utils.ai_helpers
-            process_query_with_rag = utils.ai_helpers.process_query_with_rag
-            generate_embedding = utils.ai_helpers.generate_embedding
-            format_prompt_with_rag = utils.ai_helpers.format_prompt_with_rag
+            sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+            from utils.ai_helpers import process_query_with_rag, generate_embedding, format_prompt_with_rag
             rag_available = True
-            print("Successfully imported RAG utilities via alternative path 1")
-        except ImportError:
+            print("Successfully imported RAG utilities via relative path")
+        except ImportError as e:
+            # Try alternative import path for both Lambda handler paths
             try:
-                # Try as if we're inside the lambda_src directory
-                import importlib.util
-                print(f"Current working directory: {os.getcwd()}")
-                print(f"Directory contents: {os.listdir('.')}")
-                print(f"Parent directory contents: {os.listdir('..')}")
-
-                # Last resort - try to construct the path manually
-                if os.path.exists("../utils/ai_helpers.py"):
-                    spec = importlib.util.spec_from_file_location("ai_helpers", "../utils/ai_helpers.py")
-                    ai_helpers = importlib.util.module_from_spec(spec)
-                    spec.loader.exec_module(ai_helpers)
-
-                    process_query_with_rag = ai_helpers.process_query_with_rag
-                    generate_embedding = ai_helpers.generate_embedding
-                    format_prompt_with_rag = ai_helpers.format_prompt_with_rag
-                    rag_available = True
-                    print("Successfully imported RAG utilities via file location")
-                else:
-                    print("Could not find ai_helpers.py in expected locations")
+                # Try as if the handler is: lambda_src.websocket_lambda_function.lambda_handler
+                import utils.ai_helpers
+                process_query_with_rag = utils.ai_helpers.process_query_with_rag
+                generate_embedding = utils.ai_helpers.generate_embedding
+                format_prompt_with_rag = utils.ai_helpers.format_prompt_with_rag
+                rag_available = True
+                print("Successfully imported RAG utilities via alternative path 1")
+            except ImportError:
+                try:
+                    # Try as if we're inside the lambda_src directory
+                    import importlib.util
+                    print(f"Current working directory: {os.getcwd()}")
+                    print(f"Directory contents: {os.listdir('.')}")
+                    print(f"Parent directory contents: {os.listdir('..')}")
+
+                    # Last resort - try to construct the path manually
+                    if os.path.exists("../utils/ai_helpers.py"):
+                        spec = importlib.util.spec_from_file_location("ai_helpers", "../utils/ai_helpers.py")
+                        ai_helpers = importlib.util.module_from_spec(spec)
+                        spec.loader.exec_module(ai_helpers)
+
+                        process_query_with_rag = ai_helpers.process_query_with_rag
+                        generate_embedding = ai_helpers.generate_embedding
+                        format_prompt_with_rag = ai_helpers.format_prompt_with_rag
+                        rag_available = True
+                        print("Successfully imported RAG utilities via file location")
+                    else:
+                        print("Could not find ai_helpers.py in expected locations")
+                        rag_available = False
+                except Exception as final_e:
+                    print(f"Final import attempt failed: {str(final_e)}")
+                    print(f"Current sys.path: {sys.path}")
+                    print("Will use fallback implementation")
                     rag_available = False
-            except Exception as final_e:
-                print(f"Final import attempt failed: {str(final_e)}")
-                print(f"Current sys.path: {sys.path}")
-                print("Will use fallback implementation")
-                rag_available = False
 
-# Import Firebase functionality with fallback
-firebase_available = False
-try:
-    # First try direct import
-    from utils.firestore_client import initialize_firebase, get_firestore_client
-    firebase_available = True
-    print("Successfully imported Firebase utilities from utils.firestore_client")
-except ImportError:
-    # Try relative import
+    # Import Firebase functionality with fallback
+    firebase_available = False
     try:
-        from concierge.utils.firestore_client import initialize_firebase, get_firestore_client
+        # First try direct import
+        from utils.firestore_client import initialize_firebase, get_firestore_client
         firebase_available = True
-        print("Successfully imported Firebase utilities via relative path")
-    except ImportError as e:
-        print(f"Failed to import Firebase utilities: {e}")
-        firebase_available = False
+        print("Successfully imported Firebase utilities from utils.firestore_client")
+    except ImportError:
+        # Try relative import
+        try:
+            from concierge.utils.firestore_client import initialize_firebase, get_firestore_client
+            firebase_available = True
+            print("Successfully imported Firebase utilities via relative path")
+        except ImportError as e:
+            print(f"Failed to import Firebase utilities: {e}")
+            firebase_available = False
+
+    # Import precomputed property context bundles with fallback
+    context_bundle_available = False
+    try:
+        from utils.async_firestore_client import get_context_bundle
+        context_bundle_available = True
+        print("Successfully imported context bundles from utils.async_firestore_client")
+    except ImportError:
+        try:
+            from concierge.utils.async_firestore_client import get_context_bundle
+            context_bundle_available = True
+            print("Successfully imported context bundles via relative path")
+        except ImportError as e:
+            print(f"Context bundles unavailable, property info will be read from DynamoDB: {e}")
+            context_bundle_available = False
+
+    # Import conversation history compaction with fallback
+    try:
+        from utils.conversation_history import compact_history, format_history_lines, split_history, SUMMARY_ROLE
+        print("Successfully imported history compaction from utils.conversation_history")
+    except ImportError:
+        from concierge.utils.conversation_history import compact_history, format_history_lines, split_history, SUMMARY_ROLE
+        print("Successfully imported history compaction via relative path")
+
+    _ai_modules_loaded = True
+    logger.info(f"Loaded AI modules in {(time.perf_counter() - started_at) * 1000:.0f} ms")
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # Initialize DynamoDB client (outside handler for potential reuse)
-dynamodb = boto3.resource('dynamodb')
+dynamodb = get_dynamodb_resource()
 connections_table = None
 table_name = os.getenv('CONNECTIONS_TABLE_NAME')
 
@@ -152,6 +213,16 @@ env_status = check_env_variables()
 if not env_status:
     logger.warning("Some required environment variables are missing - functionality may be limited")
 
+# Client is module-scoped so warm invocations reuse its HTTP connection
+_genai_client = None
+
+def get_genai_client():
+    global _genai_client
+    if _genai_client is None:
+        load_ai_modules()
+        _genai_client = genai.Client(api_key=os.environ.get('GEMINI_API_KEY'))
+    return _genai_client
+
 def configure_gemini():
     global gemini_initialized
     gemini_api_key = os.environ.get('GEMINI_API_KEY')
@@ -159,7 +230,7 @@ def configure_gemini():
     if gemini_api_key:
         try:
             # For the new google-genai SDK, we don't need to configure globally
-            # The client is created per request with the API key
+            # The client is created lazily by get_genai_client() and reused
             logger.info("Gemini API Key available for new SDK.")
             gemini_initialized = True
             return True
@@ -178,10 +249,9 @@ configure_gemini()
 
 if table_name:
     try:
-        connections_table = dynamodb.Table(table_name)
-        # Optional: Make a simple call to check if table exists/is accessible
-        connections_table.load()
-        logger.info(f"Successfully connected to DynamoDB table: {table_name}")
+        # No DescribeTable round trip during init; access errors surface on the first read or write
+        connections_table = get_table(table_name)
+        logger.info(f"Using DynamoDB table: {table_name}")
     except Exception as e:
         logger.error(f"Failed to connect to DynamoDB table '{table_name}': {e}. WebSocket functionality will be impaired.")
         connections_table = None # Ensure it's None if connection failed
@@ -190,7 +260,7 @@ else:
 
 async def fetch_property_info(property_id):
     """
-    Fetch property information from DynamoDB.
+    Fetch property information from the context bundle, falling back to DynamoDB.
 
     Args:
         property_id (str): The ID of the property
@@ -204,15 +274,24 @@ async def fetch_property_info(property_id):
             logger.error("No property_id provided to fetch_property_info")
             return None
 
+        # Serve the precomputed context bundle when there is one
+        if context_bundle_available:
+            try:
+                bundle = await get_context_bundle(property_id)
+                if bundle and bundle.get('propertyContext'):
+                    logger.info(f"Using context bundle {bundle.get('version')} for property {property_id}")
+                    return dict(bundle['propertyContext'])
+            except Exception as bundle_err:
+                logger.warning(f"Error loading context bundle for property {property_id}: {bundle_err}")
+
         # Get the DynamoDB table name from environment variable
         table_name = os.environ.get('DYNAMODB_TABLE_NAME')
         if not table_name:
             logger.error("DYNAMODB_TABLE_NAME environment variable not set. Cannot fetch property info.")
             return None
 
-        # Initialize DynamoDB resource and table
-        dynamodb_resource = boto3.resource('dynamodb')
-        properties_table = dynamodb_resource.Table(table_name)
+        # Reuse the module-scoped DynamoDB resource and table
+        properties_table = get_table(table_name)
 
         # Query DynamoDB for property info using the correct composite key structure
         try:
@@ -256,7 +335,7 @@ async def fetch_property_info(property_id):
             try:
                 # Get the users table name from environment variable or use the same table
                 users_table_name = os.environ.get('USERS_TABLE_NAME', table_name)
-                users_table = dynamodb_resource.Table(users_table_name)
+                users_table = get_table(users_table_name)
 
                 # Query for the user with this host ID
                 user_response = users_table.get_item(
@@ -353,8 +432,8 @@ async def fetch_property_info(property_id):
         traceback.print_exc()
         return None
 
-async def process_with_rag(connection_id, _, property_id, message, logger, guest_name="", system_prompt=""):
-    """Process a message using the RAG system."""
+async def process_with_rag(connection_id, _, property_id, message, logger, guest_name="", system_prompt="", streamer=None):
+    """Process a message using the RAG system, streaming the reply through `streamer` when given."""
     try:
         # Get timestamp for conversation history
         timestamp = datetime.now().isoformat()
@@ -413,11 +492,18 @@ async def process_with_rag(connection_id, _, property_id, message, logger, guest
 
         # Process the response with the language model
         ai_response = await generate_response_with_model(
-            property_id, message, response, conversation_history, system_prompt)
+            property_id, message, response, conversation_history, system_prompt, streamer)
 
         # Store the new conversation entries
         await store_conversation_entry(connection_id, "user", message, timestamp)
-        await store_conversation_entry(connection_id, "assistant", ai_response, datetime.now().isoformat())
+        assistant_timestamp = datetime.now().isoformat()
+        await store_conversation_entry(connection_id, "assistant", ai_response, assistant_timestamp)
+
+        # Keep the stored history bounded for long chats
+        await compact_stored_history(connection_id, conversation_history + [
+            {'role': 'user', 'text': message, 'timestamp': timestamp},
+            {'role': 'assistant', 'text': ai_response, 'timestamp': assistant_timestamp}
+        ])
 
         return ai_response
     except Exception as e:
@@ -432,6 +518,10 @@ async def get_conversation_history(connection_id):
     """
     Retrieve conversation history for a connection from DynamoDB.
 
+    The stored history is kept compacted by compact_stored_history: messages
+    older than the verbatim window live in `history_summary`, which is returned
+    as a leading summary entry.
+
     Args:
         connection_id (str): The WebSocket connection ID
 
@@ -442,20 +532,59 @@ async def get_conversation_history(connection_id):
         # Get conversation history from DynamoDB
         response = connections_table.get_item(
             Key={'connectionId': connection_id},
-            ProjectionExpression="conversation_history"
+            ProjectionExpression="conversation_history, history_summary"
         )
 
         # Extract conversation history if it exists
-        if 'Item' in response and 'conversation_history' in response['Item']:
-            return response['Item']['conversation_history']
-        else:
+        item = response.get('Item') or {}
+        history = list(item.get('conversation_history') or [])
+        if item.get('history_summary'):
+            history.insert(0, {'role': SUMMARY_ROLE, 'text': item['history_summary']})
+        if not history:
             logger.info(f"No conversation history found for connection {connection_id}")
-            return []
+        return history
     except Exception as e:
         logger.error(f"Error retrieving conversation history: {e}")
         traceback.print_exc()
         return []
 
+async def compact_stored_history(connection_id, history):
+    """
+    Fold older stored messages into the connection's history summary.
+
+    Keeps the stored list (and therefore every later read and prompt) bounded
+    for long chats. The write is conditional on the stored list length, so a
+    message appended concurrently is never lost; compaction is simply retried
+    on a later turn.
+
+    Args:
+        connection_id (str): The WebSocket connection ID
+        history (list): The stored history including the latest messages
+    """
+    summary, messages = split_history(history)
+    compacted_summary, recent = split_history(compact_history(history, connection_id))
+    if compacted_summary == summary and len(recent) == len(messages):
+        return
+
+    try:
+        connections_table.update_item(
+            Key={'connectionId': connection_id},
+            UpdateExpression="SET conversation_history = :recent, history_summary = :summary",
+            ConditionExpression="size(conversation_history) = :stored_count",
+            ExpressionAttributeValues={
+                ':recent': recent,
+                ':summary': compacted_summary,
+                ':stored_count': len(messages)
+            }
+        )
+        logger.info(f"Compacted conversation history for {connection_id}: "
+                    f"{len(messages)} messages -> summary + {len(recent)}")
+    except Exception as e:
+        if 'ConditionalCheckFailed' in str(e):
+            logger.info(f"Conversation history for {connection_id} changed during compaction, will retry later")
+        else:
+            logger.error(f"Error compacting conversation history: {e}")
+
 async def store_conversation_entry(connection_id, role, text, timestamp):
     """
     Store a new conversation entry in DynamoDB.
@@ -489,7 +618,33 @@ async def store_conversation_entry(connection_id, role, text, timestamp):
         logger.error(f"Error storing conversation entry: {e}")
         traceback.print_exc()
 
-async def process_with_gemini_fallback(message, conversation_history=None, property_info=None, property_id=None, system_prompt=None):
+def _generate_reply(client, prompt, config=None, streamer=None):
+    """
+    Generate a reply with gemini-2.0-flash.
+
+    With a streamer the reply is generated with generate_content_stream and each
+    piece of text is handed to the streamer as it arrives; generation stops early
+    if the guest's connection is gone.
+    """
+    kwargs = {'model': 'gemini-2.0-flash', 'contents': prompt}
+    if config is not None:
+        kwargs['config'] = config
+
+    if streamer is None:
+        response = client.models.generate_content(**kwargs)
+        return response.text if response and hasattr(response, 'text') else None
+
+    text_parts = []
+    for chunk in client.models.generate_content_stream(**kwargs):
+        text = getattr(chunk, 'text', None)
+        if text:
+            text_parts.append(text)
+            if not streamer.add(text):
+                logger.info("Connection gone, stopping reply generation")
+                break
+    return ''.join(text_parts)
+
+async def process_with_gemini_fallback(message, conversation_history=None, property_info=None, property_id=None, system_prompt=None, streamer=None):
     """Process a message with Gemini as a fallback when no RAG context is available."""
     try:
         # Ensure Gemini is configured
@@ -528,17 +683,10 @@ async def process_with_gemini_fallback(message, conversation_history=None, prope
             if conversation_history and len(conversation_history) > 0:
                 conversation_context = "\n\nPREVIOUS CONVERSATION:\n"
 
-                # Only include the actual conversation messages, not the system prompt
-                for message_entry in conversation_history:
-                    role = message_entry.get('role', '')
-                    text = message_entry.get('text', '')
-
-                    # Skip empty messages or system messages
-                    if not role or not text or role.lower() == 'system':
-                        continue
-
-                    # Add the message to the conversation context
-                    conversation_context += f"{role.upper()}: {text}\n"
+                # Only include the actual conversation messages (and the summary of older ones)
+                conversation_context += format_history_lines(
+                    compact_history(conversation_history), user_label='USER', assistant_label='ASSISTANT'
+                )
 
                 # Only add conversation context if there are actual messages
                 if conversation_context != "\n\nPREVIOUS CONVERSATION:\n":
@@ -630,17 +778,10 @@ async def process_with_gemini_fallback(message, conversation_history=None, prope
                 if conversation_history and len(conversation_history) > 0:
                     conversation_context = "PREVIOUS CONVERSATION:\n"
 
-                    # Only include the actual conversation messages, not the system prompt
-                    for message_entry in conversation_history:
-                        role = message_entry.get('role', '')
-                        text = message_entry.get('text', '')
-
-                        # Skip empty messages or system messages
-                        if not role or not text or role.lower() == 'system':
-                            continue
-
-                        # Add the message to the conversation context
-                        conversation_context += f"{role.upper()}: {text}\n"
+                    # Only include the actual conversation messages (and the summary of older ones)
+                    conversation_context += format_history_lines(
+                        compact_history(conversation_history), user_label='USER', assistant_label='ASSISTANT'
+                    )
 
                     # Only add conversation context if there are actual messages
                     if conversation_context != "PREVIOUS CONVERSATION:\n":
@@ -655,41 +796,43 @@ async def process_with_gemini_fallback(message, conversation_history=None, prope
 
         # Generate response from Gemini with Google Search tool using new SDK
         try:
-            # Create client with the new google-genai SDK
-            logger.info("Initializing Google GenAI client with Google Search tool")
+            # Shared client with the new google-genai SDK
+            logger.info("Calling Google GenAI client with Google Search tool")
             
-            client = genai.Client(api_key=os.environ.get('GEMINI_API_KEY'))
+            client = get_genai_client()
             
             # Use the new SDK syntax for Google Search
-            response = client.models.generate_content(
-                model='gemini-2.0-flash',
-                contents=prompt,
+            response_text = _generate_reply(
+                client,
+                prompt,
                 config=genai.types.GenerateContentConfig(
                     tools=[genai.types.Tool(google_search=genai.types.GoogleSearch())]
-                )
+                ),
+                streamer=streamer
             )
             
             logger.info("Successfully called Gemini with Google Search tool using new SDK")
 
         except Exception as tool_error:
-            # Fallback to regular generation if Google Search tool fails
-            logger.warning(f"Google Search tool failed: {tool_error}")
-            logger.info("Falling back to regular Gemini generation")
-            
-            try:
-                # Create client for fallback
-                client = genai.Client(api_key=os.environ.get('GEMINI_API_KEY'))
-                response = client.models.generate_content(
-                    model='gemini-2.0-flash',
-                    contents=prompt
-                )
-            except Exception as fallback_error:
-                logger.error(f"Fallback generation also failed: {fallback_error}")
-                raise fallback_error
+            if streamer is not None and streamer.chunks_sent:
+                # Part of the reply already reached the guest; keep what was sent
+                logger.error(f"Reply stream interrupted after {streamer.chunks_sent} chunks: {tool_error}")
+                response_text = streamer.text
+            else:
+                # Fallback to regular generation if Google Search tool fails
+                logger.warning(f"Google Search tool failed: {tool_error}")
+                logger.info("Falling back to regular Gemini generation")
 
-        # Extract text from response
-        if response and hasattr(response, 'text'):
-            response_text = response.text
+                try:
+                    # Same shared client for fallback
+                    client = get_genai_client()
+                    response_text = _generate_reply(client, prompt, streamer=streamer)
+                except Exception as fallback_error:
+                    logger.error(f"Fallback generation also failed: {fallback_error}")
+                    raise fallback_error
+
+        # Check the generated text
+        if response_text:
             logger.info(f"Fallback Gemini response length: {len(response_text)}")
 
             # Log a preview of the response (truncated if very long)
@@ -700,7 +843,7 @@ async def process_with_gemini_fallback(message, conversation_history=None, prope
 
             return response_text
         else:
-            logger.error(f"Empty or invalid response from fallback Gemini: {response}")
+            logger.error("Empty or invalid response from fallback Gemini")
             return "I'm sorry, I don't have enough information to assist with that. Is there something else I can help with?"
 
     except Exception as e:
@@ -745,11 +888,13 @@ async def get_relevant_context(query_text, property_id, similarity_threshold=0.2
             'error': str(e)
         }
 
-async def generate_response_with_model(property_id, message, rag_results, conversation_history=None, system_prompt=None):
+async def generate_response_with_model(property_id, message, rag_results, conversation_history=None, system_prompt=None, streamer=None):
     """
     Generate a response using the language model with RAG results.
 
     This function serves as a bridge between the RAG system and the final response.
+    Both RAG and Gemini fallback replies are streamed through `streamer` when one
+    is given.
     """
     try:
         # Get the property info (may have been passed earlier)
@@ -772,22 +917,41 @@ async def generate_response_with_model(property_id, message, rag_results, conver
         if rag_results and rag_results.get('found', False):
             logger.info(f"Using RAG context with {len(rag_results.get('items', []))} items")
 
-            # Import the function if available
-            from utils.ai_helpers import process_query_with_rag
+            from utils.ai_helpers import format_prompt_with_rag
 
-            # Process with RAG, passing conversation history and system prompt
-            result = process_query_with_rag(message, property_id, property_info, conversation_history, system_prompt)
-            logger.info("Successfully processed query with RAG")
+            # Build the RAG prompt and generate the reply, streaming it like the fallback path
+            prompt = format_prompt_with_rag(message, property_info, rag_results, conversation_history)
+            if system_prompt:
+                prompt = f"{system_prompt}\n\n{prompt}"
 
-            # Extract the text response
-            if result and 'response' in result:
-                return result['response']
-            else:
-                logger.warning("process_query_with_rag returned no response, falling back to Gemini")
-                return await process_with_gemini_fallback(message, conversation_history, property_info, property_id, system_prompt)
+            configure_gemini()
+            client = get_genai_client()
+            try:
+                response_text = _generate_reply(
+                    client,
+                    prompt,
+                    config=genai.types.GenerateContentConfig(
+                        tools=[genai.types.Tool(google_search=genai.types.GoogleSearch())]
+                    ),
+                    streamer=streamer
+                )
+            except Exception as tool_error:
+                if streamer is not None and streamer.chunks_sent:
+                    # Part of the reply already reached the guest; keep what was sent
+                    logger.error(f"RAG reply stream interrupted after {streamer.chunks_sent} chunks: {tool_error}")
+                    response_text = streamer.text
+                else:
+                    logger.warning(f"Google Search tool failed for RAG reply, retrying without it: {tool_error}")
+                    response_text = _generate_reply(client, prompt, streamer=streamer)
+
+            if response_text:
+                logger.info("Successfully processed query with RAG")
+                return response_text
+            logger.warning("RAG generation returned no response, falling back to Gemini")
+            return await process_with_gemini_fallback(message, conversation_history, property_info, property_id, system_prompt, streamer)
         else:
             logger.info("No RAG context found, using Gemini fallback")
-            return await process_with_gemini_fallback(message, conversation_history, property_info, property_id, system_prompt)
+            return await process_with_gemini_fallback(message, conversation_history, property_info, property_id, system_prompt, streamer)
     except Exception as e:
         logger.error(f"Error generating response with model: {e}")
         traceback.print_exc()
@@ -802,9 +966,11 @@ def lambda_handler(event, context):
         status_code = 200 if route_key == '$disconnect' else 500
         return {'statusCode': status_code, 'body': 'Internal server configuration error.'}
 
-    # Use asyncio.run to handle the async logic
-    import asyncio
-    return asyncio.run(_process_event(event, context))
+    record_invocation('websocket_lambda_function', event.get('requestContext', {}).get('routeKey', 'unknown'),
+                      _INIT_STARTED_AT)
+
+    # Run the async logic on the environment's long-lived event loop
+    return run_async(_process_event(event, context))
 
 async def _process_event(event, _):
     """Asynchronous handler for processing WebSocket events."""
@@ -874,8 +1040,8 @@ async def _process_event(event, _):
                 message_type = message_data.get('type', '')
                 payload = message_data.get('payload', {})
 
-                # Create API Gateway management client for responses
-                apigw_management = boto3.client('apigatewaymanagementapi', endpoint_url=endpoint_url)
+                # API Gateway management client for responses (created once per endpoint)
+                apigw_management = get_apigw_management_client(endpoint_url)
 
                 # Get or set property ID in connection attributes
                 property_id = None
@@ -957,6 +1123,9 @@ async def _process_event(event, _):
                     logger.info(f"Sent auth_success to {connection_id}")
 
                 elif message_type == 'message':
+                    # Chat messages are the only route that needs the AI modules
+                    load_ai_modules()
+
                     # Handle regular message
                     user_message = payload.get('message', '')
                     # Try to get property_id from message payload first
@@ -993,6 +1162,15 @@ async def _process_event(event, _):
                         except Exception as e:
                             logger.error(f"Error retrieving data from connections table: {e}")
 
+                    # Post the reply as it is generated (or only the final message for non-streaming clients)
+                    streamer = ConnectionStreamer(
+                        apigw_management,
+                        connection_id,
+                        connections_table,
+                        timestamp=message_data.get('timestamp', 0),
+                        stream=stream_requested(payload)
+                    )
+
                     if not property_id:
                         logger.warning("No property_id available for processing. Using fallback.")
                         # Since no property_id, create special error message for the user
@@ -1010,7 +1188,7 @@ async def _process_event(event, _):
                             logger.warning(f"Could not fetch property info: {e}")
 
                         # Use RAG to generate a response
-                        response_message = await process_with_rag(connection_id, connection_id, property_id, user_message, logger, guest_name, system_prompt)
+                        response_message = await process_with_rag(connection_id, connection_id, property_id, user_message, logger, guest_name, system_prompt, streamer)
 
                         # If response indicates no context, send a more helpful error
                         if isinstance(response_message, str) and "I don't have that specific information" in response_message:
@@ -1020,16 +1198,9 @@ async def _process_event(event, _):
                         logger.warning("Gemini not configured, using fallback response")
                         response_message = "I received your message, but I'm not able to process it at the moment. Please try again later."
 
-                    # Send response back to client
-                    apigw_management.post_to_connection(
-                        ConnectionId=connection_id,
-                        Data=json.dumps({
-                            "type": "message",
-                            "payload": {"message": response_message},
-                            "timestamp": message_data.get('timestamp', 0)
-                        }).encode('utf-8')
-                    )
-                    logger.info(f"Sent AI response to {connection_id}")
+                    # Send the final response (any remaining streamed text first); a gone
+                    # connection is removed from the table by the streamer
+                    streamer.finish(response_message)
 
                 elif message_type == 'ping':
                     # Handle ping message (for connection keepalive)
@@ -2,6 +2,7 @@ from flask import request, session, current_app
 from flask_socketio import emit, disconnect, join_room, leave_room
 from functools import wraps
 import traceback # For logging
+import uuid
 from datetime import datetime, timezone
 from google.cloud.firestore_v1.base_query import FieldFilter
 
@@ -13,8 +14,14 @@ from flask_socketio import SocketIO # For type hinting
 
 # We also need access to shared state and utilities
 from concierge.auth.utils import verify_token # For token verification
-from concierge.utils.firestore_client import get_firestore_db, get_property # Import Firestore client
-from concierge.utils.ai_helpers import process_text_query_with_tools # Import text chat processing function
+from concierge.utils.firestore_client import get_firestore_db # Import Firestore client
+from concierge.utils.context_bundle import get_context_bundle
+from concierge.utils.conversation_history import compact_history
+from concierge.utils.ai_helpers import process_text_query_with_tools, stream_text_query_with_tools # Import text chat processing functions
+from concierge.utils.async_runtime import run_blocking # Offloads blocking calls under async workers
+from concierge.utils.import_jobs import (
+    set_socketio as set_import_jobs_socketio, get_import_job, import_job_room, serialize_import_job
+)
 
 # --- Global state (managed here or passed in/imported if refactored further) ---
 # These dictionaries store runtime state. Consider a more robust state management
@@ -111,7 +118,7 @@ def register_socketio_handlers(socketio: SocketIO):
             # Get user from Firestore to verify existence
             try:
                 from concierge.utils.firestore_client import get_user
-                user_data = get_user(user_id)
+                user_data = run_blocking(get_user, user_id)
 
                 if not user_data:
                     print(f"Socket connection from {sid} rejected: User {user_id} not found in Firestore.")
@@ -696,10 +703,12 @@ def register_socketio_handlers(socketio: SocketIO):
             payload = data.get('payload', {})
             message_text = payload.get('message')
             property_id_from_payload = payload.get('property_id')
+            stream_requested = bool(payload.get('stream'))
         else:
             # Fallback for direct data format
             message_text = data.get('message')
             property_id_from_payload = data.get('property_id')
+            stream_requested = bool(data.get('stream'))
 
         if not message_text:
              print(f"Warning: Received empty text message from {sid} (User: {user_id}).")
@@ -813,9 +822,10 @@ def register_socketio_handlers(socketio: SocketIO):
         # --- END UPDATED ---
 
         # --- IMPLEMENT AI Response Generation (tools-only, no RAG) ---
-        from concierge.utils.ai_helpers import process_text_query_with_tools
-
         assistant_response_text = ""
+        # Streaming clients receive ai_response_chunk events tagged with this id
+        message_id = str(uuid.uuid4()) if stream_requested else None
+        result = {}
 
         if error_message:
             # Personalize error message with user's phone number if available
@@ -843,29 +853,11 @@ def register_socketio_handlers(socketio: SocketIO):
                 property_context = {}
                 property_name = "this property"
                 
-                # Get property from Firestore
-                property_data = get_property(property_id)
-
-                # Extract WiFi details from property data if available
-                if property_data:
-                    wifi_details = property_data.get('wifiDetails', {})
-                    if wifi_details:
-                        property_context = {}
-                        property_context['wifiNetwork'] = wifi_details.get('network', '')
-                        property_context['wifiPassword'] = wifi_details.get('password', '')
-                        print(f"Extracted WiFi details - Network: {property_context.get('wifiNetwork')}, Password: {property_context.get('wifiPassword')}")
-
-                    # Add location information for timezone detection
-                    location_fields = ['address', 'location', 'city', 'state', 'country', 'name', 'timezone']
-                    for field in location_fields:
-                        if field in property_data and property_data[field]:
-                            property_context[field] = property_data[field]
-                        # Also try capitalized versions
-                        cap_field = field.capitalize()
-                        if cap_field in property_data and property_data[cap_field]:
-                            property_context[field] = property_data[cap_field]
-                    
-                    # Add property_id for fallback timezone lookup
+                # Property details and knowledge come from the precomputed context bundle
+                bundle = run_blocking(get_context_bundle, property_id)
+
+                if bundle:
+                    property_context = dict(bundle.get('propertyContext') or {})
                     property_context['property_id'] = property_id
 
                     # Add any relevant reservation details to context
@@ -876,13 +868,13 @@ def register_socketio_handlers(socketio: SocketIO):
                         # Try to get more reservation details from Firestore
                         try:
                             from concierge.utils.firestore_client import get_reservation
-                            reservation_data = get_reservation(reservation_id)
+                            reservation_data = run_blocking(get_reservation, reservation_id)
                             if reservation_data:
-                                # Add check-in and check-out times if available
+                                # Stay dates are added after the shared property prompt
                                 if 'startDate' in reservation_data:
-                                    property_context['checkInTime'] = reservation_data.get('startDate')
+                                    property_context['reservationCheckIn'] = reservation_data.get('startDate')
                                 if 'endDate' in reservation_data:
-                                    property_context['checkOutTime'] = reservation_data.get('endDate')
+                                    property_context['reservationCheckOut'] = reservation_data.get('endDate')
                                 # Add any other useful reservation details
                                 if 'guestName' in reservation_data and not property_context.get('guestName'):
                                     property_context['guestName'] = reservation_data.get('guestName')
@@ -905,13 +897,29 @@ def register_socketio_handlers(socketio: SocketIO):
 
                 # Process query with text chat tools (includes Google Search tool and system prompt)
                 print(f"Processing text query for property {property_id}: '{message_text}'")
-                print(f"[HANDLERS DEBUG] Calling process_text_query_with_tools from ai_helpers")
-                result = process_text_query_with_tools(
-                    message_text,
-                    property_context=property_context,
-                    conversation_history=chat_history,
-                    system_prompt=system_prompt
-                )
+                if stream_requested:
+                    def send_chunk(text, index):
+                        emit('ai_response_chunk', {
+                            'message_id': message_id,
+                            'index': index,
+                            'text': text
+                        }, room=sid)
+
+                    result = stream_text_query_with_tools(
+                        message_text,
+                        property_context=property_context,
+                        conversation_history=chat_history,
+                        system_prompt=system_prompt,
+                        on_chunk=send_chunk
+                    )
+                else:
+                    result = run_blocking(
+                        process_text_query_with_tools,
+                        message_text,
+                        property_context=property_context,
+                        conversation_history=chat_history,
+                        system_prompt=system_prompt
+                    )
 
                 # Use the generated response
                 assistant_response_text = result['response']
@@ -939,9 +947,9 @@ def register_socketio_handlers(socketio: SocketIO):
                     'text': assistant_response_text
                 })
 
-                # Limit history to last 10 messages (5 exchanges) to prevent context overflow
-                if len(conversation_history[sid]) > 10:
-                    conversation_history[sid] = conversation_history[sid][-10:]
+                # Keep recent messages verbatim and fold older ones into a running summary,
+                # so the prompt stays bounded without forgetting the start of the chat
+                conversation_history[sid] = run_blocking(compact_history, conversation_history[sid], sid)
 
                 print(f"Updated conversation history for SID {sid}, now has {len(conversation_history[sid])} messages")
 
@@ -983,7 +991,8 @@ def register_socketio_handlers(socketio: SocketIO):
                             phone_number = property_context.get('guestPhone')
                             print(f"Using phone number from property context: {phone_number}")
 
-                        conversation_id = create_conversation_session(
+                        conversation_id = run_blocking(
+                            create_conversation_session,
                             property_id=property_id,
                             user_id=user_id,
                             guest_name=guest_name,
@@ -1023,14 +1032,16 @@ def register_socketio_handlers(socketio: SocketIO):
                             user_message_data['phone_number'] = phone_number
                             print(f"Including phone number {phone_number} in user message")
 
-                        add_message_to_conversation(
+                        run_blocking(
+                            add_message_to_conversation,
                             conversation_id=conversation_id,
                             property_id=property_id,
                             message_data=user_message_data
                         )
 
                         # Add AI response
-                        add_message_to_conversation(
+                        run_blocking(
+                            add_message_to_conversation,
                             conversation_id=conversation_id,
                             property_id=property_id,
                             message_data={
@@ -1060,7 +1071,15 @@ def register_socketio_handlers(socketio: SocketIO):
         # --- END RAG Implementation ---
 
         print(f"Sending response to SID {sid}: {assistant_response_text}")
-        emit('text_message_from_ai', {'message': assistant_response_text}, room=sid)
+        if message_id:
+            # Final event for streaming clients: full text replaces the streamed bubble, plus token usage
+            emit('ai_response_complete', {
+                'message_id': message_id,
+                'message': assistant_response_text,
+                'usage': result.get('usage', {}),
+                'tool_calls': [call.get('name') for call in result.get('tool_calls', [])]
+            }, room=sid)
+        emit('text_message_from_ai', {'message': assistant_response_text, 'message_id': message_id}, room=sid)
 
     # --- NEW: Tool Configuration Handler ---
     @socketio.on('configure_tools')
@@ -1182,6 +1201,32 @@ def register_socketio_handlers(socketio: SocketIO):
             print(f"Error updating system prompt for SID {sid}: {e}")
             traceback.print_exc()
 
+    # --- Property import job progress ---
+    # Import jobs stream 'import_job_progress' events into a per-job room.
+    set_import_jobs_socketio(socketio)
+
+    @socketio.on('join_import_job')
+    @socketio_authenticated_only
+    def handle_join_import_job(data, user_id):
+        """Subscribe the client to progress events for one of its import jobs."""
+        sid = request.sid
+        job_id = (data or {}).get('job_id')
+        if not job_id:
+            emit('import_job_error', {'error': 'job_id required'}, room=sid)
+            return
+
+        job = get_import_job(job_id)
+        if not job or job.get('userId') != user_id:
+            emit('import_job_error', {'job_id': job_id, 'error': 'Job not found'}, room=sid)
+            return
+
+        join_room(import_job_room(job_id))
+        print(f"SID {sid} joined import job room for {job_id}")
+        # Send the current state so clients joining late are in sync
+        snapshot = serialize_import_job(job)
+        snapshot['type'] = 'snapshot'
+        emit('import_job_progress', snapshot, room=sid)
+
     # Add other handlers from app.py if they exist (e.g., 'start_stream', 'stop_stream')
     # Make sure to add the @socketio_authenticated_only decorator if they require auth.
 
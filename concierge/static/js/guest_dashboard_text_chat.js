@@ -11,6 +11,7 @@ let lastActivityTimestamp = 0;
 let inactivityTimeout = null;
 let isChatEnabled = false;
 let intentionalDisconnect = false; // Track intentional disconnects
+let streamingMessages = {}; // message_id -> content element of an AI reply being streamed
 
 const INACTIVITY_TIMEOUT_MS = 2 * 60 * 1000; // 2 minutes in milliseconds
 
@@ -104,8 +105,8 @@ window.loadRecentConversationHistory = async function loadRecentConversationHist
     }
 }
 
-// Function to display a chat message with proper formatting
-window.displayChatMessage = function displayChatMessage(role, text, timestamp, skipScroll = false, messageData = {}) {
+// Prepare message text for a .chat-message-content element (shared by new and streamed messages)
+function renderChatMessageContent(text, messageData = {}) {
     // Preprocess transcript for masking if function is available (e.g., for voice call messages)
     if (typeof window.preprocessTranscript === 'function') {
         const lang = messageData.language || window.currentGeminiLanguage || localStorage.getItem('geminiLanguagePreference') || 'en-US';
@@ -115,6 +116,12 @@ window.displayChatMessage = function displayChatMessage(role, text, timestamp, s
             console.warn('Transcript preprocessing failed:', err);
         }
     }
+    return text;
+}
+
+// Function to display a chat message with proper formatting
+window.displayChatMessage = function displayChatMessage(role, text, timestamp, skipScroll = false, messageData = {}) {
+    text = renderChatMessageContent(text, messageData);
     const chatMessages = document.getElementById('chat-messages');
     const messageDiv = document.createElement('div');
 
@@ -720,11 +727,48 @@ function connectToSocketIO(url, token, propertyIdToSend, resolve, reject) {
             // Don't show server errors to user - they'll just see no response
         });
 
+        // Handle streamed AI reply chunks (first words arrive before generation finishes)
+        socketIO.on('ai_response_chunk', (data) => {
+            if (!data || !data.message_id || !data.text) {
+                return;
+            }
+            let contentEl = streamingMessages[data.message_id];
+            if (!contentEl) {
+                addMessageToChat('', 'ai', 'staycee');
+                const chatMessages = document.getElementById('chat-messages');
+                const contents = chatMessages ? chatMessages.querySelectorAll('.chat-message-content') : [];
+                contentEl = contents.length ? contents[contents.length - 1] : null;
+                if (!contentEl) {
+                    return;
+                }
+                streamingMessages[data.message_id] = contentEl;
+            }
+            contentEl.textContent += data.text;
+            const chatMessages = document.getElementById('chat-messages');
+            if (chatMessages) {
+                chatMessages.scrollTop = chatMessages.scrollHeight;
+            }
+            updateLastActivity();
+        });
+
+        socketIO.on('ai_response_complete', (data) => {
+            if (data && data.usage) {
+                console.log("AI response complete, token usage:", data.usage);
+            }
+        });
+
         // Handle AI messages
         socketIO.on('text_message_from_ai', (data) => {
             console.log("Text message from AI via Socket.IO:", data);
             if (data && data.message) {
-                addMessageToChat(data.message, 'ai', 'staycee');
+                const streamedEl = data.message_id ? streamingMessages[data.message_id] : null;
+                if (streamedEl) {
+                    // Replace the streamed text with the final message, rendered like any other message
+                    streamedEl.innerHTML = renderChatMessageContent(data.message);
+                    delete streamingMessages[data.message_id];
+                } else {
+                    addMessageToChat(data.message, 'ai', 'staycee');
+                }
                 updateLastActivity();
 
                 // Store in conversation history for potential restart
@@ -987,7 +1031,8 @@ function sendTextMessage() {
                 if (socket && isSocketConnected) {
                     socket.emit('text_message_from_user', {
                         message: pendingMessage,
-                        property_id: propertyId
+                        property_id: propertyId,
+                        stream: true
                     });
                     console.log(`Sent pending message via Socket.IO: ${pendingMessage} for property: ${propertyId}`);
                     updateLastActivity();
@@ -1021,7 +1066,8 @@ function sendTextMessage() {
         // Use Socket.IO emit instead of WebSocket send
         socket.emit('text_message_from_user', {
             message: messageText,
-            property_id: propertyId // Include property ID in the message
+            property_id: propertyId, // Include property ID in the message
+            stream: true // Receive the reply as ai_response_chunk events
         });
 
         console.log(`Sent text message via Socket.IO: ${messageText} for property: ${propertyId}`);
@@ -16,7 +16,8 @@ let progressState = {
     totalProperties: 0,
     currentStep: '',
     activityIconIndex: 0,
-    activityIconInterval: null
+    activityIconInterval: null,
+    simulationStopped: false
 };
 
 // --- Utility Functions ---
@@ -1052,6 +1053,28 @@ function importSelectedProperties(userUrl) {
         throw new Error(`Server returned ${status} with non-JSON body: ${snippet}`);
     };
 
+    const handleImportFailure = (error) => {
+        console.error('Error importing properties:', error);
+
+        // Stop activity icon rotation
+        stopActivityIconRotation();
+
+        // Clear cancel handle on error
+        window.propertyImportCancel = null;
+
+        // Restore button state
+        importBtn.innerHTML = originalText;
+        importBtn.disabled = false;
+
+        if (error.name === 'AbortError') {
+            // Silent if user closed modal
+            console.log('Property import aborted by user');
+        } else {
+            alert((error && error.message) || 'Error importing properties. Please try again.');
+        }
+    };
+
+    // The import runs as a background job; the request only starts it
     fetch('/api/property-setup/import-properties', {
         method: 'POST',
         headers: {
@@ -1065,50 +1088,114 @@ function importSelectedProperties(userUrl) {
             job_id: jobId
         })
     })
-    .then(async response => {
-        if (!response.ok) {
-            // Try to surface useful details even if body is not JSON
-            return parseJsonSafely(response);
-        }
-        return parseJsonSafely(response);
-    })
+    .then(parseJsonSafely)
     .then(data => {
-        // Stop activity icon rotation
-        stopActivityIconRotation();
-
-        // Clear cancel handle after completion
-        window.propertyImportCancel = null;
-
-        if (data.success) {
-            // Update progress to completion
-            updateImportProgress('Import completed successfully!', selectedListings.length);
-            setTimeout(() => {
-                showImportSuccess(data.created_properties, data.total_imported);
-            }, 1000);
-        } else {
+        if (!data.success || !data.job) {
             throw new Error(data.error || 'Failed to import properties');
         }
-    })
-    .catch(error => {
-        console.error('Error importing properties:', error);
+        trackImportJob(data.job.job_id || jobId, selectedListings.length, {
+            onFinished: (job) => {
+                // Stop activity icon rotation
+                stopActivityIconRotation();
 
-        // Stop activity icon rotation
-        stopActivityIconRotation();
+                // Clear cancel handle after completion
+                window.propertyImportCancel = null;
 
-        // Clear cancel handle on error
-        window.propertyImportCancel = null;
+                if (job.status === 'completed' || job.status === 'canceled') {
+                    // Update progress to completion
+                    updateImportProgress('Import completed successfully!', selectedListings.length);
+                    setTimeout(() => {
+                        showImportSuccess(job.created_properties || [], job.total_imported || 0);
+                    }, 1000);
+                } else {
+                    handleImportFailure(new Error(job.error || 'Failed to import properties'));
+                }
+            },
+            onError: handleImportFailure
+        });
+    })
+    .catch(handleImportFailure);
+}
+
+/**
+ * Follow an import job until it finishes. Progress arrives as Socket.IO
+ * 'import_job_progress' events; the job status endpoint is polled as a fallback
+ * (and is the source of truth for the final result).
+ */
+function trackImportJob(jobId, totalProperties, { onFinished, onError }) {
+    let finished = false;
+    let pollTimer = null;
+    let socket = null;
+
+    const finish = (job) => {
+        if (finished) return;
+        finished = true;
+        if (pollTimer) clearInterval(pollTimer);
+        if (socket) socket.disconnect();
+        onFinished(job);
+    };
 
-        // Restore button state
-        importBtn.innerHTML = originalText;
-        importBtn.disabled = false;
+    const applyProgress = (event) => {
+        if (!event) return;
+        progressState.simulationStopped = true;
+        const completed = event.completed || 0;
+        const total = event.total || totalProperties;
+        const current = event.type === 'listing_started' || event.type === 'listing_step'
+            ? Math.min(completed + 1, total)
+            : completed;
+        const step = event.step || (total > 1 ? `Imported ${completed} of ${total} properties` : 'Importing property...');
+        updateImportProgress(step, current);
+    };
 
-        if (error.name === 'AbortError') {
-            // Silent if user closed modal
-            console.log('Property import aborted by user');
-        } else {
-            alert((error && error.message) || 'Error importing properties. Please try again.');
+    const poll = () => {
+        fetch(`/api/property-setup/import-jobs/${encodeURIComponent(jobId)}`, { credentials: 'same-origin' })
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success || !data.job) return;
+                const job = data.job;
+                if (['completed', 'canceled', 'failed'].includes(job.status)) {
+                    finish(job);
+                } else if (job.completed > 0) {
+                    applyProgress(job);
+                }
+            })
+            .catch(err => console.warn('Import job status poll failed:', err));
+    };
+
+    // Streamed progress over Socket.IO when available
+    try {
+        if (typeof io !== 'undefined' && window.HOST_USER_ID) {
+            socket = io({ query: { user_id: window.HOST_USER_ID } });
+            socket.on('connection_success', () => socket.emit('join_import_job', { job_id: jobId }));
+            socket.on('import_job_progress', (event) => {
+                if (event.job_id !== jobId) return;
+                if (['completed', 'canceled', 'failed'].includes(event.type)) {
+                    // Fetch the authoritative final state
+                    poll();
+                } else {
+                    applyProgress(event);
+                }
+            });
         }
-    });
+    } catch (e) {
+        console.warn('Socket.IO progress unavailable, falling back to polling:', e);
+    }
+
+    pollTimer = setInterval(poll, 5000);
+
+    // Stop tracking if the modal is closed
+    const cancelHandle = window.propertyImportCancel;
+    if (cancelHandle && cancelHandle.controller) {
+        cancelHandle.controller.signal.addEventListener('abort', () => {
+            if (finished) return;
+            finished = true;
+            if (pollTimer) clearInterval(pollTimer);
+            if (socket) socket.disconnect();
+            const abortError = new Error('Import aborted');
+            abortError.name = 'AbortError';
+            onError(abortError);
+        });
+    }
 }
 
 function showImportSuccess(createdProperties, totalImported) {
@@ -5903,9 +5990,10 @@ function loadSupportData() {
 // === SUPPORT CENTER FUNCTIONALITY ===
 
 let conversationsData = [];
-let conversationsOffset = 0;
 let conversationsLimit = 20;
 let hasMoreConversations = true;
+// next_cursor of each property's last loaded page (null once a property has no more)
+let conversationsCursors = {};
 let currentFilters = {};
 
 function loadSupportData() {
@@ -5923,7 +6011,7 @@ function loadSupportData() {
 
 function loadConversations(reset = true) {
     if (reset) {
-        conversationsOffset = 0;
+        conversationsCursors = {};
         conversationsData = [];
         hasMoreConversations = true;
     }
@@ -5948,8 +6036,9 @@ function loadConversations(reset = true) {
         return;
     }
 
-    // Load conversations for all properties
-    Promise.all(properties.map(property => loadPropertyConversations(property.id)))
+    // Load conversations for all properties (on "load more", only those with another page)
+    const propertiesToLoad = reset ? properties : properties.filter(property => conversationsCursors[property.id]);
+    Promise.all(propertiesToLoad.map(property => loadPropertyConversations(property.id, reset ? null : conversationsCursors[property.id])))
         .then(results => {
             // Flatten and combine all conversations
             const allConversations = results.flat();
@@ -5984,12 +6073,14 @@ function loadConversations(reset = true) {
         });
 }
 
-function loadPropertyConversations(propertyId) {
+function loadPropertyConversations(propertyId, cursor = null) {
     const params = new URLSearchParams({
         limit: conversationsLimit,
-        offset: conversationsOffset,
         ...currentFilters
     });
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
 
     return fetch(`/api/conversations/property/${propertyId}?${params}`, {
         credentials: 'same-origin'
@@ -5997,6 +6088,7 @@ function loadPropertyConversations(propertyId) {
     .then(response => response.json())
     .then(data => {
         if (data.success) {
+            conversationsCursors[propertyId] = data.next_cursor || null;
             return data.conversations.map(conv => ({
                 ...conv,
                 property_id: propertyId,
@@ -6025,7 +6117,8 @@ function displayConversations(conversations, reset = true) {
 
     // Update load more button
     const loadMoreContainer = document.getElementById('load-more-container');
-    if (hasMoreConversations && conversations.length >= conversationsLimit) {
+    hasMoreConversations = Object.values(conversationsCursors).some(Boolean);
+    if (hasMoreConversations) {
         loadMoreContainer.classList.remove('hidden');
     } else {
         loadMoreContainer.classList.add('hidden');
@@ -6553,7 +6646,6 @@ function refreshConversations() {
 }
 
 function loadMoreConversations() {
-    conversationsOffset += conversationsLimit;
     loadConversations(false);
 }
 
@@ -8700,8 +8792,13 @@ function startProgressSimulation(totalProperties) {
 
     let currentStepIndex = 0;
     let currentPropertyIndex = 1;
+    progressState.simulationStopped = false;
 
     function simulateNextStep() {
+        // Real progress events from the import job replace the simulation
+        if (progressState.simulationStopped) {
+            return;
+        }
         if (currentStepIndex < steps.length) {
             const step = steps[currentStepIndex];
             const propertyProgress = (currentPropertyIndex - 1) / totalProperties;
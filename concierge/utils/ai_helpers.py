@@ -4,16 +4,17 @@ This module now uses Firestore for vector search instead of LanceDB.
 """
 
 import os
+import time
 import traceback
 import logging
 import json
 from typing import Dict, List, Optional
 
 # Import rate limiter for Gemini API calls
-from concierge.utils.rate_limiter import rate_limited_gemini_call, get_gemini_rate_limiter
-
-# Import rate limiter for Gemini API calls
-from concierge.utils.rate_limiter import rate_limited_gemini_call, get_gemini_rate_limiter
+from concierge.utils.rate_limiter import rate_limited_gemini_call, get_gemini_rate_limiter, PRIORITY_BATCH
+from concierge.utils.gemini_clients import get_genai_client
+from concierge.utils.conversation_history import compact_history, format_history_lines
+from concierge.utils.tool_executor import ToolExecutor
 
 # Import Firestore client functions
 try:
@@ -66,6 +67,159 @@ COFFEE_RELATED_TERMS = ['coffee', 'tea', 'keurig', 'caffeine', 'brew', 'drink',
 LOCATION_RELATED_TERMS = ['location', 'address', 'area', 'neighborhood', 'where', 'place', 'town', 'city', 'direction']
 FIRST_AID_RELATED_TERMS = ['first aid', 'firstaid', 'first-aid', 'bandage', 'medical', 'emergency', 'kit', 'injury', 'hurt']
 
+# Static assistant instructions shared by every text chat prompt. Kept as a module
+# constant so precomputed context bundles (utils/context_bundle.py) start with
+# the exact same prefix.
+BASE_SYSTEM_INSTRUCTIONS = (
+    "You are Staycee, a helpful concierge assistant for property guests. " +
+    "Your goal is to provide direct, polite, accurate, and helpful responses to guest inquiries. " +
+    "IMPORTANT: You are NOT helping a host respond to guests; you ARE the assistant talking directly to guests. " +
+    "Only provide information that you are confident is correct based on the context provided. " +
+    "Answer in first person as if you're directly communicating with the guest. " +
+    "CRITICAL: When a guest asks about WiFi information, ALWAYS provide the complete WiFi network name and password. " +
+    "Do not withhold any property information that has been provided to you in the context below. " +
+    "CONVERSATION STYLE: If there is previous conversation history, continue the conversation naturally without repeating greetings. " +
+    "Only greet the guest if this is the first message in the conversation. " +
+    "Be conversational and helpful, but avoid unnecessary pleasantries when continuing an ongoing conversation. " +
+    "Do NOT start responses with 'Hi [name], thanks for reaching out!' or similar greetings in ongoing conversations. " +
+    "When you need to search for information, do the search and provide the results directly without announcing that you will search. " +
+    "\n\nTRAVEL GUIDE CAPABILITIES: " +
+    "When guests ask about attractions, activities, restaurants, places to visit, or things to do beyond the property, " +
+    "act as a knowledgeable travel guide. To provide the most relevant recommendations, ask clarifying questions about: " +
+    "- The nature of their stay (celebration, family vacation, romantic getaway, business trip, casual leisure) " +
+    "- For family stays: ages and composition of travelers (young children, teenagers, adults, seniors) " +
+    "- Interests and preferences (outdoor activities, cultural attractions, dining preferences, etc.) " +
+    "- Special occasions or events they're celebrating " +
+    "Once you understand their context, retain this information throughout the conversation and incorporate it into all recommendations. " +
+    "Tailor suggestions for restaurants, activities, timing, and experiences based on their stay purpose and group composition. " +
+    "Don't repeatedly ask for the same context information - use what you've learned to provide increasingly personalized suggestions. " +
+    "\n\nSTRATEGIC RECOMMENDATION APPROACH: " +
+    "When providing travel guide recommendations, be strategic and concise: " +
+    "- CRITICAL: Offer EXACTLY 1 or 2 top options first based on distance from property or context of user's trip intent " +
+    "- Ask if the guest would like additional alternatives or more information about the suggested options " +
+    "- If they decline the initial suggestions, provide exactly 1 or 2 of the next best available options " +
+    "- Consider current time of day and weather conditions when relevant to enhance recommendation usefulness " +
+    "- Keep responses focused and avoid overwhelming guests with too many options at once " +
+    "\n\nIMPORTANT - YOUR CAPABILITIES AND LIMITATIONS: " +
+    "You are an AI assistant that can ONLY: " +
+    "- Answer questions about the property using the information provided " +
+    "- Search for local information (restaurants, attractions, services, etc.) using web search " +
+    "- Provide helpful suggestions and recommendations based on available information " +
+    "- Act as a travel guide for local attractions and activities " +
+    "\n\nYou CANNOT: " +
+    "- Contact the host, neighbors, or any other people on behalf of the guest " +
+    "- Make reservations, bookings, or appointments " +
+    "- Control any property systems (lights, temperature, appliances, etc.) " +
+    "- Arrange services, deliveries, or maintenance " +
+    "- Take any physical actions or interventions " +
+    "- Resolve issues that require human intervention " +
+    "\n\nFor ANY situation that requires action beyond providing information, you MUST suggest that the guest contact the host directly. This includes but is not limited to: " +
+    "- Noise complaints or neighbor issues " +
+    "- Maintenance problems or repairs needed " +
+    "- Missing amenities or supplies " +
+    "- Property access issues " +
+    "- Emergency situations requiring immediate human response " +
+    "- Any requests for services or interventions " +
+    "\n\nAlways be clear that you are an informational assistant only and cannot take actions on the guest's behalf."
+)
+
+
+def guest_name_instruction(guest_name=""):
+    """Return the sentence telling the assistant how to address the guest."""
+    if guest_name:
+        if guest_name == 'Guest' or not guest_name.strip():
+            return " The guest name is currently generic or unavailable. When appropriate during the conversation (such as during initial greetings or when it feels natural), politely ask for their name so you can address them personally. Once they provide their name, use it throughout the conversation to create a more personalized experience."
+        return f" The guest's name is {guest_name}. Use their name naturally throughout the conversation to create a personalized experience."
+    return " The guest name is not available. When appropriate during the conversation (such as during initial greetings or when it feels natural), politely ask for their name so you can address them personally. Once they provide their name, use it throughout the conversation to create a more personalized experience."
+
+
+def format_property_info(property_context=None):
+    """
+    Render the PROPERTY INFORMATION section of the prompt.
+
+    Args:
+        property_context (dict, optional): Context about the property (name, details, etc.)
+
+    Returns:
+        str: The rendered section, or an empty string if there is nothing to show
+    """
+    if not property_context:
+        return ""
+
+    # Start building property information
+    property_info = []
+
+    # Basic property information
+    property_name = property_context.get('name', '')
+    if property_name:
+        property_info.append(f"PROPERTY NAME: {property_name}")
+
+    # Host information
+    host_name = property_context.get('hostName', '')
+    if host_name:
+        property_info.append(f"HOST: {host_name}")
+
+    # Location information
+    location_parts = []
+    location = property_context.get('location', '')
+    address = property_context.get('address', '')
+    city = property_context.get('city', '')
+    state = property_context.get('state', '')
+    country = property_context.get('country', '')
+
+    # Build location string with available components
+    if address:
+        location_parts.append(address)
+    if location and location != address:  # Avoid duplication
+        location_parts.append(location)
+    if city:
+        location_parts.append(city)
+    if state:
+        location_parts.append(state)
+    if country:
+        location_parts.append(country)
+
+    # Add location if we have any information
+    if location_parts:
+        property_info.append(f"LOCATION: {', '.join(location_parts)}")
+
+    # Check-in/check-out information
+    check_in = property_context.get('checkInTime', '')
+    check_out = property_context.get('checkOutTime', '')
+    if check_in or check_out:
+        check_times = []
+        if check_in:
+            check_times.append(f"Check-in: {check_in}")
+        if check_out:
+            check_times.append(f"Check-out: {check_out}")
+        property_info.append(f"SCHEDULE: {', '.join(check_times)}")
+
+    # WiFi information
+    wifi_network = property_context.get('wifiNetwork', '')
+    wifi_password = property_context.get('wifiPassword', '')
+    if wifi_network or wifi_password:
+        wifi_info = []
+        if wifi_network:
+            wifi_info.append(f"Network: {wifi_network}")
+        if wifi_password:
+            wifi_info.append(f"Password: {wifi_password}")
+        property_info.append(f"WIFI: {', '.join(wifi_info)}")
+
+    # House rules
+    rules = property_context.get('rules', '')
+    if rules:
+        property_info.append(f"HOUSE RULES: {rules}")
+
+    # Property description
+    description = property_context.get('description', '')
+    if description:
+        property_info.append(f"DESCRIPTION: {description}")
+
+    if not property_info:
+        return ""
+    return "\n".join(["PROPERTY INFORMATION:"] + property_info)
+
+
 def create_base_prompt(property_context=None, guest_name=""):
     """
     Create a base prompt with system context and property information.
@@ -78,146 +232,17 @@ def create_base_prompt(property_context=None, guest_name=""):
     Returns:
         str: Base prompt with system context and property information
     """
-    # Start with system context
-    prompt_parts = [
-        "You are Staycee, a helpful concierge assistant for property guests. " +
-        "Your goal is to provide direct, polite, accurate, and helpful responses to guest inquiries. " +
-        "IMPORTANT: You are NOT helping a host respond to guests; you ARE the assistant talking directly to guests. " +
-        "Only provide information that you are confident is correct based on the context provided. " +
-        "Answer in first person as if you're directly communicating with the guest. " +
-        "CRITICAL: When a guest asks about WiFi information, ALWAYS provide the complete WiFi network name and password. " +
-        "Do not withhold any property information that has been provided to you in the context below. " +
-        "CONVERSATION STYLE: If there is previous conversation history, continue the conversation naturally without repeating greetings. " +
-        "Only greet the guest if this is the first message in the conversation. " +
-        "Be conversational and helpful, but avoid unnecessary pleasantries when continuing an ongoing conversation. " +
-        "Do NOT start responses with 'Hi [name], thanks for reaching out!' or similar greetings in ongoing conversations. " +
-        "When you need to search for information, do the search and provide the results directly without announcing that you will search. " +
-        "\n\nTRAVEL GUIDE CAPABILITIES: " +
-        "When guests ask about attractions, activities, restaurants, places to visit, or things to do beyond the property, " +
-        "act as a knowledgeable travel guide. To provide the most relevant recommendations, ask clarifying questions about: " +
-        "- The nature of their stay (celebration, family vacation, romantic getaway, business trip, casual leisure) " +
-        "- For family stays: ages and composition of travelers (young children, teenagers, adults, seniors) " +
-        "- Interests and preferences (outdoor activities, cultural attractions, dining preferences, etc.) " +
-        "- Special occasions or events they're celebrating " +
-        "Once you understand their context, retain this information throughout the conversation and incorporate it into all recommendations. " +
-        "Tailor suggestions for restaurants, activities, timing, and experiences based on their stay purpose and group composition. " +
-        "Don't repeatedly ask for the same context information - use what you've learned to provide increasingly personalized suggestions. " +
-        "\n\nSTRATEGIC RECOMMENDATION APPROACH: " +
-        "When providing travel guide recommendations, be strategic and concise: " +
-        "- CRITICAL: Offer EXACTLY 1 or 2 top options first based on distance from property or context of user's trip intent " +
-        "- Ask if the guest would like additional alternatives or more information about the suggested options " +
-        "- If they decline the initial suggestions, provide exactly 1 or 2 of the next best available options " +
-        "- Consider current time of day and weather conditions when relevant to enhance recommendation usefulness " +
-        "- Keep responses focused and avoid overwhelming guests with too many options at once " +
-        "\n\nIMPORTANT - YOUR CAPABILITIES AND LIMITATIONS: " +
-        "You are an AI assistant that can ONLY: " +
-        "- Answer questions about the property using the information provided " +
-        "- Search for local information (restaurants, attractions, services, etc.) using web search " +
-        "- Provide helpful suggestions and recommendations based on available information " +
-        "- Act as a travel guide for local attractions and activities " +
-        "\n\nYou CANNOT: " +
-        "- Contact the host, neighbors, or any other people on behalf of the guest " +
-        "- Make reservations, bookings, or appointments " +
-        "- Control any property systems (lights, temperature, appliances, etc.) " +
-        "- Arrange services, deliveries, or maintenance " +
-        "- Take any physical actions or interventions " +
-        "- Resolve issues that require human intervention " +
-        "\n\nFor ANY situation that requires action beyond providing information, you MUST suggest that the guest contact the host directly. This includes but is not limited to: " +
-        "- Noise complaints or neighbor issues " +
-        "- Maintenance problems or repairs needed " +
-        "- Missing amenities or supplies " +
-        "- Property access issues " +
-        "- Emergency situations requiring immediate human response " +
-        "- Any requests for services or interventions " +
-        "\n\nAlways be clear that you are an informational assistant only and cannot take actions on the guest's behalf."
-    ]
-
     # Add guest name if available (either from parameter or property_context)
     if not guest_name and property_context:
         guest_name = property_context.get('guestName', '')
 
-    if guest_name:
-        if guest_name == 'Guest' or not guest_name.strip():
-            prompt_parts[0] += " The guest name is currently generic or unavailable. When appropriate during the conversation (such as during initial greetings or when it feels natural), politely ask for their name so you can address them personally. Once they provide their name, use it throughout the conversation to create a more personalized experience."
-        else:
-            prompt_parts[0] += f" The guest's name is {guest_name}. Use their name naturally throughout the conversation to create a personalized experience."
-    else:
-        prompt_parts[0] += " The guest name is not available. When appropriate during the conversation (such as during initial greetings or when it feels natural), politely ask for their name so you can address them personally. Once they provide their name, use it throughout the conversation to create a more personalized experience."
+    # Start with system context
+    prompt_parts = [BASE_SYSTEM_INSTRUCTIONS + guest_name_instruction(guest_name)]
 
     # Add property context with more details
-    if property_context:
-        # Start building property information
-        property_info = []
-
-        # Basic property information
-        property_name = property_context.get('name', '')
-        if property_name:
-            property_info.append(f"PROPERTY NAME: {property_name}")
-
-        # Host information
-        host_name = property_context.get('hostName', '')
-        if host_name:
-            property_info.append(f"HOST: {host_name}")
-
-        # Location information
-        location_parts = []
-        location = property_context.get('location', '')
-        address = property_context.get('address', '')
-        city = property_context.get('city', '')
-        state = property_context.get('state', '')
-        country = property_context.get('country', '')
-
-        # Build location string with available components
-        if address:
-            location_parts.append(address)
-        if location and location != address:  # Avoid duplication
-            location_parts.append(location)
-        if city:
-            location_parts.append(city)
-        if state:
-            location_parts.append(state)
-        if country:
-            location_parts.append(country)
-
-        # Add location if we have any information
-        if location_parts:
-            property_info.append(f"LOCATION: {', '.join(location_parts)}")
-
-        # Check-in/check-out information
-        check_in = property_context.get('checkInTime', '')
-        check_out = property_context.get('checkOutTime', '')
-        if check_in or check_out:
-            check_times = []
-            if check_in:
-                check_times.append(f"Check-in: {check_in}")
-            if check_out:
-                check_times.append(f"Check-out: {check_out}")
-            property_info.append(f"SCHEDULE: {', '.join(check_times)}")
-
-        # WiFi information
-        wifi_network = property_context.get('wifiNetwork', '')
-        wifi_password = property_context.get('wifiPassword', '')
-        if wifi_network or wifi_password:
-            wifi_info = []
-            if wifi_network:
-                wifi_info.append(f"Network: {wifi_network}")
-            if wifi_password:
-                wifi_info.append(f"Password: {wifi_password}")
-            property_info.append(f"WIFI: {', '.join(wifi_info)}")
-
-        # House rules
-        rules = property_context.get('rules', '')
-        if rules:
-            property_info.append(f"HOUSE RULES: {rules}")
-
-        # Property description
-        description = property_context.get('description', '')
-        if description:
-            property_info.append(f"DESCRIPTION: {description}")
-
-        # Add all property info to prompt if we have any
-        if property_info:
-            prompt_parts.append("\n".join(["PROPERTY INFORMATION:"] + property_info))
+    property_info = format_property_info(property_context)
+    if property_info:
+        prompt_parts.append(property_info)
 
     # Return as a single string
     return "\n\n".join(prompt_parts)
@@ -243,7 +268,7 @@ def generate_embedding(text, task_type=GEMINI_EMBEDDING_TASK_TYPE):
             return None
 
         # Create client with the new SDK
-        client = genai.Client(api_key=os.environ.get('GEMINI_API_KEY'))
+        client = get_genai_client(os.environ.get('GEMINI_API_KEY'))
         
         # Generate embedding using the new SDK syntax
         embedding_result = client.models.embed_content(
@@ -290,45 +315,23 @@ def get_relevant_context(query_text, property_id, limit=MAX_RESULTS, threshold=S
         'items': []
     }
 
-    # Special cases for common queries
-    query_lower = query_text.lower()
-
-    # First aid kit query
-    if any(term in query_lower for term in FIRST_AID_RELATED_TERMS) and property_id == "hJ9La2TD6qU6H5DNhsNf":
-        logging.info("First aid kit query detected, returning hardcoded response")
-        results['found'] = True
-        first_aid_item = {
-            'id': 'ee429b77-f83b-4ca9-8757-9b5f9870cb9a',
-            'text': 'Question: Where is the first aid kit?\nAnswer: The first aid kit is in the central corner cabinet in the kitchen.',
-            'similarity': 0.95
+    # Small talk needs no retrieval; a matching FAQ is put first in the retrieved context
+    from concierge.utils.intent_fast_path import classify
+    fast_path = classify(query_text, property_id)
+    faq_item = None
+    if fast_path is not None:
+        if fast_path.is_small_talk:
+            logging.info(f"Small talk ({fast_path.intent}) detected, skipping retrieval")
+            return results
+        logging.info(f"FAQ {fast_path.item['id']} matched (score {fast_path.score:.2f})")
+        faq_item = {
+            'id': fast_path.item['id'],
+            'text': fast_path.text,
+            'similarity': fast_path.score
         }
-        results['items'] = [first_aid_item]
-        results['context'] = first_aid_item['text']
-        return results
-
-    # Coffee maker query
-    if any(term in query_lower for term in COFFEE_RELATED_TERMS) and property_id == "hJ9La2TD6qU6H5DNhsNf":
-        logging.info("Coffee maker query detected, returning hardcoded response")
         results['found'] = True
-
-        # Check if it's about making coffee
-        if "how" in query_lower and ("make" in query_lower or "brew" in query_lower):
-            coffee_item = {
-                'id': 'ae59As0rkir81saz53zQ',
-                'text': 'Question: How do I make coffee?\nAnswer: Place a K-Cup pod in the holder, close the lid, and press the \'brew\' button. Make sure to fill the water reservoir before starting.',
-                'similarity': 0.95
-            }
-        else:
-            # Default to coffee maker info
-            coffee_item = {
-                'id': '3XOI7uFJTdYZ6oCjyjvR',
-                'text': 'Question: What kind of coffee maker is provided?\nAnswer: The coffee maker is a Keurig machine. The model is RY-3214.',
-                'similarity': 0.95
-            }
-
-        results['items'] = [coffee_item]
-        results['context'] = coffee_item['text']
-        return results
+        results['items'] = [faq_item]
+        results['context'] = faq_item['text']
 
     try:
         # Validate inputs
@@ -353,15 +356,17 @@ def get_relevant_context(query_text, property_id, limit=MAX_RESULTS, threshold=S
             logging.info(f"No relevant context found for property: {property_id}")
             return results
 
-        # Process results
-        items = []
-        context_parts = []
+        # Process results, after the matched FAQ if any
+        items = [faq_item] if faq_item else []
+        context_parts = [faq_item['text']] if faq_item else []
 
         for item in similar_items:
             # Skip items with low similarity
             similarity = item.get('similarity', 0)
             if similarity < threshold:
                 continue
+            if faq_item and item.get('id') == faq_item['id']:
+                continue
 
             # Get content from the item
             content = item.get('content', '')
@@ -445,13 +450,7 @@ def format_prompt_with_rag(user_query, property_context, rag_results, conversati
     # Add conversation history if available
     if conversation_history and len(conversation_history) > 0:
         conversation_context = "PREVIOUS CONVERSATION:\n"
-        for message_entry in conversation_history:
-            role = message_entry.get('role', '')
-            text = message_entry.get('text', '')
-            if role.lower() == 'user':
-                conversation_context += f"Guest: {text}\n"
-            elif role.lower() == 'assistant' or role.lower() == 'ai':
-                conversation_context += f"You: {text}\n"
+        conversation_context += format_history_lines(compact_history(conversation_history))
         prompt_parts.append(conversation_context)
 
     # Add user query
@@ -490,13 +489,7 @@ def format_fallback_prompt(user_query, property_context=None, conversation_histo
     # Add conversation history if available
     if conversation_history and len(conversation_history) > 0:
         conversation_context = "PREVIOUS CONVERSATION:\n"
-        for message_entry in conversation_history:
-            role = message_entry.get('role', '')
-            text = message_entry.get('text', '')
-            if role.lower() == 'user':
-                conversation_context += f"Guest: {text}\n"
-            elif role.lower() == 'assistant' or role.lower() == 'ai':
-                conversation_context += f"You: {text}\n"
+        conversation_context += format_history_lines(compact_history(conversation_history))
         prompt_parts.append(conversation_context)
 
     # Add user query
@@ -604,7 +597,7 @@ def generate_conversation_summary(messages, property_context=None, reservation_i
 
         # Generate the summary using new Gemini SDK with rate limiting
         try:
-            client = genai.Client(api_key=os.environ.get('GEMINI_API_KEY'))
+            client = get_genai_client(os.environ.get('GEMINI_API_KEY'))
             
             def make_summary_call():
                 return client.models.generate_content(
@@ -612,7 +605,7 @@ def generate_conversation_summary(messages, property_context=None, reservation_i
                     contents=prompt
                 )
             
-            response = rate_limited_gemini_call(make_summary_call, max_retries=2)
+            response = rate_limited_gemini_call(make_summary_call, max_retries=2, model='gemini-2.5-flash-lite', priority=PRIORITY_BATCH)
             summary = response.text.strip()
         except Exception as e:
             logging.error(f"Error calling new Gemini SDK for summary: {e}")
@@ -690,14 +683,302 @@ def process_query_with_rag(user_query, property_id, property_context=None, conve
         return result
  
 # === Text Chat (No-RAG) Helper ===
+TEXT_CHAT_TOOL_NAMES = ("get_current_time", "search_nearby_places")
+# Model turns that may request tools before the reply must be text
+TEXT_CHAT_MAX_TOOL_ROUNDS = int(os.environ.get('TEXT_CHAT_MAX_TOOL_ROUNDS', '3'))
+
+
+def _build_text_chat_request(user_query, property_context=None, conversation_history=None, system_prompt=None):
+    """
+    Build the text chat request from the shared system prompt, conversation history and query.
+
+    The prompt is split into a static system instruction (identical for every
+    guest of the property, so it can be served from Gemini's context cache)
+    and the per-turn text: guest details, previous conversation and the query.
+
+    Returns:
+        dict: {
+            'system_instruction': str, static system prompt,
+            'version': str or None, context bundle version of the system prompt,
+            'turn': str, per-turn text,
+            'prompt': str, system instruction and turn as a single prompt
+        }
+    """
+    # Build the prompt: prefer provided system_prompt; otherwise fall back to base prompt
+    version = None
+    turn_parts = []
+
+    if system_prompt:
+        logging.info(f"[TEXT CHAT] Using provided shared system prompt (length: {len(system_prompt)})")
+        system_instruction = system_prompt
+    else:
+        bundle = None
+        if property_context and property_context.get('property_id'):
+            from concierge.utils.context_bundle import get_context_bundle
+            bundle = get_context_bundle(property_context['property_id'])
+
+        if bundle:
+            from concierge.utils.context_bundle import guest_prompt_lines
+            logging.info(f"[TEXT CHAT] Using precomputed context bundle {bundle.get('version')}")
+            system_instruction = bundle.get('systemPrompt', '')
+            version = bundle.get('version')
+            turn_parts.append(guest_prompt_lines(
+                guest_name=property_context.get('guestName', ''),
+                check_in=property_context.get('reservationCheckIn'),
+                check_out=property_context.get('reservationCheckOut')
+            ))
+        else:
+            logging.info("[TEXT CHAT] No system prompt provided, building a minimal base prompt")
+            system_instruction = create_base_prompt(property_context)
+
+    # Add conversation history if available
+    if conversation_history and len(conversation_history) > 0:
+        conversation_context = "\n\nPREVIOUS CONVERSATION:\n"
+        conversation_context += format_history_lines(compact_history(conversation_history))
+        turn_parts.append(conversation_context)
+
+    # Add current user query
+    turn_parts.append(f"GUEST QUERY: {user_query}")
+    turn = "\n\n".join(turn_parts)
+    return {
+        'system_instruction': system_instruction,
+        'version': version,
+        'turn': turn,
+        'prompt': "\n\n".join([system_instruction, turn])
+    }
+
+
+def _text_chat_cached_content(client, request, property_context, function_declarations, model='gemini-2.5-flash'):
+    """
+    Get the Gemini cached content holding this request's system prompt and tools.
+
+    Returns:
+        str or None: Cached content name, or None to send the full prompt
+    """
+    property_id = (property_context or {}).get('property_id')
+    if not property_id:
+        return None
+    try:
+        from concierge.utils.gemini_context_cache import get_gemini_context_cache
+        return get_gemini_context_cache().get_cached_content(
+            client,
+            model,
+            property_id,
+            request['system_instruction'],
+            tools=[genai.types.Tool(function_declarations=function_declarations)],
+            version=request['version']
+        )
+    except Exception as e:
+        logging.warning(f"[TEXT CHAT] Context cache unavailable, sending full prompt: {e}")
+        return None
+
+
+def _text_chat_function_declarations():
+    """Function declarations offered to the model in text chat (time, and Places when enabled)."""
+    from concierge.utils.places_api import is_places_api_enabled
+
+    function_declarations = [
+        genai.types.FunctionDeclaration(
+            name="get_current_time",
+            description="Get the current date and time for the property location. Use this when the guest asks about the current time, date, dining recommendations, business hours, or any time-sensitive information. Always call this function when discussing restaurants, activities, or services that depend on current time of day.",
+            parameters=genai.types.Schema(
+                type=genai.types.Type.OBJECT,
+                properties={},
+                required=[]
+            )
+        )
+    ]
+
+    # Add Places API if enabled
+    if is_places_api_enabled():
+        function_declarations.append(
+            genai.types.FunctionDeclaration(
+                name="search_nearby_places",
+                description="Search for nearby places like restaurants, cafes, attractions, shopping, etc. with accurate distances, travel times, ratings, hours, and price levels. Use this INSTEAD of google_search for ANY location-based queries about places around the property. This provides structured data with walking/driving distances, ratings, open hours, and more accurate information than web search.",
+                parameters=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    properties={
+                        "query": genai.types.Schema(
+                            type=genai.types.Type.STRING,
+                            description="What to search for (e.g., 'Italian restaurants', 'coffee shops', 'tourist attractions')"
+                        ),
+                        "place_type": genai.types.Schema(
+                            type=genai.types.Type.STRING,
+                            description="Optional category: restaurant, cafe, bar, attraction, museum, park, shopping, grocery, pharmacy, hospital, gas_station, atm, bank",
+                            enum=["restaurant", "cafe", "bar", "attraction", "museum", "park", "shopping", "grocery", "pharmacy", "hospital", "gas_station", "atm", "bank"]
+                        ),
+                        "max_results": genai.types.Schema(
+                            type=genai.types.Type.INTEGER,
+                            description="Maximum number of results to return (default: 5, max: 10)"
+                        ),
+                        "radius": genai.types.Schema(
+                            type=genai.types.Type.INTEGER,
+                            description="Search radius in meters (default: 5000m ≈ 3 miles)"
+                        ),
+                        "travel_mode": genai.types.Schema(
+                            type=genai.types.Type.STRING,
+                            description="Travel mode for distance calculation: walking, driving, transit, or bicycling",
+                            enum=["walking", "driving", "transit", "bicycling"]
+                        )
+                    },
+                    required=["query"]
+                )
+            )
+        )
+        logging.info("[TEXT CHAT] Places API enabled - including search_nearby_places tool")
+
+    return function_declarations
+
+
+def _text_chat_property_location(property_context):
+    """Full property address used as the Places search origin, or None."""
+    address_parts = []
+    for field in ['address', 'city', 'state', 'country']:
+        if property_context and property_context.get(field):
+            address_parts.append(property_context[field])
+    return ', '.join(address_parts) if address_parts else None
+
+
+def _run_get_current_time_tool(args, property_context):
+    return get_current_time(property_context)
+
+
+def _current_time_memo_key(args, property_context):
+    """The time at a property only changes every minute; without a property ID nothing is memoized."""
+    property_id = (property_context or {}).get('property_id')
+    if not property_id:
+        return None
+    return (property_id, (property_context or {}).get('timezone'), int(time.time() // 60))
+
+
+def _run_search_nearby_places_tool(args, property_context):
+    property_location = _text_chat_property_location(property_context)
+    if not property_location:
+        logging.warning("[TEXT CHAT] No property location available for Places API search")
+        return None
+
+    from concierge.utils.places_api import find_nearby_with_details
+
+    places_result = find_nearby_with_details(
+        property_location=property_location,
+        query=args.get('query', ''),
+        place_type=args.get('place_type'),
+        max_results=args.get('max_results', 5),
+        radius=args.get('radius', 5000),
+        travel_mode=args.get('travel_mode', 'walking')
+    )
+    logging.info(f"[TEXT CHAT] Places API returned {places_result.get('total_results', 0)} results")
+    return places_result
+
+
+_text_chat_tool_executor = None
+
+
+def get_text_chat_tool_executor():
+    """Get the executor running text chat tool calls (created on first use)."""
+    global _text_chat_tool_executor
+    if _text_chat_tool_executor is None:
+        executor = ToolExecutor()
+        executor.register("get_current_time", _run_get_current_time_tool, timeout=2,
+                          memo_key=_current_time_memo_key)
+        executor.register("search_nearby_places", _run_search_nearby_places_tool, timeout=20)
+        _text_chat_tool_executor = executor
+    return _text_chat_tool_executor
+
+
+def _text_chat_tool_result_text(call_result):
+    """Describe one tool result for the follow-up prompt."""
+    if call_result.name == "get_current_time":
+        if not call_result.ok:
+            return f"The current time lookup failed: {call_result.error}. Please answer without the exact time."
+        logging.info(f"[TEXT CHAT] get_current_time result: {call_result.result}")
+        return f"Function call result: {call_result.result}\n\nPlease provide a natural response using this current time information."
+
+    places_result = call_result.result
+    if call_result.ok and places_result is None:
+        return "I couldn't determine the property location to search nearby places. Please provide a response without location search."
+    if call_result.ok and places_result.get('success') and places_result.get('places'):
+        from concierge.utils.places_api import format_place_for_response
+
+        query = call_result.args.get('query', '')
+        places_info = f"Found {len(places_result['places'])} nearby places{f' for {query!r}' if query else ''}:\n\n"
+        for i, place in enumerate(places_result['places'], 1):
+            places_info += f"{i}. {format_place_for_response(place)}\n"
+        return f"Nearby places search results:\n{places_info}\n\nPlease provide a helpful response based on these results. Present 1-2 top recommendations and ask if the guest would like more options."
+
+    error_msg = call_result.error if not call_result.ok else places_result.get('error', 'No results found')
+    return f"Places search returned no results: {error_msg}. Please provide an alternative response or suggestion."
+
+
+def _text_chat_function_calls(function_calls):
+    """(name, args) pairs of the text chat tools among one model turn's function calls."""
+    calls = []
+    for function_call in function_calls or []:
+        if getattr(function_call, 'name', None) in TEXT_CHAT_TOOL_NAMES:
+            args = dict(function_call.args) if getattr(function_call, 'args', None) else {}
+            calls.append((function_call.name, args))
+    return calls
+
+
+def _response_function_calls(response):
+    """All function calls in a (non-streamed) model response."""
+    function_calls = []
+    for candidate in (getattr(response, 'candidates', None) or []):
+        content = getattr(candidate, 'content', None)
+        for part in (getattr(content, 'parts', None) or []):
+            if getattr(part, 'function_call', None):
+                function_calls.append(part.function_call)
+    return function_calls
+
+
+def _run_text_chat_tools(calls, property_context):
+    """
+    Run all tool calls of one model turn concurrently.
+
+    Returns:
+        str: Tool results to append to the follow-up prompt
+    """
+    for fname, args in calls:
+        logging.info(f"[TEXT CHAT] Function call detected: {fname} args: {args}")
+    results = get_text_chat_tool_executor().run(calls, property_context)
+    return "\n\n" + "\n\n".join(_text_chat_tool_result_text(call_result) for call_result in results)
+
+
+def _text_chat_fast_path_reply(user_query, property_context=None, conversation_history=None):
+    """
+    Reply to small talk and to FAQs asked word for word without calling the model.
+
+    Returns:
+        tuple or None: (reply, intent), or None if the message needs the model
+    """
+    from concierge.utils.intent_fast_path import (
+        classify, small_talk_reply, last_assistant_message, INTENT_ACKNOWLEDGEMENT
+    )
+
+    property_context = property_context or {}
+    fast_path = classify(user_query, property_context.get('property_id'))
+    if fast_path is None:
+        return None
+    if fast_path.is_small_talk:
+        # "ok" after a question from the assistant is an answer, not an acknowledgement
+        if fast_path.intent == INTENT_ACKNOWLEDGEMENT and last_assistant_message(conversation_history).rstrip().endswith('?'):
+            return None
+        return small_talk_reply(fast_path.intent, property_context.get('guestName', '')), fast_path.intent
+    if fast_path.answerable:
+        logging.info(f"[TEXT CHAT] Answering from FAQ {fast_path.item['id']} (exact question)")
+        return fast_path.answer, fast_path.intent
+    return None
+
+
 def process_text_query_with_tools(user_query, property_context=None, conversation_history=None, system_prompt=None):
     """
     Process a user text query WITHOUT RAG retrieval. Uses a shared system prompt that
     already contains property context (and optionally knowledge items) similar to voice calls.
 
     The model is given both google_search and get_current_time tools and will decide when
-    to use them. If a function call to get_current_time is returned, we execute it and
-    perform a single follow-up call including the function result to complete the reply.
+    to use them. All function calls of a model turn run concurrently (see
+    get_text_chat_tool_executor) and one follow-up call includes their results; the
+    model may request more tools for up to TEXT_CHAT_MAX_TOOL_ROUNDS turns.
 
     Args:
         user_query (str): The user's query or message
@@ -705,6 +986,9 @@ def process_text_query_with_tools(user_query, property_context=None, conversatio
         conversation_history (list, optional): Previous conversation messages (role/text)
         system_prompt (str, optional): Shared system prompt to use
 
+    Small talk and clearly matched FAQs are answered without calling the model
+    (see _text_chat_fast_path_reply).
+
     Returns:
         dict: { 'response': str }
     """
@@ -712,96 +996,37 @@ def process_text_query_with_tools(user_query, property_context=None, conversatio
         'response': ''
     }
 
+    fast_reply = _text_chat_fast_path_reply(user_query, property_context, conversation_history)
+    if fast_reply:
+        result['response'], result['fast_path'] = fast_reply
+        return result
+
     try:
         if genai is None:
             logging.error("Google Generative AI module not available")
             result['response'] = "I'm having trouble accessing my AI capabilities right now. Please try again later."
             return result
 
-        # Build the prompt: prefer provided system_prompt; otherwise fall back to base prompt
-        prompt_parts = []
-
-        if system_prompt:
-            logging.info(f"[TEXT CHAT] Using provided shared system prompt (length: {len(system_prompt)})")
-            prompt_parts.append(system_prompt)
-        else:
-            logging.info("[TEXT CHAT] No system prompt provided, building a minimal base prompt")
-            prompt_parts.append(create_base_prompt(property_context))
-
-        # Add conversation history if available
-        if conversation_history and len(conversation_history) > 0:
-            conversation_context = "\n\nPREVIOUS CONVERSATION:\n"
-            for message_entry in conversation_history:
-                role = message_entry.get('role', '')
-                text = message_entry.get('text', '')
-                if role.lower() == 'user':
-                    conversation_context += f"Guest: {text}\n"
-                elif role.lower() in ['assistant', 'ai']:
-                    conversation_context += f"You: {text}\n"
-            prompt_parts.append(conversation_context)
-
-        # Add current user query
-        prompt_parts.append(f"GUEST QUERY: {user_query}")
-        prompt = "\n\n".join(prompt_parts)
+        request = _build_text_chat_request(user_query, property_context, conversation_history, system_prompt)
+        prompt = request['prompt']
 
         # Create client and configure tools: both google_search and function calling
-        client = genai.Client(api_key=os.environ.get('GEMINI_API_KEY'))
+        client = get_genai_client(os.environ.get('GEMINI_API_KEY'))
         
-        # Import Places API functions
-        from concierge.utils.places_api import find_nearby_with_details, is_places_api_enabled
+        function_declarations = _text_chat_function_declarations()
 
-        function_declarations = [
-            genai.types.FunctionDeclaration(
-                name="get_current_time",
-                description="Get the current date and time for the property location. Use this when the guest asks about the current time, date, dining recommendations, business hours, or any time-sensitive information. Always call this function when discussing restaurants, activities, or services that depend on current time of day.",
-                parameters=genai.types.Schema(
-                    type=genai.types.Type.OBJECT,
-                    properties={},
-                    required=[]
-                )
-            )
-        ]
-        
-        # Add Places API if enabled
-        if is_places_api_enabled():
-            function_declarations.append(
-                genai.types.FunctionDeclaration(
-                    name="search_nearby_places",
-                    description="Search for nearby places like restaurants, cafes, attractions, shopping, etc. with accurate distances, travel times, ratings, hours, and price levels. Use this INSTEAD of google_search for ANY location-based queries about places around the property. This provides structured data with walking/driving distances, ratings, open hours, and more accurate information than web search.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={
-                            "query": genai.types.Schema(
-                                type=genai.types.Type.STRING,
-                                description="What to search for (e.g., 'Italian restaurants', 'coffee shops', 'tourist attractions')"
-                            ),
-                            "place_type": genai.types.Schema(
-                                type=genai.types.Type.STRING,
-                                description="Optional category: restaurant, cafe, bar, attraction, museum, park, shopping, grocery, pharmacy, hospital, gas_station, atm, bank",
-                                enum=["restaurant", "cafe", "bar", "attraction", "museum", "park", "shopping", "grocery", "pharmacy", "hospital", "gas_station", "atm", "bank"]
-                            ),
-                            "max_results": genai.types.Schema(
-                                type=genai.types.Type.INTEGER,
-                                description="Maximum number of results to return (default: 5, max: 10)"
-                            ),
-                            "radius": genai.types.Schema(
-                                type=genai.types.Type.INTEGER,
-                                description="Search radius in meters (default: 5000m ≈ 3 miles)"
-                            ),
-                            "travel_mode": genai.types.Schema(
-                                type=genai.types.Type.STRING,
-                                description="Travel mode for distance calculation: walking, driving, transit, or bicycling",
-                                enum=["walking", "driving", "transit", "bicycling"]
-                            )
-                        },
-                        required=["query"]
-                    )
-                )
-            )
-            logging.info("[TEXT CHAT] Places API enabled - including search_nearby_places tool")
+        # Long system prompts (and the tools) are served from Gemini's context cache,
+        # so only the new turn is sent with each message
+        cached_content = _text_chat_cached_content(client, request, property_context, function_declarations)
 
         # Try function calling first
         def make_function_call():
+            if cached_content:
+                return client.models.generate_content(
+                    model='gemini-2.5-flash',
+                    contents=request['turn'],
+                    config=genai.types.GenerateContentConfig(cached_content=cached_content)
+                )
             return client.models.generate_content(
                 model='gemini-2.5-flash',
                 contents=prompt,
@@ -811,106 +1036,55 @@ def process_text_query_with_tools(user_query, property_context=None, conversatio
             )
 
         logging.info("[TEXT CHAT DEBUG] Attempting function call with get_current_time")
-        response = rate_limited_gemini_call(make_function_call, max_retries=2)
+        try:
+            response = rate_limited_gemini_call(make_function_call, max_retries=2, model='gemini-2.5-flash')
+        except Exception as cache_err:
+            if not cached_content:
+                raise
+            # The cache may have expired or been deleted; retry once with the full prompt
+            logging.warning(f"[TEXT CHAT] Cached content call failed, sending full prompt: {cache_err}")
+            from concierge.utils.gemini_context_cache import get_gemini_context_cache
+            get_gemini_context_cache().forget(cached_content)
+            cached_content = None
+            response = rate_limited_gemini_call(make_function_call, max_retries=2, model='gemini-2.5-flash')
         logging.info(f"[TEXT CHAT DEBUG] Function call response received: {response is not None}")
 
-        # Handle potential function calls (get_current_time and search_nearby_places)
+        # Handle function calls (get_current_time and search_nearby_places): all calls of a
+        # turn run concurrently, and the model may ask for more tools for up to
+        # TEXT_CHAT_MAX_TOOL_ROUNDS turns before it has to answer
+        function_called = False
         try:
-            function_called = False
-            if response and hasattr(response, 'candidates') and response.candidates:
-                for candidate in response.candidates:
-                    if hasattr(candidate, 'content') and candidate.content and hasattr(candidate.content, 'parts'):
-                        for part in candidate.content.parts:
-                            if hasattr(part, 'function_call') and part.function_call:
-                                fname = part.function_call.name
-                                logging.info(f"[TEXT CHAT] Function call detected: {fname}")
-                                
-                                if fname == "get_current_time":
-                                    function_called = True
-                                    time_result = get_current_time(property_context)
-                                    logging.info(f"[TEXT CHAT] get_current_time result: {time_result}")
-
-                                    follow_up_prompt = f"{prompt}\n\nFunction call result: {time_result}\n\nPlease provide a natural response using this current time information."
-
-                                    def make_follow_up_call():
-                                        return client.models.generate_content(
-                                            model='gemini-2.5-flash',
-                                            contents=follow_up_prompt
-                                        )
-
-                                    response = rate_limited_gemini_call(make_follow_up_call, max_retries=2)
-                                    break
-                                
-                                elif fname == "search_nearby_places":
-                                    function_called = True
-                                    logging.info("[TEXT CHAT] Function call detected: search_nearby_places")
-                                    
-                                    # Extract arguments
-                                    args = {}
-                                    if hasattr(part.function_call, 'args') and part.function_call.args:
-                                        args = dict(part.function_call.args)
-                                    
-                                    logging.info(f"[TEXT CHAT] search_nearby_places args: {args}")
-                                    
-                                    # Get property location
-                                    property_location = None
-                                    if property_context:
-                                        address_parts = []
-                                        for field in ['address', 'city', 'state', 'country']:
-                                            if field in property_context and property_context[field]:
-                                                address_parts.append(property_context[field])
-                                        if address_parts:
-                                            property_location = ', '.join(address_parts)
-                                    
-                                    if not property_location:
-                                        logging.warning("[TEXT CHAT] No property location available for Places API search")
-                                        follow_up_prompt = f"{prompt}\n\nI couldn't determine the property location to search nearby places. Please provide a response without location search."
-                                        
-                                        def make_error_call():
-                                            return client.models.generate_content(
-                                                model='gemini-2.5-flash',
-                                                contents=follow_up_prompt
-                                            )
-                                        
-                                        response = rate_limited_gemini_call(make_error_call, max_retries=2)
-                                        break
-                                    
-                                    # Call Places API
-                                    places_result = find_nearby_with_details(
-                                        property_location=property_location,
-                                        query=args.get('query', ''),
-                                        place_type=args.get('place_type'),
-                                        max_results=args.get('max_results', 5),
-                                        radius=args.get('radius', 5000),
-                                        travel_mode=args.get('travel_mode', 'walking')
-                                    )
-                                    
-                                    logging.info(f"[TEXT CHAT] Places API returned {places_result.get('total_results', 0)} results")
-                                    
-                                    # Format places info for the model
-                                    if places_result.get('success') and places_result.get('places'):
-                                        from concierge.utils.places_api import format_place_for_response
-                                        places_info = f"Found {len(places_result['places'])} nearby places:\n\n"
-                                        for i, place in enumerate(places_result['places'], 1):
-                                            places_info += f"{i}. {format_place_for_response(place)}\n"
-                                        
-                                        follow_up_prompt = f"{prompt}\n\nNearby places search results:\n{places_info}\n\nPlease provide a helpful response based on these results. Present 1-2 top recommendations and ask if the guest would like more options."
-                                    else:
-                                        error_msg = places_result.get('error', 'No results found')
-                                        follow_up_prompt = f"{prompt}\n\nPlaces search returned no results: {error_msg}. Please provide an alternative response or suggestion."
-                                    
-                                    # Generate final response with places context
-                                    def make_places_call():
-                                        return client.models.generate_content(
-                                            model='gemini-2.5-flash',
-                                            contents=follow_up_prompt
-                                        )
-                                    
-                                    response = rate_limited_gemini_call(make_places_call, max_retries=2)
-                                    break
-                    
-                    if function_called:
-                        break
+            tool_results = ''
+            for tool_round in range(TEXT_CHAT_MAX_TOOL_ROUNDS):
+                calls = _text_chat_function_calls(_response_function_calls(response))
+                if not calls:
+                    break
+                function_called = True
+                tool_results += _run_text_chat_tools(calls, property_context)
+                last_round = tool_round == TEXT_CHAT_MAX_TOOL_ROUNDS - 1
+                if cached_content and not last_round:
+                    follow_up_prompt = request['turn'] + tool_results
+                    follow_up_config = genai.types.GenerateContentConfig(cached_content=cached_content)
+                else:
+                    # The cached content always offers tools, so the last round sends the full prompt without them
+                    follow_up_prompt = prompt + tool_results
+                    follow_up_config = None if last_round else genai.types.GenerateContentConfig(
+                        tools=[genai.types.Tool(function_declarations=function_declarations)]
+                    )
+
+                def make_follow_up_call():
+                    if follow_up_config is None:
+                        return client.models.generate_content(
+                            model='gemini-2.5-flash',
+                            contents=follow_up_prompt
+                        )
+                    return client.models.generate_content(
+                        model='gemini-2.5-flash',
+                        contents=follow_up_prompt,
+                        config=follow_up_config
+                    )
+
+                response = rate_limited_gemini_call(make_follow_up_call, max_retries=2, model='gemini-2.5-flash')
         except Exception as func_err:
             logging.warning(f"[TEXT CHAT] Error while handling function call: {func_err}")
 
@@ -928,7 +1102,7 @@ def process_text_query_with_tools(user_query, property_context=None, conversatio
                 )
             
             logging.info("[TEXT CHAT DEBUG] Making Google Search call")
-            response = rate_limited_gemini_call(make_search_call, max_retries=2)
+            response = rate_limited_gemini_call(make_search_call, max_retries=2, model='gemini-2.5-flash')
         else:
             logging.info(f"[TEXT CHAT DEBUG] Function called: {function_called}, Response has text: {response and hasattr(response, 'text') and bool(response.text.strip())}")
 
@@ -987,403 +1161,223 @@ def process_text_query_with_tools(user_query, property_context=None, conversatio
         return result
 
 
-# === Firestore Vector Search ===
-def get_relevant_context(user_query, property_id):
-    """
-    Get relevant context from Firestore using vector search.
-    
-    Args:
-        user_query (str): The user's query
-        property_id (str): The property ID to search within
-        
-    Returns:
-        dict: Contains 'found' (bool) and 'items' (list) with relevant context
-    """
-    try:
-        # Get relevant context from Firestore
-        logging.info(f"Searching for similar knowledge items in Firestore for property: {property_id}")
-        rag_results = get_relevant_context(user_query, property_id)
+def _usage_to_dict(usage_metadata):
+    """Convert Gemini usage metadata into a plain token count dict."""
+    usage = {'prompt_tokens': 0, 'cached_tokens': 0, 'output_tokens': 0, 'total_tokens': 0}
+    if usage_metadata is not None:
+        usage['prompt_tokens'] = getattr(usage_metadata, 'prompt_token_count', 0) or 0
+        usage['output_tokens'] = getattr(usage_metadata, 'candidates_token_count', 0) or 0
+        usage['total_tokens'] = getattr(usage_metadata, 'total_token_count', 0) or 0
+        usage['cached_tokens'] = getattr(usage_metadata, 'cached_content_token_count', 0) or 0
+    return usage
 
-        # Initialize property information flags
-        has_name = False
-        has_host = False
-        has_address = False
-        has_wifi = False
-
-        # Log results of context lookup
-        if rag_results.get('found'):
-            logging.info(f"Found {len(rag_results.get('items', []))} relevant items in knowledge base")
-            for idx, item in enumerate(rag_results.get('items', [])):
-                logging.info(f"Context item {idx+1}: similarity={item.get('similarity', 0):.4f}, text='{item.get('text', '')[:100]}...'")
-        else:
-            logging.warning(f"No relevant context found in knowledge base for property_id: {property_id}")
 
-        # If no property_context provided, create a minimal one
-        if not property_context:
-            logging.warning(f"No property_context provided for property {property_id}, using minimal context")
-            property_context = {'name': f'Property {property_id}', 'hostName': 'Your Host'}
-        else:
-            # Log the property context we received
-            logging.info(f"Received property_context with keys: {', '.join(property_context.keys())}")
-
-            # Check if we have essential fields
-            has_name = 'name' in property_context and property_context['name'] != f'Property {property_id}'
-            has_host = 'hostName' in property_context and property_context['hostName'] not in ['the host', 'Your Host']
-            has_address = 'address' in property_context or 'location' in property_context
-            has_wifi = 'wifiNetwork' in property_context or 'wifiPassword' in property_context
-
-            logging.info(f"Property context check - Name: {has_name}, Host: {has_host}, Address: {has_address}, WiFi: {has_wifi}")
-
-            # Log specific fields for debugging
-            if has_name:
-                logging.info(f"Property name: {property_context.get('name')}")
-            if has_host:
-                logging.info(f"Host name: {property_context.get('hostName')}")
-            if has_address:
-                address_value = property_context.get('address', property_context.get('location', ''))
-                logging.info(f"Address: {address_value}")
-            if has_wifi:
-                logging.info(f"WiFi details available: network={bool(property_context.get('wifiNetwork'))}, password={bool(property_context.get('wifiPassword'))}")
-
-        # Format prompt based on whether a custom system prompt is provided
-        if system_prompt:
-            logging.info(f"Using provided system prompt (length: {len(system_prompt)})")
-
-            # Start with the system prompt
-            prompt_parts = [system_prompt]
-
-            # Add relevant RAG results if available
-            if rag_results and rag_results.get('found') and rag_results.get('items'):
-                knowledge_context = "\n\nRELEVANT PROPERTY INFORMATION:\n"
-                for item in rag_results.get('items', []):
-                    knowledge_context += f"- {item.get('text', '')}\n"
-                prompt_parts.append(knowledge_context)
-
-            # Add conversation history if available
-            if conversation_history and len(conversation_history) > 0:
-                conversation_context = "\n\nPREVIOUS CONVERSATION:\n"
-                for message_entry in conversation_history:
-                    role = message_entry.get('role', '')
-                    text = message_entry.get('text', '')
-                    if role.lower() == 'user':
-                        conversation_context += f"USER: {text}\n"
-                    elif role.lower() == 'assistant' or role.lower() == 'ai':
-                        conversation_context += f"ASSISTANT: {text}\n"
-                prompt_parts.append(conversation_context)
-
-            # Add the current user message
-            prompt_parts.append(f"\nUSER: {user_query}\nASSISTANT:")
-
-            # Combine all prompt parts
-            prompt = "\n".join(prompt_parts)
-        else:
-            # Use the default prompt formatting function
-            prompt = format_prompt_with_rag(user_query, property_context, rag_results, conversation_history)
+def _stream_text_chat_generation(client, contents, config, on_chunk, chunk_index, model='gemini-2.5-flash'):
+    """
+    Run one streaming generation, forwarding text as it arrives.
 
-        logging.info(f"Generated prompt length: {len(prompt)} characters")
+    Stops forwarding at the first function call part; the caller runs the tool
+    and starts a follow-up stream. Stops reading the stream when on_chunk
+    returns False (nobody is listening anymore).
 
-        # Log key parts of the prompt for debugging (without exposing sensitive info)
-        if len(prompt) > 1000:
-            # Log first 200 and last 200 characters to avoid excessive logging
-            logging.info(f"Prompt start: {prompt[:200]}...")
-            logging.info(f"Prompt end: ...{prompt[-200:]}")
-        else:
-            logging.info(f"Full prompt: {prompt}")
-
-        # Generate response from Gemini with conditional tool usage
-        try:
-            # Create client with the new google-genai SDK
-            logging.info("Initializing Google GenAI client with conditional tool usage")
-            
-            client = genai.Client(api_key=os.environ.get('GEMINI_API_KEY'))
-            
-            # Define function declarations for time queries
-            function_declarations = [
-                genai.types.FunctionDeclaration(
-                    name="get_current_time",
-                    description="Get the current date and time for the property location. Use this when the guest asks about the current time, date, or when you need to provide time-sensitive information.",
-                    parameters=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        properties={},
-                        required=[]
-                    )
-                )
-            ]
-            
-            # Check if this is a current-time/date query (narrow phrases to avoid false positives like 'when is checkout')
-            query_lower = user_query.lower()
-            time_keywords = [
-                'what time is it',
-                'what is the time',
-                "what's the time",
-                'current time',
-                'time now',
-                'local time',
-                'current date',
-                "today's date",
-                'date today'
-            ]
-            matched_kw = next((kw for kw in time_keywords if kw in query_lower), None)
-            is_time_query = matched_kw is not None
-            logging.info(f"[TEXT CHAT DEBUG] Time-query detection: {is_time_query} (matched='{matched_kw}')")
-            
-            def make_search_call():
-                if is_time_query:
-                    # For time queries, prioritize function calling
-                    return client.models.generate_content(
-                        model='gemini-2.5-flash-lite',
-                        contents=prompt,
-                        config=genai.types.GenerateContentConfig(
-                            tools=[genai.types.Tool(function_declarations=function_declarations)]
-                        )
-                    )
-                else:
-                    # For other queries, use Google Search ONLY (no function calling to avoid API conflict)
-                    return client.models.generate_content(
-                        model='gemini-2.5-flash-lite',
-                        contents=prompt,
-                        config=genai.types.GenerateContentConfig(
-                            tools=[
-                                genai.types.Tool(google_search=genai.types.GoogleSearch())
-                            ]
-                        )
-                    )
-            
-            # Use the new SDK syntax for Google Search with rate limiting
-            response = rate_limited_gemini_call(make_search_call, max_retries=2)
-            
-            # Check for function calls in the response
-            if response and hasattr(response, 'candidates') and response.candidates:
-                for candidate in response.candidates:
-                    if hasattr(candidate, 'content') and candidate.content and hasattr(candidate.content, 'parts'):
-                        for part in candidate.content.parts:
-                            if hasattr(part, 'function_call') and part.function_call:
-                                fname = part.function_call.name
-                                logging.info(f"[TEXT CHAT DEBUG] Function call detected: {fname}")
-                                if fname == "get_current_time":
-                                    function_called = True
-                                    logging.info("[TEXT CHAT] Function call detected: get_current_time")
-                                    
-                                    # Call the actual function
-                                    time_result = get_current_time(property_context)
-                                    logging.info(f"[TEXT CHAT] get_current_time result: {time_result}")
-                                    
-                                    # Create follow-up prompt with the time information
-                                    time_info = f"Current time information: {time_result['full_datetime']}"
-                                    follow_up_prompt = f"{prompt}\n\n{time_info}\n\nPlease provide your response using this current time information."
-                                    
-                                    # Generate final response with time context
-                                    def make_follow_up_call():
-                                        return client.models.generate_content(
-                                            model='gemini-2.5-flash',
-                                            contents=follow_up_prompt
-                                        )
-                                    
-                                    logging.info("[TEXT CHAT DEBUG] Making follow-up call with time context")
-                                    response = rate_limited_gemini_call(make_follow_up_call, max_retries=2)
-                                    break
-            
-            logging.info(f"Successfully called Gemini with {'function calling only' if is_time_query else 'Google Search only'} using new SDK")
+    Returns:
+        tuple: (text, function_calls, usage, next chunk index)
+    """
+    get_gemini_rate_limiter().acquire(model=model)
+
+    kwargs = {'model': model, 'contents': contents}
+    if config is not None:
+        kwargs['config'] = config
+
+    text_parts = []
+    function_calls = []
+    usage_metadata = None
+    for chunk in client.models.generate_content_stream(**kwargs):
+        if getattr(chunk, 'usage_metadata', None) is not None:
+            usage_metadata = chunk.usage_metadata
+        for candidate in getattr(chunk, 'candidates', None) or []:
+            content = getattr(candidate, 'content', None)
+            for part in (getattr(content, 'parts', None) or []):
+                if getattr(part, 'function_call', None):
+                    function_calls.append(part.function_call)
+                elif getattr(part, 'text', None) and not function_calls:
+                    text_parts.append(part.text)
+                    listening = on_chunk(part.text, chunk_index) if on_chunk else True
+                    chunk_index += 1
+                    if listening is False:
+                        return ''.join(text_parts), [], _usage_to_dict(usage_metadata), chunk_index
+
+    return ''.join(text_parts), function_calls, _usage_to_dict(usage_metadata), chunk_index
+
+
+def stream_text_query_with_tools(user_query, property_context=None, conversation_history=None, system_prompt=None,
+                                 on_chunk=None):
+    """
+    Streaming variant of process_text_query_with_tools.
 
-        except Exception as tool_error:
-            # Fallback to regular generation if function calling fails
-            logging.warning(f"Function calling failed: {tool_error}")
-            logging.info("Falling back to regular Gemini generation")
-            
-            try:
-                # Create client for fallback with function calling still enabled
-                client = genai.Client(api_key=os.environ.get('GEMINI_API_KEY'))
-                
-                # Define function declarations for fallback too
-                function_declarations = [
-                    genai.types.FunctionDeclaration(
-                        name="get_current_time",
-                        description="Get the current date and time for the property location. Use this when the guest asks about the current time, date, or when you need to provide time-sensitive information.",
-                        parameters=genai.types.Schema(
-                            type=genai.types.Type.OBJECT,
-                            properties={},
-                            required=[]
-                        )
-                    )
-                ]
-                
-                def make_fallback_call():
-                    return client.models.generate_content(
-                        model='gemini-2.5-flash-lite',
-                        contents=prompt,
-                        config=genai.types.GenerateContentConfig(
-                            tools=[genai.types.Tool(function_declarations=function_declarations)]
-                        )
-                    )
-                
-                response = rate_limited_gemini_call(make_fallback_call, max_retries=2)
-                
-                # Check for function calls in fallback response too
-                if response and hasattr(response, 'candidates') and response.candidates:
-                    for candidate in response.candidates:
-                        if hasattr(candidate, 'content') and candidate.content and hasattr(candidate.content, 'parts'):
-                            for part in candidate.content.parts:
-                                if hasattr(part, 'function_call') and part.function_call:
-                                    function_name = part.function_call.name
-                                    logging.warning(f"[TEXT CHAT DEBUG] Function call detected in fallback: {function_name}")
-                                    
-                                    if function_name == "get_current_time":
-                                        # Execute the function with property context
-                                        time_result = get_current_time(property_context)
-                                        logging.warning(f"[TEXT CHAT DEBUG] Fallback function result: {time_result}")
-                                        
-                                        # Continue the conversation with the function result
-                                        follow_up_prompt = f"{prompt}\n\nFunction call result: {time_result}\n\nPlease provide a natural response using this current time information."
-                                        
-                                        def make_follow_up_fallback_call():
-                                            return client.models.generate_content(
-                                                model='gemini-2.5-flash-lite',
-                                                contents=follow_up_prompt
-                                            )
-                                        
-                                        response = rate_limited_gemini_call(make_follow_up_fallback_call, max_retries=2)
-                                        break
-            except Exception as fallback_error:
-                logging.error(f"Fallback generation also failed: {fallback_error}")
-                raise fallback_error
+    Text is passed to `on_chunk(text, index)` as the model produces it. When the model
+    asks for a tool mid-stream, the tool runs and a follow-up stream continues the
+    reply. If streaming fails before anything was sent, this falls back to the
+    non-streaming path and delivers the full reply as a single chunk. Fast path
+    replies (small talk, known FAQs) are also delivered as a single chunk.
+    Generation stops as soon as on_chunk returns False (e.g. the guest's
+    connection is gone); the reply is then what was sent so far.
 
-        if response and getattr(response, 'text', None):
-            result['response'] = response.text
-            result['has_context'] = rag_results.get('found', False)
-            if rag_results.get('items'):
-                result['context_used'] = rag_results['items']
-
-            # Log the response (truncated for readability)
-            response_text = response.text or ''
-            if len(response_text) > 500:
-                logging.info(f"Gemini response (truncated): '{response_text[:500]}...'")
-            else:
-                logging.info(f"Gemini response: '{response_text}'")
+    Args:
+        user_query (str): The user's query or message
+        property_context (dict, optional): Property details for local tools (timezone)
+        conversation_history (list, optional): Previous conversation messages (role/text)
+        system_prompt (str, optional): Shared system prompt to use
+        on_chunk (callable, optional): Called with (text, index) for every streamed piece;
+            returning False stops generation
 
-            # Check if response contains requested information when available
-            query_lower = user_query.lower()
+    Returns:
+        dict: { 'response': str, 'usage': dict, 'tool_calls': list, 'streamed': bool }
+    """
+    result = {
+        'response': '',
+        'usage': _usage_to_dict(None),
+        'tool_calls': [],
+        'streamed': True
+    }
+    chunk_index = 0
+    sent_parts = []
+    stopped = []
+
+    def add_usage(usage):
+        for key, value in usage.items():
+            result['usage'][key] += value
+
+    def forward(text, index):
+        sent_parts.append(text)
+        if on_chunk and on_chunk(text, index) is False:
+            stopped.append(index)
+            return False
+        return True
 
-            # Check for WiFi information in response
-            if ('wifi' in query_lower or 'internet' in query_lower or 'password' in query_lower) and has_wifi:
-                wifi_in_response = ('wifi' in response_text.lower() and
-                                    ('password' in response_text.lower() or 'network' in response_text.lower()))
+    def stopped_result():
+        logging.info(f"[TEXT CHAT STREAM] Listener gone after {len(sent_parts)} chunks, stopping generation")
+        result['response'] = ''.join(sent_parts)
+        result['stopped'] = True
+        return result
 
-                if wifi_in_response:
-                    logging.info("WiFi information successfully included in response")
-                else:
-                    logging.warning("User asked about WiFi but response may not include complete WiFi details")
+    fast_reply = _text_chat_fast_path_reply(user_query, property_context, conversation_history)
+    if fast_reply:
+        result['response'], result['fast_path'] = fast_reply
+        result['streamed'] = False
+        forward(result['response'], 0)
+        return result
 
-            # Check for address information in response
-            if ('address' in query_lower or 'location' in query_lower or 'where' in query_lower) and has_address:
-                address_in_response = ('address' in response_text.lower() or
-                                      property_context.get('address', '') in response_text or
-                                      property_context.get('location', '') in response_text)
+    try:
+        if genai is None:
+            raise RuntimeError("Google Generative AI module not available")
 
-                if address_in_response:
-                    logging.info("Address information successfully included in response")
-                else:
-                    logging.warning("User asked about location but response may not include complete address details")
+        request = _build_text_chat_request(user_query, property_context, conversation_history, system_prompt)
+        prompt = request['prompt']
+        client = get_genai_client(os.environ.get('GEMINI_API_KEY'))
+        function_declarations = _text_chat_function_declarations()
+        cached_content = _text_chat_cached_content(client, request, property_context, function_declarations)
 
-            # Check if the response appears to be a fallback response
-            if "I don't have that specific information" in response_text or "I don't have information about" in response_text:
-                logging.warning("Generated response indicates no specific information available")
-        else:
-            # Try to extract text from candidates if available
-            extracted_text = None
+        if cached_content:
             try:
-                if response and hasattr(response, 'candidates') and response.candidates:
-                    for candidate in response.candidates:
-                        if hasattr(candidate, 'content') and candidate.content and hasattr(candidate.content, 'parts'):
-                            for part in candidate.content.parts:
-                                if getattr(part, 'text', None):
-                                    extracted_text = part.text
-                                    break
-                        if extracted_text:
-                            break
-            except Exception as parse_err:
-                logging.warning(f"Could not extract text from response candidates: {parse_err}")
+                text, function_calls, usage, chunk_index = _stream_text_chat_generation(
+                    client,
+                    request['turn'],
+                    genai.types.GenerateContentConfig(cached_content=cached_content),
+                    forward,
+                    chunk_index
+                )
+            except Exception as cache_err:
+                if sent_parts:
+                    # Chunks already reached the guest; re-streaming would duplicate them
+                    raise
+                # The cache may have expired or been deleted; continue with the full prompt
+                logging.warning(f"[TEXT CHAT STREAM] Cached content call failed, sending full prompt: {cache_err}")
+                from concierge.utils.gemini_context_cache import get_gemini_context_cache
+                get_gemini_context_cache().forget(cached_content)
+                cached_content = None
+
+        if not cached_content:
+            text, function_calls, usage, chunk_index = _stream_text_chat_generation(
+                client,
+                prompt,
+                genai.types.GenerateContentConfig(
+                    tools=[genai.types.Tool(function_declarations=function_declarations)]
+                ),
+                forward,
+                chunk_index
+            )
+        add_usage(usage)
+        if stopped:
+            return stopped_result()
+
+        calls = _text_chat_function_calls(function_calls)
+        if calls:
+            tool_results = ''
+            for tool_round in range(TEXT_CHAT_MAX_TOOL_ROUNDS):
+                result['tool_calls'].extend({'name': fname, 'args': args} for fname, args in calls)
+                tool_results += _run_text_chat_tools(calls, property_context)
+                last_round = tool_round == TEXT_CHAT_MAX_TOOL_ROUNDS - 1
+                if cached_content and not last_round:
+                    follow_up_prompt = request['turn'] + tool_results
+                    follow_up_config = genai.types.GenerateContentConfig(cached_content=cached_content)
+                else:
+                    # The cached content always offers tools, so the last round sends the full prompt without them
+                    follow_up_prompt = prompt + tool_results
+                    follow_up_config = None if last_round else genai.types.GenerateContentConfig(
+                        tools=[genai.types.Tool(function_declarations=function_declarations)]
+                    )
+                follow_up_text, function_calls, usage, chunk_index = _stream_text_chat_generation(
+                    client, follow_up_prompt, follow_up_config, forward, chunk_index
+                )
+                add_usage(usage)
+                if stopped:
+                    return stopped_result()
+                text += follow_up_text
+                calls = _text_chat_function_calls(function_calls)
+                if not calls:
+                    break
+        elif not text.strip():
+            logging.info("[TEXT CHAT STREAM] No function call or text, trying Google Search")
+            text, _, usage, chunk_index = _stream_text_chat_generation(
+                client,
+                prompt,
+                genai.types.GenerateContentConfig(
+                    tools=[genai.types.Tool(google_search=genai.types.GoogleSearch())]
+                ),
+                forward,
+                chunk_index
+            )
+            add_usage(usage)
+            if stopped:
+                return stopped_result()
 
-            if extracted_text:
-                result['response'] = extracted_text
-                result['has_context'] = rag_results.get('found', False)
-                if rag_results.get('items'):
-                    result['context_used'] = rag_results['items']
-                logging.info("Extracted response text from candidates.")
-            else:
-                logging.error(f"Empty or invalid response from Gemini: {response}")
-                result['response'] = "I'm sorry, I'm having trouble processing your request. Can you please try again?"
+        if not text.strip():
+            raise RuntimeError("Empty streamed response from Gemini")
 
+        result['response'] = text
         return result
 
     except Exception as e:
-        logging.error(f"Error processing query with RAG: {e}")
-        traceback.print_exc()
-        
-        # Check if this is a quota exceeded error and provide intelligent fallback
-        error_str = str(e).lower()
-        if '429' in error_str or 'quota' in error_str or 'resource_exhausted' in error_str:
-            logging.info("Detected quota exceeded error, providing intelligent fallback response")
-            
-            # Check if this is a WiFi-related query and we have WiFi context
-            query_lower = user_query.lower()
-            if ('wifi' in query_lower or 'password' in query_lower or 'internet' in query_lower) and property_context:
-                wifi_network = property_context.get('wifiNetwork', '')
-                wifi_password = property_context.get('wifiPassword', '')
-                
-                if wifi_network and wifi_password:
-                    result['response'] = f"Here are the WiFi details for your stay:\n\n **Network:** {wifi_network}\n **Password:** {wifi_password}\n\nJust connect to the network and enter the password when prompted!"
-                    result['has_context'] = True
-                    logging.info("Provided WiFi information from property context as fallback")
-                    return result
-            
-            # Check for basic property information queries
-            if ('property' in query_lower or 'name' in query_lower or 'address' in query_lower or 'location' in query_lower) and property_context:
-                property_name = property_context.get('name', property_context.get('Name', 'this property'))
-                property_address = property_context.get('address', property_context.get('location', ''))
-                
-                if 'name' in query_lower and property_name:
-                    result['response'] = f"You're staying at **{property_name}**"
-                    if property_address:
-                        result['response'] += f" located in {property_address}"
-                    result['response'] += "."
-                    result['has_context'] = True
-                    logging.info("Provided property name from context as fallback")
-                    return result
-                elif ('address' in query_lower or 'location' in query_lower) and property_address:
-                    result['response'] = f"The property is located at: **{property_address}**"
-                    result['has_context'] = True
-                    logging.info("Provided property address from context as fallback")
-                    return result
-            
-            # Check for check-in/check-out time queries
-            if ('check' in query_lower or 'time' in query_lower) and property_context:
-                checkin_time = property_context.get('checkInTime', '')
-                checkout_time = property_context.get('checkOutTime', '')
-                
-                if 'in' in query_lower and checkin_time:
-                    result['response'] = f"Check-in time is **{checkin_time}**"
-                    result['has_context'] = True
-                    logging.info("Provided check-in time from context as fallback")
-                    return result
-                elif 'out' in query_lower and checkout_time:
-                    result['response'] = f"Check-out time is **{checkout_time}**"
-                    result['has_context'] = True
-                    logging.info("Provided check-out time from context as fallback")
-                    return result
-                elif checkin_time and checkout_time:
-                    result['response'] = f"**Check-in:** {checkin_time}\n**Check-out:** {checkout_time}"
-                    result['has_context'] = True
-                    logging.info("Provided check-in/out times from context as fallback")
-                    return result
-            
-            # Generic quota exceeded message
-            result['response'] = "I'm currently experiencing high usage and my AI engine is temporarily unavailable. However, I can still help you with basic information about your stay. Try asking about WiFi, check-in times, or property details!"
-            
-        else:
-            # Non-quota error
-            result['response'] = "I'm sorry, I'm having trouble accessing the information you need. How else can I assist you?"
+        if sent_parts:
+            # Part of the reply already reached the guest; keep what was sent
+            logging.error(f"[TEXT CHAT STREAM] Stream interrupted after {len(sent_parts)} chunks: {e}")
+            result['response'] = ''.join(sent_parts)
+            return result
+
+        logging.warning(f"[TEXT CHAT STREAM] Streaming failed, falling back to non-streaming reply: {e}")
+        fallback = process_text_query_with_tools(
+            user_query,
+            property_context=property_context,
+            conversation_history=conversation_history,
+            system_prompt=system_prompt
+        )
+        result['response'] = fallback['response']
+        result['streamed'] = False
+        if on_chunk and result['response']:
+            on_chunk(result['response'], 0)
+        return result
 
-    return result
 
 # === Firestore Vector Search Functions ===
 # These functions replace the previous LanceDB functions
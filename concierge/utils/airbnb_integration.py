@@ -19,7 +19,8 @@ from .airbnb_scraper import AirbnbScraper
 # Import existing AI and knowledge base utilities
 try:
     from .ai_helpers import process_query_with_rag, generate_embedding
-    from .firestore_client import create_knowledge_item, list_knowledge_items_by_property
+    from .firestore_client import create_knowledge_item, find_duplicate_content
+    from .knowledge_dedup import DUPLICATE_EXACT
     AI_HELPERS_AVAILABLE = True
 except ImportError as e:
     logging.warning(f"AI helpers not available: {e}")
@@ -218,6 +219,11 @@ class AirbnbPropertyIntegrator:
         """
         Find existing knowledge items that are similar to the new item.
 
+        Uses the property's knowledge dedup index, so each lookup is constant
+        time rather than a scan of every existing item. Only an exact match is
+        returned; a near match is recorded on new_item as possibleDuplicateOf,
+        so it is created for the host to review.
+
         Args:
             new_item: The new knowledge item to check
 
@@ -228,24 +234,16 @@ class AirbnbPropertyIntegrator:
             if not AI_HELPERS_AVAILABLE:
                 return []
 
-            # Get existing items for this property, then filter by category locally
-            existing_items = list_knowledge_items_by_property(self.property_id)
-            
-            # Simple similarity check based on title and category
-            similar_items = []
-            new_title = new_item.get('title', '').lower()
-            new_category = new_item.get('category', '')
-            
-            for existing_item in existing_items:
-                existing_title = existing_item.get('title', '').lower()
-                existing_category = existing_item.get('category', '')
-                
-                # Check for title similarity and same category
-                if (new_category == existing_category and 
-                    (new_title in existing_title or existing_title in new_title)):
-                    similar_items.append(existing_item)
-            
-            return similar_items
+            duplicate = find_duplicate_content(self.property_id, new_item.get('content', ''))
+            if not duplicate:
+                return []
+
+            existing_item, kind = duplicate
+            # Stored items are typed by the imported item's category
+            if kind == DUPLICATE_EXACT and existing_item.get('type') == new_item.get('category', 'general'):
+                return [existing_item]
+            new_item['possibleDuplicateOf'] = existing_item['id']
+            return []
             
         except Exception as e:
             self.logger.error(f"Error finding similar knowledge items: {e}")
@@ -277,6 +275,10 @@ class AirbnbPropertyIntegrator:
                 'createdAt': datetime.now().isoformat(),
                 'updatedAt': datetime.now().isoformat()
             }
+            if item.get('possibleDuplicateOf'):
+                # Nearly the same as an existing item, possibly a changed fact: leave it for review
+                item_data['possibleDuplicateOf'] = item['possibleDuplicateOf']
+                item_data['status'] = 'pending'
 
             # Generate a unique item ID
             import uuid
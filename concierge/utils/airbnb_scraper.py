@@ -76,6 +76,8 @@ except ImportError as e:
     print("Install it with: pip install selenium")
     print(f"Import error: {e}")
 
+from concierge.utils.gemini_request_planner import get_gemini_request_planner, content_hash
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -99,6 +101,15 @@ class AirbnbScraper:
         self.driver = None
         self._selenium_failures = 0  # Track Selenium failures for graceful degradation
         self._max_selenium_failures = 3  # Max failures before disabling Selenium
+
+        # All Gemini requests go through the shared planner (rate limiting + content-hash cache)
+        self._gemini_planner = get_gemini_request_planner()
+        # When set, per-listing validation is collected and run as one batched call
+        self._defer_listing_validation = False
+        self._pending_listing_samples: Dict[str, str] = {}
+        # When set, JSON enhancement and rule validation are folded into consolidated processing
+        self._defer_gemini_enhancements = False
+        self._page_content_hash = None
         
         # Set up headers to mimic a real browser
         self.session.headers.update({
@@ -550,6 +561,10 @@ class AirbnbScraper:
                 except Exception as e:
                     logger.debug(f"Error parsing script tag: {e}")
 
+        # Collect per-listing Gemini validation and run it as one batched call at the end
+        self._defer_listing_validation = True
+        self._pending_listing_samples.clear()
+
         # ENHANCED: Always try to get detailed info for each listing found
         if listings:
             logger.info(f"Enhancing {len(listings)} listings with detailed information")
@@ -604,6 +619,9 @@ class AirbnbScraper:
                 except Exception as e:
                     logger.error(f"Error extracting listing details from {link_info['url']}: {e}")
 
+        self._defer_listing_validation = False
+        self._validate_listings_batch(listings)
+
         logger.info(f"Found {len(listings)} listings for user")
         return listings
 
@@ -1135,76 +1153,17 @@ RESPONSE: Return only the clean name or "INVALID" (no explanation needed)."""
         return False
 
     def _call_gemini_api(self, prompt: str) -> str:
-        """Call Gemini API with the given prompt and rate limit handling"""
-        try:
-            import google.generativeai as genai
-            import os
-            import time
-
-            gemini_api_key = os.getenv('GEMINI_API_KEY')
-            if not gemini_api_key:
-                logger.debug("No Gemini API key found")
-                return ""
-
-            genai.configure(api_key=gemini_api_key)
-            model = genai.GenerativeModel('gemini-2.0-flash')
-
-            # Retry logic for rate limits
-            max_retries = 2
-            for attempt in range(max_retries + 1):
-                try:
-                    response = model.generate_content(prompt)
-                    return response.text.strip() if response and response.text else ""
-
-                except Exception as api_error:
-                    error_str = str(api_error)
-
-                    # Check for rate limit errors
-                    if "429" in error_str or "quota" in error_str.lower() or "rate limit" in error_str.lower():
-                        if attempt < max_retries:
-                            # Extract retry_delay from Gemini's error response
-                            retry_delay = self._extract_retry_delay_from_error(error_str)
-                            logger.warning(f"Rate limit hit, retrying in {retry_delay} seconds (attempt {attempt + 1}/{max_retries + 1})")
-                            logger.info(f"Gemini suggested retry_delay: {retry_delay} seconds")
-                            time.sleep(retry_delay)
-                            continue
-                        else:
-                            logger.warning(f"Rate limit exceeded after {max_retries} retries, skipping Gemini validation")
-                            return ""
-                    else:
-                        # Non-rate-limit error, don't retry
-                        logger.error(f"Gemini API error: {api_error}")
-                        return ""
-
-            return ""
+        """Call Gemini API with the given prompt through the shared request planner.
 
+        The planner applies the global GeminiRateLimiter budget (with backoff on 429s)
+        and caches responses by prompt hash, so repeated validations are free.
+        """
+        try:
+            return self._gemini_planner.generate_text(prompt)
         except Exception as e:
             logger.error(f"Error calling Gemini API: {e}")
             return ""
 
-    def _extract_retry_delay_from_error(self, error_str: str) -> int:
-        """Extract retry_delay from Gemini's error response"""
-        try:
-            import re
-            # Look for retry_delay { seconds: X } pattern
-            delay_match = re.search(r'retry_delay\s*\{\s*seconds:\s*(\d+)', error_str)
-            if delay_match:
-                suggested_delay = int(delay_match.group(1))
-                # Add a small buffer to the suggested delay
-                return suggested_delay + 2
-
-            # Fallback: look for just "seconds: X" pattern
-            delay_match = re.search(r'seconds:\s*(\d+)', error_str)
-            if delay_match:
-                suggested_delay = int(delay_match.group(1))
-                return suggested_delay + 2
-
-        except Exception as e:
-            logger.debug(f"Could not extract retry_delay from error: {e}")
-
-        # Default fallback delay
-        return 10
-
     def _is_valid_name(self, name):
         """Validate if a string is a reasonable host name"""
         if not name or len(name) < 2 or len(name) > 50:
@@ -2285,6 +2244,9 @@ RESPONSE: Return only the clean name or "INVALID" (no explanation needed)."""
         """
         Use Gemini to validate and normalize listing data for better quality.
 
+        When validation is deferred (multi-listing extraction), the page sample is
+        recorded and the listing is validated later by _validate_listings_batch.
+
         Args:
             listing_data: Raw extracted listing data
             page_content_sample: Sample of page content for context
@@ -2292,81 +2254,61 @@ RESPONSE: Return only the clean name or "INVALID" (no explanation needed)."""
         Returns:
             Validated and normalized listing data
         """
-        try:
-            # Only validate if we have a Gemini API key
-            gemini_api_key = os.getenv('GEMINI_API_KEY')
-            if not gemini_api_key:
-                logger.debug("No Gemini API key found, skipping validation")
-                return listing_data
-
-            import google.generativeai as genai
-            genai.configure(api_key=gemini_api_key)
-            model = genai.GenerativeModel('gemini-2.0-flash')
-
-            # Prepare validation prompt
-            prompt = f"""
-You are a data validation expert for Airbnb listings. Please review and normalize the following extracted data:
-
-EXTRACTED DATA:
-- Title: "{listing_data.get('title', '')}"
-- Location: "{listing_data.get('location', '')}"
-- Property Type: "{listing_data.get('property_type', '')}"
-
-PAGE CONTENT SAMPLE:
-{page_content_sample[:500]}...
-
-VALIDATION TASKS:
-1. TITLE: Choose the best, most user-friendly title that clearly identifies the property
-2. LOCATION: Normalize to format "Neighborhood, City, State, Country" (if neighborhood available) or "City, State, Country"
-3. PROPERTY TYPE: Standardize to one of: House, Apartment, Condo, Studio, Villa, Cottage, Townhouse, Other
+        if self._defer_listing_validation and listing_data.get('url'):
+            self._pending_listing_samples[listing_data['url']] = page_content_sample
+            return listing_data
 
-RULES:
-- Keep titles descriptive but concise (under 60 characters)
-- For locations, include neighborhood if it's a well-known area
-- Use proper capitalization
-- Be consistent with naming conventions
+        try:
+            validated_data = self._gemini_planner.validate_listing(listing_data, page_content_sample)
+            self._apply_listing_validation(listing_data, validated_data)
+        except Exception as e:
+            logger.warning(f"Gemini validation failed: {e}")
+            # Return original data if validation fails
 
-Please respond in JSON format:
-{{
-    "title": "normalized title",
-    "location": "normalized location",
-    "property_type": "normalized type",
-    "confidence": "high|medium|low",
-    "changes_made": ["list of changes"]
-}}
-"""
+        return listing_data
 
-            response = model.generate_content(prompt)
+    def _apply_listing_validation(self, listing_data: Dict[str, Any], validated_data: Optional[Dict[str, Any]]) -> None:
+        """Apply a listing validation result if confidence is high or medium."""
+        if not validated_data:
+            return
 
-            # Parse the response
-            response_text = response.text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:-3]
-            elif response_text.startswith('```'):
-                response_text = response_text[3:-3]
+        if validated_data.get('confidence') in ['high', 'medium']:
+            if validated_data.get('title'):
+                listing_data['title'] = validated_data['title']
+            if validated_data.get('location'):
+                listing_data['location'] = validated_data['location']
+            if validated_data.get('property_type'):
+                listing_data['property_type'] = validated_data['property_type']
+
+            logger.info(f"Gemini validation applied with {validated_data.get('confidence')} confidence")
+            if validated_data.get('changes_made'):
+                logger.info(f"Changes made: {', '.join(validated_data['changes_made'])}")
+        else:
+            logger.info("Gemini validation had low confidence, keeping original data")
 
-            validated_data = json.loads(response_text)
+    def _validate_listings_batch(self, listings: List[Dict[str, Any]]) -> None:
+        """
+        Validate listings collected while validation was deferred, using batched Gemini calls.
 
-            # Apply validated data if confidence is high or medium
-            if validated_data.get('confidence') in ['high', 'medium']:
-                if validated_data.get('title'):
-                    listing_data['title'] = validated_data['title']
-                if validated_data.get('location'):
-                    listing_data['location'] = validated_data['location']
-                if validated_data.get('property_type'):
-                    listing_data['property_type'] = validated_data['property_type']
-
-                logger.info(f"Gemini validation applied with {validated_data.get('confidence')} confidence")
-                if validated_data.get('changes_made'):
-                    logger.info(f"Changes made: {', '.join(validated_data['changes_made'])}")
-            else:
-                logger.info("Gemini validation had low confidence, keeping original data")
+        Args:
+            listings: Listing dicts to validate in place
+        """
+        pending = [l for l in listings if l.get('url') in self._pending_listing_samples]
+        if not pending:
+            return
 
+        try:
+            results = self._gemini_planner.validate_listings([
+                {'listing': l, 'page_sample': self._pending_listing_samples.get(l['url'], '')}
+                for l in pending
+            ])
+            for listing, validated_data in zip(pending, results):
+                self._apply_listing_validation(listing, validated_data)
+            logger.info(f"Batched Gemini validation completed for {len(pending)} listings")
         except Exception as e:
-            logger.warning(f"Gemini validation failed: {e}")
-            # Return original data if validation fails
-
-        return listing_data
+            logger.warning(f"Batched Gemini validation failed: {e}")
+        finally:
+            self._pending_listing_samples.clear()
 
     def extract_deep_property_data(self, listing_url: str) -> Dict[str, Any]:
         """
@@ -2422,6 +2364,10 @@ Please respond in JSON format:
                 soup = BeautifulSoup(response.content, 'html.parser')
                 page_source = response.text
 
+            # Fold JSON enhancement and rule validation into the single consolidated Gemini call
+            self._defer_gemini_enhancements = True
+            self._page_content_hash = content_hash(page_source)
+
             # First try to extract from JSON data in script tags (more reliable for modern Airbnb)
             json_extracted_data = self._extract_from_json_scripts(soup, page_source)
 
@@ -2570,6 +2516,8 @@ Please respond in JSON format:
             logger.error(f"Deep extraction failed for {listing_url}: {e}")
             return self._get_empty_deep_extraction_result()
         finally:
+            self._defer_gemini_enhancements = False
+            self._page_content_hash = None
             # Restore original Selenium setting
             if 'original_selenium_setting' in locals():
                 self.use_selenium = original_selenium_setting
@@ -3896,38 +3844,26 @@ Please respond in JSON format:
                 driver.quit()
 
     # --- OCR helpers (Gemini) ---
-    def _ocr_with_gemini(self, png_bytes: bytes, prompt: str) -> List[Dict[str, Any]]:
-        """Call the configured GEMINI_MODEL to extract structured items from an image.
+    def _ocr_with_gemini(self, png_bytes, prompt: str) -> List[Dict[str, Any]]:
+        """Ask Gemini to extract structured items from one or more screenshots in a single call.
+        Accepts a PNG byte string or a list of them; results are cached by image hash.
         Returns a list of dicts with keys: title, content, type
         """
         items: List[Dict[str, Any]] = []
+        images = [png_bytes] if isinstance(png_bytes, (bytes, bytearray)) else list(png_bytes or [])
+        images = [img for img in images if img]
+        if not images:
+            return items
         try:
-            from concierge.config import GEMINI_MODEL  # already used elsewhere
-            if not GEMINI_MODEL:
-                return items
-            resp = GEMINI_MODEL.generate_content([
-                prompt,
-                {"mime_type": "image/png", "data": png_bytes},
-            ])
-            text = (resp.text or "").strip()
-            if text.startswith("```"):
-                parts = text.split("\n", 1)
-                text = parts[1] if len(parts) > 1 else text
-                if text.endswith("```"):
-                    text = text[:-3]
-            import json as _json
-            try:
-                data = _json.loads(text)
-                if isinstance(data, list):
-                    for it in data:
-                        if isinstance(it, dict):
-                            title = str(it.get("title", "")).strip()
-                            content = str(it.get("content", "")).strip()
-                            itype = str(it.get("type", "rule")).strip().lower() or "rule"
-                            if content:
-                                items.append({"title": title, "content": content, "type": itype})
-            except Exception:
-                pass
+            data = self._gemini_planner.generate_json(prompt, images=images, model_name='gemini-2.5-flash-lite')
+            if isinstance(data, list):
+                for it in data:
+                    if isinstance(it, dict):
+                        title = str(it.get("title", "")).strip()
+                        content = str(it.get("content", "")).strip()
+                        itype = str(it.get("type", "rule")).strip().lower() or "rule"
+                        if content:
+                            items.append({"title": title, "content": content, "type": itype})
         except Exception:
             pass
         return items
@@ -4203,19 +4139,19 @@ Please respond in JSON format:
 
             if captures:
                 safety_prompt = (
-                    "You are given a screenshot image of the Airbnb Safety & property page or modal. "
+                    "You are given one or more screenshot images of the Airbnb Safety & property page or modal. "
                     "Extract all safety/emergency-related items as {title, content, type}. Use type 'emergency'. "
                     "Return a JSON array of {title, content, type}."
                 )
                 seen = set()
-                for cap in captures:
-                    items = self._ocr_with_gemini(cap, safety_prompt)
-                    for it in items:
-                        key = (it.get('title','').strip().lower(), it.get('content','').strip().lower())
-                        if key in seen:
-                            continue
-                        seen.add(key)
-                        safety.append(it)
+                # All captures go into one OCR request instead of one request per screenshot
+                items = self._ocr_with_gemini(captures, safety_prompt)
+                for it in items:
+                    key = (it.get('title','').strip().lower(), it.get('content','').strip().lower())
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    safety.append(it)
         except Exception:
             pass
         return safety
@@ -5301,7 +5237,8 @@ Please respond in JSON format:
                 self._extracted_time_info.update(time_info)
 
         # Use Gemini to validate and improve rules
-        if rules:
+        # (skipped during deep extraction, where consolidated processing covers it in one call)
+        if rules and not self._defer_gemini_enhancements:
             validated_rules = self._validate_rules_with_gemini(rules, modal_content.get_text()[:3000] if modal_content else "")
             if validated_rules:
                 rules = validated_rules
@@ -5554,12 +5491,6 @@ Please respond in JSON format:
             return None
 
         try:
-            import google.generativeai as genai
-
-            # Configure Gemini
-            genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-            model = genai.GenerativeModel('gemini-2.0-flash-lite')
-
             # Prepare rules for validation
             rules_text = []
             for i, rule in enumerate(rules):
@@ -5598,18 +5529,7 @@ Please respond with a JSON array of cleaned rules:
 IMPORTANT: Return ONLY the JSON array, no other text.
 """
 
-            response = model.generate_content(prompt)
-            response_text = response.text.strip()
-
-            # Clean up response
-            if response_text.startswith('```json'):
-                response_text = response_text[7:-3]
-            elif response_text.startswith('```'):
-                response_text = response_text[3:-3]
-
-            # Parse JSON response
-            import json
-            validated_rules = json.loads(response_text)
+            validated_rules = self._gemini_planner.generate_json(prompt, model_name='gemini-2.0-flash-lite')
 
             if isinstance(validated_rules, list) and len(validated_rules) > 0:
                 logger.info(f"Gemini validation: {len(rules)} -> {len(validated_rules)} rules")
@@ -5970,16 +5890,6 @@ IMPORTANT: Return ONLY the JSON array, no other text.
             Validated and improved extraction data
         """
         try:
-            # Only validate if we have a Gemini API key
-            gemini_api_key = os.getenv('GEMINI_API_KEY')
-            if not gemini_api_key:
-                logger.debug("No Gemini API key found, skipping deep extraction validation")
-                return extracted_data
-
-            import google.generativeai as genai
-            genai.configure(api_key=gemini_api_key)
-            model = genai.GenerativeModel('gemini-2.0-flash')
-
             # Prepare validation prompt for deep extraction
             prompt = f"""
 You are a data validation expert for Airbnb property extraction. Please review and improve the following extracted data:
@@ -6013,16 +5923,9 @@ Please respond in JSON format:
 }}
 """
 
-            response = model.generate_content(prompt)
-
-            # Parse the response
-            response_text = response.text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:-3]
-            elif response_text.startswith('```'):
-                response_text = response_text[3:-3]
-
-            validated_data = json.loads(response_text)
+            validated_data = self._gemini_planner.generate_json(prompt, cache_key=self._page_content_hash)
+            if not isinstance(validated_data, dict):
+                return extracted_data
 
             # Apply validated improvements if confidence is high or medium
             if validated_data.get('confidence') in ['high', 'medium']:
@@ -6049,18 +5952,11 @@ Please respond in JSON format:
     def _consolidate_gemini_processing(self, extracted_data: Dict[str, Any], page_content_sample: str) -> Dict[str, Any]:
         """
         Consolidate all Gemini processing into a single API call to reduce rate limit issues.
-        This replaces multiple separate calls for validation, enhancement, and rule processing.
+        This replaces multiple separate calls for validation, enhancement, and rule processing;
+        during deep extraction the JSON enhancement and rule validation steps are deferred here.
+        The structured result is cached by the page content hash.
         """
         try:
-            gemini_api_key = os.getenv('GEMINI_API_KEY')
-            if not gemini_api_key:
-                logger.debug("No Gemini API key found, skipping consolidated processing")
-                return extracted_data
-
-            import google.generativeai as genai
-            genai.configure(api_key=gemini_api_key)
-            model = genai.GenerativeModel('gemini-2.0-flash')
-
             # Prepare comprehensive prompt that handles all tasks
             house_rules = extracted_data.get('house_rules', [])
             rules_text = []
@@ -6094,7 +5990,9 @@ TASKS TO PERFORM:
    - Proper type classification (rule vs instruction vs information)
    - Standardizing language and formatting
 
-3. DATA VALIDATION: Validate and normalize all extracted data for quality and consistency.
+3. DATA VALIDATION: Validate and normalize all extracted data for quality and consistency,
+   standardizing amenity names (e.g., "Wi-Fi" -> "WiFi", "A/C" -> "Air conditioning") and
+   properly categorizing appliances vs basic amenities.
 
 4. TIME EXTRACTION: Extract any check-in/check-out times from rules and apply to property fields.
 
@@ -6120,20 +6018,10 @@ IMPORTANT RULES:
 - Return ONLY the JSON, no other text
 """
 
-            # Make the consolidated API call with retry logic
-            response = self._call_gemini_api(prompt)
-
-            if response:
-                # Parse the response
-                response_text = response.strip()
-                if response_text.startswith('```json'):
-                    response_text = response_text[7:-3]
-                elif response_text.startswith('```'):
-                    response_text = response_text[3:-3]
-
-                import json
-                consolidated_result = json.loads(response_text)
+            # Make the consolidated structured-output call (rate limited and cached by page hash)
+            consolidated_result = self._gemini_planner.generate_json(prompt, cache_key=self._page_content_hash)
 
+            if isinstance(consolidated_result, dict):
                 # Apply the consolidated results back to extracted_data
                 if 'description' in consolidated_result:
                     extracted_data['description'] = consolidated_result['description']
@@ -6152,8 +6040,16 @@ IMPORTANT RULES:
                     extracted_data['checkOutTime'] = cout
                     logger.info(f"Updated check-out time from consolidated processing: {cout}")
 
-                if 'amenities' in consolidated_result:
+                if isinstance(consolidated_result.get('amenities'), dict):
                     extracted_data['amenities'] = consolidated_result['amenities']
+                    extracted_data['amenities'].setdefault('basic', [])
+                    extracted_data['amenities'].setdefault('appliances', [])
+                    # Same post-processing the standalone JSON enhancement used to apply
+                    try:
+                        self._post_process_appliances(extracted_data['amenities'])
+                        self._deduplicate_amenities(extracted_data['amenities'])
+                    except Exception as e:
+                        logger.debug(f"Amenity post-processing after consolidation failed: {e}")
 
                 if 'validation_notes' in consolidated_result:
                     logger.info(f"Consolidated Gemini processing notes: {consolidated_result['validation_notes']}")
@@ -6190,7 +6086,7 @@ IMPORTANT RULES:
         }
 
     def create_property_from_extraction(self, host_id: str, listing_data: Dict[str, Any],
-                                      extracted_data: Dict[str, Any]) -> Optional[str]:
+                                      extracted_data: Dict[str, Any], property_id: Optional[str] = None) -> Optional[str]:
         """
         Create a new property from listing and extracted data.
 
@@ -6198,6 +6094,9 @@ IMPORTANT RULES:
             host_id: ID of the host
             listing_data: Basic listing data from scraper
             extracted_data: Deep extracted data
+            property_id: (optional) ID reserved for the new property. If a property with this
+                ID already exists (an earlier attempt of the same import step created it), it is
+                returned as is, so retried import steps do not create duplicates.
 
         Returns:
             Property ID if successful, None otherwise
@@ -6214,6 +6113,11 @@ IMPORTANT RULES:
 
             # Check for existing properties with the same Airbnb URL for current user only
             db = get_firestore_db()
+            if db and property_id:
+                # A failed check fails the step (outer handler) rather than risking a duplicate
+                if db.collection('properties').document(property_id).get().exists:
+                    logger.info(f"Property {property_id} was already created by an earlier attempt")
+                    return property_id
             if db:
                 try:
                     # Query only current user's properties to check for duplicates
@@ -6237,8 +6141,8 @@ IMPORTANT RULES:
                     logger.error(f"Error checking for duplicate properties for user {host_id}: {e}")
                     # Continue with creation if duplicate check fails
 
-            # Generate property ID
-            property_id = str(uuid.uuid4())
+            # Generate property ID (unless the caller reserved one)
+            property_id = property_id or str(uuid.uuid4())
 
             # Create property data structure
             property_data = get_default_property_data(host_id, normalized_url)
@@ -7374,7 +7278,10 @@ IMPORTANT RULES:
             self._deduplicate_amenities(extracted_data['amenities'])
 
             # Use Gemini to enhance and validate the extracted JSON data
-            if extracted_data['amenities']['basic'] or extracted_data['amenities']['appliances'] or extracted_data['description']:
+            # (skipped during deep extraction, where consolidated processing covers it in one call)
+            if self._defer_gemini_enhancements:
+                logger.debug("Deferring JSON enhancement to consolidated Gemini processing")
+            elif extracted_data['amenities']['basic'] or extracted_data['amenities']['appliances'] or extracted_data['description']:
                 enhanced_data = self._enhance_json_extraction_with_gemini(extracted_data, page_text[:5000])
                 if enhanced_data:
                     extracted_data = enhanced_data
@@ -7407,16 +7314,6 @@ IMPORTANT RULES:
             Enhanced extraction data or None if enhancement fails
         """
         try:
-            # Only enhance if we have a Gemini API key
-            gemini_api_key = os.getenv('GEMINI_API_KEY')
-            if not gemini_api_key:
-                logger.debug("No Gemini API key found, skipping JSON extraction enhancement")
-                return extracted_data
-
-            import google.generativeai as genai
-            genai.configure(api_key=gemini_api_key)
-            model = genai.GenerativeModel('gemini-2.0-flash')
-
             # Prepare enhancement prompt
             prompt = f"""
 You are an expert at processing Airbnb property data. I've extracted some data from JSON scripts on an Airbnb listing page, but it needs cleaning and enhancement.
@@ -7451,17 +7348,9 @@ Return ONLY a JSON object with this structure:
 }}
 """
 
-            response = model.generate_content(prompt)
-            response_text = response.text.strip()
-
-            # Clean up response text
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]
-            response_text = response_text.strip()
-
-            enhanced_data = json.loads(response_text)
+            enhanced_data = self._gemini_planner.generate_json(prompt)
+            if not isinstance(enhanced_data, dict):
+                return extracted_data
 
             # Apply enhancements if confidence is reasonable
             if enhanced_data.get('confidence') in ['high', 'medium']:
@@ -0,0 +1,168 @@
+"""
+Streaming chat replies to API Gateway WebSocket connections.
+
+The Lambda WebSocket handlers used to wait for the complete Gemini answer and
+send it with a single post_to_connection, so guests saw nothing until the whole
+reply was generated. ConnectionStreamer posts the reply as it is generated:
+
+- Every piece of text is appended to a buffer that is posted as a
+  `message_chunk` frame once it holds STREAM_MIN_CHUNK_CHARS characters or
+  STREAM_MAX_DELAY_SECONDS have passed since the last post. Tiny model chunks
+  are coalesced that way instead of costing one API Gateway call each, while
+  the first piece is posted immediately so the reply starts as soon as the
+  model produces text.
+- finish() posts the usual `message` frame with the full reply, so clients
+  that ignore chunks keep working and streaming clients can replace the
+  streamed text with the final one (frames carry the same message_id).
+- A GoneException means the guest disconnected: the streamer stops posting,
+  removes the connection from the connections table and reports `gone`, so
+  the caller can stop generating.
+
+Frames:
+    {"type": "message_chunk", "payload": {"message_id", "index", "text"}, "timestamp"}
+    {"type": "message", "payload": {"message", "message_id", "streamed"}, "timestamp"}
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+WEBSOCKET_STREAM_REPLIES = os.getenv('WEBSOCKET_STREAM_REPLIES', 'true').lower() in ('1', 'true', 'yes')
+STREAM_MIN_CHUNK_CHARS = int(os.getenv('STREAM_MIN_CHUNK_CHARS', '40'))
+STREAM_MAX_DELAY_SECONDS = float(os.getenv('STREAM_MAX_DELAY_SECONDS', '0.25'))
+
+
+def stream_requested(payload: Optional[Dict[str, Any]]) -> bool:
+    """Whether a chat message should be answered with streamed chunks (payload 'stream' overrides the default)."""
+    stream = (payload or {}).get('stream')
+    if stream is None:
+        return WEBSOCKET_STREAM_REPLIES
+    return bool(stream)
+
+
+class ConnectionStreamer:
+    """
+    Posts one chat reply to an API Gateway WebSocket connection, chunk by chunk.
+    """
+
+    def __init__(self, apigw_client, connection_id: str, connections_table=None, timestamp: Any = 0,
+                 stream: bool = True, min_chars: int = STREAM_MIN_CHUNK_CHARS,
+                 max_delay: float = STREAM_MAX_DELAY_SECONDS):
+        """
+        Initialize the streamer.
+
+        Args:
+            apigw_client: Reused apigatewaymanagementapi client for the connection's endpoint
+            connection_id: WebSocket connection to post to
+            connections_table: DynamoDB connections table, cleaned up when the connection is gone
+            timestamp: Timestamp of the guest message, echoed in every frame
+            stream: Post chunks while generating; otherwise only finish() posts
+            min_chars: Buffered characters that trigger a chunk post
+            max_delay: Seconds after the last post that trigger a chunk post
+        """
+        self.connection_id = connection_id
+        self.message_id = str(uuid.uuid4()) if stream else None
+        self.gone = False
+        self._apigw = apigw_client
+        self._connections_table = connections_table
+        self._timestamp = timestamp
+        self._stream = stream
+        self._min_chars = min_chars
+        self._max_delay = max_delay
+        self._parts = []
+        self._buffer = ''
+        self._chunks_sent = 0
+        self._last_post = 0.0
+        self._started = time.perf_counter()
+
+    @property
+    def chunks_sent(self) -> int:
+        """Number of chunk frames posted so far."""
+        return self._chunks_sent
+
+    @property
+    def text(self) -> str:
+        """All text added so far."""
+        return ''.join(self._parts)
+
+    def add(self, text: str) -> bool:
+        """
+        Add generated text, posting a chunk when enough has been buffered.
+
+        Returns:
+            bool: False once the connection is gone (generation can stop)
+        """
+        if not text:
+            return not self.gone
+        self._parts.append(text)
+        if not self._stream or self.gone:
+            return not self.gone
+
+        self._buffer += text
+        if (self._chunks_sent == 0 or len(self._buffer) >= self._min_chars
+                or time.perf_counter() - self._last_post >= self._max_delay):
+            self.flush()
+        return not self.gone
+
+    def flush(self) -> None:
+        """Post the buffered text as a chunk frame."""
+        if not self._buffer or not self._stream or self.gone:
+            return
+        text, self._buffer = self._buffer, ''
+        if self._post({
+            "type": "message_chunk",
+            "payload": {"message_id": self.message_id, "index": self._chunks_sent, "text": text},
+            "timestamp": self._timestamp
+        }):
+            if self._chunks_sent == 0:
+                logger.info(f"First reply chunk posted to {self.connection_id} after "
+                            f"{(time.perf_counter() - self._started) * 1000:.0f} ms")
+            self._chunks_sent += 1
+        self._last_post = time.perf_counter()
+
+    def finish(self, message: Any) -> bool:
+        """
+        Post any buffered text and then the final message frame with the full reply.
+
+        Returns:
+            bool: True if the final frame was delivered
+        """
+        self.flush()
+        if self.gone:
+            return False
+        payload = {"message": message}
+        if self.message_id:
+            payload["message_id"] = self.message_id
+            payload["streamed"] = self._chunks_sent > 0
+        delivered = self._post({"type": "message", "payload": payload, "timestamp": self._timestamp})
+        if delivered:
+            logger.info(f"Sent AI response to {self.connection_id} ({self._chunks_sent} streamed chunks)")
+        return delivered
+
+    def _post(self, frame: Dict[str, Any]) -> bool:
+        try:
+            self._apigw.post_to_connection(
+                ConnectionId=self.connection_id,
+                Data=json.dumps(frame).encode('utf-8')
+            )
+            return True
+        except self._apigw.exceptions.GoneException:
+            logger.warning(f"Connection {self.connection_id} is gone, removing from table.")
+            self.gone = True
+            self._remove_connection()
+        except Exception as e:
+            logger.error(f"Error posting {frame.get('type')} to {self.connection_id}: {e}")
+        return False
+
+    def _remove_connection(self) -> None:
+        if self._connections_table is None:
+            return
+        try:
+            self._connections_table.delete_item(Key={'connectionId': self.connection_id})
+        except Exception as e:
+            logger.error(f"Error cleaning up stale connection: {e}")
@@ -0,0 +1,448 @@
+"""
+Async Firestore access for the asyncio services.
+
+The voice handler, the Telnyx websocket server and the Lambdas run on an
+asyncio event loop. Calling the blocking Firestore client from a coroutine
+stalls that loop, and every other call it serves, for the whole round trip.
+This module mirrors the read and write helpers of firestore_client that those
+services need (properties, reservations, knowledge items, conversations and
+context bundles) on top of `google.cloud.firestore_v1.AsyncClient`, so the
+waits overlap instead of serializing. Independent queries inside a helper are
+issued together with asyncio.gather.
+
+- The client uses the same project, credentials and database as
+  firestore_client. gRPC channels are bound to the event loop that created
+  them, so one client is kept per running loop (the Lambdas start a new loop
+  for each invocation with asyncio.run).
+- Return values and error handling match the sync functions of the same name:
+  documents are dicts with an 'id' field, and errors are logged and turned
+  into None / [] / False.
+- There is no request identity map here; these services run outside Flask
+  requests, where firestore_client does not cache either.
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+import threading
+import traceback
+import weakref
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import firebase_admin
+from google.cloud import firestore_v1 as gc_firestore
+
+from concierge.utils.firestore_client import (
+    initialize_firebase, _determine_firestore_database_id, FIRESTORE_BATCH_LIMIT, KNOWLEDGE_ITEM_LIST_FIELDS
+)
+
+logger = logging.getLogger(__name__)
+
+# One AsyncClient per event loop (gRPC aio channels cannot be shared across loops)
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, gc_firestore.AsyncClient]" = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+def _create_async_client(database_id: str) -> Optional[gc_firestore.AsyncClient]:
+    """Create an AsyncClient targeting a specific database ID using Admin app creds."""
+    try:
+        if not firebase_admin._apps:
+            return None
+        app = firebase_admin.get_app()
+        project_id = (
+            app.project_id
+            or os.environ.get('FIREBASE_PROJECT_ID')
+            or os.environ.get('GOOGLE_CLOUD_PROJECT')
+            or os.environ.get('GOOGLE_CLOUD_PROJECT_ID')
+        )
+        if not project_id:
+            logger.error("Unable to resolve project ID for async Firestore client")
+            return None
+        return gc_firestore.AsyncClient(
+            project=project_id, credentials=app.credential.get_credential(), database=database_id
+        )
+    except Exception as e:
+        logger.error(f"Failed to create async Firestore client for database '{database_id}': {e}")
+        return None
+
+
+def get_async_firestore_client() -> Optional[gc_firestore.AsyncClient]:
+    """
+    Get the AsyncClient for the running event loop, creating it on first use.
+
+    Must be called from a coroutine (or code running on an event loop).
+    """
+    if not initialize_firebase():
+        logger.error("Firebase initialization failed in get_async_firestore_client()")
+        return None
+
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        client = _clients.get(loop)
+        if client is None:
+            database_id = _determine_firestore_database_id()
+            client = _create_async_client(database_id)
+            if client is None:
+                return None
+            _clients[loop] = client
+            logger.info(f"Created async Firestore client for database '{database_id}'")
+        return client
+
+
+def _to_dict(doc) -> Dict:
+    data = doc.to_dict()
+    data['id'] = doc.id
+    return data
+
+
+async def _get_document(collection: str, doc_id: str) -> Optional[Dict]:
+    client = get_async_firestore_client()
+    if client is None or not doc_id:
+        return None
+    doc = await client.collection(collection).document(doc_id).get()
+    return _to_dict(doc) if doc.exists else None
+
+
+async def _get_documents(collection: str, doc_ids: List[str]) -> Dict[str, Optional[Dict]]:
+    """
+    Read several documents of one collection with batched get_all calls.
+
+    Returns:
+        Dictionary mapping each ID to its document data, or None if it does not exist
+    """
+    client = get_async_firestore_client()
+    doc_ids = list(dict.fromkeys(doc_id for doc_id in doc_ids if doc_id))
+    if client is None or not doc_ids:
+        return {}
+
+    async def fetch_chunk(ids: List[str]) -> List:
+        refs = [client.collection(collection).document(doc_id) for doc_id in ids]
+        return [doc async for doc in client.get_all(refs)]
+
+    try:
+        chunks = await asyncio.gather(*[
+            fetch_chunk(doc_ids[start:start + FIRESTORE_BATCH_LIMIT])
+            for start in range(0, len(doc_ids), FIRESTORE_BATCH_LIMIT)
+        ])
+    except Exception as e:
+        logger.error(f"Error batch-reading {len(doc_ids)} documents from {collection}: {e}")
+        return {}
+
+    found: Dict[str, Optional[Dict]] = {doc_id: None for doc_id in doc_ids}
+    for docs in chunks:
+        for doc in docs:
+            if doc.exists:
+                found[doc.id] = _to_dict(doc)
+    return found
+
+
+async def _stream(query) -> List[Dict]:
+    return [_to_dict(doc) async for doc in query.stream()]
+
+
+# === Property Functions ===
+
+async def get_property(property_id: str) -> Optional[Dict]:
+    """Get a property by ID."""
+    try:
+        property_data = await _get_document('properties', property_id)
+        if property_data is None:
+            logger.warning(f"Property {property_id} not found")
+        return property_data
+    except Exception as e:
+        logger.error(f"Error getting property {property_id}: {e}")
+        return None
+
+
+async def get_properties(property_ids: List[str]) -> Dict[str, Optional[Dict]]:
+    """Get several properties by ID with batched reads; missing properties map to None."""
+    return await _get_documents('properties', property_ids)
+
+
+async def get_context_bundle(property_id: str) -> Optional[Dict]:
+    """
+    Get the current context bundle for a property, rebuilding it if it is missing or stale.
+
+    The bundle document is read asynchronously; a rebuild (rare, after a
+    property or knowledge edit) runs build_context_bundle on a worker thread.
+
+    Args:
+        property_id: The property ID
+
+    Returns:
+        The bundle dictionary, or None if the property does not exist
+    """
+    from concierge.utils.context_bundle import (
+        CONTEXT_BUNDLE_COLLECTION, build_context_bundle, get_local_bundle, is_bundle_current,
+        remember_local_bundle
+    )
+
+    if not property_id:
+        return None
+
+    bundle = get_local_bundle(property_id)
+    if bundle:
+        return bundle
+
+    client = get_async_firestore_client()
+    if client is not None:
+        try:
+            doc = await client.collection(CONTEXT_BUNDLE_COLLECTION).document(property_id).get()
+            if doc.exists:
+                bundle = doc.to_dict()
+                if is_bundle_current(bundle):
+                    remember_local_bundle(property_id, bundle)
+                    return bundle
+                logger.info(f"Context bundle for property {property_id} is stale, rebuilding")
+        except Exception as e:
+            logger.error(f"Error reading context bundle for property {property_id}: {e}")
+
+    return await asyncio.to_thread(build_context_bundle, property_id)
+
+
+# === Knowledge Item Functions ===
+
+async def get_knowledge_item(item_id: str) -> Optional[Dict]:
+    """Get a knowledge item by ID."""
+    try:
+        item_data = await _get_document('knowledge_items', item_id)
+        if item_data is None:
+            logger.warning(f"Knowledge item {item_id} not found")
+        return item_data
+    except Exception as e:
+        logger.error(f"Error getting knowledge item {item_id}: {e}")
+        return None
+
+
+async def list_knowledge_items_by_property(property_id: str, status: str = None, *,
+                                           include_embeddings: bool = False) -> List[Dict]:
+    """
+    List all knowledge items for a specific property, optionally filtered by status.
+
+    Args:
+        property_id: ID of the property
+        status: (optional) Status to filter by (e.g., 'approved')
+        include_embeddings: Also return the embedding vectors (otherwise only KNOWLEDGE_ITEM_LIST_FIELDS)
+
+    Returns:
+        List of knowledge items
+    """
+    client = get_async_firestore_client()
+    if client is None:
+        return []
+
+    try:
+        query = client.collection('knowledge_items').where('propertyId', '==', property_id)
+        if status:
+            query = query.where('status', '==', status)
+        if not include_embeddings:
+            query = query.select(KNOWLEDGE_ITEM_LIST_FIELDS)
+        return await _stream(query)
+    except Exception as e:
+        logger.error(f"Error listing knowledge items for property {property_id}: {e}")
+        return []
+
+
+# === Reservation Functions ===
+
+async def get_reservation(reservation_id: str) -> Optional[Dict]:
+    """Get a reservation by ID."""
+    try:
+        reservation_data = await _get_document('reservations', reservation_id)
+        if reservation_data is None:
+            logger.warning(f"Reservation {reservation_id} not found")
+        return reservation_data
+    except Exception as e:
+        logger.error(f"Error getting reservation {reservation_id}: {e}")
+        return None
+
+
+async def get_reservations(reservation_ids: List[str]) -> Dict[str, Optional[Dict]]:
+    """Get several reservations by ID with batched reads; missing reservations map to None."""
+    return await _get_documents('reservations', reservation_ids)
+
+
+async def list_property_reservations(property_id: str) -> List[Dict]:
+    """List all reservations for a specific property."""
+    client = get_async_firestore_client()
+    if client is None:
+        return []
+
+    try:
+        return await _stream(client.collection('reservations').where('propertyId', '==', property_id))
+    except Exception as e:
+        logger.error(f"Error listing reservations for property {property_id}: {e}")
+        return []
+
+
+async def find_active_property_reservation(property_id: str) -> Optional[Dict]:
+    """
+    Find a reservation of the property whose stay includes the current time.
+
+    Returns:
+        The first matching reservation, or None
+    """
+    client = get_async_firestore_client()
+    if client is None:
+        return None
+
+    try:
+        now = datetime.now()
+        query = client.collection('reservations') \
+            .where('propertyId', '==', property_id) \
+            .where('startDate', '<=', now) \
+            .where('endDate', '>=', now) \
+            .limit(1)
+        reservations = await _stream(query)
+        return reservations[0] if reservations else None
+    except Exception as e:
+        logger.error(f"Error finding active reservation for property {property_id}: {e}")
+        return None
+
+
+def _contact_phone(contact: Dict) -> Optional[str]:
+    return contact.get('phone') or contact.get('phoneNumber') or contact.get('phone_number')
+
+
+def _matches_phone(reservation: Dict, phone_versions: List[str], last_four_digits: str,
+                   check_last_four: bool) -> bool:
+    """Match a reservation on an additional contact's exact phone or, optionally, on the last 4 digits."""
+    additional_contacts = reservation.get('additional_contacts', [])
+    if any(_contact_phone(contact) in phone_versions for contact in additional_contacts):
+        return True
+    if not check_last_four:
+        return False
+
+    guest_phone = reservation.get('guestPhoneNumber')
+    if guest_phone and len(guest_phone) >= 4 and guest_phone[-4:] == last_four_digits:
+        return True
+    if reservation.get('guestPhoneLast4') == last_four_digits:
+        return True
+    for contact in additional_contacts:
+        contact_phone = _contact_phone(contact)
+        if contact_phone and len(contact_phone) >= 4 and contact_phone[-4:] == last_four_digits:
+            return True
+    return False
+
+
+async def _reservations_matching_phone(phone_versions: List[str], clean_number: str,
+                                       check_last_four: bool = True) -> List[Dict]:
+    """
+    Find reservations whose primary guest phone equals one of phone_versions, or that
+    match on additional contacts / last 4 digits. All queries are issued concurrently.
+    """
+    client = get_async_firestore_client()
+    if client is None:
+        return []
+
+    reservations_ref = client.collection('reservations')
+    phone_versions = list(dict.fromkeys(phone_versions))
+    primary_queries = [
+        reservations_ref.where(field, '==', phone_version)
+        for phone_version in phone_versions
+        for field in ('guestPhoneNumber', 'GuestPhoneNumber', 'guest_phone_number')
+    ]
+    # The scan covers additional contacts and last 4 digit matches, which cannot be queried
+    results = await asyncio.gather(*[_stream(query) for query in primary_queries], _stream(reservations_ref))
+    all_reservations = results[-1]
+
+    reservations_by_id = {}
+    for reservations in results[:-1]:
+        for reservation in reservations:
+            reservations_by_id[reservation['id']] = reservation
+
+    last_four_digits = clean_number[-4:] if len(clean_number) >= 4 else clean_number
+    check_last_four = check_last_four and len(clean_number) >= 4
+    for reservation in all_reservations:
+        if reservation['id'] in reservations_by_id:
+            continue
+        if _matches_phone(reservation, phone_versions, last_four_digits, check_last_four):
+            reservations_by_id[reservation['id']] = reservation
+    return list(reservations_by_id.values())
+
+
+async def find_reservations_by_phone(phone_number: str) -> List[Dict]:
+    """
+    Find reservations by phone number.
+
+    Args:
+        phone_number: The phone number to search for
+
+    Returns:
+        List of reservation dictionaries
+    """
+    try:
+        clean_number = ''.join(filter(str.isdigit, phone_number))
+        phone_versions = [
+            phone_number,
+            clean_number,
+            f"+{clean_number}",
+            clean_number[-10:] if len(clean_number) >= 10 else clean_number
+        ]
+        reservations = await _reservations_matching_phone(phone_versions, clean_number)
+        logger.info(f"Found {len(reservations)} reservations for phone number {phone_number}")
+        return reservations
+    except Exception as e:
+        logger.error(f"Error finding reservations by phone number {phone_number}: {e}")
+        logger.error(traceback.format_exc())
+        return []
+
+
+async def list_reservations_by_phone(phone_number: str, check_last_four: bool = True) -> List[Dict]:
+    """
+    List all reservations for a specific phone number.
+
+    Args:
+        phone_number: Phone number to search for
+        check_last_four: Whether to also check for matches on the last 4 digits
+
+    Returns:
+        List of reservations
+    """
+    try:
+        normalized_phone = phone_number.strip()
+        phone_versions = [normalized_phone]
+        if normalized_phone.startswith('+'):
+            phone_versions.append(normalized_phone[1:])
+        else:
+            phone_versions.append(f"+{normalized_phone}")
+
+        clean_number = ''.join(filter(str.isdigit, normalized_phone))
+        reservations = await _reservations_matching_phone(phone_versions, clean_number, check_last_four)
+        logger.info(f"Found {len(reservations)} unique reservations for phone number {phone_number}")
+        return reservations
+    except Exception as e:
+        logger.error(f"Error listing reservations for phone number {phone_number}: {e}")
+        logger.error(traceback.format_exc())
+        return []
+
+
+# === Conversation History Functions ===
+
+async def store_conversation(conversation_data: Dict) -> Optional[str]:
+    """
+    Store a conversation entry.
+
+    Args:
+        conversation_data: Dictionary containing conversation data
+
+    Returns:
+        The ID of the created conversation entry, or None if creation failed
+    """
+    client = get_async_firestore_client()
+    if client is None:
+        return None
+
+    try:
+        conversation_id = conversation_data.get('id', str(uuid.uuid4()))
+        if 'timestamp' not in conversation_data:
+            conversation_data['timestamp'] = datetime.now(timezone.utc)
+
+        await client.collection('conversations').document(conversation_id).set(conversation_data)
+        logger.info(f"Conversation {conversation_id} stored successfully")
+        return conversation_id
+    except Exception as e:
+        logger.error(f"Error storing conversation: {e}")
+        return None
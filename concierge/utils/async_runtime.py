@@ -0,0 +1,126 @@
+"""
+Async worker support for the Flask-SocketIO server.
+
+The server runs in one of three modes, selected with SOCKETIO_ASYNC_MODE:
+
+- ``threading`` (default): gunicorn ``sync`` workers with a thread per request;
+  every connected guest holds a thread.
+- ``gevent``: one greenlet per connection. gunicorn uses the gevent-websocket
+  worker, so a single worker process serves hundreds of guests.
+- ``eventlet``: same idea with eventlet green threads.
+
+In the async modes, sockets are monkey-patched, so HTTP-based clients
+(boto3/DynamoDB, google-genai streaming) already yield while waiting. Calls that
+still block the event loop can be run on a bounded pool of native threads with
+`run_blocking`: Firestore (gRPC), non-streaming Gemini SDK calls and CPU-heavy
+work. In threading mode, `run_blocking` calls the function inline, because the
+caller already owns a thread.
+
+Socket.IO needs sticky sessions, which gunicorn cannot provide across workers
+sharing one port. To scale past one async worker, run several single-worker
+gunicorn instances on separate ports behind nginx ``ip_hash``, and set
+SOCKETIO_MESSAGE_QUEUE (e.g. ``redis://localhost:6379/0``) so emits reach
+clients connected to the other instances.
+"""
+
+import os
+import logging
+import threading
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_ASYNC_MODES = ('threading', 'gevent', 'eventlet')
+
+SOCKETIO_ASYNC_MODE = os.getenv('SOCKETIO_ASYNC_MODE', 'threading').strip().lower()
+if SOCKETIO_ASYNC_MODE not in SUPPORTED_ASYNC_MODES:
+    logger.warning(f"Unknown SOCKETIO_ASYNC_MODE '{SOCKETIO_ASYNC_MODE}', falling back to threading")
+    SOCKETIO_ASYNC_MODE = 'threading'
+
+# Message queue shared by all server instances (required when running more than one)
+SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE') or None
+
+# Maximum number of native threads running blocking calls per worker process
+BLOCKING_POOL_SIZE = int(os.getenv('BLOCKING_POOL_SIZE', '16'))
+
+if SOCKETIO_ASYNC_MODE == 'eventlet':
+    # eventlet sizes its native thread pool from the environment when tpool is first used
+    os.environ.setdefault('EVENTLET_THREADPOOL_SIZE', str(BLOCKING_POOL_SIZE))
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _init_grpc_for_gevent() -> None:
+    # Must run before the first gRPC channel (Firestore client) is created
+    try:
+        import grpc.experimental.gevent as grpc_gevent
+        grpc_gevent.init_gevent()
+    except Exception as e:
+        logger.warning(f"Could not enable gRPC gevent support: {e}")
+
+
+if SOCKETIO_ASYNC_MODE == 'gevent':
+    _init_grpc_for_gevent()
+
+
+def is_async_mode() -> bool:
+    """True when running on gevent or eventlet workers."""
+    return SOCKETIO_ASYNC_MODE != 'threading'
+
+
+def get_socketio_options() -> Dict[str, Any]:
+    """SocketIO constructor arguments for the configured deployment mode."""
+    options: Dict[str, Any] = {'async_mode': SOCKETIO_ASYNC_MODE}
+    if SOCKETIO_MESSAGE_QUEUE:
+        options['message_queue'] = SOCKETIO_MESSAGE_QUEUE
+    return options
+
+
+def _get_gevent_pool():
+    global _pool, _pool_pid
+    # Native threads do not survive fork; rebuild the pool in each worker process
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                from gevent.threadpool import ThreadPool
+                _pool = ThreadPool(maxsize=BLOCKING_POOL_SIZE)
+                _pool_pid = os.getpid()
+                logger.info(f"Started blocking call pool with {BLOCKING_POOL_SIZE} threads (pid={_pool_pid})")
+    return _pool
+
+
+def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """
+    Run a blocking call without stalling the worker's event loop.
+
+    Under gevent/eventlet the call runs on a bounded pool of native threads and
+    only the calling greenlet waits for it; once the pool is saturated, further
+    callers queue for a free thread. In threading mode the call runs inline.
+
+    The function must not emit Socket.IO events itself: emits have to happen
+    on the event loop, so do them after run_blocking returns.
+
+    Returns:
+        Whatever func returns; exceptions raised by func propagate to the caller
+    """
+    if SOCKETIO_ASYNC_MODE == 'gevent':
+        return _get_gevent_pool().apply(func, args, kwargs)
+    if SOCKETIO_ASYNC_MODE == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute(func, *args, **kwargs)
+    return func(*args, **kwargs)
+
+
+def get_runtime_stats() -> Dict[str, Any]:
+    """Get worker mode and blocking pool statistics for monitoring."""
+    stats: Dict[str, Any] = {
+        'async_mode': SOCKETIO_ASYNC_MODE,
+        'message_queue': bool(SOCKETIO_MESSAGE_QUEUE),
+        'blocking_pool_size': BLOCKING_POOL_SIZE,
+        'pid': os.getpid(),
+    }
+    if SOCKETIO_ASYNC_MODE == 'gevent' and _pool is not None and _pool_pid == os.getpid():
+        stats['blocking_pool_pending'] = len(_pool)
+    return stats
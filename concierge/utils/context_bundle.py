@@ -0,0 +1,296 @@
+"""
+Precomputed per-property context bundles.
+
+Text chat, voice calls and the Lambdas all describe the same property to the
+model: its details (host, location, WiFi, check-in times, rules) and its
+approved knowledge items. Instead of reading the property and its knowledge
+and rendering the prompt on every message or call, the rendered pieces are
+stored once per property in the `property_context_bundles` collection:
+
+- `propertyContext`: the normalized property fields used by tools (timezone,
+  location) and by callers that build their own prompt
+- `propertyPrompt` / `knowledgePrompt`: the rendered PROPERTY INFORMATION and
+  knowledge sections
+- `systemPrompt`: the full static text chat system prompt
+- `version`: a hash of the rendered content, so callers (and model-side caches)
+  can tell when the prompt actually changed
+
+Writes to a property or its knowledge items call
+`firestore_client.mark_context_bundle_stale`, which stamps `staleAt` on the
+bundle; the next reader rebuilds it. Each process also keeps bundles in memory
+for CONTEXT_BUNDLE_CACHE_SECONDS, so a change made through another process is
+picked up within that window.
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from concierge.utils.firestore_client import (
+    initialize_firebase, get_firestore_client, get_property, list_knowledge_items_by_property
+)
+
+logger = logging.getLogger(__name__)
+
+# Firestore collection holding one bundle document per property (document ID = property ID)
+CONTEXT_BUNDLE_COLLECTION = 'property_context_bundles'
+
+# Bump when the bundle layout or rendering changes, so stored bundles are rebuilt
+CONTEXT_BUNDLE_FORMAT = 1
+
+# How long a process serves a bundle from memory before re-checking Firestore
+CONTEXT_BUNDLE_CACHE_SECONDS = int(os.getenv('CONTEXT_BUNDLE_CACHE_SECONDS', '60'))
+
+# Knowledge item statuses included in the prompt
+PROMPT_KNOWLEDGE_STATUSES = ('approved', 'active')
+
+_PROPERTY_FIELDS = ['name', 'hostName', 'address', 'location', 'city', 'state', 'country',
+                    'checkInTime', 'checkOutTime', 'rules', 'description']
+_TIMEZONE_KEYS = ['timezone', 'timeZone', 'TimeZone', 'tz', 'TZ', 'localTimezone', 'localTimeZone']
+
+_local_bundles: Dict[str, tuple] = {}
+_local_lock = threading.Lock()
+
+
+def extract_property_context(property_id: str, property_data: Dict) -> Dict:
+    """
+    Normalize a property document into the context dict used by prompts and tools.
+
+    Args:
+        property_id: The property ID
+        property_data: The property document
+
+    Returns:
+        Dictionary with name, host, location fields, timezone, WiFi and house details
+    """
+    context = {'property_id': property_id}
+    for field in _PROPERTY_FIELDS:
+        value = property_data.get(field) or property_data.get(field[0].upper() + field[1:])
+        if value:
+            context[field] = value
+
+    for key in _TIMEZONE_KEYS:
+        if property_data.get(key):
+            context['timezone'] = property_data[key]
+            break
+
+    wifi_details = property_data.get('wifiDetails')
+    if isinstance(wifi_details, dict):
+        if wifi_details.get('network'):
+            context['wifiNetwork'] = wifi_details['network']
+        if wifi_details.get('password'):
+            context['wifiPassword'] = wifi_details['password']
+
+    return context
+
+
+def format_knowledge_items(items: List[Dict]) -> List[str]:
+    """
+    Render approved knowledge items for the property knowledge base section.
+
+    Args:
+        items: Knowledge item documents for one property
+
+    Returns:
+        One formatted entry per approved item with content
+    """
+    formatted = []
+    for item in items:
+        if (item.get('status') or '').lower() not in PROMPT_KNOWLEDGE_STATUSES:
+            continue
+        content = item.get('content', '')
+        if not content:
+            continue
+
+        item_type = (item.get('type') or '').lower()
+        tags = item.get('tags') or []
+        if item_type in ('qa', 'q&a'):
+            if item.get('question') and item.get('answer'):
+                formatted.append(f"Q: {item['question']}\nA: {item['answer']}")
+            else:
+                formatted.append(content)
+        elif item_type == 'instruction':
+            formatted.append(f"INSTRUCTION: {content}")
+        elif item_type == 'info':
+            formatted.append(f"INFO ({', '.join(tags) if tags else 'general'}): {content}")
+        elif item_type == 'places':
+            formatted.append(f"PLACES: {content}")
+        else:
+            tag_str = ', '.join(tags) if tags else ''
+            formatted.append(f"{item_type.upper()}{' - ' + tag_str if tag_str else ''}: {content}")
+
+    return formatted
+
+
+def build_context_bundle(property_id: str) -> Optional[Dict]:
+    """
+    Render and store the context bundle for a property.
+
+    Args:
+        property_id: The property ID
+
+    Returns:
+        The bundle dictionary, or None if the property does not exist
+    """
+    from concierge.utils.ai_helpers import BASE_SYSTEM_INSTRUCTIONS, format_property_info
+
+    # Recorded before reading, so a write that lands during the build keeps the bundle stale
+    sources_read_at = datetime.now(timezone.utc)
+    property_data = get_property(property_id)
+    if not property_data:
+        logger.warning(f"Cannot build context bundle: property {property_id} not found")
+        return None
+
+    property_context = extract_property_context(property_id, property_data)
+    knowledge_items = list_knowledge_items_by_property(property_id)
+    property_prompt = format_property_info(property_context)
+    knowledge_entries = format_knowledge_items(knowledge_items)
+    knowledge_prompt = ""
+    if knowledge_entries:
+        knowledge_prompt = "PROPERTY KNOWLEDGE BASE:\n" + "\n\n".join(knowledge_entries)
+
+    system_prompt = "\n\n".join(part for part in [BASE_SYSTEM_INSTRUCTIONS, property_prompt, knowledge_prompt] if part)
+    version = hashlib.sha256(
+        f"{CONTEXT_BUNDLE_FORMAT}\x00{system_prompt}\x00{sorted(property_context.items())}".encode('utf-8')
+    ).hexdigest()[:16]
+
+    bundle = {
+        'propertyId': property_id,
+        'version': version,
+        'formatVersion': CONTEXT_BUNDLE_FORMAT,
+        'propertyContext': property_context,
+        'propertyPrompt': property_prompt,
+        'knowledgePrompt': knowledge_prompt,
+        'knowledgeCount': len(knowledge_entries),
+        'systemPrompt': system_prompt,
+        'builtAt': datetime.now(timezone.utc),
+        'sourcesReadAt': sources_read_at,
+    }
+
+    if initialize_firebase():
+        try:
+            # Replace only the bundle fields, keeping a staleAt stamped by a concurrent write
+            get_firestore_client().collection(CONTEXT_BUNDLE_COLLECTION).document(property_id).set(
+                bundle, merge=list(bundle.keys()))
+            logger.info(f"Built context bundle {version} for property {property_id} "
+                        f"({len(system_prompt)} chars, {bundle['knowledgeCount']} knowledge items)")
+        except Exception as e:
+            logger.error(f"Error storing context bundle for property {property_id}: {e}")
+
+    remember_local_bundle(property_id, bundle)
+    return bundle
+
+
+def is_bundle_current(bundle: Optional[Dict]) -> bool:
+    """Return True if a stored bundle matches the current format and was not marked stale after it was built."""
+    if not bundle or not bundle.get('version') or bundle.get('formatVersion') != CONTEXT_BUNDLE_FORMAT:
+        return False
+    stale_at = bundle.get('staleAt')
+    sources_read_at = bundle.get('sourcesReadAt')
+    if stale_at and (not sources_read_at or stale_at >= sources_read_at):
+        return False
+    return True
+
+
+def get_context_bundle(property_id: str) -> Optional[Dict]:
+    """
+    Get the current context bundle for a property, rebuilding it if it is missing or stale.
+
+    Args:
+        property_id: The property ID
+
+    Returns:
+        The bundle dictionary, or None if the property does not exist
+    """
+    if not property_id:
+        return None
+
+    bundle = get_local_bundle(property_id)
+    if bundle:
+        return bundle
+
+    if initialize_firebase():
+        try:
+            doc = get_firestore_client().collection(CONTEXT_BUNDLE_COLLECTION).document(property_id).get()
+            if doc.exists:
+                bundle = doc.to_dict()
+                if is_bundle_current(bundle):
+                    remember_local_bundle(property_id, bundle)
+                    return bundle
+                logger.info(f"Context bundle for property {property_id} is stale, rebuilding")
+        except Exception as e:
+            logger.error(f"Error reading context bundle for property {property_id}: {e}")
+
+    return build_context_bundle(property_id)
+
+
+def get_local_bundle(property_id: str) -> Optional[Dict]:
+    """Return the bundle this process read within CONTEXT_BUNDLE_CACHE_SECONDS, or None."""
+    with _local_lock:
+        entry = _local_bundles.get(property_id)
+    if entry and time.time() - entry[0] < CONTEXT_BUNDLE_CACHE_SECONDS:
+        return entry[1]
+    return None
+
+
+def remember_local_bundle(property_id: str, bundle: Dict) -> None:
+    """Keep a current bundle in this process's in-memory cache."""
+    with _local_lock:
+        _local_bundles[property_id] = (time.time(), bundle)
+
+
+def forget_local_bundle(property_id: str) -> None:
+    """Drop a property's bundle from this process's in-memory cache."""
+    with _local_lock:
+        _local_bundles.pop(property_id, None)
+
+
+def guest_prompt_lines(guest_name: str = "", check_in: Optional[str] = None,
+                       check_out: Optional[str] = None) -> str:
+    """
+    Render the per-guest lines that follow a bundle's static system prompt.
+
+    Args:
+        guest_name: Name of the guest if available
+        check_in: Reservation check-in date, if known
+        check_out: Reservation check-out date, if known
+
+    Returns:
+        str: Guest name instruction and, if known, the reservation dates
+    """
+    from concierge.utils.ai_helpers import guest_name_instruction
+
+    prompt_parts = [guest_name_instruction(guest_name).strip()]
+    if check_in or check_out:
+        dates = []
+        if check_in:
+            dates.append(f"Check-in: {check_in}")
+        if check_out:
+            dates.append(f"Check-out: {check_out}")
+        prompt_parts.append(f"GUEST RESERVATION: {', '.join(dates)}")
+    return "\n\n".join(prompt_parts)
+
+
+def compose_system_prompt(bundle: Dict, guest_name: str = "", check_in: Optional[str] = None,
+                          check_out: Optional[str] = None) -> str:
+    """
+    Complete a bundle's static system prompt with the per-guest details.
+
+    The static part comes first and is identical for every guest of the
+    property; only the short guest and reservation lines vary.
+
+    Args:
+        bundle: Context bundle from get_context_bundle
+        guest_name: Name of the guest if available
+        check_in: Reservation check-in date, if known
+        check_out: Reservation check-out date, if known
+
+    Returns:
+        str: The complete system prompt
+    """
+    prompt_parts = [bundle.get('systemPrompt', ''), guest_prompt_lines(guest_name, check_in, check_out)]
+    return "\n\n".join(part for part in prompt_parts if part)
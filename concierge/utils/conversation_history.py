@@ -0,0 +1,253 @@
+"""
+Rolling compaction of chat and voice conversation history.
+
+Every turn, the conversation history is rendered into the model prompt. Left
+alone, long chats grow the prompt (and its cost and latency) without bound;
+cutting to the last few messages instead makes the assistant forget what the
+guest said earlier. Compaction keeps the last HISTORY_VERBATIM_MESSAGES
+messages verbatim and folds older ones into a running summary, which is
+updated incrementally: only the newly folded messages and the previous summary
+are sent to the summarizer.
+
+The compacted history is still a plain message list. The summary travels as a
+leading entry with role 'summary', so existing callers can store the compacted
+list in place of the full one (socket sessions, the Lambdas' connection items)
+and pass it back later; prompt formatters render it with format_history_lines.
+
+Folding happens in batches of HISTORY_FOLD_BATCH messages, so the summarizer
+runs every few turns rather than on every message, and summaries are cached per
+conversation so re-compacting the same history does not call the model again.
+The whole rendered history is kept within HISTORY_TOKEN_BUDGET (estimated) by
+folding more messages when it runs over; messages are never dropped, since
+callers store the compacted list back in place of the full history.
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from concierge.utils.rate_limiter import rate_limited_gemini_call
+from concierge.utils.gemini_clients import get_genai_client
+
+logger = logging.getLogger(__name__)
+
+# Role of the leading entry that carries the summary of older messages
+SUMMARY_ROLE = 'summary'
+
+HISTORY_VERBATIM_MESSAGES = int(os.getenv('HISTORY_VERBATIM_MESSAGES', '10'))
+HISTORY_FOLD_BATCH = int(os.getenv('HISTORY_FOLD_BATCH', '6'))
+HISTORY_TOKEN_BUDGET = int(os.getenv('HISTORY_TOKEN_BUDGET', '1500'))
+HISTORY_SUMMARY_MAX_CHARS = int(os.getenv('HISTORY_SUMMARY_MAX_CHARS', '1200'))
+HISTORY_SUMMARY_MODEL = 'gemini-2.5-flash-lite'
+
+# Always keep at least the latest exchange verbatim, even over budget
+_MIN_VERBATIM_MESSAGES = 2
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about 4 characters per token) used for budgeting."""
+    return (len(text or '') + 3) // 4
+
+
+def split_history(history: Optional[List[Dict]]) -> Tuple[str, List[Dict]]:
+    """
+    Split a (possibly compacted) history into its summary and its verbatim messages.
+
+    Returns:
+        tuple: (summary text or '', list of messages)
+    """
+    history = list(history or [])
+    if history and (history[0].get('role') or '').lower() == SUMMARY_ROLE:
+        return history[0].get('text', ''), history[1:]
+    return '', history
+
+
+def format_history_lines(history: Optional[List[Dict]], user_label: str = 'Guest',
+                         assistant_label: str = 'You') -> str:
+    """
+    Render history as prompt lines, including the summary of older messages.
+
+    Args:
+        history: Message list, optionally starting with a summary entry
+        user_label: Label for guest messages
+        assistant_label: Label for assistant messages
+
+    Returns:
+        str: One line per message, newline terminated
+    """
+    summary, messages = split_history(history)
+    lines = ''
+    if summary:
+        lines += f"(Summary of earlier conversation: {summary})\n"
+    for message_entry in messages:
+        role = (message_entry.get('role') or '').lower()
+        text = message_entry.get('text', '')
+        if role == 'user':
+            lines += f"{user_label}: {text}\n"
+        elif role in ['assistant', 'ai']:
+            lines += f"{assistant_label}: {text}\n"
+    return lines
+
+
+def _history_tokens(summary: str, messages: List[Dict]) -> int:
+    return estimate_tokens(summary) + sum(estimate_tokens(m.get('text', '')) + 3 for m in messages)
+
+
+class ConversationHistoryManager:
+    """
+    Compacts conversation histories and caches the running summaries per conversation.
+    """
+
+    def __init__(self, verbatim_messages: int = HISTORY_VERBATIM_MESSAGES, fold_batch: int = HISTORY_FOLD_BATCH,
+                 token_budget: int = HISTORY_TOKEN_BUDGET, max_cached_summaries: int = 1000):
+        """
+        Initialize the manager.
+
+        Args:
+            verbatim_messages: Number of most recent messages kept verbatim
+            fold_batch: Minimum number of older messages folded into the summary at once
+            token_budget: Estimated token budget for the rendered history
+            max_cached_summaries: Maximum number of cached summaries
+        """
+        self._verbatim = max(verbatim_messages, _MIN_VERBATIM_MESSAGES)
+        self._fold_batch = max(fold_batch, 1)
+        self._budget = token_budget
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+        self._max_cached = max_cached_summaries
+        self._lock = threading.Lock()
+        self._folds = 0
+        self._cache_hits = 0
+        self._errors = 0
+
+    def _summarize(self, previous_summary: str, messages: List[Dict]) -> Optional[str]:
+        """Fold messages into the running summary with one small model call."""
+        conversation_text = format_history_lines(messages, assistant_label='Assistant')
+        prompt = f"""
+        You maintain a running summary of a chat between a property guest and the AI concierge.
+        Update the summary so it also covers the new messages.
+
+        Requirements:
+        - Keep every fact the assistant may need later: guest name, dates, requests, problems reported, answers and promises given
+        - Drop greetings and small talk
+        - Plain sentences, at most {HISTORY_SUMMARY_MAX_CHARS} characters
+
+        Current summary:
+        {previous_summary or '(none)'}
+
+        New messages:
+        {conversation_text}
+
+        Updated summary:
+        """
+        try:
+            client = get_genai_client(os.environ.get('GEMINI_API_KEY'))
+            if client is None:
+                return None
+
+            def make_summary_call():
+                return client.models.generate_content(model=HISTORY_SUMMARY_MODEL, contents=prompt)
+
+            response = rate_limited_gemini_call(make_summary_call, max_retries=1, model=HISTORY_SUMMARY_MODEL)
+            summary = (response.text or '').strip() if response else ''
+        except Exception as e:
+            logger.warning(f"Could not update conversation summary: {e}")
+            with self._lock:
+                self._errors += 1
+            return None
+
+        if not summary:
+            return None
+        if len(summary) > HISTORY_SUMMARY_MAX_CHARS:
+            summary = summary[:HISTORY_SUMMARY_MAX_CHARS - 3] + "..."
+        return summary
+
+    def _fold(self, conversation_id: str, previous_summary: str, messages: List[Dict]) -> Optional[str]:
+        digest = hashlib.sha256(previous_summary.encode('utf-8'))
+        for message in messages:
+            digest.update(f"\x00{message.get('role', '')}\x00{message.get('text', '')}".encode('utf-8'))
+        key = f"{conversation_id}:{digest.hexdigest()}"
+
+        with self._lock:
+            cached = self._summaries.get(key)
+            if cached is not None:
+                self._summaries.move_to_end(key)
+                self._cache_hits += 1
+                return cached
+
+        summary = self._summarize(previous_summary, messages)
+        if summary is None:
+            return None
+
+        with self._lock:
+            self._summaries[key] = summary
+            self._folds += 1
+            while len(self._summaries) > self._max_cached:
+                self._summaries.popitem(last=False)
+        return summary
+
+    def compact(self, history: Optional[List[Dict]], conversation_id: str = '') -> List[Dict]:
+        """
+        Compact a conversation history for use in a prompt.
+
+        Args:
+            history: Full or previously compacted message list
+            conversation_id: Conversation / session identifier used to scope the summary cache
+
+        Returns:
+            list: Message list starting with a summary entry when older messages were folded
+        """
+        summary, messages = split_history(history)
+        if not messages and not summary:
+            return []
+
+        older_count = max(0, len(messages) - self._verbatim)
+        fold_count = older_count if older_count >= self._fold_batch else 0
+
+        # Over budget: fold the oldest verbatim messages too (never drop them, the
+        # compacted list replaces the stored history), leaving room for a full-size summary
+        if _history_tokens(summary, messages) > self._budget:
+            fold_count = older_count
+            summary_reserve = estimate_tokens(' ' * HISTORY_SUMMARY_MAX_CHARS)
+            while (len(messages) - fold_count > _MIN_VERBATIM_MESSAGES
+                   and summary_reserve + _history_tokens('', messages[fold_count:]) > self._budget):
+                fold_count += 1
+
+        if fold_count:
+            folded = self._fold(conversation_id, summary, messages[:fold_count])
+            if folded is not None:
+                summary, messages = folded, messages[fold_count:]
+            else:
+                logger.info(f"Keeping {fold_count} unsummarized messages for conversation {conversation_id}")
+
+        compacted = [{'role': SUMMARY_ROLE, 'text': summary}] if summary else []
+        return compacted + list(messages)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get compaction statistics for monitoring."""
+        with self._lock:
+            return {
+                'cached_summaries': len(self._summaries),
+                'folds': self._folds,
+                'cache_hits': self._cache_hits,
+                'errors': self._errors,
+            }
+
+
+# Global history manager shared by all sessions in this process
+_history_manager = None
+
+
+def get_history_manager() -> ConversationHistoryManager:
+    """Get or create the global conversation history manager instance."""
+    global _history_manager
+    if _history_manager is None:
+        _history_manager = ConversationHistoryManager()
+    return _history_manager
+
+
+def compact_history(history: Optional[List[Dict]], conversation_id: str = '') -> List[Dict]:
+    """Compact a conversation history with the shared manager (see ConversationHistoryManager.compact)."""
+    return get_history_manager().compact(history, conversation_id)
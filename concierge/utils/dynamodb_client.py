@@ -9,6 +9,8 @@ from typing import Dict, List, Optional, Any, Union
 from botocore.exceptions import ClientError
 from decimal import Decimal
 import json
+import heapq
+import base64
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -21,6 +23,8 @@ dynamodb_resource = None
 # DynamoDB is now only used for conversations and websocket connections
 conversations_table = None
 conversations_table_name = os.environ.get('CONVERSATIONS_TABLE_NAME', 'Conversations')
+# Time-ordered index of the conversation list (GSI2PK/GSI2SK, see conversation_time_index_keys)
+conversations_time_index_name = os.environ.get('CONVERSATIONS_TIME_INDEX_NAME', 'GSI2')
 
 def initialize_dynamodb():
     """Initialize the DynamoDB client and resource for conversations only."""
@@ -511,6 +515,7 @@ def create_conversation_session(property_id: str, user_id: str, guest_name: str
         'SK': f"CONVERSATION#{conversation_id}",
         'GSI1PK': f"USER#{user_id}",
         'GSI1SK': timestamp,
+        **conversation_time_index_keys(property_id, f"CONVERSATION#{conversation_id}", timestamp),
         'EntityType': 'CONVERSATION',
         'ConversationId': conversation_id,
         'PropertyId': property_id,
@@ -536,6 +541,7 @@ def create_conversation_session(property_id: str, user_id: str, guest_name: str
         conversations_table = get_conversations_table()
         if conversations_table:
             conversations_table.put_item(Item=item)
+            mark_summary_pending(item['PK'], item['SK'], property_id)
             logger.info(f"Created conversation session {conversation_id} for property {property_id}, user {user_id}, guest {item['GuestName']}, reservation {reservation_id}, phone {phone_number}")
             return conversation_id
         else:
@@ -767,6 +773,9 @@ def update_conversation(property_id: str, conversation_id: str, update_data: Dic
             ReturnValues="UPDATED_NEW"
         )
 
+        if update_data.get('AISummary'):
+            clear_summary_pending(f"PROPERTY#{property_id}", f"CONVERSATION#{conversation_id}")
+
         logger.info(f"Updated conversation {conversation_id} with new data: {update_data.keys()}")
         return True
     except Exception as e:
@@ -891,6 +900,7 @@ def create_voice_call_diagnostics_session(property_id: str, user_id: str, sessio
         'SK': f"VOICE_DIAGNOSTICS#{session_id}",
         'GSI1PK': f"USER#{user_id}",
         'GSI1SK': timestamp,
+        **conversation_time_index_keys(property_id, f"VOICE_DIAGNOSTICS#{session_id}", timestamp),
         'EntityType': 'VOICE_CALL_DIAGNOSTICS',
 
         # Session Info
@@ -1514,6 +1524,8 @@ def finalize_voice_call_session(session_id: str, end_reason: str, final_metrics:
         conversations_table.update_item(**update_params)
 
         logger.info(f"Finalized voice call session {session_id} with reason: {end_reason}, status: {final_status}, duration: {duration}s")
+        # Queue for the summaries job in case the background generation below fails
+        mark_summary_pending(pk, sk, item.get('PropertyId'))
         # Trigger background summary generation (best-effort)
         try:
             generate_and_store_session_summary_async(session_id, pk, sk)
@@ -1616,6 +1628,7 @@ def force_finalize_voice_call_session(session_id: str, end_reason: str = 'user_e
             ExpressionAttributeNames=expr_names
         )
 
+        mark_summary_pending(pk, sk, item.get('PropertyId'))
         logger.info(f"Force-finalized voice session {session_id} as COMPLETED")
         return True
     except Exception as e:
@@ -1641,6 +1654,7 @@ def generate_and_store_session_summary_async(session_id: str, pk: str, sk: str)
 
                 # Skip if already summarized
                 if item.get('AISummary'):
+                    clear_summary_pending(pk, sk)
                     return
 
                 # Build messages list from transcripts for voice sessions
@@ -1686,6 +1700,7 @@ def generate_and_store_session_summary_async(session_id: str, pk: str, sk: str)
                         ':ts': datetime.now(timezone.utc).isoformat()
                     }
                 )
+                clear_summary_pending(pk, sk)
                 logger.info(f"Stored AI summary for session {session_id} ({len(ai_summary)} chars)")
             except Exception as worker_err:
                 logger.warning(f"AI summary generation worker failed for {session_id}: {worker_err}")
@@ -1781,9 +1796,12 @@ def store_voice_call_transcript(session_id: str, role: str, text: str, timestamp
         # Update the session with the new transcript
         update_params = {
             'Key': {'PK': pk, 'SK': sk},
-            'UpdateExpression': 'SET Transcripts = list_append(if_not_exists(Transcripts, :empty_list), :transcript)',
+            'UpdateExpression': ('SET Transcripts = list_append(if_not_exists(Transcripts, :empty_list), :transcript), '
+                                 'TranscriptCount = if_not_exists(TranscriptCount, :zero) + :one'),
             'ExpressionAttributeValues': {
                 ':empty_list': [],
+                ':zero': 0,
+                ':one': 1,
                 ':transcript': [convert_floats_to_decimal(transcript_entry)]
             }
         }
@@ -1893,119 +1911,349 @@ def list_conversations_by_property(property_id: str) -> List[Dict]:
         return []
 
 
-def list_property_conversations_all(property_id: str, limit: int = 100, channel_filter: str = None,
-                                   date_from: str = None, date_to: str = None, guest_name_filter: str = None) -> List[Dict]:
-    """List all conversations and voice call sessions for a property with filtering."""
-    if not initialize_dynamodb():
-        return []
+# Attributes read for the conversation list views: everything
+# format_conversation_for_list needs except the Messages/Transcripts bodies,
+# whose lengths are kept in MessageCount/TranscriptCount
+CONVERSATION_LIST_ATTRIBUTES = [
+    'PK', 'SK', 'EntityType', 'ConversationId', 'SessionId', 'PropertyId', 'UserId', 'GuestName',
+    'ReservationId', 'StartTime', 'CreatedAt', 'LastUpdateTime', 'EndTime', 'Duration', 'Status',
+    'Channel', 'AISummary', 'MessageCount', 'TranscriptCount',
+]
+CONVERSATION_SORT_KEY_PREFIXES = {'text_chat': 'CONVERSATION#', 'voice_call': 'VOICE_DIAGNOSTICS#'}
+# Items read per DynamoDB request while paging through the list of one prefix
+CONVERSATION_LIST_QUERY_PAGE_SIZE = 100
+# Body attribute and count attribute of each list entity type
+_CONVERSATION_BODY_COUNTS = {
+    'CONVERSATION': ('Messages', 'MessageCount'),
+    'VOICE_CALL_DIAGNOSTICS': ('Transcripts', 'TranscriptCount'),
+}
+
+
+def _conversation_sort_key(item: Dict) -> tuple:
+    """Most-recent-first ordering key of a conversation list item (SK breaks ties)."""
+    return (item.get('StartTime') or item.get('CreatedAt') or '', item.get('SK', ''))
+
+
+def conversation_time_index_keys(property_id: str, sort_key: str, start_time: str) -> Dict[str, str]:
+    """
+    Keys of a conversation list item in the time-ordered index.
+
+    The base table sort key holds an ID, so it cannot return a property's
+    conversations by recency. The index partitions them by property and list
+    type (GSI2PK = PROPERTY#<id>#CONVERSATION or #VOICE_DIAGNOSTICS) and sorts
+    them by "<StartTime>#<SK>", the same order as _conversation_sort_key, so a
+    page is a reverse range query from the cursor.
+
+    Args:
+        property_id: ID of the property
+        sort_key: Base table SK of the item (CONVERSATION#... or VOICE_DIAGNOSTICS#...)
+        start_time: StartTime of the item (CreatedAt for items without one)
 
+    Returns:
+        Dictionary with the GSI2PK and GSI2SK attributes
+    """
+    entity_prefix = sort_key.split('#', 1)[0]
+    return {
+        'GSI2PK': f"PROPERTY#{property_id}#{entity_prefix}",
+        'GSI2SK': f"{start_time}#{sort_key}",
+    }
+
+
+def encode_conversation_cursor(item: Dict) -> str:
+    """Opaque continuation token pointing after a conversation list item."""
+    raw = json.dumps(list(_conversation_sort_key(item)), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_conversation_cursor(cursor: str) -> tuple:
+    """
+    Decode a token from encode_conversation_cursor.
+
+    Raises:
+        ValueError: If the token is malformed
+    """
     try:
-        conversations_table = get_conversations_table()
-        if not conversations_table:
-            logger.error("Conversations table not available")
-            return []
+        start_time, sort_key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return (str(start_time), str(sort_key))
+    except Exception:
+        raise ValueError(f"Invalid conversation cursor: {cursor!r}")
 
-        all_conversations = []
 
-        # Get regular conversations (fetch up to 1MB via pagination to ensure recency coverage)
-        try:
-            conversations = []
-            query_kwargs = {
-                'KeyConditionExpression': Key('PK').eq(f"PROPERTY#{property_id}") & Key('SK').begins_with("CONVERSATION#"),
-                'ScanIndexForward': False  # Sort by sort key descending (lexicographic)
-            }
-            while True:
-                response = conversations_table.query(**query_kwargs)
-                conversations.extend(response.get('Items', []))
-                last_evaluated_key = response.get('LastEvaluatedKey')
-                if not last_evaluated_key:
-                    break
-                query_kwargs['ExclusiveStartKey'] = last_evaluated_key
-                # Safety cap to avoid excessive reads
-                if len(conversations) >= max(limit * 5, 200):
-                    break
-            all_conversations.extend(conversations)
-            logger.info(f"Retrieved {len(conversations)} regular conversations for property {property_id}")
-        except Exception as e:
-            logger.warning(f"Error getting regular conversations: {e}")
+def _normalize_list_date(value: Optional[str]) -> Optional[str]:
+    """Convert a date filter to the stored StartTime format (UTC isoformat) so strings compare chronologically."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        logger.warning(f"Ignoring invalid conversation date filter: {value}")
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
+def _conversation_date_filter(date_from: Optional[str], date_to: Optional[str]):
+    """FilterExpression for a date range on StartTime, falling back to CreatedAt for items without one."""
+    def in_range(attribute):
+        condition = None
+        if date_from:
+            condition = Attr(attribute).gte(date_from)
+        if date_to:
+            condition = Attr(attribute).lte(date_to) if condition is None else condition & Attr(attribute).lte(date_to)
+        return condition
+
+    if not date_from and not date_to:
+        return None
+    return in_range('StartTime') | (Attr('StartTime').not_exists() & in_range('CreatedAt'))
 
-        # Get voice call diagnostics sessions (pagination similar to above)
+
+def _iter_conversation_summaries(conversations_table, property_id: str, prefix: str, after: Optional[tuple],
+                                 date_from: Optional[str], date_to: Optional[str]):
+    """
+    Yield the list attributes of one sort-key prefix, most recent first.
+
+    Reads the time-ordered index lazily, one CONVERSATION_LIST_QUERY_PAGE_SIZE
+    request at a time, starting from the cursor (after) and bounded by the
+    date range, so a page only reads about as many items as it returns. When
+    the index is not available the whole prefix is read from the base table
+    instead (the pre-index behaviour).
+    """
+    names = {f"#p{i}": attribute for i, attribute in enumerate(CONVERSATION_LIST_ATTRIBUTES)}
+    index_keys = conversation_time_index_keys(property_id, prefix, '')
+    key_condition = Key('GSI2PK').eq(index_keys['GSI2PK'])
+    # "~" sorts after every character of an SK, so "<date_to>~" includes everything started at date_to
+    upper = f"{after[0]}#{after[1]}" if after is not None else None
+    if date_to and (upper is None or f"{date_to}~" < upper):
+        upper = f"{date_to}~"
+    if date_from and upper is not None and date_from > upper:
+        return
+    if date_from and upper is not None:
+        key_condition = key_condition & Key('GSI2SK').between(date_from, upper)
+    elif date_from:
+        key_condition = key_condition & Key('GSI2SK').gte(date_from)
+    elif upper is not None:
+        key_condition = key_condition & Key('GSI2SK').lte(upper)
+
+    query_kwargs = {
+        'IndexName': conversations_time_index_name,
+        'KeyConditionExpression': key_condition,
+        'ProjectionExpression': ', '.join(names),
+        'ExpressionAttributeNames': names,
+        'ScanIndexForward': False,
+        'Limit': CONVERSATION_LIST_QUERY_PAGE_SIZE,
+    }
+    try:
+        response = conversations_table.query(**query_kwargs)
+    except ClientError as e:
+        logger.warning(f"Conversation time index {conversations_time_index_name} not usable, "
+                       f"reading all {prefix} items for property {property_id}: {e}")
+        yield from _read_conversation_summaries(conversations_table, property_id, prefix, after, date_from, date_to)
+        return
+
+    while True:
+        for item in response.get('Items', []):
+            # The range bounds are inclusive, the cursor item itself was on the previous page
+            if after is None or _conversation_sort_key(item) < after:
+                yield item
+        last_evaluated_key = response.get('LastEvaluatedKey')
+        if not last_evaluated_key:
+            return
+        query_kwargs['ExclusiveStartKey'] = last_evaluated_key
+        response = conversations_table.query(**query_kwargs)
+
+
+def _read_conversation_summaries(conversations_table, property_id: str, prefix: str, after: Optional[tuple],
+                                 date_from: Optional[str], date_to: Optional[str]) -> List[Dict]:
+    """Read every item of one sort-key prefix from the base table, most recent first (no time index)."""
+    names = {f"#p{i}": attribute for i, attribute in enumerate(CONVERSATION_LIST_ATTRIBUTES)}
+    query_kwargs = {
+        'KeyConditionExpression': Key('PK').eq(f"PROPERTY#{property_id}") & Key('SK').begins_with(prefix),
+        'ProjectionExpression': ', '.join(names),
+        'ExpressionAttributeNames': names,
+    }
+    date_filter = _conversation_date_filter(date_from, date_to)
+    if date_filter is not None:
+        query_kwargs['FilterExpression'] = date_filter
+
+    items = []
+    while True:
+        response = conversations_table.query(**query_kwargs)
+        items.extend(item for item in response.get('Items', [])
+                     if after is None or _conversation_sort_key(item) < after)
+        last_evaluated_key = response.get('LastEvaluatedKey')
+        if not last_evaluated_key:
+            break
+        query_kwargs['ExclusiveStartKey'] = last_evaluated_key
+    items.sort(key=_conversation_sort_key, reverse=True)
+    return items
+
+
+def backfill_conversation_time_index(property_id: str = None) -> int:
+    """
+    Add the time index keys (GSI2PK/GSI2SK) to conversation list items written before they were maintained.
+
+    Args:
+        property_id: (optional) Only backfill this property (default: every property)
+
+    Returns:
+        Number of updated items
+    """
+    if not initialize_dynamodb():
+        return 0
+    conversations_table = get_conversations_table()
+    if not conversations_table:
+        logger.error("Conversations table not available")
+        return 0
+
+    prefixes = list(CONVERSATION_SORT_KEY_PREFIXES.values())
+    # Older releases wrote a table-wide GSI2PK="CONVERSATION" on conversations; those are rewritten too
+    missing_keys = Attr('GSI2PK').not_exists() | ~Attr('GSI2PK').begins_with('PROPERTY#')
+    if property_id:
+        requests = [('query', {
+            'KeyConditionExpression': Key('PK').eq(f"PROPERTY#{property_id}") & Key('SK').begins_with(prefix),
+            'FilterExpression': missing_keys,
+        }) for prefix in prefixes]
+    else:
+        prefix_condition = Attr('SK').begins_with(prefixes[0])
+        for prefix in prefixes[1:]:
+            prefix_condition = prefix_condition | Attr('SK').begins_with(prefix)
+        requests = [('scan', {'FilterExpression': Attr('PK').begins_with('PROPERTY#') & prefix_condition & missing_keys})]
+
+    updated = 0
+    for operation, kwargs in requests:
+        kwargs['ProjectionExpression'] = 'PK, SK, StartTime, CreatedAt'
+        while True:
+            response = getattr(conversations_table, operation)(**kwargs)
+            for item in response.get('Items', []):
+                start_time = item.get('StartTime') or item.get('CreatedAt')
+                if not start_time:
+                    logger.warning(f"Skipping {item['PK']}/{item['SK']}: no StartTime or CreatedAt")
+                    continue
+                index_keys = conversation_time_index_keys(item['PK'][len('PROPERTY#'):], item['SK'], start_time)
+                try:
+                    conversations_table.update_item(
+                        Key={'PK': item['PK'], 'SK': item['SK']},
+                        UpdateExpression='SET GSI2PK = :pk, GSI2SK = :sk',
+                        ExpressionAttributeValues={':pk': index_keys['GSI2PK'], ':sk': index_keys['GSI2SK']},
+                    )
+                    updated += 1
+                except Exception as e:
+                    logger.warning(f"Error backfilling time index keys of {item['PK']}/{item['SK']}: {e}")
+            last_evaluated_key = response.get('LastEvaluatedKey')
+            if not last_evaluated_key:
+                break
+            kwargs['ExclusiveStartKey'] = last_evaluated_key
+
+    logger.info(f"Backfilled conversation time index keys on {updated} items")
+    return updated
+
+
+def _fill_conversation_counts(conversations_table, items: List[Dict]) -> None:
+    """Set MessageCount/TranscriptCount on items written before the counts were maintained."""
+    missing = {}
+    for item in items:
+        body_attribute, count_attribute = _CONVERSATION_BODY_COUNTS.get(item.get('EntityType'), (None, None))
+        if count_attribute and count_attribute not in item:
+            missing[(item['PK'], item['SK'])] = item
+
+    keys = [{'PK': pk, 'SK': sk} for pk, sk in missing]
+    for i in range(0, len(keys), 100):
+        request = {conversations_table.name: {
+            'Keys': keys[i:i + 100],
+            'ProjectionExpression': 'PK, SK, Messages, Transcripts',
+        }}
         try:
-            voice_sessions = []
-            query_kwargs = {
-                'KeyConditionExpression': Key('PK').eq(f"PROPERTY#{property_id}") & Key('SK').begins_with("VOICE_DIAGNOSTICS#"),
-                'ScanIndexForward': False
-            }
-            while True:
-                response = conversations_table.query(**query_kwargs)
-                voice_sessions.extend(response.get('Items', []))
-                last_evaluated_key = response.get('LastEvaluatedKey')
-                if not last_evaluated_key:
-                    break
-                query_kwargs['ExclusiveStartKey'] = last_evaluated_key
-                if len(voice_sessions) >= max(limit * 5, 200):
-                    break
-            all_conversations.extend(voice_sessions)
-            logger.info(f"Retrieved {len(voice_sessions)} voice call sessions for property {property_id}")
+            response = dynamodb_resource.batch_get_item(RequestItems=request)
         except Exception as e:
-            logger.warning(f"Error getting voice call sessions: {e}")
+            logger.warning(f"Error reading conversation bodies for counts: {e}")
+            continue
+        for body in response.get('Responses', {}).get(conversations_table.name, []):
+            item = missing.get((body['PK'], body['SK']))
+            if item is not None:
+                body_attribute, count_attribute = _CONVERSATION_BODY_COUNTS[item['EntityType']]
+                item[count_attribute] = len(body.get(body_attribute) or [])
+
+
+def list_property_conversations_page(property_id: str, limit: int = 50, cursor: str = None,
+                                     channel_filter: str = None, date_from: str = None, date_to: str = None,
+                                     guest_name_filter: str = None) -> Dict[str, Any]:
+    """
+    List one page of a property's conversations and voice call sessions, most recent first.
 
-        # Apply filters
-        filtered_conversations = []
+    Items carry the list attributes only (CONVERSATION_LIST_ATTRIBUTES): the
+    Messages and Transcripts bodies are not read, use get_conversation or
+    get_voice_call_diagnostics for those. Pages are read from the
+    time-ordered index (CONVERSATIONS_TIME_INDEX_NAME, partition key GSI2PK,
+    sort key GSI2SK, projecting at least the list attributes); items written
+    before it existed need backfill_conversation_time_index.
 
-        for conv in all_conversations:
-            # Channel filter
-            if channel_filter:
-                entity_type = conv.get('EntityType', '')
-                if channel_filter == 'text_chat' and entity_type == 'VOICE_CALL_DIAGNOSTICS':
-                    continue
-                elif channel_filter == 'voice_call' and entity_type != 'VOICE_CALL_DIAGNOSTICS':
-                    continue
+    Args:
+        property_id: ID of the property
+        limit: Maximum number of items in the page
+        cursor: (optional) next_cursor of the previous page
+        channel_filter: (optional) 'text_chat' or 'voice_call'
+        date_from: (optional) ISO date/time; only sessions started at or after it
+        date_to: (optional) ISO date/time; only sessions started at or before it
+        guest_name_filter: (optional) Case-insensitive substring of the guest name
 
-            # Date filter
-            if date_from or date_to:
-                conv_date = conv.get('StartTime') or conv.get('CreatedAt')
-                if conv_date:
-                    try:
-                        from datetime import datetime
-                        if isinstance(conv_date, str):
-                            conv_datetime = datetime.fromisoformat(conv_date.replace('Z', '+00:00'))
-                        else:
-                            conv_datetime = conv_date
-
-                        if date_from:
-                            from_datetime = datetime.fromisoformat(date_from)
-                            if conv_datetime < from_datetime:
-                                continue
-
-                        if date_to:
-                            to_datetime = datetime.fromisoformat(date_to)
-                            if conv_datetime > to_datetime:
-                                continue
-                    except (ValueError, TypeError):
-                        # Skip if date parsing fails
-                        continue
-
-            # Guest name filter
-            if guest_name_filter:
-                guest_name = conv.get('GuestName', '').lower()
-                if guest_name_filter.lower() not in guest_name:
-                    continue
+    Returns:
+        Dictionary with 'items' and 'next_cursor' (None on the last page)
 
-            filtered_conversations.append(conv)
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    after = decode_conversation_cursor(cursor) if cursor else None
+    empty_page = {'items': [], 'next_cursor': None}
+    if not initialize_dynamodb():
+        return empty_page
 
-        # Sort by creation time (most recent first)
-        filtered_conversations.sort(
-            key=lambda x: x.get('StartTime') or x.get('CreatedAt') or '',
-            reverse=True
-        )
+    conversations_table = get_conversations_table()
+    if not conversations_table:
+        logger.error("Conversations table not available")
+        return empty_page
+
+    prefixes = [CONVERSATION_SORT_KEY_PREFIXES[channel_filter]] if channel_filter in CONVERSATION_SORT_KEY_PREFIXES \
+        else list(CONVERSATION_SORT_KEY_PREFIXES.values())
+    date_from, date_to = _normalize_list_date(date_from), _normalize_list_date(date_to)
+    guest_name_filter = (guest_name_filter or '').lower()
+
+    streams = [
+        _iter_conversation_summaries(conversations_table, property_id, prefix, after, date_from, date_to)
+        for prefix in prefixes
+    ]
+
+    # Each prefix is read lazily in order, so the merge stops reading once it has limit + 1 items
+    page = []
+    try:
+        for item in heapq.merge(*streams, key=_conversation_sort_key, reverse=True):
+            if guest_name_filter and guest_name_filter not in (item.get('GuestName') or '').lower():
+                continue
+            page.append(item)
+            if len(page) > limit:
+                break
+    except Exception as e:
+        logger.error(f"Error listing conversations for property {property_id}: {e}")
+        return empty_page
 
-        # Apply limit
-        result = filtered_conversations[:limit]
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_conversation_cursor(page[-1])
+    _fill_conversation_counts(conversations_table, page)
 
-        logger.info(f"Returning {len(result)} filtered conversations for property {property_id}")
-        return result
+    logger.info(f"Returning {len(page)} conversations for property {property_id}")
+    return {'items': page, 'next_cursor': next_cursor}
 
+
+def list_property_conversations_all(property_id: str, limit: int = 100, channel_filter: str = None,
+                                   date_from: str = None, date_to: str = None, guest_name_filter: str = None) -> List[Dict]:
+    """List the most recent conversations and voice call sessions for a property with filtering (list attributes only)."""
+    try:
+        return list_property_conversations_page(
+            property_id, limit=limit, channel_filter=channel_filter, date_from=date_from,
+            date_to=date_to, guest_name_filter=guest_name_filter
+        )['items']
     except Exception as e:
         logger.error(f"Error listing all conversations for property {property_id}: {e}")
         return []
@@ -2079,6 +2327,7 @@ def create_fallback_voice_session(property_id: str, user_id: str, session_id: st
         'SK': f"VOICE_DIAGNOSTICS#{session_id}",
         'GSI1PK': f"USER#{user_id}",
         'GSI1SK': timestamp,
+        **conversation_time_index_keys(property_id, f"VOICE_DIAGNOSTICS#{session_id}", timestamp),
         'EntityType': 'VOICE_CALL_DIAGNOSTICS',
 
         # Session Info
@@ -2247,139 +2496,322 @@ def set_voice_session_summary(property_id: str, session_id: str, ai_summary: str
         logger.error("Failed to initialize DynamoDB for setting voice session summary")
         return False
 
-
-def run_missing_conversation_summaries_job(max_items: int = 50) -> dict:
-    """Scan for conversations/sessions missing AISummary and generate them.
-
-    Returns a dict with counts: {"processed": int, "skipped": int, "errors": int}
-    """
-    results = {"processed": 0, "skipped": 0, "errors": 0}
-    if not initialize_dynamodb():
-        logger.error("Failed to initialize DynamoDB for missing summaries job")
-        return results
+    if not ai_summary:
+        return False
 
     try:
         conversations_table = get_conversations_table()
         if not conversations_table:
-            logger.error("Conversations table not available for missing summaries job")
-            return results
+            logger.error("Conversations table not available for setting voice session summary")
+            return False
 
-        # Scan the table (1MB pages). We'll post-filter items missing AISummary and with messages.
-        scan_kwargs = {
-            'ProjectionExpression': 'PK, SK, EntityType, PropertyId, ConversationId, SessionId, GuestName, Messages, Transcripts, AISummary'
-        }
+        pk = f"PROPERTY#{property_id}"
+        sk = f"VOICE_DIAGNOSTICS#{session_id}"
+
+        conversations_table.update_item(
+            Key={'PK': pk, 'SK': sk},
+            UpdateExpression='SET AISummary = :summary, LastUpdateTime = :ts',
+            ExpressionAttributeValues={
+                ':summary': ai_summary,
+                ':ts': datetime.now(timezone.utc).isoformat()
+            }
+        )
+        clear_summary_pending(pk, sk)
+        logger.info(f"Stored AI summary for voice session {session_id} (property {property_id})")
+        return True
+    except Exception as e:
+        logger.error(f"Error setting voice session summary {session_id}: {e}")
+        return False
 
-        from concierge.utils.rate_limiter import get_gemini_rate_limiter
-        rate_limiter = get_gemini_rate_limiter()
 
-        def build_messages(item: dict) -> list:
-            msgs = []
-            if item.get('EntityType') == 'VOICE_CALL_DIAGNOSTICS':
-                for t in item.get('Transcripts', []) or []:
-                    msgs.append({'role': t.get('role', ''), 'text': t.get('text', '')})
-            else:
-                for m in item.get('Messages', []) or []:
-                    msgs.append({'role': m.get('role', ''), 'text': m.get('text') or m.get('content', '')})
-            return [m for m in msgs if (m.get('text') or '').strip()]
+# === PENDING SUMMARY QUEUE ===
+# Conversations and voice sessions that still need an AISummary get a small marker
+# item in the conversations table (PK=SUMMARY_QUEUE). The hourly job reads only the
+# markers instead of scanning every conversation, so its cost follows new traffic.
 
-        processed = 0
-        last_evaluated_key = None
-        while True:
-            if last_evaluated_key:
-                scan_kwargs['ExclusiveStartKey'] = last_evaluated_key
-            response = conversations_table.scan(**scan_kwargs)
-            items = response.get('Items', [])
+SUMMARY_QUEUE_PK = 'SUMMARY_QUEUE'
+# Text chats have no explicit end; they are summarized after this much inactivity
+SUMMARY_QUIET_MINUTES = int(os.environ.get('SUMMARY_QUIET_MINUTES', '30'))
+SUMMARY_JOB_CONCURRENCY = int(os.environ.get('SUMMARY_JOB_CONCURRENCY', '4'))
+# Failed markers are retried after SUMMARY_RETRY_BASE_MINUTES, doubling per attempt up to a day,
+# and moved to the SUMMARY_DEAD_LETTER partition after SUMMARY_MAX_ATTEMPTS failures
+SUMMARY_MAX_ATTEMPTS = int(os.environ.get('SUMMARY_MAX_ATTEMPTS', '5'))
+SUMMARY_RETRY_BASE_MINUTES = int(os.environ.get('SUMMARY_RETRY_BASE_MINUTES', '60'))
+SUMMARY_RETRY_MAX_MINUTES = 24 * 60
+SUMMARY_DEAD_LETTER_PK = 'SUMMARY_DEAD_LETTER'
 
-            for item in items:
-                if processed >= max_items:
-                    break
 
-                if item.get('AISummary'):
-                    results['skipped'] += 1
-                    continue
+def _summary_marker_key(pk: str, sk: str) -> Dict[str, str]:
+    return {'PK': SUMMARY_QUEUE_PK, 'SK': f"{pk}|{sk}"}
 
-                messages = build_messages(item)
-                if not messages:
-                    results['skipped'] += 1
-                    continue
 
-                try:
-                    # Rate limit Gemini calls
-                    rate_limiter.wait_if_needed()
-
-                    # Best-effort property context for better summaries
-                    property_context = None
-                    try:
-                        from concierge.utils.firestore_client import get_property as fs_get_property
-                        if item.get('PropertyId'):
-                            property_context = fs_get_property(item['PropertyId'])
-                    except Exception:
-                        pass
-
-                    from concierge.utils.ai_helpers import generate_conversation_summary as gen_sum
-                    summary_text = gen_sum(messages=messages, property_context=property_context, guest_name=item.get('GuestName'))
-                    if not summary_text:
-                        results['skipped'] += 1
-                        continue
-
-                    # Persist
-                    if item.get('EntityType') == 'VOICE_CALL_DIAGNOSTICS':
-                        session_id = item.get('SessionId') or (item.get('SK', '').split('#')[1] if '#' in item.get('SK', '') else None)
-                        if session_id and item.get('PropertyId'):
-                            ok = set_voice_session_summary(item['PropertyId'], session_id, summary_text)
-                            if ok:
-                                processed += 1
-                                results['processed'] += 1
-                            else:
-                                results['errors'] += 1
-                    else:
-                        conversation_id = item.get('ConversationId') or (item.get('SK', '').split('#')[1] if '#' in item.get('SK', '') else None)
-                        if conversation_id and item.get('PropertyId'):
-                            ok = update_conversation(item['PropertyId'], conversation_id, {'AISummary': summary_text})
-                            if ok:
-                                processed += 1
-                                results['processed'] += 1
-                            else:
-                                results['errors'] += 1
-                except Exception as e:
-                    logger.warning(f"Failed to summarize item {item.get('SK')}: {e}")
-                    results['errors'] += 1
+def _record_summary_failure(marker: dict, reason: str) -> str:
+    """
+    Count a failed summary attempt on a marker and schedule its retry.
 
-            if processed >= max_items:
-                break
+    After SUMMARY_MAX_ATTEMPTS failures the marker is moved to the dead-letter
+    partition, so it no longer takes a slot from newer conversations.
 
-            last_evaluated_key = response.get('LastEvaluatedKey')
-            if not last_evaluated_key:
-                break
+    Args:
+        marker: The SUMMARY_QUEUE marker item
+        reason: Why the attempt failed
 
-        logger.info(f"Missing summaries job complete: {results}")
-        return results
+    Returns:
+        'errors', or 'dead_lettered' when the marker was retired
+    """
+    conversations_table = get_conversations_table()
+    attempts = int(marker.get('Attempts', 0)) + 1
+    now = datetime.now(timezone.utc)
+    try:
+        if attempts >= SUMMARY_MAX_ATTEMPTS:
+            dead_letter = dict(marker)
+            dead_letter.update({
+                'PK': SUMMARY_DEAD_LETTER_PK,
+                'EntityType': 'SUMMARY_FAILED',
+                'Attempts': attempts,
+                'LastError': reason[:500],
+                'FailedAt': now.isoformat()
+            })
+            dead_letter.pop('NextAttemptAt', None)
+            conversations_table.put_item(Item=dead_letter)
+            conversations_table.delete_item(Key={'PK': marker['PK'], 'SK': marker['SK']})
+            logger.error(f"Giving up on summary for {marker.get('TargetSK')} after {attempts} attempts: {reason}")
+            return 'dead_lettered'
+
+        delay = min(SUMMARY_RETRY_BASE_MINUTES * 2 ** (attempts - 1), SUMMARY_RETRY_MAX_MINUTES)
+        # Conditional so a marker cleared meanwhile is not recreated
+        conversations_table.update_item(
+            Key={'PK': marker['PK'], 'SK': marker['SK']},
+            UpdateExpression='SET Attempts = :attempts, NextAttemptAt = :next, LastError = :error',
+            ConditionExpression=Attr('PK').exists(),
+            ExpressionAttributeValues={
+                ':attempts': attempts,
+                ':next': (now + timedelta(minutes=delay)).isoformat(),
+                ':error': reason[:500]
+            }
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            logger.warning(f"Could not record summary failure for {marker.get('SK')}: {e}")
     except Exception as e:
-        logger.error(f"Error in missing summaries job: {e}")
-        return results
+        logger.warning(f"Could not record summary failure for {marker.get('SK')}: {e}")
+    return 'errors'
 
-    if not ai_summary:
+
+def mark_summary_pending(pk: str, sk: str, property_id: str = None) -> bool:
+    """Record that the conversation/session item at (pk, sk) needs an AI summary."""
+    if not initialize_dynamodb():
         return False
 
     try:
         conversations_table = get_conversations_table()
         if not conversations_table:
-            logger.error("Conversations table not available for setting voice session summary")
             return False
 
-        pk = f"PROPERTY#{property_id}"
-        sk = f"VOICE_DIAGNOSTICS#{session_id}"
+        item = _summary_marker_key(pk, sk)
+        item.update({
+            'EntityType': 'SUMMARY_PENDING',
+            'TargetPK': pk,
+            'TargetSK': sk,
+            'QueuedAt': datetime.now(timezone.utc).isoformat()
+        })
+        if property_id:
+            item['PropertyId'] = property_id
+        # Overwrites any earlier marker, so new activity resets Attempts/NextAttemptAt
+        conversations_table.put_item(Item=item)
+        return True
+    except Exception as e:
+        logger.warning(f"Could not mark summary pending for {pk}/{sk}: {e}")
+        return False
+
+
+def clear_summary_pending(pk: str, sk: str) -> bool:
+    """Remove the pending-summary marker for the item at (pk, sk), if any."""
+    if not initialize_dynamodb():
+        return False
+
+    try:
+        conversations_table = get_conversations_table()
+        if not conversations_table:
+            return False
+        conversations_table.delete_item(Key=_summary_marker_key(pk, sk))
+        return True
+    except Exception as e:
+        logger.warning(f"Could not clear summary marker for {pk}/{sk}: {e}")
+        return False
+
+
+def enqueue_missing_summaries_backfill() -> int:
+    """One-off scan that queues existing conversations/sessions without AISummary.
+
+    Only needed once for items created before the pending queue existed. The scan
+    projects keys only, never message bodies.
+
+    Returns the number of markers written.
+    """
+    if not initialize_dynamodb():
+        return 0
+
+    conversations_table = get_conversations_table()
+    if not conversations_table:
+        return 0
+
+    queued = 0
+    scan_kwargs = {
+        'ProjectionExpression': 'PK, SK, PropertyId',
+        'FilterExpression': Attr('AISummary').not_exists() & (
+            Attr('EntityType').eq('CONVERSATION') | Attr('EntityType').eq('VOICE_CALL_DIAGNOSTICS')
+        )
+    }
+    queued_at = datetime.now(timezone.utc).isoformat()
+    try:
+        with conversations_table.batch_writer() as batch:
+            while True:
+                response = conversations_table.scan(**scan_kwargs)
+                for item in response.get('Items', []):
+                    marker = _summary_marker_key(item['PK'], item['SK'])
+                    marker.update({
+                        'EntityType': 'SUMMARY_PENDING',
+                        'TargetPK': item['PK'],
+                        'TargetSK': item['SK'],
+                        'QueuedAt': queued_at
+                    })
+                    if item.get('PropertyId'):
+                        marker['PropertyId'] = item['PropertyId']
+                    batch.put_item(Item=marker)
+                    queued += 1
+                last_evaluated_key = response.get('LastEvaluatedKey')
+                if not last_evaluated_key:
+                    break
+                scan_kwargs['ExclusiveStartKey'] = last_evaluated_key
+    except Exception as e:
+        logger.error(f"Error backfilling pending summary markers: {e}")
+
+    logger.info(f"Queued {queued} conversations/sessions for summary backfill")
+    return queued
+
+
+def _build_summary_messages(item: dict) -> list:
+    msgs = []
+    if item.get('EntityType') == 'VOICE_CALL_DIAGNOSTICS':
+        for t in item.get('Transcripts', []) or []:
+            msgs.append({'role': t.get('role', ''), 'text': t.get('text', '')})
+    else:
+        for m in item.get('Messages', []) or []:
+            msgs.append({'role': m.get('role', ''), 'text': m.get('text') or m.get('content', '')})
+    return [m for m in msgs if (m.get('text') or '').strip()]
+
+
+def _process_summary_marker(marker: dict, quiet_cutoff: str) -> str:
+    """Summarize the item a marker points to. Returns processed/skipped/deferred/errors/dead_lettered."""
+    pk = marker.get('TargetPK')
+    sk = marker.get('TargetSK')
+    if not pk or not sk:
+        get_conversations_table().delete_item(Key={'PK': marker['PK'], 'SK': marker['SK']})
+        return 'skipped'
+
+    try:
+        conversations_table = get_conversations_table()
+        response = conversations_table.get_item(
+            Key={'PK': pk, 'SK': sk},
+            ProjectionExpression='PK, SK, EntityType, PropertyId, GuestName, Messages, Transcripts, AISummary, LastUpdateTime'
+        )
+        item = response.get('Item')
+        if not item or item.get('AISummary'):
+            clear_summary_pending(pk, sk)
+            return 'skipped'
+
+        # Leave text chats that are still active for a later run
+        if item.get('EntityType') != 'VOICE_CALL_DIAGNOSTICS' and (item.get('LastUpdateTime') or '') > quiet_cutoff:
+            return 'deferred'
+
+        messages = _build_summary_messages(item)
+        if not messages:
+            clear_summary_pending(pk, sk)
+            return 'skipped'
+
+        # Best-effort property context for better summaries
+        property_context = None
+        try:
+            from concierge.utils.firestore_client import get_property as fs_get_property
+            if item.get('PropertyId'):
+                property_context = fs_get_property(item['PropertyId'])
+        except Exception:
+            pass
+
+        # Gemini calls are rate limited at batch priority inside generate_conversation_summary
+        from concierge.utils.ai_helpers import generate_conversation_summary as gen_sum
+        summary_text = gen_sum(messages=messages, property_context=property_context, guest_name=item.get('GuestName'))
+        if not summary_text:
+            return _record_summary_failure(marker, 'empty summary')
 
         conversations_table.update_item(
             Key={'PK': pk, 'SK': sk},
             UpdateExpression='SET AISummary = :summary, LastUpdateTime = :ts',
             ExpressionAttributeValues={
-                ':summary': ai_summary,
+                ':summary': summary_text,
                 ':ts': datetime.now(timezone.utc).isoformat()
             }
         )
-        logger.info(f"Stored AI summary for voice session {session_id} (property {property_id})")
-        return True
+        clear_summary_pending(pk, sk)
+        return 'processed'
     except Exception as e:
-        logger.error(f"Error setting voice session summary {session_id}: {e}")
-        return False
\ No newline at end of file
+        logger.warning(f"Failed to summarize item {sk}: {e}")
+        return _record_summary_failure(marker, str(e))
+
+
+def run_missing_conversation_summaries_job(max_items: int = 50) -> dict:
+    """Generate AISummary for conversations/sessions queued in the pending-summary queue.
+
+    Reads only SUMMARY_QUEUE markers (no table scan) and summarizes up to
+    `max_items` of them concurrently; the Gemini rate limiter bounds the call rate.
+    Markers waiting out a retry backoff (NextAttemptAt in the future) are counted
+    as deferred and do not take a slot.
+
+    Returns a dict with counts: {"processed": int, "skipped": int, "deferred": int, "errors": int,
+    "dead_lettered": int}
+    """
+    results = {"processed": 0, "skipped": 0, "deferred": 0, "errors": 0, "dead_lettered": 0}
+    if not initialize_dynamodb():
+        logger.error("Failed to initialize DynamoDB for missing summaries job")
+        return results
+
+    try:
+        conversations_table = get_conversations_table()
+        if not conversations_table:
+            logger.error("Conversations table not available for missing summaries job")
+            return results
+
+        # Oldest markers first (SK order is arbitrary, so sort by QueuedAt after reading)
+        markers = []
+        query_kwargs = {'KeyConditionExpression': Key('PK').eq(SUMMARY_QUEUE_PK)}
+        while True:
+            response = conversations_table.query(**query_kwargs)
+            markers.extend(response.get('Items', []))
+            last_evaluated_key = response.get('LastEvaluatedKey')
+            if not last_evaluated_key:
+                break
+            query_kwargs['ExclusiveStartKey'] = last_evaluated_key
+
+        if not markers:
+            logger.info("Missing summaries job: no pending conversations")
+            return results
+
+        now = datetime.now(timezone.utc)
+        due = [m for m in markers if (m.get('NextAttemptAt') or '') <= now.isoformat()]
+        results['deferred'] += len(markers) - len(due)
+
+        due.sort(key=lambda m: m.get('QueuedAt', ''))
+        markers = due[:max_items]
+        quiet_cutoff = (now - timedelta(minutes=SUMMARY_QUIET_MINUTES)).isoformat()
+
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=max(1, SUMMARY_JOB_CONCURRENCY)) as executor:
+            for outcome in executor.map(lambda m: _process_summary_marker(m, quiet_cutoff), markers):
+                results[outcome] += 1
+
+        logger.info(f"Missing summaries job complete: {results}")
+        return results
+    except Exception as e:
+        logger.error(f"Error in missing summaries job: {e}")
+        return results
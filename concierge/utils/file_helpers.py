@@ -1,5 +1,9 @@
 """File handling utilities for the concierge application."""
 
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
 # File Upload Configuration
 ALLOWED_EXTENSIONS = {'txt', 'pdf', 'docx', 'xlsx'}
 
@@ -16,6 +20,98 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS 
 
 # --- Text Extraction Helpers ---
+# Large PDFs and workbooks are extracted by several workers at once. Each worker
+# opens its own reader (pypdf and openpyxl objects are not thread-safe) and
+# collects text into a list that is joined once at the end.
+EXTRACTION_WORKERS = int(os.getenv('EXTRACTION_WORKERS', '4'))
+# Pages per PDF extraction task; smaller PDFs are read by a single worker
+PDF_PAGES_PER_TASK = int(os.getenv('PDF_PAGES_PER_TASK', '8'))
+
+MIME_TYPE_TXT = 'text/plain'
+MIME_TYPE_PDF = 'application/pdf'
+MIME_TYPE_DOCX = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+MIME_TYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _map_in_parallel(func, tasks):
+    """Run func over tasks with the extraction workers, preserving task order."""
+    if len(tasks) <= 1 or EXTRACTION_WORKERS <= 1:
+        return [func(task) for task in tasks]
+    with ThreadPoolExecutor(max_workers=min(EXTRACTION_WORKERS, len(tasks))) as executor:
+        return list(executor.map(func, tasks))
+
+
+def _read_pdf_pages(file_path):
+    import pypdf
+    reader = pypdf.PdfReader(file_path)
+    page_count = len(reader.pages)
+    if page_count <= PDF_PAGES_PER_TASK:
+        return [page.extract_text() or "" for page in reader.pages]
+
+    def extract_range(page_range):
+        worker_reader = pypdf.PdfReader(file_path)
+        return [worker_reader.pages[i].extract_text() or "" for i in page_range]
+
+    ranges = [range(i, min(i + PDF_PAGES_PER_TASK, page_count)) for i in range(0, page_count, PDF_PAGES_PER_TASK)]
+    return [text for texts in _map_in_parallel(extract_range, ranges) for text in texts]
+
+
+def _read_docx_paragraphs(file_path):
+    import docx
+    doc = docx.Document(file_path)
+    return [para.text for para in doc.paragraphs]
+
+
+def _read_xlsx_sheets(file_path):
+    import openpyxl
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    sheet_names = list(wb.sheetnames)
+    wb.close()
+
+    def extract_sheet(sheet_name):
+        worker_wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            lines = [f"Sheet: {sheet_name}"]
+            for row in worker_wb[sheet_name].iter_rows(values_only=True):
+                values = [str(value) for value in row if value is not None]
+                if values:
+                    lines.append("\t".join(values))
+            return "\n".join(lines)
+        finally:
+            worker_wb.close()
+
+    return _map_in_parallel(extract_sheet, sheet_names)
+
+
+def extract_document_text(file_path, mime_type):
+    """Extract the text of an uploaded knowledge document.
+
+    PDF pages and workbook sheets are extracted in parallel. Pages and sheets
+    are separated by blank lines, which split_text_into_chunks uses as
+    boundaries.
+
+    Args:
+        file_path: Path to the document
+        mime_type: Detected MIME type of the document
+
+    Returns:
+        str: Extracted text content, or None if the MIME type is not supported
+
+    Raises:
+        Exception: If the document cannot be read
+    """
+    if mime_type == MIME_TYPE_TXT:
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            return f.read()
+    if mime_type == MIME_TYPE_PDF:
+        return "\n\n".join(_read_pdf_pages(file_path))
+    if mime_type == MIME_TYPE_DOCX:
+        return "\n".join(_read_docx_paragraphs(file_path))
+    if mime_type == MIME_TYPE_XLSX:
+        return "\n\n".join(_read_xlsx_sheets(file_path))
+    return None
+
+
 def extract_text_from_pdf(file_path):
     """Extract text content from a PDF file.
     
@@ -25,15 +121,11 @@ def extract_text_from_pdf(file_path):
     Returns:
         str: Extracted text content
     """
-    text = ""
     try:
-        import pypdf
-        reader = pypdf.PdfReader(file_path)
-        for page in reader.pages:
-            text += page.extract_text() or ""
+        return extract_document_text(file_path, MIME_TYPE_PDF)
     except Exception as e:
         print(f"Error extracting text from PDF {file_path}: {e}")
-    return text
+    return ""
 
 def extract_text_from_docx(file_path):
     """Extract text content from a DOCX file.
@@ -44,15 +136,11 @@ def extract_text_from_docx(file_path):
     Returns:
         str: Extracted text content
     """
-    text = ""
     try:
-        import docx
-        doc = docx.Document(file_path)
-        for para in doc.paragraphs:
-            text += para.text + "\n"
+        return extract_document_text(file_path, MIME_TYPE_DOCX)
     except Exception as e:
         print(f"Error extracting text from DOCX {file_path}: {e}")
-    return text
+    return ""
 
 def extract_text_from_xlsx(file_path):
     """Extract text content from an XLSX file.
@@ -63,24 +151,11 @@ def extract_text_from_xlsx(file_path):
     Returns:
         str: Extracted text content
     """
-    text = ""
     try:
-        import openpyxl
-        # Load the workbook
-        wb = openpyxl.load_workbook(file_path, data_only=True)
-        # Process each sheet
-        for sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-            # Process each row
-            for row in ws.iter_rows():
-                # Process each cell in the row
-                for cell in row:
-                    if cell.value is not None:
-                        text += str(cell.value) + "\n"
-            text += "\n\n"  # Separate sheets
+        return extract_document_text(file_path, MIME_TYPE_XLSX)
     except Exception as e:
         print(f"Error extracting text from XLSX {file_path}: {e}")
-    return text
+    return ""
 
 def extract_text_from_txt(file_path):
     """Extract text content from a plain text file.
@@ -97,4 +172,72 @@ def extract_text_from_txt(file_path):
             text = f.read()
     except Exception as e:
         print(f"Error reading text file {file_path}: {e}")
-    return text 
\ No newline at end of file
+    return text
+
+
+# --- Chunking ---
+# Documents longer than this are split before knowledge generation, so each
+# Gemini call gets a focused prompt and its JSON answer stays well below the
+# output token limit
+KNOWLEDGE_CHUNK_CHARS = int(os.getenv('KNOWLEDGE_CHUNK_CHARS', '12000'))
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def _split_oversized(block, max_chars):
+    """Split a block without blank lines at line, then sentence, then hard boundaries."""
+    pieces = []
+    for line in block.split("\n"):
+        if len(line) <= max_chars:
+            pieces.append(line)
+            continue
+        for sentence in _SENTENCE_END.split(line):
+            while len(sentence) > max_chars:
+                pieces.append(sentence[:max_chars])
+                sentence = sentence[max_chars:]
+            pieces.append(sentence)
+    return pieces
+
+
+def split_text_into_chunks(text, max_chars=KNOWLEDGE_CHUNK_CHARS):
+    """Split text into chunks of at most max_chars along semantic boundaries.
+
+    Chunks are built from whole paragraphs (blocks separated by blank lines,
+    which includes PDF pages and workbook sheets). A paragraph that is longer
+    than max_chars on its own is split at line breaks, then sentence ends.
+
+    Args:
+        text: Text to split
+        max_chars: Maximum chunk length in characters
+
+    Returns:
+        list: Non-empty text chunks in document order
+    """
+    text = (text or "").strip()
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    chunks = []
+    current = []
+    current_len = 0
+
+    def close_chunk():
+        nonlocal current, current_len
+        if current:
+            chunks.append("\n\n".join(current).strip())
+        current, current_len = [], 0
+
+    for block in re.split(r'\n\s*\n', text):
+        block = block.strip()
+        if not block:
+            continue
+        parts = [block] if len(block) <= max_chars else _split_oversized(block, max_chars)
+        for part in parts:
+            if not part.strip():
+                continue
+            if current and current_len + len(part) + 2 > max_chars:
+                close_chunk()
+            current.append(part)
+            current_len += len(part) + 2
+    close_chunk()
+    return [chunk for chunk in chunks if chunk]
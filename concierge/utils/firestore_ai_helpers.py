@@ -25,6 +25,8 @@ except ImportError:
     genai = None
     logging.warning("google.generativeai module not imported - AI functions will fail!")
 
+from concierge.utils.gemini_clients import get_legacy_model
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -280,7 +282,7 @@ def process_query_with_rag(user_query: str, property_id: str, property_context:
             ]
 
             # Initialize Gemini model (without tools to avoid API issues)
-            model = genai.GenerativeModel(
+            model = get_legacy_model(
                 model_name="gemini-2.5-flash-lite",
                 generation_config=generation_config,
                 safety_settings=safety_settings
@@ -470,7 +472,7 @@ def process_query_with_tools(user_query: str, property_id: str, property_context
             logger.info("[FIRESTORE AI] Places API enabled - including search_nearby_places tool")
         
         def make_function_call():
-            return genai.GenerativeModel(
+            return get_legacy_model(
                 model_name="gemini-2.5-flash",
                 generation_config=generation_config,
                 safety_settings=safety_settings
@@ -510,7 +512,7 @@ def process_query_with_tools(user_query: str, property_id: str, property_context
                                 follow_up_prompt = f"{prompt}\n\n{time_info}\n\nPlease provide your response using this current time information."
                                 
                                 # Generate final response with time context
-                                response = genai.GenerativeModel(
+                                response = get_legacy_model(
                                     model_name="gemini-2.5-flash",
                                     generation_config=generation_config,
                                     safety_settings=safety_settings
@@ -541,7 +543,7 @@ def process_query_with_tools(user_query: str, property_id: str, property_context
                                 if not property_location:
                                     logger.warning("[FIRESTORE AI] No property location available for Places API search")
                                     follow_up_prompt = f"{prompt}\n\nI couldn't determine the property location to search nearby places. Please provide a response without location search."
-                                    response = genai.GenerativeModel(
+                                    response = get_legacy_model(
                                         model_name="gemini-2.5-flash",
                                         generation_config=generation_config,
                                         safety_settings=safety_settings
@@ -580,7 +582,7 @@ def process_query_with_tools(user_query: str, property_id: str, property_context
                                     follow_up_prompt = f"{prompt}\n\nPlaces search returned no results: {error_msg}. Please provide an alternative response or suggestion."
                                 
                                 # Generate final response with places context
-                                response = genai.GenerativeModel(
+                                response = get_legacy_model(
                                     model_name="gemini-2.5-flash",
                                     generation_config=generation_config,
                                     safety_settings=safety_settings
@@ -592,7 +594,7 @@ def process_query_with_tools(user_query: str, property_id: str, property_context
             logger.info("[FIRESTORE AI] No function call made, trying Google Search fallback")
             
             def make_search_call():
-                return genai.GenerativeModel(
+                return get_legacy_model(
                     model_name="gemini-2.5-flash",
                     generation_config=generation_config,
                     safety_settings=safety_settings
@@ -11,6 +11,9 @@ import traceback
 from typing import Dict, List, Any, Optional, Union
 from datetime import datetime, timezone
 
+from concierge.utils.request_cache import invalidates
+from concierge.utils.knowledge_dedup import drop_index
+
 # Import Firebase Admin SDK
 try:
     import firebase_admin
@@ -78,6 +81,7 @@ def get_firestore_db():
         logging.error(f"Error getting Firestore client: {e}")
         return None
 
+@invalidates('knowledge_items')
 def upsert_batch_to_firestore(items: List[Dict[str, Any]], embeddings: List[List[float]]) -> Dict:
     """
     Upsert a batch of knowledge items into Firestore.
@@ -224,6 +228,13 @@ def upsert_batch_to_firestore(items: List[Dict[str, Any]], embeddings: List[List
             # Count all items in the failed batch as failed
             failed_items.extend([items[j].get('id', items[j].get('qna_id', f"item_{j}")) for j in range(len(items)-batch_size, len(items))])
     
+    # Knowledge changed, so the affected properties' prompt bundles must be rebuilt
+    if success_count:
+        from concierge.utils.firestore_client import mark_context_bundle_stale
+        for property_id in {item.get('property_id') or item.get('propertyId') for item in items}:
+            mark_context_bundle_stale(property_id)
+            drop_index(property_id)
+
     # Return statistics
     return {
         "success": success_count,
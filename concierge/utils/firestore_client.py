@@ -7,8 +7,9 @@ knowledge sources, knowledge items, reservations, and magic links.
 import os
 import logging
 import uuid
+import time
 from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Tuple, Union
 import traceback
 import warnings
 import hashlib
@@ -48,6 +49,12 @@ except ImportError:
     legacy_genai = None
     logging.warning("google.genai module not imported - embedding generation will fail!")
 
+from concierge.utils.gemini_clients import get_genai_client
+from concierge.utils.request_cache import (
+    cached_document, cached_list, invalidates, invalidate, get_many_cached
+)
+from concierge.utils import knowledge_dedup, magic_link_cache
+
 # Set up logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -258,8 +265,8 @@ def generate_embedding(text, task_type="RETRIEVAL_QUERY"):
                 logger.error("Failed to configure Gemini")
                 return None
 
-        # Create client with the new SDK
-        client = genai.Client(api_key=os.environ.get('GEMINI_API_KEY'))
+        # Shared client (keeps the HTTP connection alive across calls)
+        client = get_genai_client(os.environ.get('GEMINI_API_KEY'))
 
         # Generate embedding using the new SDK syntax
         result = client.models.embed_content(
@@ -287,8 +294,127 @@ def generate_embedding(text, task_type="RETRIEVAL_QUERY"):
         traceback.print_exc()
         return None
 
+# === Bulk Write Helpers ===
+
+# Firestore limits a WriteBatch to 500 operations
+FIRESTORE_BATCH_LIMIT = 500
+FIRESTORE_BULK_MAX_RETRIES = 3
+
+def bulk_write(operations, max_retries: int = FIRESTORE_BULK_MAX_RETRIES) -> int:
+    """
+    Apply many document writes with as few RPCs as possible.
+
+    Uses Firestore's BulkWriter (batched, parallel, with retries on transient
+    errors) when the client supports it, otherwise 500-operation WriteBatches
+    that are retried with backoff.
+
+    Args:
+        operations: Iterable of (op, document_reference, data) tuples, where op is
+            'update', 'set' (merge) or 'delete' (data is ignored for deletes)
+        max_retries: Attempts per failed write (BulkWriter) or per batch commit
+
+    Returns:
+        Number of writes that succeeded
+    """
+    if not initialize_firebase():
+        return 0
+
+    operations = list(operations)
+    if not operations:
+        return 0
+    # Drop request-cached reads of every collection being written
+    invalidate(*{ref.parent.id for _, ref, _ in operations})
+
+    if hasattr(db, 'bulk_writer'):
+        failures = []
+
+        def _on_write_error(failure, *args) -> bool:
+            if failure.attempts < max_retries:
+                return True
+            failures.append(failure)
+            logger.error(f"Bulk write failed after {failure.attempts} attempts: {failure.message}")
+            return False
+
+        writer = db.bulk_writer()
+        writer.on_write_error(_on_write_error)
+        for op, ref, data in operations:
+            if op == 'delete':
+                writer.delete(ref)
+            elif op == 'update':
+                writer.update(ref, data)
+            else:
+                writer.set(ref, data, merge=True)
+        # close() flushes pending writes and waits for them to finish
+        writer.close()
+        return len(operations) - len(failures)
+
+    written = 0
+    for start in range(0, len(operations), FIRESTORE_BATCH_LIMIT):
+        chunk = operations[start:start + FIRESTORE_BATCH_LIMIT]
+        for attempt in range(max_retries):
+            batch = db.batch()
+            for op, ref, data in chunk:
+                if op == 'delete':
+                    batch.delete(ref)
+                elif op == 'update':
+                    batch.update(ref, data)
+                else:
+                    batch.set(ref, data, merge=True)
+            try:
+                batch.commit()
+                written += len(chunk)
+                break
+            except Exception as e:
+                if attempt + 1 >= max_retries:
+                    logger.error(f"Batch of {len(chunk)} writes failed after {max_retries} attempts: {e}")
+                else:
+                    time.sleep(2 ** attempt)
+    return written
+
+def count_query(query) -> int:
+    """Count documents matching a query with a server-side count() aggregation."""
+    try:
+        result = query.count(alias='count').get()
+        return int(result[0][0].value)
+    except AttributeError:
+        # Older clients without aggregation support: stream document names only
+        return sum(1 for _ in query.select([]).stream())
+
+def _get_documents(collection: str, doc_ids: List[str], id_field: str = 'id') -> Dict[str, Optional[Dict]]:
+    """
+    Read several documents of one collection with batched get_all calls.
+
+    Documents already read during the current request are served from the
+    request identity map; the rest are fetched in chunks of FIRESTORE_BATCH_LIMIT.
+
+    Returns:
+        Dictionary mapping each ID to its document data, or None if it does not exist
+    """
+    if not initialize_firebase():
+        return {}
+
+    def fetch_many(ids: List[str]) -> Dict[str, Optional[Dict]]:
+        found: Dict[str, Optional[Dict]] = {}
+        collection_ref = db.collection(collection)
+        for start in range(0, len(ids), FIRESTORE_BATCH_LIMIT):
+            refs = [collection_ref.document(doc_id) for doc_id in ids[start:start + FIRESTORE_BATCH_LIMIT]]
+            for doc in db.get_all(refs):
+                if doc.exists:
+                    data = doc.to_dict()
+                    data[id_field] = doc.id
+                    found[doc.id] = data
+        return found
+
+    try:
+        return get_many_cached(collection, doc_ids, fetch_many)
+    except Exception as e:
+        logger.error(f"Error batch-reading {len(doc_ids)} documents from {collection}: {e}")
+        return {}
+
+
 # === User Functions ===
 
+@cached_document('users')
 def get_user(user_id: str) -> Optional[Dict]:
     """Get a user by ID."""
     if not initialize_firebase():
@@ -309,6 +435,11 @@ def get_user(user_id: str) -> Optional[Dict]:
         logger.error(f"Error getting user {user_id}: {e}")
         return None
 
+def get_users(user_ids: List[str]) -> Dict[str, Optional[Dict]]:
+    """Get several users by ID with one batched read; missing users map to None."""
+    return _get_documents('users', list(user_ids), id_field='uid')
+
+@invalidates('users')
 def create_user(user_id: str, user_data: Dict) -> bool:
     """Create a new user with the given ID."""
     if not initialize_firebase():
@@ -328,6 +459,7 @@ def create_user(user_id: str, user_data: Dict) -> bool:
         logger.error(f"Error creating user {user_id}: {e}")
         return False
 
+@invalidates('users')
 def update_user(user_id: str, user_data: Dict) -> bool:
     """
     Update an existing user in Firestore.
@@ -682,6 +814,7 @@ def enhanced_user_detection(reservation_phone: str, entered_pin: str, magic_link
             'message': 'Detection failed'
         }
 
+@invalidates('users')
 def attach_reservation_to_permanent_user(user_id: str, reservation_id: str, token: str = None) -> bool:
     """
     Attach a reservation to a permanent user's account.
@@ -735,6 +868,7 @@ def attach_reservation_to_permanent_user(user_id: str, reservation_id: str, toke
         logger.error(f"Error attaching reservation {reservation_id} to user {user_id}: {e}")
         return False
 
+@invalidates('users')
 def create_permanent_user_from_magic_link(firebase_uid: str, user_data: Dict) -> Optional[str]:
     """
     Create a new permanent user account from magic link signup.
@@ -816,6 +950,7 @@ def create_permanent_user_from_magic_link(firebase_uid: str, user_data: Dict) ->
         logger.error(f"Error creating/updating permanent user from magic link: {e}")
         return None
 
+@invalidates('users')
 def create_permanent_user_from_temp(firebase_uid: str, firebase_phone: str, guest_name: str, temp_user_id: str, token: str, email: str = '') -> Optional[str]:
     """
     Create a permanent user account from temporary user upgrade.
@@ -928,6 +1063,7 @@ def create_permanent_user_from_temp(firebase_uid: str, firebase_phone: str, gues
         logger.error(f"Error creating permanent user from temp: {e}")
         return None
 
+@invalidates('users')
 def disable_temp_user_access(temp_user_id: str) -> bool:
     """
     Disable access to a temporary user account after migration.
@@ -1023,7 +1159,7 @@ def find_reservations_by_phone(phone_number: str) -> List[Dict]:
         logger.info(f"Last 4 digits for partial matching: {last_four_digits}")
 
         # Debug: Count total reservations
-        total_reservations = len(list(db.collection('reservations').stream()))
+        total_reservations = count_query(db.collection('reservations'))
         logger.info(f"Total reservations in database: {total_reservations}")
 
         # Dictionary to store found reservations (keyed by ID to avoid duplicates)
@@ -1113,6 +1249,28 @@ def find_reservations_by_phone(phone_number: str) -> List[Dict]:
 
 # === Property Functions ===
 
+def mark_context_bundle_stale(property_id: str) -> None:
+    """
+    Mark a property's precomputed context bundle as stale so the next reader rebuilds it.
+
+    Call after any write that changes what the assistant is told about a
+    property: the property itself or any of its knowledge items. Also drops the
+    property's FAQ index (utils/intent_fast_path.py).
+    """
+    if not property_id or not initialize_firebase():
+        return
+
+    try:
+        from concierge.utils.context_bundle import CONTEXT_BUNDLE_COLLECTION, forget_local_bundle
+        from concierge.utils.intent_fast_path import drop_index as drop_faq_index
+        forget_local_bundle(property_id)
+        drop_faq_index(property_id)
+        db.collection(CONTEXT_BUNDLE_COLLECTION).document(property_id).set(
+            {'staleAt': datetime.now(timezone.utc)}, merge=True)
+    except Exception as e:
+        logger.warning(f"Error marking context bundle stale for property {property_id}: {e}")
+
+@cached_document('properties')
 def get_property(property_id: str) -> Optional[Dict]:
     """Get a property by ID."""
     if not initialize_firebase():
@@ -1133,6 +1291,11 @@ def get_property(property_id: str) -> Optional[Dict]:
         logger.error(f"Error getting property {property_id}: {e}")
         return None
 
+def get_properties(property_ids: List[str]) -> Dict[str, Optional[Dict]]:
+    """Get several properties by ID with one batched read; missing properties map to None."""
+    return _get_documents('properties', list(property_ids))
+
+@invalidates('properties')
 def create_property(property_id: str, property_data: Dict) -> bool:
     """Create a new property with the given ID."""
     if not initialize_firebase():
@@ -1155,6 +1318,7 @@ def create_property(property_id: str, property_data: Dict) -> bool:
         logger.error(f"Error creating property {property_id}: {e}")
         return False
 
+@invalidates('properties')
 def update_property(property_id: str, property_data: Dict) -> bool:
     """Update an existing property."""
     if not initialize_firebase():
@@ -1169,12 +1333,16 @@ def update_property(property_id: str, property_data: Dict) -> bool:
 
         # Update the document
         db.collection('properties').document(property_id).update(property_data)
+        mark_context_bundle_stale(property_id)
+        # Status or token changes must reach magic link resolution right away
+        magic_link_cache.forget_property(property_id)
         logger.info(f"Property {property_id} updated successfully")
         return True
     except Exception as e:
         logger.error(f"Error updating property {property_id}: {e}")
         return False
 
+@cached_list('properties')
 def list_properties_by_host(host_id: str) -> List[Dict]:
     """List all properties for a specific host."""
     if not initialize_firebase():
@@ -1194,6 +1362,7 @@ def list_properties_by_host(host_id: str) -> List[Dict]:
         logger.error(f"Error listing properties for host {host_id}: {e}")
         return []
 
+@invalidates('properties', 'reservations', 'knowledge_items', 'knowledge_sources')
 def delete_property(property_id: str) -> bool:
     """Delete a property by ID and all related data."""
     if not initialize_firebase():
@@ -1223,8 +1392,15 @@ def delete_property(property_id: str) -> bool:
         except Exception as e:
             logger.warning(f"Failed to delete DynamoDB conversations for property {property_id}: {e}")
 
-        # Delete the property document
+        # Delete the property document and its precomputed context bundle
         db.collection('properties').document(property_id).delete()
+        magic_link_cache.forget_property(property_id)
+        try:
+            from concierge.utils.context_bundle import CONTEXT_BUNDLE_COLLECTION, forget_local_bundle
+            forget_local_bundle(property_id)
+            db.collection(CONTEXT_BUNDLE_COLLECTION).document(property_id).delete()
+        except Exception as e:
+            logger.warning(f"Failed to delete context bundle for property {property_id}: {e}")
         logger.info(f"Property {property_id} and related data deleted successfully")
         return True
     except Exception as e:
@@ -1233,6 +1409,7 @@ def delete_property(property_id: str) -> bool:
 
 # === Knowledge Source Functions ===
 
+@invalidates('knowledge_sources')
 def create_knowledge_source(source_id: str, source_data: Dict) -> bool:
     """
     Create a new knowledge source with the given ID.
@@ -1263,6 +1440,7 @@ def create_knowledge_source(source_id: str, source_data: Dict) -> bool:
         logger.error(f"Error creating knowledge source: {e}")
         return False
 
+@cached_list('knowledge_sources')
 def list_knowledge_sources(property_id: str = None) -> List[Dict]:
     """List all knowledge sources, optionally filtered by property ID."""
     if not initialize_firebase():
@@ -1285,6 +1463,7 @@ def list_knowledge_sources(property_id: str = None) -> List[Dict]:
         logger.error(f"Error listing knowledge sources: {e}")
         return []
 
+@invalidates('knowledge_sources')
 def update_knowledge_source(source_id: str, source_data: Dict) -> bool:
     """
     Update an existing knowledge source.
@@ -1314,6 +1493,48 @@ def update_knowledge_source(source_id: str, source_data: Dict) -> bool:
 
 # === Knowledge Item Functions ===
 
+# Fields returned by knowledge item listings unless embeddings are requested.
+# Firestore projections name the fields to keep, so this lists every field the
+# app reads from listed items; the embedding vector is only needed by vector
+# search and the embedding status/regeneration endpoints.
+KNOWLEDGE_ITEM_LIST_FIELDS = [
+    'propertyId', 'sourceId', 'hostId', 'type', 'tags', 'content', 'status',
+    'title', 'question', 'answer', 'category', 'source', 'metadata',
+    'createdAt', 'updatedAt', 'contentUpdatedAt', 'embeddingUpdatedAt',
+    # Set on imported items that nearly duplicate an existing one
+    'possibleDuplicateOf',
+    # Written by the setup wizard and read by the dashboards' date sorting
+    'created_at', 'updated_at',
+]
+KNOWLEDGE_ITEMS_PAGE_SIZE = 100
+
+
+def _lists_partial_knowledge_items(*args, include_embeddings: bool = False, **kwargs) -> bool:
+    """Whether a knowledge item listing returns projected (embedding-less) documents."""
+    return not include_embeddings
+
+
+def _stream_knowledge_items(query, include_embeddings: bool = False, limit: Optional[int] = None,
+                            start_after: Optional[str] = None) -> List[Dict]:
+    """Run a knowledge item query with the listing projection and optional document-ID paging."""
+    if not include_embeddings:
+        query = query.select(KNOWLEDGE_ITEM_LIST_FIELDS)
+    if limit or start_after:
+        document_id = gc_firestore.FieldPath.document_id()
+        query = query.order_by(document_id)
+        if start_after:
+            query = query.start_after({document_id: start_after})
+        if limit:
+            query = query.limit(limit)
+
+    items = []
+    for doc in query.stream():
+        item_data = doc.to_dict()
+        item_data['id'] = doc.id
+        items.append(item_data)
+    return items
+
+@invalidates('knowledge_items')
 def create_knowledge_item(item_id: str, item_data: Dict) -> bool:
     """
     Create a new knowledge item with the new schema.
@@ -1357,6 +1578,8 @@ def create_knowledge_item(item_id: str, item_data: Dict) -> bool:
 
         # Set the document
         db.collection('knowledge_items').document(item_id).set(item_data)
+        mark_context_bundle_stale(item_data.get('propertyId'))
+        knowledge_dedup.record_item(item_data.get('propertyId'), item_id, item_data.get('content', ''))
         logger.info(f"Knowledge item {item_id} created successfully")
         return True
     except Exception as e:
@@ -1364,6 +1587,15 @@ def create_knowledge_item(item_id: str, item_data: Dict) -> bool:
         traceback.print_exc()
         return False
 
+def _mark_knowledge_item_bundle_stale(item_id: str, property_id: Optional[str] = None) -> Optional[str]:
+    """Mark the context bundle of the property a knowledge item belongs to as stale; returns the property ID."""
+    if not property_id:
+        item = get_knowledge_item(item_id)
+        property_id = item.get('propertyId') if item else None
+    mark_context_bundle_stale(property_id)
+    return property_id
+
+@invalidates('knowledge_items')
 def update_knowledge_item(item_id: str, item_data: Dict) -> bool:
     """
     Update an existing knowledge item.
@@ -1394,12 +1626,16 @@ def update_knowledge_item(item_id: str, item_data: Dict) -> bool:
 
         # Update the document
         db.collection('knowledge_items').document(item_id).update(item_data)
+        property_id = _mark_knowledge_item_bundle_stale(item_id, item_data.get('propertyId'))
+        if item_data.get('content'):
+            knowledge_dedup.record_item(property_id, item_id, item_data['content'])
         logger.info(f"Knowledge item {item_id} updated successfully")
         return True
     except Exception as e:
         logger.error(f"Error updating knowledge item {item_id}: {e}")
         return False
 
+@cached_document('knowledge_items')
 def get_knowledge_item(item_id: str) -> Optional[Dict]:
     """
     Get a knowledge item by ID.
@@ -1428,13 +1664,22 @@ def get_knowledge_item(item_id: str) -> Optional[Dict]:
         logger.error(f"Error getting knowledge item {item_id}: {e}")
         return None
 
-def list_knowledge_items_by_property(property_id: str, status: str = None) -> List[Dict]:
+def get_knowledge_items(item_ids: List[str]) -> Dict[str, Optional[Dict]]:
+    """Get several knowledge items by ID with one batched read; missing items map to None."""
+    return _get_documents('knowledge_items', list(item_ids))
+
+@cached_list('knowledge_items', partial=_lists_partial_knowledge_items)
+def list_knowledge_items_by_property(property_id: str, status: str = None, *, include_embeddings: bool = False,
+                                     limit: Optional[int] = None, start_after: Optional[str] = None) -> List[Dict]:
     """
     List all knowledge items for a specific property, optionally filtered by status.
 
     Args:
         property_id: ID of the property
         status: (optional) Status to filter by (e.g., 'approved')
+        include_embeddings: Also return the embedding vectors (otherwise only KNOWLEDGE_ITEM_LIST_FIELDS)
+        limit: (optional) Maximum number of items, in document ID order
+        start_after: (optional) Return items after this item ID (a page cursor)
 
     Returns:
         List of knowledge items
@@ -1450,56 +1695,104 @@ def list_knowledge_items_by_property(property_id: str, status: str = None) -> Li
         if status:
             query = query.where('status', '==', status)
 
-        items = []
-        for doc in query.stream():
-            item_data = doc.to_dict()
-            item_data['id'] = doc.id
-            items.append(item_data)
-
-        return items
+        return _stream_knowledge_items(query, include_embeddings, limit, start_after)
     except Exception as e:
         logger.error(f"Error listing knowledge items for property {property_id}: {e}")
         return []
 
-def check_duplicate_content(property_id: str, content: str) -> Optional[Dict]:
+def list_knowledge_items_page(property_id: str, status: str = None, page_size: int = KNOWLEDGE_ITEMS_PAGE_SIZE,
+                              cursor: Optional[str] = None, include_embeddings: bool = False) -> Dict[str, Any]:
+    """
+    List one page of a property's knowledge items.
+
+    Args:
+        property_id: ID of the property
+        status: (optional) Status to filter by (e.g., 'approved')
+        page_size: Maximum number of items in the page
+        cursor: (optional) next_cursor of the previous page
+        include_embeddings: Also return the embedding vectors
+
+    Returns:
+        Dictionary with 'items' and 'next_cursor' (None on the last page)
+    """
+    # One extra item tells whether another page exists without a second query
+    items = list_knowledge_items_by_property(property_id, status, include_embeddings=include_embeddings,
+                                             limit=page_size + 1, start_after=cursor)
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = items[-1]['id']
+    return {'items': items, 'next_cursor': next_cursor}
+
+def find_duplicate_content(property_id: str, content: str) -> Optional[Tuple[Dict, str]]:
     """
-    Check if a knowledge item with identical content already exists for this property.
+    Find a knowledge item of this property with the same or nearly the same content.
+
+    Uses the property's dedup index (see knowledge_dedup), so each check is a
+    constant-time lookup instead of a scan of all the property's items.
+
+    Only exact duplicates are safe to skip. A changed fact ("10 AM" vs "11 AM",
+    a new WiFi password, "not allowed") is a near duplicate of the old one, so
+    callers create near matches anyway and flag them with possibleDuplicateOf
+    for the host to review.
 
     Args:
         property_id: ID of the property
         content: Content to check for duplicates
 
     Returns:
-        The duplicate item if found, None otherwise
+        (duplicate item, knowledge_dedup.DUPLICATE_EXACT or DUPLICATE_NEAR), or None
     """
     if not initialize_firebase():
         return None
 
     try:
-        # Normalize content for comparison (trim whitespace, lowercase)
-        normalized_content = content.strip().lower()
-
-        # Get all knowledge items for this property
-        items = list_knowledge_items_by_property(property_id)
+        match = knowledge_dedup.find_duplicate(property_id, content)
+        if not match:
+            return None
 
-        # Check each item for matching content
-        for item in items:
-            item_content = item.get('content', '').strip().lower()
-            if item_content == normalized_content:
-                logger.info(f"Found duplicate content in item {item.get('id')} for property {property_id}")
-                return item
+        item_id, kind = match
+        item = get_knowledge_item(item_id)
+        if not item:
+            # Deleted by another process since the index was built
+            knowledge_dedup.forget_item(property_id, item_id)
+            return None
 
-        return None
+        logger.info(f"Found {kind} duplicate content in item {item_id} for property {property_id}")
+        return item, kind
     except Exception as e:
         logger.error(f"Error checking for duplicate content for property {property_id}: {e}")
         return None
 
-def list_knowledge_items_by_source(source_id: str) -> List[Dict]:
+def check_duplicate_content(property_id: str, content: str, near: bool = False) -> Optional[Dict]:
+    """
+    Check if a knowledge item with the same content already exists for this property.
+
+    Args:
+        property_id: ID of the property
+        content: Content to check for duplicates
+        near: Also return near duplicates (see find_duplicate_content)
+
+    Returns:
+        The duplicate item if found, None otherwise
+    """
+    match = find_duplicate_content(property_id, content)
+    if not match:
+        return None
+    item, kind = match
+    return item if near or kind == knowledge_dedup.DUPLICATE_EXACT else None
+
+@cached_list('knowledge_items', partial=_lists_partial_knowledge_items)
+def list_knowledge_items_by_source(source_id: str, *, include_embeddings: bool = False,
+                                   limit: Optional[int] = None, start_after: Optional[str] = None) -> List[Dict]:
     """
     List all knowledge items for a specific source.
 
     Args:
         source_id: ID of the source
+        include_embeddings: Also return the embedding vectors (otherwise only KNOWLEDGE_ITEM_LIST_FIELDS)
+        limit: (optional) Maximum number of items, in document ID order
+        start_after: (optional) Return items after this item ID (a page cursor)
 
     Returns:
         List of knowledge items
@@ -1509,18 +1802,12 @@ def list_knowledge_items_by_source(source_id: str) -> List[Dict]:
 
     try:
         query = db.collection('knowledge_items').where('sourceId', '==', source_id)
-
-        items = []
-        for doc in query.stream():
-            item_data = doc.to_dict()
-            item_data['id'] = doc.id
-            items.append(item_data)
-
-        return items
+        return _stream_knowledge_items(query, include_embeddings, limit, start_after)
     except Exception as e:
         logger.error(f"Error listing knowledge items for source {source_id}: {e}")
         return []
 
+@invalidates('knowledge_items')
 def update_knowledge_item_status(item_id: str, status: str) -> bool:
     """
     Update the status of a knowledge item.
@@ -1541,12 +1828,14 @@ def update_knowledge_item_status(item_id: str, status: str) -> bool:
             'status': status,
             'updatedAt': datetime.now(timezone.utc)
         })
+        _mark_knowledge_item_bundle_stale(item_id)
         logger.info(f"Knowledge item {item_id} status updated to {status}")
         return True
     except Exception as e:
         logger.error(f"Error updating knowledge item {item_id} status: {e}")
         return False
 
+@invalidates('knowledge_items')
 def delete_knowledge_item(item_id: str) -> bool:
     """
     Delete a knowledge item.
@@ -1561,7 +1850,12 @@ def delete_knowledge_item(item_id: str) -> bool:
         return False
 
     try:
+        # Look up the property before the item is gone
+        item = get_knowledge_item(item_id)
         db.collection('knowledge_items').document(item_id).delete()
+        if item:
+            mark_context_bundle_stale(item.get('propertyId'))
+            knowledge_dedup.forget_item(item.get('propertyId'), item_id)
         logger.info(f"Knowledge item {item_id} deleted successfully")
         return True
     except Exception as e:
@@ -1582,28 +1876,15 @@ def delete_all_knowledge(property_id: str) -> bool:
         return False
 
     try:
-        # Get all knowledge items for this property
-        items = list_knowledge_items_by_property(property_id)
-
-        # Delete each item
-        deleted_count = 0
-        for item in items:
-            item_id = item.get('id')
-            if item_id:
-                db.collection('knowledge_items').document(item_id).delete()
-                deleted_count += 1
+        # Only references are needed, so skip reading item bodies (and embeddings)
+        items_query = db.collection('knowledge_items').where('propertyId', '==', property_id).select([])
+        deleted_count = bulk_write(('delete', doc.reference, None) for doc in items_query.stream())
 
-        # Get all knowledge sources for this property
-        sources = list_knowledge_sources(property_id)
-
-        # Delete each source
-        source_count = 0
-        for source in sources:
-            source_id = source.get('id')
-            if source_id:
-                db.collection('knowledge_sources').document(source_id).delete()
-                source_count += 1
+        sources_query = db.collection('knowledge_sources').where('propertyId', '==', property_id).select([])
+        source_count = bulk_write(('delete', doc.reference, None) for doc in sources_query.stream())
 
+        mark_context_bundle_stale(property_id)
+        knowledge_dedup.drop_index(property_id)
         logger.info(f"Deleted {deleted_count} knowledge items and {source_count} sources for property {property_id}")
         return True
     except Exception as e:
@@ -1670,6 +1951,7 @@ def find_similar_knowledge_items(query_text: str, property_id: str, limit: int =
 
 # === Reservation Functions ===
 
+@invalidates('reservations')
 def create_reservation(reservation_data: Dict) -> Optional[str]:
     """
     Create a new reservation.
@@ -1698,6 +1980,8 @@ def create_reservation(reservation_data: Dict) -> Optional[str]:
         normalized_data = reservation_data.copy()
         normalized_data['startDate'] = start_date
         normalized_data['endDate'] = end_date
+        normalized_data.update(_reservation_lookup_fields(normalized_data))
+        normalized_data['activeUntil'] = _reservation_active_until(normalized_data)
 
         # Add timestamps
         timestamp = datetime.now(timezone.utc)
@@ -1712,6 +1996,7 @@ def create_reservation(reservation_data: Dict) -> Optional[str]:
         logger.error(f"Error creating reservation: {e}")
         return None
 
+@cached_document('reservations')
 def get_reservation(reservation_id: str) -> Optional[Dict]:
     """
     Get a reservation by ID.
@@ -1740,6 +2025,11 @@ def get_reservation(reservation_id: str) -> Optional[Dict]:
         logger.error(f"Error getting reservation {reservation_id}: {e}")
         return None
 
+def get_reservations(reservation_ids: List[str]) -> Dict[str, Optional[Dict]]:
+    """Get several reservations by ID with one batched read; missing reservations map to None."""
+    return _get_documents('reservations', list(reservation_ids))
+
+@cached_list('reservations')
 def list_property_reservations(property_id: str) -> List[Dict]:
     """
     List all reservations for a specific property.
@@ -1767,6 +2057,130 @@ def list_property_reservations(property_id: str) -> List[Dict]:
         logger.error(f"Error listing reservations for property {property_id}: {e}")
         return []
 
+# Firestore allows at most 30 values in an 'in' filter
+FIRESTORE_IN_QUERY_LIMIT = 30
+RESERVATION_QUERY_WORKERS = 8
+
+# Query-only 'activeUntil' of reservations without an end date, which count as active
+OPEN_ENDED_RESERVATION_DATE = '9999-12-31'
+# One-off data migrations; a document per migration records when it completed
+DATA_MIGRATIONS_COLLECTION = 'data_migrations'
+RESERVATION_LOOKUP_MIGRATION = 'reservation_lookup_fields'
+# How long a "not migrated yet" answer is trusted before Firestore is asked again
+MIGRATION_CHECK_INTERVAL_SECONDS = 300
+_migration_status: Dict[str, Tuple[bool, float]] = {}
+
+def _reservation_active_until(reservation_data: Dict) -> str:
+    """
+    Query key for "still active on a date": the normalized end date, whatever field it is stored in.
+
+    Reservations without a usable end date get OPEN_ENDED_RESERVATION_DATE, so
+    date-filtered queries keep them, like the routes do.
+    """
+    from concierge.utils.date_utils import normalize_reservation_dates
+    return normalize_reservation_dates(reservation_data).get('endDate') or OPEN_ENDED_RESERVATION_DATE
+
+def _is_reservation_active(reservation_data: Dict, end_date_from: str) -> bool:
+    """In-memory version of the activeUntil >= end_date_from filter."""
+    return _reservation_active_until(reservation_data) >= end_date_from
+
+def is_migration_complete(name: str) -> bool:
+    """
+    Whether a data migration (e.g. RESERVATION_LOOKUP_MIGRATION) has completed.
+
+    Completion is permanent, so a positive answer is kept for the life of the
+    process; a negative one is re-checked after MIGRATION_CHECK_INTERVAL_SECONDS.
+    """
+    cached = _migration_status.get(name)
+    if cached and (cached[0] or time.time() - cached[1] < MIGRATION_CHECK_INTERVAL_SECONDS):
+        return cached[0]
+    if not initialize_firebase():
+        return False
+    try:
+        complete = db.collection(DATA_MIGRATIONS_COLLECTION).document(name).get().exists
+    except Exception as e:
+        logger.warning(f"Could not read migration status of {name}: {e}")
+        return False
+    _migration_status[name] = (complete, time.time())
+    return complete
+
+def mark_migration_complete(name: str, details: Optional[Dict] = None) -> None:
+    """Record that a data migration has completed for every document."""
+    if not initialize_firebase():
+        return
+    db.collection(DATA_MIGRATIONS_COLLECTION).document(name).set(
+        {'completedAt': datetime.now(timezone.utc), **(details or {})}
+    )
+    _migration_status[name] = (True, time.time())
+
+def list_reservations_for_properties(property_ids: List[str], end_date_from: Optional[str] = None) -> Dict[str, List[Dict]]:
+    """
+    List reservations for many properties at once.
+
+    Property IDs are grouped into 'in' queries of up to FIRESTORE_IN_QUERY_LIMIT
+    IDs, and the groups are queried in parallel, so a host's whole portfolio
+    loads in about one query round trip. With end_date_from, reservations whose
+    normalized end date is earlier are left out; reservations without an end
+    date are kept. Once backfill_reservation_lookup_fields has completed, the
+    window is filtered server-side on 'activeUntil'; before that (or without
+    the (propertyId, activeUntil) composite index) it is filtered in memory.
+
+    Args:
+        property_ids: IDs of the properties
+        end_date_from: Optional date (YYYY-MM-DD); only reservations ending on or after it are returned
+
+    Returns:
+        Dictionary mapping each property ID to its list of reservations
+    """
+    results: Dict[str, List[Dict]] = {property_id: [] for property_id in property_ids if property_id}
+    if not results or not initialize_firebase():
+        return results
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    ids = list(results)
+    chunks = [ids[i:i + FIRESTORE_IN_QUERY_LIMIT] for i in range(0, len(ids), FIRESTORE_IN_QUERY_LIMIT)]
+    # Legacy reservations only have a usable activeUntil once the backfill has completed
+    server_date_filter = bool(end_date_from) and is_migration_complete(RESERVATION_LOOKUP_MIGRATION)
+
+    def query_chunk(chunk: List[str]) -> List[Dict]:
+        query = db.collection('reservations').where('propertyId', 'in', chunk)
+        docs = None
+        if end_date_from and server_date_filter:
+            try:
+                docs = list(query.where('activeUntil', '>=', end_date_from).stream())
+            except Exception as e:
+                # The date-window query needs the (propertyId, activeUntil) composite index
+                logger.warning(f"Date-filtered reservation query failed, filtering in memory: {e}")
+        if docs is None:
+            docs = list(query.stream())
+            if end_date_from:
+                docs = [doc for doc in docs if _is_reservation_active(doc.to_dict() or {}, end_date_from)]
+
+        reservations = []
+        for doc in docs:
+            reservation_data = doc.to_dict()
+            reservation_data['id'] = doc.id
+            reservations.append(reservation_data)
+        return reservations
+
+    try:
+        if len(chunks) == 1:
+            chunk_results = [query_chunk(chunks[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(RESERVATION_QUERY_WORKERS, len(chunks))) as executor:
+                chunk_results = list(executor.map(query_chunk, chunks))
+    except Exception as e:
+        logger.error(f"Error listing reservations for {len(ids)} properties: {e}")
+        return results
+
+    for reservations in chunk_results:
+        for reservation in reservations:
+            property_id = reservation.get('propertyId')
+            if property_id in results:
+                results[property_id].append(reservation)
+    return results
+
 def list_reservations_by_phone(phone_number: str, check_last_four: bool = True) -> List[Dict]:
     """
     List all reservations for a specific phone number.
@@ -1984,6 +2398,7 @@ def find_reservation_by_phone(phone_number: str, check_last_four: bool = True) -
         logger.error(f"Error finding reservation by phone number {phone_number}: {e}")
         return None
 
+@invalidates('reservations')
 def update_reservation(reservation_id: str, update_data: Dict) -> bool:
     """
     Update an existing reservation.
@@ -2004,6 +2419,9 @@ def update_reservation(reservation_id: str, update_data: Dict) -> bool:
 
         # Normalize dates in update data to ensure consistent date-only format
         normalized_update_data = normalize_reservation_dates(update_data)
+        normalized_update_data.update(_reservation_lookup_fields(normalized_update_data))
+        # normalize_reservation_dates always sets endDate, so activeUntil follows it
+        normalized_update_data['activeUntil'] = _reservation_active_until(normalized_update_data)
 
         # Add updated timestamp if not provided
         if 'updatedAt' not in normalized_update_data:
@@ -2193,6 +2611,10 @@ def create_magic_link(reservation_id: str, expires_at: datetime, base_url: str =
         logger.error(f"Error creating magic link for reservation {reservation_id}: {e}")
         return None
 
+# Fields re-read on every cached magic link hit, since they can revoke the link
+MAGIC_LINK_STATE_FIELDS = ['is_active', 'status', 'expires_at']
+PROPERTY_LINK_STATE_FIELDS = ['status', 'magicLinkToken']
+
 def get_magic_link_by_token(token: str) -> Optional[Dict]:
     """
     Get magic link data by raw token.
@@ -2210,20 +2632,34 @@ def get_magic_link_by_token(token: str) -> Optional[Dict]:
 
     try:
         token_hash = hash_magic_link_token(token)
-        doc_ref = db.collection('magic_links').document(token_hash)
-        doc = doc_ref.get()
-
-        if doc.exists:
-            magic_link_data = doc.to_dict()
-            magic_link_data['id'] = doc.id
-
-            # Check if link is still valid
+        link_ref = db.collection('magic_links').document(token_hash)
+        magic_link_data = magic_link_cache.get_resolved(token_hash, magic_link_cache.RESOLVED_LEGACY)
+        cached = magic_link_data is not magic_link_cache.MISSING
+        if cached:
+            # Revocation may have happened in another process: re-read the fields that decide validity
+            state = link_ref.get(field_paths=MAGIC_LINK_STATE_FIELDS)
+            if state.exists:
+                magic_link_data.update(state.to_dict() or {})
+            else:
+                magic_link_data = None
+        else:
+            doc = link_ref.get()
+            magic_link_data = None
+            if doc.exists:
+                magic_link_data = doc.to_dict()
+                magic_link_data['id'] = doc.id
+
+        if magic_link_data:
+            # Check if link is still valid (also for cached links, which may have expired since)
             now = datetime.now(timezone.utc)
             expires_at = magic_link_data.get('expires_at')
 
             if expires_at and expires_at > now and magic_link_data.get('is_active', False):
+                if not cached:
+                    magic_link_cache.remember(token_hash, magic_link_cache.RESOLVED_LEGACY, magic_link_data)
                 return magic_link_data
             else:
+                magic_link_cache.forget(token_hash)
                 logger.warning(f"Magic link expired or inactive: {token_hash[:8]}...")
                 return None
         else:
@@ -2248,8 +2684,19 @@ def get_property_by_magic_link_token(token: str) -> Optional[Dict]:
         return None
 
     try:
+        token_hash = hash_magic_link_token(token)
+        property_data = magic_link_cache.get_resolved(token_hash, magic_link_cache.RESOLVED_PROPERTY)
+        if property_data is not magic_link_cache.MISSING:
+            # Deactivation or a new token may have been written by another process:
+            # re-check them with a projected read before trusting the cached property
+            state = db.collection('properties').document(property_data['id']).get(field_paths=PROPERTY_LINK_STATE_FIELDS)
+            state_data = state.to_dict() if state.exists else None
+            if state_data and state_data.get('status') == 'active' and state_data.get('magicLinkToken') == token:
+                return property_data
+            magic_link_cache.forget(token_hash)
+
         # Query properties collection for matching magic link token
-        query = db.collection('properties').where('magicLinkToken', '==', token)
+        query = db.collection('properties').where('magicLinkToken', '==', token).limit(1)
         results = list(query.stream())
 
         if results:
@@ -2259,6 +2706,8 @@ def get_property_by_magic_link_token(token: str) -> Optional[Dict]:
 
             # Check if property is active (magic links only work for active properties)
             if property_data.get('status') == 'active':
+                magic_link_cache.remember(token_hash, magic_link_cache.RESOLVED_PROPERTY, property_data,
+                                          property_id=property_doc.id)
                 return property_data
             else:
                 logger.warning(f"Magic link accessed for inactive property: {property_data.get('id')}")
@@ -2271,10 +2720,141 @@ def get_property_by_magic_link_token(token: str) -> Optional[Dict]:
         logger.error(f"Error getting property by magic link token: {e}")
         return None
 
+# Phone number fields a reservation may use
+RESERVATION_PHONE_FIELDS = ('guestPhoneNumber', 'GuestPhoneNumber', 'guest_phone_number', 'guest_phone')
+
+def _reservation_lookup_fields(reservation_data: Dict) -> Dict:
+    """
+    Fields that let find_property_reservations_by_phone find a reservation with one indexed query.
+
+    Args:
+        reservation_data: Reservation document, or the fields of an update
+
+    Returns:
+        'propertyId' (legacy documents may only have 'property_id') and
+        'guestPhoneLast4' (last 4 digits of the guest's phone number), where derivable
+    """
+    fields = {}
+    if not reservation_data.get('propertyId') and reservation_data.get('property_id'):
+        fields['propertyId'] = reservation_data['property_id']
+    for field in RESERVATION_PHONE_FIELDS:
+        digits = ''.join(filter(str.isdigit, str(reservation_data.get(field) or '')))
+        if len(digits) >= 4:
+            fields['guestPhoneLast4'] = digits[-4:]
+            break
+    return fields
+
 def find_property_reservations_by_phone(property_id: str, phone_last_4: str) -> List[Dict]:
     """
     Find active/upcoming reservations for a property matching the last 4 digits of phone number.
 
+    Runs a single query on propertyId, guestPhoneLast4 and activeUntil, backed
+    by the (propertyId, guestPhoneLast4, activeUntil) composite index, so only
+    matching reservations are read. Until backfill_reservation_lookup_fields
+    has completed (RESERVATION_LOOKUP_MIGRATION), legacy reservations may lack
+    those fields and all of the property's reservations are scanned instead.
+
+    Args:
+        property_id: ID of the property to search reservations for
+        phone_last_4: Last 4 digits of phone number
+
+    Returns:
+        List of matching reservations (may be empty or contain multiple matches)
+    """
+    if not initialize_firebase():
+        return []
+
+    if not is_migration_complete(RESERVATION_LOOKUP_MIGRATION):
+        return _scan_property_reservations_by_phone(property_id, phone_last_4)
+
+    try:
+        today = datetime.now(timezone.utc).date().isoformat()
+        query = (db.collection('reservations')
+                 .where('propertyId', '==', property_id)
+                 .where('guestPhoneLast4', '==', phone_last_4))
+        try:
+            docs = list(query.where('activeUntil', '>=', today).stream())
+        except Exception as e:
+            # The date filter needs the composite index; fall back to filtering
+            # this guest's reservations in memory if it has not been created yet
+            logger.warning(f"Date-filtered reservation phone lookup failed, filtering in memory: {e}")
+            docs = [doc for doc in query.stream() if _is_reservation_active(doc.to_dict() or {}, today)]
+
+        reservations = []
+        for doc in docs:
+            reservation_data = doc.to_dict()
+            reservation_data['id'] = doc.id
+            # Skip cancelled reservations
+            if reservation_data.get('status') == 'cancelled':
+                continue
+            reservations.append(reservation_data)
+
+        logger.info(f"Found {len(reservations)} matching reservations for property {property_id} with phone ending {phone_last_4}")
+        return reservations
+
+    except Exception as e:
+        logger.error(f"Error finding property reservations by phone: {e}")
+        return []
+
+def backfill_reservation_lookup_fields(property_id: Optional[str] = None) -> int:
+    """
+    Add the fields used by find_property_reservations_by_phone to existing reservations.
+
+    Sets propertyId, guestPhoneLast4, a normalized endDate and activeUntil
+    where they are missing or out of date. A run over all reservations
+    records RESERVATION_LOOKUP_MIGRATION as complete in Firestore, which
+    switches the reservation lookups to their server-side filters.
+
+    Args:
+        property_id: (optional) Only backfill this property's reservations
+
+    Returns:
+        Number of reservations updated
+    """
+    if not initialize_firebase():
+        return 0
+
+    from concierge.utils.date_utils import normalize_reservation_dates
+
+    query = db.collection('reservations')
+    if property_id:
+        query = query.where('propertyId', '==', property_id)
+
+    updated = 0
+    batch = db.batch()
+    pending = 0
+    for doc in query.stream():
+        reservation_data = doc.to_dict() or {}
+        update_data = _reservation_lookup_fields(reservation_data)
+        end_date = normalize_reservation_dates(reservation_data).get('endDate')
+        if end_date and end_date != reservation_data.get('endDate'):
+            update_data['endDate'] = end_date
+        update_data['activeUntil'] = end_date or OPEN_ENDED_RESERVATION_DATE
+        update_data = {key: value for key, value in update_data.items() if reservation_data.get(key) != value}
+        if not update_data:
+            continue
+        batch.update(doc.reference, update_data)
+        pending += 1
+        updated += 1
+        if pending == 400:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+    invalidate('reservations')
+    if not property_id:
+        mark_migration_complete(RESERVATION_LOOKUP_MIGRATION, {'updated': updated})
+    logger.info(f"Backfilled lookup fields on {updated} reservations")
+    return updated
+
+def _scan_property_reservations_by_phone(property_id: str, phone_last_4: str) -> List[Dict]:
+    """
+    Find active/upcoming reservations for a property by scanning all of its reservations.
+
+    Used for reservations written before guestPhoneLast4 was kept up to date
+    (see backfill_reservation_lookup_fields).
+
     Args:
         property_id: ID of the property to search reservations for
         phone_last_4: Last 4 digits of phone number
@@ -2405,6 +2985,7 @@ def update_magic_link(token_hash: str, update_data: Dict) -> bool:
 
         # Update the document
         db.collection('magic_links').document(token_hash).update(update_data)
+        magic_link_cache.forget(token_hash)
         logger.info(f"Magic link {token_hash[:8]}... updated successfully")
         return True
 
@@ -2626,14 +3207,15 @@ def expire_old_magic_links() -> int:
         now = datetime.now(timezone.utc)
         query = db.collection('magic_links').where('expires_at', '<', now).where('is_active', '==', True)
 
-        expired_count = 0
-        for doc in query.stream():
-            doc.reference.update({
-                'is_active': False,
-                'status': 'expired',
-                'updated_at': now
-            })
-            expired_count += 1
+        # Only document references are needed; the field mask keeps the read small
+        update = {
+            'is_active': False,
+            'status': 'expired',
+            'updated_at': now
+        }
+        expired_count = bulk_write(
+            ('update', doc.reference, update) for doc in query.select(['is_active']).stream()
+        )
 
         logger.info(f"Expired {expired_count} old magic links")
         return expired_count
@@ -2659,34 +3241,15 @@ def cleanup_expired_temporary_users() -> int:
         # Query for expired temporary users
         query = db.collection('users').where('isTemporary', '==', True).where('expiresAt', '<', now)
         
-        cleanup_count = 0
-        temp_users_to_cleanup = []
-        
-        # Collect expired temporary users
-        for doc in query.stream():
-            temp_user_data = doc.to_dict()
-            temp_users_to_cleanup.append({
-                'id': doc.id,
-                'data': temp_user_data
-            })
-        
+        operations = []
+        for doc in query.select(['expiresAt']).stream():
+            # Log cleanup for audit trail
+            logger.info(f"Cleaning up expired temporary user: {doc.id} (expired: {doc.to_dict().get('expiresAt')})")
+            operations.append(('delete', doc.reference, None))
+
         # Delete expired temporary users
-        for temp_user in temp_users_to_cleanup:
-            user_id = temp_user['id']
-            user_data = temp_user['data']
-            
-            try:
-                # Log cleanup for audit trail
-                logger.info(f"Cleaning up expired temporary user: {user_id} (expired: {user_data.get('expiresAt')})")
-                
-                # Delete the user document
-                db.collection('users').document(user_id).delete()
-                cleanup_count += 1
-                
-            except Exception as user_error:
-                logger.error(f"Error cleaning up temporary user {user_id}: {user_error}")
-                continue
-        
+        cleanup_count = bulk_write(operations)
+
         logger.info(f"Cleaned up {cleanup_count} expired temporary users")
         return cleanup_count
 
@@ -2755,6 +3318,7 @@ def upgrade_magic_link_to_full_account(token: str, user_id: str) -> bool:
         logger.error(f"Error upgrading magic link to full account: {e}")
         return False
 
+@invalidates('reservations')
 def delete_reservation(reservation_id: str) -> bool:
     """
     Delete a reservation.
@@ -2777,6 +3341,7 @@ def delete_reservation(reservation_id: str) -> bool:
         logger.error(f"Error deleting reservation {reservation_id}: {e}")
         return False
 
+@invalidates('reservations')
 def update_reservation_phone(reservation_id: str, phone_number: str) -> bool:
     """
     Update the phone number for a reservation.
@@ -2793,16 +3358,19 @@ def update_reservation_phone(reservation_id: str, phone_number: str) -> bool:
 
     try:
         # Update the phone number
-        db.collection('reservations').document(reservation_id).update({
+        update_data = {
             'guestPhoneNumber': phone_number,
             'updatedAt': datetime.now(timezone.utc)
-        })
+        }
+        update_data.update(_reservation_lookup_fields(update_data))
+        db.collection('reservations').document(reservation_id).update(update_data)
         logger.info(f"Reservation {reservation_id} phone number updated to {phone_number}")
         return True
     except Exception as e:
         logger.error(f"Error updating reservation {reservation_id} phone number: {e}")
         return False
 
+@invalidates('reservations')
 def update_reservation_contacts(reservation_id: str, contacts: List[Dict]) -> bool:
     """
     Update the additional contacts for a reservation.
@@ -2863,6 +3431,7 @@ def store_conversation(conversation_data: Dict) -> Optional[str]:
 
 # === Temporary User Functions for Magic Links ===
 
+@invalidates('users')
 def create_temporary_user(magic_link_data: Dict, reservation: Dict, guest_name: str = None) -> Optional[str]:
     """
     Create a temporary Firebase user for magic link access.
@@ -2959,6 +3528,7 @@ def get_temporary_user(user_id: str) -> Optional[Dict]:
         logger.error(f"Error getting temporary user {user_id}: {e}")
         return None
 
+@invalidates('users')
 def update_temporary_user_name(user_id: str, display_name: str) -> bool:
     """
     Update the display name for a temporary user.
@@ -3026,6 +3596,7 @@ def verify_user_pin(user_id: str, entered_pin: str) -> bool:
         logger.error(f"Error verifying PIN for user {user_id}: {e}")
         return False
 
+@invalidates('users')
 def update_user_pin(user_id: str, new_pin: str) -> bool:
     """
     Update a user's PIN code.
@@ -3085,6 +3656,7 @@ def has_default_pin(user_id: str) -> bool:
         logger.error(f"Error checking default PIN for user {user_id}: {e}")
         return False
 
+@invalidates('users')
 def create_user_with_pin(user_id: str, user_data: Dict[str, Any], pin: Optional[str] = None) -> bool:
     """
     Create a new user with optional PIN.
@@ -3157,6 +3729,7 @@ def get_user_auth_info(user_id: str) -> Optional[Dict[str, Any]]:
         logger.error(f"Error getting auth info for user {user_id}: {e}")
         return None
 
+@invalidates('users')
 def update_last_login(user_id: str) -> bool:
     """
     Update user's last login timestamp.
@@ -3180,6 +3753,7 @@ def update_last_login(user_id: str) -> bool:
         logger.error(f"Error updating last login for user {user_id}: {e}")
         return False
 
+@invalidates('users')
 def record_data_access_consent(user_id: str, consent_type: str = 'airbnb_data_access',
                               consent_details: Dict = None) -> bool:
     """
@@ -3392,11 +3966,8 @@ def create_ephemeral_token(user_id: str) -> Optional[str]:
         # Import the Google GenAI SDK
         import google.genai as genai
         
-        # Create client with v1alpha API version (required for auth_tokens.create())
-        client = genai.Client(
-            api_key=api_key,
-            http_options={'api_version': 'v1alpha'}
-        )
+        # Shared client with v1alpha API version (required for auth_tokens.create())
+        client = get_genai_client(api_key, api_version='v1alpha')
         
         # Calculate expiration times
         now = datetime.now(timezone.utc)
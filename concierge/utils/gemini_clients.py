@@ -0,0 +1,170 @@
+"""
+Process-wide registry of Gemini SDK clients.
+
+Building a `genai.Client` per request costs client construction plus a fresh
+HTTPS connection (TLS handshake included) on every call. The registry hands out
+one lazily created client per (API key, API version) so the underlying HTTP
+connection pool is kept alive and reused across requests and threads.
+
+The registry is fork-safe: gunicorn runs with `preload_app = True`, so anything
+created in the master before fork would share sockets with the workers. Clients
+are dropped in the child after a fork and re-created on first use.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Keep-alive tuning for the HTTP connection pool used by each client
+GENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('GENAI_MAX_KEEPALIVE_CONNECTIONS', '20'))
+GENAI_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv('GENAI_KEEPALIVE_EXPIRY_SECONDS', '120'))
+
+_clients: Dict[Tuple[str, str], Any] = {}
+_legacy_models: Dict[str, Any] = {}
+_legacy_configured_key: Optional[str] = None
+_registry_lock = threading.Lock()
+_registry_pid = os.getpid()
+
+
+def _reset_after_fork() -> None:
+    """Forget clients inherited from the parent process; they are rebuilt lazily."""
+    global _registry_lock, _registry_pid, _legacy_configured_key
+    _registry_lock = threading.Lock()
+    _clients.clear()
+    _legacy_models.clear()
+    _legacy_configured_key = None
+    _registry_pid = os.getpid()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _check_pid() -> None:
+    # Fallback for fork paths that bypass register_at_fork hooks
+    if _registry_pid != os.getpid():
+        _reset_after_fork()
+
+
+def _default_api_key() -> str:
+    env = os.getenv('DEPLOYMENT_ENV', '').lower()
+    if env == 'production':
+        return os.getenv('GEMINI_API_KEY_PAID') or os.getenv('GEMINI_API_KEY') or ''
+    return os.getenv('GEMINI_API_KEY') or os.getenv('GEMINI_API_KEY_FREE') or ''
+
+
+def _key_id(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:12]
+
+
+def _build_client(api_key: str, api_version: Optional[str]):
+    import google.genai as genai
+
+    http_options: Dict[str, Any] = {}
+    if api_version:
+        http_options['api_version'] = api_version
+
+    try:
+        import httpx
+        pooled_options = dict(http_options)
+        pooled_options['client_args'] = {
+            'limits': httpx.Limits(
+                max_keepalive_connections=GENAI_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=GENAI_KEEPALIVE_EXPIRY_SECONDS,
+            )
+        }
+        return genai.Client(api_key=api_key, http_options=pooled_options)
+    except Exception as e:
+        # Older SDK versions do not accept client_args; their default pool still keeps connections alive
+        logger.debug(f"Creating genai client without custom pool limits: {e}")
+
+    if http_options:
+        return genai.Client(api_key=api_key, http_options=http_options)
+    return genai.Client(api_key=api_key)
+
+
+def get_genai_client(api_key: Optional[str] = None, api_version: Optional[str] = None):
+    """
+    Get the shared google-genai client for an API key.
+
+    Args:
+        api_key: API key to use (defaults to the environment's Gemini key)
+        api_version: Optional API version (e.g. 'v1alpha' for Live and auth tokens)
+
+    Returns:
+        A genai.Client, or None if no API key is configured or the SDK is missing
+    """
+    _check_pid()
+    api_key = api_key or _default_api_key()
+    if not api_key:
+        logger.error("No Gemini API key configured")
+        return None
+
+    registry_key = (_key_id(api_key), api_version or '')
+    client = _clients.get(registry_key)
+    if client is not None:
+        return client
+
+    with _registry_lock:
+        client = _clients.get(registry_key)
+        if client is None:
+            try:
+                client = _build_client(api_key, api_version)
+            except ImportError:
+                logger.error("google.genai module not available")
+                return None
+            _clients[registry_key] = client
+            logger.info(f"Created shared genai client (api_version={api_version or 'default'}, pid={os.getpid()})")
+    return client
+
+
+def get_legacy_model(model_name: str, **kwargs):
+    """
+    Get a shared legacy `google.generativeai` GenerativeModel.
+
+    Models are cached per model name and construction arguments
+    (generation_config, safety_settings, system_instruction, ...).
+
+    Returns:
+        A GenerativeModel, or None if the SDK or API key is unavailable
+    """
+    global _legacy_configured_key
+    _check_pid()
+    cache_key = model_name + ':' + json.dumps(kwargs, sort_keys=True, default=str)
+    model = _legacy_models.get(cache_key)
+    if model is not None:
+        return model
+
+    try:
+        import google.generativeai as legacy_genai
+    except ImportError:
+        logger.error("google.generativeai module not available")
+        return None
+
+    with _registry_lock:
+        model = _legacy_models.get(cache_key)
+        if model is None:
+            api_key = os.getenv('GEMINI_API_KEY') or _default_api_key()
+            if not api_key:
+                logger.error("No Gemini API key configured")
+                return None
+            if _legacy_configured_key != api_key:
+                legacy_genai.configure(api_key=api_key)
+                _legacy_configured_key = api_key
+            model = legacy_genai.GenerativeModel(model_name, **kwargs)
+            _legacy_models[cache_key] = model
+    return model
+
+
+def get_client_registry_stats() -> Dict[str, Any]:
+    """Get registry statistics for monitoring."""
+    return {
+        'pid': os.getpid(),
+        'genai_clients': len(_clients),
+        'legacy_models': len(_legacy_models),
+    }
@@ -6,6 +6,8 @@ from dotenv import load_dotenv
 import numpy as np
 import logging
 
+from concierge.utils.gemini_clients import get_genai_client
+
 # Load environment variables from .env file
 load_dotenv('./concierge/.env')
 
@@ -29,7 +31,7 @@ if not GEMINI_API_KEY:
     genai_enabled = False
 else:
     try:
-        client = genai.Client(api_key=GEMINI_API_KEY)
+        client = get_genai_client(GEMINI_API_KEY)
         print("Gemini API client created successfully with new SDK.")
         genai_enabled = True
     except Exception as e:
@@ -41,7 +43,7 @@ else:
 gemini_model = None
 if genai_enabled:
     try:
-        # For the new SDK, we create clients per request instead of global models
+        # For the new SDK, clients come from the shared registry in gemini_clients
         print("Gemini API functionality available with new SDK.")
     except Exception as e:
         print(f"ERROR: Failed to initialize Gemini functionality: {e}")
@@ -72,8 +74,8 @@ def generate_embeddings(texts, task_type="RETRIEVAL_DOCUMENT"):
 
     embeddings = []
     try:
-        # Create client for this request
-        client = genai.Client(api_key=GEMINI_API_KEY)
+        # Shared client (keeps the HTTP connection alive across requests)
+        client = get_genai_client(GEMINI_API_KEY)
         
         for text in texts:
             try:
@@ -124,11 +126,11 @@ except Exception as e:
 
 # New SDK client factory function
 def create_gemini_client():
-    """Create a new Google GenAI client."""
+    """Return the shared Google GenAI client for the selected API key."""
     try:
         api_key = _select_gemini_api_key()
         if api_key and genai:
-            return genai.Client(api_key=api_key)
+            return get_genai_client(api_key)
     except Exception as e:
         logging.error(f"Failed to create Gemini client: {e}")
     return None 
\ No newline at end of file
@@ -0,0 +1,247 @@
+"""
+Gemini explicit context caching for text chat system prompts.
+
+Every guest message used to resend the property's full system prompt (property
+details plus the rendered knowledge base) along with the tool declarations.
+For properties with a large knowledge base that prefix dominates input tokens
+and latency. The cache stores the system prompt and tools once as Gemini
+cached content; each turn then sends only the cache reference plus the new
+turn, and cached tokens are billed at the reduced rate.
+
+- Entries are keyed by model, property and context version (the context
+  bundle version, or a hash of the system prompt when the client supplied
+  its own), so a knowledge or property edit naturally starts a new cache and
+  the previous ones for that property are deleted. Superseded caches are
+  found by display name (`property-<id>-<version>`) in Gemini's cache list,
+  so caches created by other worker processes are cleaned up too.
+- Caches are created with CONTEXT_CACHE_TTL_SECONDS and their TTL is extended
+  while in use, once less than CONTEXT_CACHE_REFRESH_SECONDS remain. Idle
+  caches simply expire on Gemini's side.
+- Prompts shorter than CONTEXT_CACHE_MIN_CHARS are not cached (Gemini rejects
+  cached content below its minimum token count, and small prompts gain
+  little). A failed creation is not retried for CONTEXT_CACHE_RETRY_SECONDS.
+
+Each worker process keeps its own registry of the caches it uses, so every
+process creates at most one cache per property version.
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_CACHE_ENABLED = os.getenv('CONTEXT_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv('CONTEXT_CACHE_TTL_SECONDS', '3600'))
+CONTEXT_CACHE_REFRESH_SECONDS = int(os.getenv('CONTEXT_CACHE_REFRESH_SECONDS', '600'))
+# Roughly 2,000 tokens; below this the cache minimum is not met or the saving is negligible
+CONTEXT_CACHE_MIN_CHARS = int(os.getenv('CONTEXT_CACHE_MIN_CHARS', '8000'))
+CONTEXT_CACHE_RETRY_SECONDS = int(os.getenv('CONTEXT_CACHE_RETRY_SECONDS', '600'))
+
+
+def prompt_version(text: str) -> str:
+    """Return a short stable version for a system prompt that has no bundle version."""
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()[:16]
+
+
+def _tools_signature(tools: Optional[List[Any]]) -> str:
+    names = []
+    for tool in tools or []:
+        for declaration in getattr(tool, 'function_declarations', None) or []:
+            names.append(getattr(declaration, 'name', ''))
+        if getattr(tool, 'google_search', None) is not None:
+            names.append('google_search')
+    return ','.join(sorted(names))
+
+
+class GeminiContextCache:
+    """
+    Creates, reuses and refreshes Gemini cached content for system prompts.
+    """
+
+    def __init__(self, ttl_seconds: int = CONTEXT_CACHE_TTL_SECONDS,
+                 refresh_seconds: int = CONTEXT_CACHE_REFRESH_SECONDS,
+                 min_chars: int = CONTEXT_CACHE_MIN_CHARS):
+        """
+        Initialize the cache registry.
+
+        Args:
+            ttl_seconds: TTL requested for each cached content
+            refresh_seconds: Extend the TTL when less than this remains
+            min_chars: Minimum system prompt length worth caching
+        """
+        self._ttl_seconds = ttl_seconds
+        self._refresh_seconds = min(refresh_seconds, ttl_seconds // 2)
+        self._min_chars = min_chars
+        # (model, property_id, version, tools) -> {'name': str, 'expires_at': float}
+        self._entries: Dict[Tuple[str, str, str, str], Dict[str, Any]] = {}
+        # Keys whose creation failed -> time of failure
+        self._failures: Dict[Tuple[str, str, str, str], float] = {}
+        self._key_locks: Dict[Tuple[str, str, str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._creates = 0
+        self._refreshes = 0
+        self._errors = 0
+
+    def _key_lock(self, key: Tuple[str, str, str, str]) -> threading.Lock:
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def _create(self, client, key, system_instruction: str, tools: Optional[List[Any]]) -> Optional[str]:
+        import google.genai as genai
+
+        model, property_id, version, _ = key
+        config = genai.types.CreateCachedContentConfig(
+            display_name=f"property-{property_id}-{version}"[:128],
+            system_instruction=system_instruction,
+            tools=tools or None,
+            ttl=f"{self._ttl_seconds}s",
+        )
+        cached = client.caches.create(model=model, config=config)
+        with self._lock:
+            self._creates += 1
+            self._entries[key] = {'name': cached.name, 'expires_at': time.time() + self._ttl_seconds}
+        logger.info(f"Created Gemini context cache {cached.name} for property {property_id} "
+                    f"(version {version}, {len(system_instruction)} chars)")
+        self._delete_superseded(client, key, cached)
+        return cached.name
+
+    def _refresh(self, client, key, entry: Dict[str, Any]) -> bool:
+        import google.genai as genai
+
+        try:
+            client.caches.update(
+                name=entry['name'],
+                config=genai.types.UpdateCachedContentConfig(ttl=f"{self._ttl_seconds}s")
+            )
+        except Exception as e:
+            logger.info(f"Could not extend Gemini context cache {entry['name']}, recreating: {e}")
+            with self._lock:
+                self._entries.pop(key, None)
+            return False
+        with self._lock:
+            entry['expires_at'] = time.time() + self._ttl_seconds
+            self._refreshes += 1
+        return True
+
+    def _delete_superseded(self, client, key, created) -> None:
+        """
+        Delete caches for other versions of the same property and model.
+
+        Gemini's cache list is searched by display name, so caches created by
+        other worker processes are deleted as well. Only caches created before
+        the new one are deleted, so a worker that still has an old version
+        cannot delete a newer cache.
+        """
+        model, property_id, version, tools = key
+        with self._lock:
+            for k in [k for k in self._entries
+                      if k[0] == model and k[1] == property_id and k[3] == tools and k[2] != version]:
+                del self._entries[k]
+
+        prefix = f"property-{property_id}-"
+        created_at = getattr(created, 'create_time', None)
+        try:
+            listed = list(client.caches.list())
+        except Exception as e:
+            logger.debug(f"Could not list Gemini context caches: {e}")
+            return
+        for cached in listed:
+            display_name = getattr(cached, 'display_name', None) or ''
+            cached_version = display_name[len(prefix):]
+            if (not display_name.startswith(prefix) or not cached_version or '-' in cached_version
+                    or cached.name == created.name or cached_version == version[:len(cached_version)]):
+                continue
+            if not (getattr(cached, 'model', '') or '').endswith(model):
+                continue
+            cached_at = getattr(cached, 'create_time', None)
+            if created_at and cached_at and cached_at > created_at:
+                continue
+            try:
+                client.caches.delete(name=cached.name)
+                logger.info(f"Deleted superseded Gemini context cache {cached.name}")
+            except Exception as e:
+                logger.debug(f"Could not delete Gemini context cache {cached.name}: {e}")
+
+    def get_cached_content(self, client, model: str, property_id: str, system_instruction: str,
+                           tools: Optional[List[Any]] = None, version: Optional[str] = None) -> Optional[str]:
+        """
+        Get the cached content name for a system prompt, creating or refreshing it as needed.
+
+        Args:
+            client: genai.Client used for the cache calls
+            model: Model the cache is created for (caches are model specific)
+            property_id: Property the prompt belongs to
+            system_instruction: The static system prompt
+            tools: Tools stored with the cache (requests using the cache cannot add their own)
+            version: Context version; defaults to a hash of the system prompt
+
+        Returns:
+            The cached content name, or None if the prompt should be sent uncached
+        """
+        if not CONTEXT_CACHE_ENABLED or client is None or not property_id:
+            return None
+        if not system_instruction or len(system_instruction) < self._min_chars:
+            return None
+
+        key = (model, property_id, version or prompt_version(system_instruction), _tools_signature(tools))
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+                failed_at = self._failures.get(key)
+            now = time.time()
+
+            if entry and entry['expires_at'] > now:
+                if entry['expires_at'] - now >= self._refresh_seconds or self._refresh(client, key, entry):
+                    with self._lock:
+                        self._hits += 1
+                    return entry['name']
+
+            if failed_at and now - failed_at < CONTEXT_CACHE_RETRY_SECONDS:
+                return None
+
+            try:
+                return self._create(client, key, system_instruction, tools)
+            except Exception as e:
+                logger.warning(f"Could not create Gemini context cache for property {property_id}: {e}")
+                with self._lock:
+                    self._errors += 1
+                    self._failures[key] = now
+                return None
+
+    def forget(self, cached_content: str) -> None:
+        """Drop a cache that Gemini reported as missing or expired, so the next call recreates it."""
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e['name'] == cached_content]:
+                del self._entries[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics for monitoring."""
+        with self._lock:
+            return {
+                'enabled': CONTEXT_CACHE_ENABLED,
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'creates': self._creates,
+                'refreshes': self._refreshes,
+                'errors': self._errors,
+            }
+
+
+# Global context cache registry shared by all requests in this process
+_context_cache = None
+
+
+def get_gemini_context_cache() -> GeminiContextCache:
+    """Get or create the global Gemini context cache instance."""
+    global _context_cache
+    if _context_cache is None:
+        _context_cache = GeminiContextCache()
+    return _context_cache
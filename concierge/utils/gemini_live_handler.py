@@ -26,6 +26,9 @@ except ImportError:
     from google.generativeai import types
 
 from .ai_helpers import get_relevant_context, format_prompt_with_rag, get_current_time, GEMINI_FUNCTION_DECLARATIONS
+from .gemini_clients import get_genai_client, get_legacy_model
+from .conversation_history import compact_history, split_history, SUMMARY_ROLE
+from . import async_firestore_client
 
 # Setup detailed logging for the handler
 handler_logger = logging.getLogger('gemini_live_handler')
@@ -86,7 +89,7 @@ async def create_gemini_live_session(sid, property_id, property_context=None, db
             return False
 
         # Create Gemini client
-        client = genai.Client(http_options={"api_version": "v1alpha"}, api_key=api_key)
+        client = get_genai_client(api_key, api_version="v1alpha")
 
         # Configure response modalities (audio) with transcription enabled and function calling
         config = types.LiveConnectConfig(
@@ -116,37 +119,30 @@ async def create_gemini_live_session(sid, property_id, property_context=None, db
         # If caller number is provided, try to find guest name from Firestore
         if not guest_name and caller_number:
             try:
-                # Import Firestore client functions dynamically to avoid circular imports
-                import importlib.util
-                spec = importlib.util.find_spec('utils.firestore_client')
-                if spec:
-                    firestore_client = importlib.util.module_from_spec(spec)
-                    spec.loader.exec_module(firestore_client)
-
-                    # Look up reservations by phone number
-                    reservations = firestore_client.find_reservations_by_phone(caller_number)
-                    if reservations:
-                        # Use the first reservation's guest name
-                        # Try different field names for guest name
-                        guest_name = (
-                            reservations[0].get('guestName') or
-                            reservations[0].get('GuestName') or
-                            reservations[0].get('guest_name')
-                        )
-                        if guest_name:
-                            property_context['guestName'] = guest_name
-                            handler_logger.info(f"Found guest name from Firestore for caller {caller_number}: {guest_name}")
-
-                            # If property_id is not provided but found in reservation, use it
-                            if not property_id:
-                                property_id = (
-                                    reservations[0].get('propertyId') or
-                                    reservations[0].get('PropertyId') or
-                                    reservations[0].get('property_id') or
-                                    reservations[0].get('property')
-                                )
-                                if property_id:
-                                    handler_logger.info(f"Found property ID from Firestore for caller {caller_number}: {property_id}")
+                # Look up reservations by phone number without blocking the event loop
+                reservations = await async_firestore_client.find_reservations_by_phone(caller_number)
+                if reservations:
+                    # Use the first reservation's guest name
+                    # Try different field names for guest name
+                    guest_name = (
+                        reservations[0].get('guestName') or
+                        reservations[0].get('GuestName') or
+                        reservations[0].get('guest_name')
+                    )
+                    if guest_name:
+                        property_context['guestName'] = guest_name
+                        handler_logger.info(f"Found guest name from Firestore for caller {caller_number}: {guest_name}")
+
+                        # If property_id is not provided but found in reservation, use it
+                        if not property_id:
+                            property_id = (
+                                reservations[0].get('propertyId') or
+                                reservations[0].get('PropertyId') or
+                                reservations[0].get('property_id') or
+                                reservations[0].get('property')
+                            )
+                            if property_id:
+                                handler_logger.info(f"Found property ID from Firestore for caller {caller_number}: {property_id}")
             except Exception as e:
                 handler_logger.error(f"Error finding guest name for caller {caller_number} in Firestore: {e}")
                 handler_logger.error(traceback.format_exc())
@@ -156,25 +152,11 @@ async def create_gemini_live_session(sid, property_id, property_context=None, db
         if not guest_name and db_firestore and property_id:
             try:
                 # Check for an active reservation for this property
-                from datetime import datetime
-                now = datetime.now()
-
-                # Query reservations for this property that are currently active
-                reservations_ref = db_firestore.collection('reservations')
-                query = reservations_ref.where('propertyId', '==', property_id) \
-                                      .where('startDate', '<=', now) \
-                                      .where('endDate', '>=', now) \
-                                      .limit(1)
-
-                reservation_docs = query.get()
-
-                for doc in reservation_docs:
-                    res_data = doc.to_dict()
-                    if 'guestName' in res_data:
-                        guest_name = res_data['guestName']
-                        property_context['guestName'] = guest_name
-                        logging.info(f"Found guest name from Firestore reservation: {guest_name}")
-                    break  # Just get the first one
+                res_data = await async_firestore_client.find_active_property_reservation(property_id)
+                if res_data and 'guestName' in res_data:
+                    guest_name = res_data['guestName']
+                    property_context['guestName'] = guest_name
+                    logging.info(f"Found guest name from Firestore reservation: {guest_name}")
 
             except Exception as e:
                 logging.error(f"Error fetching reservation info from Firestore: {e}")
@@ -190,6 +172,9 @@ async def create_gemini_live_session(sid, property_id, property_context=None, db
             'caller_number': caller_number,  # Store caller's phone number if available
             'task': None,  # Will be set once task starts
             'conversation_history': [],  # Store conversation segments
+            # Running summary of conversation_history[:folded] (see _advance_history_compaction)
+            'history_compaction': {'summary': '', 'folded': 0},
+            'history_compaction_running': False,
             'last_context_used': None,  # Last used context
         }
 
@@ -232,62 +217,20 @@ async def manage_gemini_live_session(sid, client, config, property_id, caller_nu
                 # Extract guest name
                 guest_name = property_context.get('guestName', 'Guest')
 
-                # Fetch detailed property information if needed
-                if not property_context or len(property_context) < 3:  # Only has minimal info
+                # Property details and knowledge come from the precomputed context bundle
+                bundle = None
+                if property_id and property_id != "unknown" and not property_context.get('fallback'):
                     try:
-                        # Import function dynamically to avoid circular imports
-                        import importlib.util
-                        spec = importlib.util.find_spec('utils.ai_helpers')
-                        if spec:
-                            ai_helpers = importlib.util.module_from_spec(spec)
-                            spec.loader.exec_module(ai_helpers)
-
-                            # Try to get more detailed property info from Firestore
-                            from concurrent.futures import ThreadPoolExecutor
-                            with ThreadPoolExecutor() as executor:
-                                # Retrieve property info from Firestore in a thread
-                                from concierge.utils.firestore_client import get_firestore_client
-                                db = get_firestore_client()
-                                prop_ref = db.collection('properties').document(property_id)
-                                prop_doc = await asyncio.to_thread(prop_ref.get)
-
-                                if prop_doc.exists:
-                                    prop_data = prop_doc.to_dict()
-                                    # Update with more complete property information
-                                    property_context.update({
-                                        'name': prop_data.get('name', property_context.get('name', f'Property {property_id}')),
-                                        'hostName': prop_data.get('hostName', property_context.get('hostName', 'the host')),
-                                        'location': prop_data.get('location', property_context.get('location', '')),
-                                        'address': prop_data.get('address', ''),
-                                        'description': prop_data.get('description', ''),
-                                        'property_id': property_id  # Ensure property_id is included for timezone detection
-                                    })
-
-                                    # Extract timezone from multiple possible keys
-                                    tz_keys = ['timezone', 'timeZone', 'TimeZone', 'tz', 'TZ', 'localTimezone', 'localTimeZone']
-                                    tz_value = None
-                                    for k in tz_keys:
-                                        if k in prop_data and prop_data[k]:
-                                            tz_value = prop_data[k]
-                                            break
-                                    if tz_value:
-                                        property_context['timezone'] = tz_value
-                                        handler_logger.info(f"Found timezone in property data: {tz_value}")
-                                    else:
-                                        handler_logger.warning(f"No timezone found in property data for {property_id}")
-
-                                    # Add WiFi details if available
-                                    if 'wifiDetails' in prop_data and isinstance(prop_data['wifiDetails'], dict):
-                                        wifi = prop_data['wifiDetails']
-                                        property_context['wifiNetwork'] = wifi.get('network', '')
-                                        property_context['wifiPassword'] = wifi.get('password', '')
-
-                                    # Update session info with enhanced property context
-                                    session_info['property_context'] = property_context
-                                    logging.info(f"Enhanced property context for {sid} with Firestore data")
+                        bundle = await async_firestore_client.get_context_bundle(property_id)
                     except Exception as e:
-                        logging.error(f"Error fetching enhanced property info: {e}")
-                        # Continue with limited property context
+                        handler_logger.error(f"Error loading context bundle for property {property_id}: {e}")
+
+                # Fill in detailed property information if needed
+                if bundle and (not property_context or len(property_context) < 3):  # Only has minimal info
+                    property_context.update(bundle.get('propertyContext') or {})
+                    property_context['property_id'] = property_id  # Ensure property_id is included for timezone detection
+                    session_info['property_context'] = property_context
+                    handler_logger.info(f"Enhanced property context for {sid} from context bundle {bundle.get('version')}")
 
                 # Build a more comprehensive initial greeting
                 property_name = property_context.get('name', f'Property {property_id}')
@@ -323,74 +266,10 @@ async def manage_gemini_live_session(sid, client, config, property_id, caller_nu
                 if 'wifiNetwork' in property_context and 'wifiPassword' in property_context:
                     greeting_parts.append(f"The WiFi network is {property_context['wifiNetwork']} and the password is {property_context['wifiPassword']}.")
 
-                # Fetch property knowledge items from Firestore (skip in fallback case)
-                if not is_fallback and property_id != "unknown":
-                    try:
-                        handler_logger.info(f"Fetching knowledge items for property {property_id}")
-                        # Get Firestore client
-                        from concierge.utils.firestore_client import get_firestore_client
-                        db = get_firestore_client()
-
-                        # Query knowledge items for this property
-                        knowledge_ref = db.collection('knowledge')
-                        query = knowledge_ref.where('propertyId', '==', property_id)
-                        knowledge_docs = query.stream()
-
-                        # Format knowledge items based on their type
-                        formatted_knowledge_items = []
-                        for doc in knowledge_docs:
-                            item = doc.to_dict()
-                            item_id = doc.id
-
-                            # Only include items with status 'active' or 'approved'
-                            status = item.get('status', '')
-                            if status.lower() not in ['active', 'approved']:
-                                continue
-
-                            # Get content and type
-                            content = item.get('content', '')
-                            item_type = item.get('type', '')
-                            tags = item.get('tags', [])
-
-                            if not content:
-                                continue
-
-                            # Format based on type
-                            if item_type.lower() == 'qa' or item_type.lower() == 'q&a':
-                                # Try to extract question and answer
-                                if 'question' in item and 'answer' in item:
-                                    question = item.get('question', '')
-                                    answer = item.get('answer', '')
-                                    if question and answer:
-                                        formatted_knowledge_items.append(f"Q: {question}\nA: {answer}")
-                                else:
-                                    # Assume content is already in Q&A format
-                                    formatted_knowledge_items.append(content)
-                            elif item_type.lower() == 'instruction':
-                                # Format as instruction
-                                formatted_knowledge_items.append(f"INSTRUCTION: {content}")
-                            elif item_type.lower() == 'info':
-                                # Format as information with tags
-                                tag_str = ', '.join(tags) if tags else 'general'
-                                formatted_knowledge_items.append(f"INFO ({tag_str}): {content}")
-                            elif item_type.lower() == 'places':
-                                # Format as places information
-                                formatted_knowledge_items.append(f"PLACES: {content}")
-                            else:
-                                # Default format with type and tags
-                                tag_str = ', '.join(tags) if tags else ''
-                                type_tag = f"{item_type.upper()}{' - ' + tag_str if tag_str else ''}"
-                                formatted_knowledge_items.append(f"{type_tag}: {content}")
-
-                        # Add formatted knowledge items to the prompt
-                        if formatted_knowledge_items:
-                            knowledge_text = "\n\n".join(formatted_knowledge_items)
-                            greeting_parts.append(f"\nProperty Knowledge Base:\n{knowledge_text}")
-                            handler_logger.info(f"Added {len(formatted_knowledge_items)} knowledge items from Firestore to system prompt")
-                    except Exception as e:
-                        handler_logger.error(f"Error fetching knowledge items: {e}")
-                        handler_logger.error(traceback.format_exc())
-                        # Continue without knowledge items
+                # Add the property's rendered knowledge base (skip in fallback case)
+                if not is_fallback and bundle and bundle.get('knowledgePrompt'):
+                    greeting_parts.append(f"\n{bundle['knowledgePrompt']}")
+                    handler_logger.info(f"Added {bundle.get('knowledgeCount', 0)} knowledge items from context bundle to system prompt")
 
                 # Add instructions for tool usage (different for fallback case)
                 if is_fallback:
@@ -690,6 +569,44 @@ async def end_gemini_live_session(sid):
         traceback.print_exc()
         return False
 
+def _prompt_history(session_info):
+    """History for the prompt: the running summary plus the messages not folded into it yet."""
+    state = session_info.get('history_compaction') or {'summary': '', 'folded': 0}
+    history = session_info.get('conversation_history', [])
+    summary_entry = [{'role': SUMMARY_ROLE, 'text': state['summary']}] if state['summary'] else []
+    return summary_entry + history[state['folded']:]
+
+
+def _advance_history_compaction(session_info, sid):
+    """
+    Fold older messages of a voice session into its running summary.
+
+    Only the messages added since the last fold are compacted, together with the
+    previous summary, so each message is summarized once. The session keeps the
+    full history for the end-of-call summary.
+    """
+    state = session_info.get('history_compaction') or {'summary': '', 'folded': 0}
+    pending = list(session_info.get('conversation_history', [])[state['folded']:])
+    summary_entry = [{'role': SUMMARY_ROLE, 'text': state['summary']}] if state['summary'] else []
+    summary, remaining = split_history(compact_history(summary_entry + pending, sid))
+    session_info['history_compaction'] = {
+        'summary': summary,
+        'folded': state['folded'] + len(pending) - len(remaining),
+    }
+
+
+async def _compact_session_history(session_info, sid):
+    if session_info.get('history_compaction_running'):
+        return
+    session_info['history_compaction_running'] = True
+    try:
+        await asyncio.to_thread(_advance_history_compaction, session_info, sid)
+    except Exception as e:
+        logging.warning(f"Could not compact voice history for {sid}: {e}")
+    finally:
+        session_info['history_compaction_running'] = False
+
+
 async def process_voice_query_with_rag(sid, transcription):
     """
     Process a transcribed voice query with RAG and update session context.
@@ -721,11 +638,10 @@ async def process_voice_query_with_rag(sid, transcription):
         if not 'guestName' in property_context and guest_name:
             property_context['guestName'] = guest_name
 
-        # Get conversation history
-        conversation_history = session_info.get('conversation_history', [])
-
-        # Get relevant context from LanceDB
-        rag_results = get_relevant_context(transcription, property_id)
+        # The prompt uses the session's running summary; folding newer messages
+        # into it runs in the background after this turn
+        conversation_history = _prompt_history(session_info)
+        rag_results = await asyncio.to_thread(get_relevant_context, transcription, property_id)
 
         # Store results for conversation tracking
         session_info['last_context_used'] = rag_results.get('items', [])
@@ -758,6 +674,7 @@ async def process_voice_query_with_rag(sid, transcription):
                 'timestamp': datetime.now(timezone.utc)
             }
             session_info['conversation_history'].append(conversation_entry)
+            asyncio.create_task(_compact_session_history(session_info, sid))
 
             # Store in Firestore if available
             await store_conversation_in_firestore(sid, 'user', transcription)
@@ -792,15 +709,8 @@ async def store_conversation_in_firestore(sid, role, text):
         return
 
     try:
-        # Import DynamoDB client functions dynamically to avoid circular imports
-        import importlib.util
-        spec = importlib.util.find_spec('concierge.utils.dynamodb_client')
-        if not spec:
-            logging.error("Could not import dynamodb_client module")
-            return
-
-        dynamodb_client = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(dynamodb_client)
+        # Import lazily to avoid circular imports (imported once, not re-executed per message)
+        from concierge.utils import dynamodb_client
 
         # Check if we have a conversation ID for this session
         conversation_id = session_info.get('conversation_id')
@@ -904,8 +814,7 @@ async def generate_conversation_summary(sid):
             logging.error("GEMINI_API_KEY not found in environment variables")
             return
 
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.0-flash')
+        model = get_legacy_model('gemini-2.0-flash')
 
         prompt = (
             "Please summarize the following conversation between a guest and an AI assistant. "
@@ -923,15 +832,8 @@ async def generate_conversation_summary(sid):
         summary = response.text
         logging.info(f"Generated summary for conversation {conversation_id}: {summary[:100]}...")
 
-        # Import DynamoDB client functions dynamically to avoid circular imports
-        import importlib.util
-        spec = importlib.util.find_spec('concierge.utils.dynamodb_client')
-        if not spec:
-            logging.error("Could not import dynamodb_client module")
-            return
-
-        dynamodb_client = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(dynamodb_client)
+        # Import lazily to avoid circular imports (imported once, not re-executed per message)
+        from concierge.utils import dynamodb_client
 
         # Update the conversation with the summary
         success = await asyncio.to_thread(
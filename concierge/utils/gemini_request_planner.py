@@ -0,0 +1,323 @@
+"""
+Request planner for the Gemini calls made while scraping Airbnb listings.
+
+The scraper used to call Gemini several times per listing (host name, listing
+normalization, JSON enhancement, house rule cleanup, consolidated processing,
+OCR), each call with its own retry/sleep loop. The planner funnels all of those
+through one place so that:
+
+- every call goes through the shared GeminiRateLimiter budget,
+- the listing-level validations are combined into one structured-output call,
+  and several listings can be validated in a single call,
+- results are cached by a hash of the page content and prompt, so re-importing
+  or retrying a listing does not spend the budget again.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Sequence, Union
+
+from concierge.utils.rate_limiter import rate_limited_gemini_call, PRIORITY_BATCH
+from concierge.utils.gemini_clients import get_legacy_model
+
+logger = logging.getLogger(__name__)
+
+# Default model used for scraper validations
+PLANNER_MODEL = 'gemini-2.0-flash'
+
+# Maximum number of listings combined into one batched validation call
+MAX_LISTINGS_PER_BATCH = 10
+
+
+def content_hash(*parts: Union[str, bytes, None]) -> str:
+    """Return a stable hash for the given page content / prompt parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if part is None:
+            part = b''
+        if isinstance(part, str):
+            part = part.encode('utf-8', errors='ignore')
+        digest.update(part)
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def _strip_code_fences(text: str) -> str:
+    """Remove ```json fences that the model sometimes adds around JSON output."""
+    text = (text or '').strip()
+    if text.startswith('```'):
+        parts = text.split('\n', 1)
+        text = parts[1] if len(parts) > 1 else ''
+        if text.endswith('```'):
+            text = text[:-3]
+    return text.strip()
+
+
+class GeminiRequestPlanner:
+    """
+    Plans, caches and rate limits the Gemini requests made by the Airbnb scraper.
+    """
+
+    def __init__(self, model_name: str = PLANNER_MODEL, max_cache_size: int = 500, ttl_seconds: int = 6 * 3600):
+        """
+        Initialize the planner.
+
+        Args:
+            model_name: Gemini model used for text and structured requests
+            max_cache_size: Maximum number of cached responses
+            ttl_seconds: Time-to-live for cached responses (default: 6 hours)
+        """
+        self.model_name = model_name
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._max_cache_size = max_cache_size
+        self._ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._calls = 0
+
+    # --- Cache helpers ---
+
+    def _cache_get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            if time.time() - entry['timestamp'] > self._ttl_seconds:
+                del self._cache[key]
+                self._misses += 1
+                return None
+            self._hits += 1
+            return entry['value']
+
+    def _cache_set(self, key: str, value: Any) -> None:
+        with self._lock:
+            if len(self._cache) >= self._max_cache_size:
+                oldest_key = min(self._cache.items(), key=lambda x: x[1]['timestamp'])[0]
+                del self._cache[oldest_key]
+            self._cache[key] = {'timestamp': time.time(), 'value': value}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache and call statistics for monitoring."""
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'api_calls': self._calls,
+                'cache_size': len(self._cache),
+            }
+
+    # --- Model access ---
+
+    def _get_model(self, model_name: str):
+        """Return the shared legacy GenerativeModel, or None if Gemini is unavailable."""
+        if not os.getenv('GEMINI_API_KEY'):
+            logger.debug("No Gemini API key found, skipping Gemini request")
+            return None
+        return get_legacy_model(model_name)
+
+    def _generate(self, contents: Any, json_output: bool, model_name: Optional[str]) -> str:
+        """Run one rate-limited generate_content call and return the response text."""
+        model = self._get_model(model_name or self.model_name)
+        if model is None:
+            return ''
+
+        kwargs = {}
+        if json_output:
+            kwargs['generation_config'] = {'response_mime_type': 'application/json'}
+
+        with self._lock:
+            self._calls += 1
+        # Scraping is background work: it must not crowd out live guest chat
+        response = rate_limited_gemini_call(model.generate_content, contents, max_retries=2,
+                                            model=model_name or self.model_name,
+                                            priority=PRIORITY_BATCH, **kwargs)
+        return response.text.strip() if response and response.text else ''
+
+    # --- Public request API ---
+
+    def generate_text(self, prompt: str, cache_key: Optional[str] = None, model_name: Optional[str] = None) -> str:
+        """
+        Generate free text for a prompt, cached by page content hash.
+
+        Args:
+            prompt: The full prompt
+            cache_key: Optional hash of the underlying page content; defaults to the prompt hash
+            model_name: Optional model override
+
+        Returns:
+            Response text, or empty string if the call failed
+        """
+        key = content_hash('text', model_name or self.model_name, cache_key or '', prompt)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        try:
+            text = self._generate(prompt, json_output=False, model_name=model_name)
+        except Exception as e:
+            logger.warning(f"Gemini text request failed: {e}")
+            return ''
+        if text:
+            self._cache_set(key, text)
+        return text
+
+    def generate_json(self, prompt: str, cache_key: Optional[str] = None, model_name: Optional[str] = None,
+                      images: Optional[Sequence[bytes]] = None) -> Optional[Any]:
+        """
+        Generate structured JSON output for a prompt, cached by page content hash.
+
+        Args:
+            prompt: The full prompt describing the expected JSON structure
+            cache_key: Optional hash of the underlying page content; defaults to the prompt hash
+            model_name: Optional model override
+            images: Optional PNG screenshots sent alongside the prompt
+
+        Returns:
+            Parsed JSON value, or None if the call or parsing failed
+
+        Raises:
+            Rate limit errors are re-raised so callers can decide how to degrade
+        """
+        image_list = list(images or [])
+        key = content_hash('json', model_name or self.model_name, cache_key or '', prompt, *image_list)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        contents: Any = prompt
+        if image_list:
+            contents = [prompt] + [{'mime_type': 'image/png', 'data': png} for png in image_list]
+
+        try:
+            text = self._generate(contents, json_output=True, model_name=model_name)
+        except Exception as e:
+            if '429' in str(e) or 'RESOURCE_EXHAUSTED' in str(e) or 'quota' in str(e).lower():
+                raise
+            logger.warning(f"Gemini structured request failed: {e}")
+            return None
+
+        if not text:
+            return None
+        try:
+            value = json.loads(_strip_code_fences(text))
+        except json.JSONDecodeError as e:
+            logger.warning(f"Could not parse Gemini JSON response: {e}")
+            return None
+
+        self._cache_set(key, value)
+        return value
+
+    # --- Listing validation ---
+
+    @staticmethod
+    def _listing_block(index: int, listing_data: Dict[str, Any], page_content_sample: str) -> str:
+        return (
+            f"LISTING {index}:\n"
+            f"- Title: \"{listing_data.get('title', '')}\"\n"
+            f"- Location: \"{listing_data.get('location', '')}\"\n"
+            f"- Property Type: \"{listing_data.get('property_type', '')}\"\n"
+            f"- Page content sample: {(page_content_sample or '')[:500]}...\n"
+        )
+
+    def validate_listings(self, items: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Validate and normalize title, location and property type for several listings.
+
+        Listings are combined into as few structured-output calls as possible
+        (MAX_LISTINGS_PER_BATCH per call), and each listing's result is cached by
+        the hash of its extracted fields and page sample.
+
+        Args:
+            items: List of dicts with 'listing' (listing data) and 'page_sample' keys
+
+        Returns:
+            List of validation dicts (or None) aligned with the input order
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        pending: List[int] = []
+        keys: List[str] = []
+
+        for i, item in enumerate(items):
+            listing = item.get('listing') or {}
+            key = content_hash('listing', listing.get('title'), listing.get('location'),
+                               listing.get('property_type'), (item.get('page_sample') or '')[:500])
+            keys.append(key)
+            cached = self._cache_get(key)
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.append(i)
+
+        for start in range(0, len(pending), MAX_LISTINGS_PER_BATCH):
+            chunk = pending[start:start + MAX_LISTINGS_PER_BATCH]
+            blocks = "\n".join(
+                self._listing_block(n, items[i].get('listing') or {}, items[i].get('page_sample', ''))
+                for n, i in enumerate(chunk)
+            )
+            prompt = f"""
+You are a data validation expert for Airbnb listings. Please review and normalize the extracted data for each of the {len(chunk)} listings below.
+
+{blocks}
+VALIDATION TASKS (for each listing):
+1. TITLE: Choose the best, most user-friendly title that clearly identifies the property
+2. LOCATION: Normalize to format "Neighborhood, City, State, Country" (if neighborhood available) or "City, State, Country"
+3. PROPERTY TYPE: Standardize to one of: House, Apartment, Condo, Studio, Villa, Cottage, Townhouse, Other
+
+RULES:
+- Keep titles descriptive but concise (under 60 characters)
+- For locations, include neighborhood if it's a well-known area
+- Use proper capitalization
+- Be consistent with naming conventions
+
+Respond with a JSON array containing exactly one object per listing, in the same order:
+[
+  {{
+    "index": 0,
+    "title": "normalized title",
+    "location": "normalized location",
+    "property_type": "normalized type",
+    "confidence": "high|medium|low",
+    "changes_made": ["list of changes"]
+  }}
+]
+"""
+            try:
+                response = self.generate_json(prompt)
+            except Exception as e:
+                logger.warning(f"Batched listing validation hit rate limit: {e}")
+                continue
+            if not isinstance(response, list):
+                continue
+
+            for position, entry in enumerate(response):
+                if not isinstance(entry, dict):
+                    continue
+                index = entry.get('index', position)
+                if not isinstance(index, int) or index < 0 or index >= len(chunk):
+                    continue
+                original_index = chunk[index]
+                results[original_index] = entry
+                self._cache_set(keys[original_index], entry)
+
+        return results
+
+    def validate_listing(self, listing_data: Dict[str, Any], page_content_sample: str) -> Optional[Dict[str, Any]]:
+        """Validate a single listing; shares the batched prompt and cache."""
+        return self.validate_listings([{'listing': listing_data, 'page_sample': page_content_sample}])[0]
+
+
+# Global planner instance shared by scraper instances in this process
+_request_planner = None
+
+
+def get_gemini_request_planner() -> GeminiRequestPlanner:
+    """Get or create the global Gemini request planner instance."""
+    global _request_planner
+    if _request_planner is None:
+        _request_planner = GeminiRequestPlanner()
+    return _request_planner
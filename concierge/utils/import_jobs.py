@@ -0,0 +1,599 @@
+"""
+Background job engine for Airbnb property imports.
+
+Imports used to run inside the HTTP request that started them, with cancellation
+tracked in a process-local dict. Jobs are now:
+
+- stored as durable records in the Firestore 'import_jobs' collection,
+- executed by a small per-process worker pool (the request returns immediately),
+- checkpointed per listing, so an interrupted job resumes where it stopped,
+- cancellable from any worker (the cancel flag lives on the job document),
+- reported to the browser as 'import_job_progress' Socket.IO events, with the
+  job document as the polling fallback.
+
+A job runs on whichever server instance claimed it, which need not be the one
+holding the browser's Socket.IO connection. With more than one instance,
+SOCKETIO_MESSAGE_QUEUE (see async_runtime) must be set so progress events
+reach clients connected elsewhere; without it those clients only see progress
+by polling the job.
+
+Every write a worker makes while running a job goes through _update_owned_job,
+which checks in a transaction that the worker still holds the lease. A worker
+whose lease expired (and whose job another worker resumed), or that cannot
+confirm its lease, stops instead of overwriting the new owner's results.
+Property creation is idempotent: the property ID is reserved in the listing's
+checkpoint first, so a resumed step finds the property an earlier attempt
+created instead of creating a duplicate.
+
+A running job's lease is renewed by a heartbeat thread. Jobs whose worker went
+away (recycled or crashed) are resumed by the resume_stale_import_jobs
+scheduler job once the lease expires, without waiting for the browser to poll.
+"""
+
+import os
+import time
+import uuid
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Any, Optional
+
+from firebase_admin import firestore
+
+from concierge.utils.firestore_client import get_firestore_db, get_user, update_user
+
+logger = logging.getLogger(__name__)
+
+IMPORT_JOBS_COLLECTION = 'import_jobs'
+
+# Number of import jobs one process runs at the same time
+IMPORT_JOB_WORKERS = int(os.getenv('IMPORT_JOB_WORKERS', '2'))
+
+# A running job whose lease has expired is considered abandoned and may be resumed.
+# The lease is renewed by a heartbeat while the job runs (deep extraction of a single
+# listing can take minutes), so it can be short and abandoned jobs are picked up quickly.
+JOB_LEASE_SECONDS = int(os.getenv('IMPORT_JOB_LEASE_SECONDS', '120'))
+LEASE_HEARTBEAT_SECONDS = int(os.getenv('IMPORT_JOB_HEARTBEAT_SECONDS', '30'))
+
+# Job statuses
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_COMPLETED = 'completed'
+STATUS_CANCELED = 'canceled'
+STATUS_FAILED = 'failed'
+FINAL_STATUSES = (STATUS_COMPLETED, STATUS_CANCELED, STATUS_FAILED)
+
+# Per-listing checkpoint statuses
+STEP_PENDING = 'pending'
+STEP_RUNNING = 'running'
+STEP_DONE = 'done'
+STEP_SKIPPED = 'skipped'
+STEP_FAILED = 'failed'
+
+# Worker identity for lease ownership (host + pid + random suffix)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_socketio = None
+
+
+def set_socketio(socketio) -> None:
+    """Register the SocketIO instance used to stream job progress events."""
+    global _socketio
+    _socketio = socketio
+
+    from concierge.utils.async_runtime import SOCKETIO_MESSAGE_QUEUE
+    if not SOCKETIO_MESSAGE_QUEUE:
+        logger.info("SOCKETIO_MESSAGE_QUEUE is not set: import job progress only reaches clients "
+                    "connected to this instance (set it when running more than one)")
+
+
+def import_job_room(job_id: str) -> str:
+    """Socket.IO room that receives progress events for a job."""
+    return f"import_job_{job_id}"
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Return the worker pool, creating it lazily (and again after a fork)."""
+    global _executor, _executor_pid, WORKER_ID
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=IMPORT_JOB_WORKERS, thread_name_prefix='import-job')
+            _executor_pid = os.getpid()
+            WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        return _executor
+
+
+def _job_ref(job_id: str):
+    db = get_firestore_db()
+    if not db:
+        return None
+    return db.collection(IMPORT_JOBS_COLLECTION).document(job_id)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _lease_expiry() -> datetime:
+    return _now() + timedelta(seconds=JOB_LEASE_SECONDS)
+
+
+def _emit(job_id: str, event: Dict[str, Any]) -> None:
+    """Send a progress event to clients watching the job (best effort)."""
+    if _socketio is None:
+        return
+    try:
+        payload = dict(event)
+        payload['job_id'] = job_id
+        _socketio.emit('import_job_progress', payload, room=import_job_room(job_id))
+    except Exception as e:
+        logger.debug(f"Failed to emit progress for import job {job_id}: {e}")
+
+
+# === Job records ===
+
+def create_import_job(user_id: str, user_url: str, listing_urls: List[str], job_id: str = None) -> Optional[str]:
+    """
+    Create a durable import job record.
+
+    Args:
+        user_id: Host user ID that owns the job
+        user_url: Airbnb user profile URL
+        listing_urls: Listing URLs to import, in order
+        job_id: Optional client-supplied job ID
+
+    Returns:
+        The job ID, or None if the record could not be created
+    """
+    job_id = job_id or f"import_{uuid.uuid4().hex}"
+    ref = _job_ref(job_id)
+    if ref is None:
+        return None
+
+    now = _now()
+    try:
+        ref.set({
+            'id': job_id,
+            'userId': user_id,
+            'userUrl': user_url,
+            'listings': list(listing_urls),
+            'checkpoints': {
+                str(i): {'url': url, 'status': STEP_PENDING} for i, url in enumerate(listing_urls)
+            },
+            'createdProperties': [],
+            'status': STATUS_QUEUED,
+            'cancelRequested': False,
+            'completedCount': 0,
+            'totalCount': len(listing_urls),
+            'workerId': None,
+            'leaseExpiresAt': None,
+            'error': None,
+            'createdAt': now,
+            'updatedAt': now,
+        })
+        logger.info(f"Created import job {job_id} with {len(listing_urls)} listings for user {user_id}")
+        return job_id
+    except Exception as e:
+        logger.error(f"Error creating import job {job_id}: {e}")
+        return None
+
+
+def get_import_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Get an import job record by ID."""
+    ref = _job_ref(job_id)
+    if ref is None:
+        return None
+    try:
+        doc = ref.get()
+        if not doc.exists:
+            return None
+        job = doc.to_dict()
+        job['id'] = doc.id
+        return job
+    except Exception as e:
+        logger.error(f"Error getting import job {job_id}: {e}")
+        return None
+
+
+def _update_job(job_id: str, update_data: Dict[str, Any]) -> bool:
+    ref = _job_ref(job_id)
+    if ref is None:
+        return False
+    try:
+        update_data['updatedAt'] = _now()
+        ref.update(update_data)
+        return True
+    except Exception as e:
+        logger.error(f"Error updating import job {job_id}: {e}")
+        return False
+
+
+class LeaseLostError(Exception):
+    """Raised when a worker tries to write to a job it no longer owns (or cannot confirm it does)."""
+
+
+class LeaseUnconfirmedError(LeaseLostError):
+    """Raised when the ownership check itself failed (e.g. Firestore unavailable)."""
+
+
+def _update_owned_job(job_id: str, update_data: Dict[str, Any]) -> None:
+    """
+    Update a running job, but only while this worker still holds its lease.
+
+    Raises:
+        LeaseLostError: If the job was taken over by another worker or is no longer running
+        LeaseUnconfirmedError: If ownership could not be checked; the caller must not assume it
+    """
+    db = get_firestore_db()
+    if not db:
+        raise LeaseUnconfirmedError(f"Firestore unavailable, cannot confirm the lease of import job {job_id}")
+    ref = db.collection(IMPORT_JOBS_COLLECTION).document(job_id)
+
+    @firestore.transactional
+    def _update(transaction):
+        snapshot = ref.get(transaction=transaction)
+        job = snapshot.to_dict() if snapshot.exists else {}
+        if job.get('workerId') != WORKER_ID or job.get('status') != STATUS_RUNNING:
+            return False
+        update_data['updatedAt'] = _now()
+        transaction.update(ref, update_data)
+        return True
+
+    try:
+        owned = _update(db.transaction())
+    except Exception as e:
+        raise LeaseUnconfirmedError(f"Error updating import job {job_id}: {e}") from e
+    if not owned:
+        raise LeaseLostError(f"Import job {job_id} is no longer owned by {WORKER_ID}")
+
+
+def request_cancel(job_id: str, user_id: str) -> bool:
+    """
+    Request cancellation of an import job. Any worker running the job sees the flag
+    before starting the next listing.
+
+    Returns:
+        True if the job exists, belongs to the user and was flagged (or already finished)
+    """
+    job = get_import_job(job_id)
+    if not job or job.get('userId') != user_id:
+        return False
+    if job.get('status') in FINAL_STATUSES:
+        return True
+    if job.get('status') == STATUS_QUEUED:
+        # Nobody picked it up yet; cancel directly
+        _update_job(job_id, {'cancelRequested': True, 'status': STATUS_CANCELED})
+        _emit(job_id, {'type': 'canceled', 'status': STATUS_CANCELED})
+        return True
+    return _update_job(job_id, {'cancelRequested': True})
+
+
+def is_job_stale(job: Dict[str, Any]) -> bool:
+    """Whether a running job's lease has expired (its worker likely died)."""
+    if job.get('status') != STATUS_RUNNING:
+        return False
+    lease = job.get('leaseExpiresAt')
+    return lease is None or lease < _now()
+
+
+def _claim_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Atomically take ownership of a queued or abandoned job.
+
+    Returns:
+        The job data if this worker now owns it, otherwise None
+    """
+    db = get_firestore_db()
+    if not db:
+        return None
+    ref = db.collection(IMPORT_JOBS_COLLECTION).document(job_id)
+
+    @firestore.transactional
+    def _claim(transaction):
+        snapshot = ref.get(transaction=transaction)
+        if not snapshot.exists:
+            return None
+        job = snapshot.to_dict()
+        status = job.get('status')
+        if status != STATUS_QUEUED and not is_job_stale(job):
+            return None
+        transaction.update(ref, {
+            'status': STATUS_RUNNING,
+            'workerId': WORKER_ID,
+            'leaseExpiresAt': _lease_expiry(),
+            'startedAt': job.get('startedAt') or _now(),
+            'updatedAt': _now(),
+        })
+        job['id'] = job_id
+        return job
+
+    try:
+        return _claim(db.transaction())
+    except Exception as e:
+        logger.error(f"Error claiming import job {job_id}: {e}")
+        return None
+
+
+def submit_import_job(job_id: str) -> None:
+    """Queue a job on this process's worker pool."""
+    _get_executor().submit(_run_import_job_safely, job_id)
+    logger.info(f"Submitted import job {job_id} to worker pool ({WORKER_ID})")
+
+
+def resume_import_job_if_stale(job: Dict[str, Any]) -> bool:
+    """Re-submit an abandoned job so it continues from its last checkpoint."""
+    if is_job_stale(job) and not job.get('cancelRequested'):
+        logger.info(f"Import job {job['id']} lease expired; resuming from checkpoint")
+        submit_import_job(job['id'])
+        return True
+    return False
+
+
+def resume_stale_import_jobs() -> Dict[str, int]:
+    """
+    Scheduler job: resume import jobs whose worker went away.
+
+    Running jobs with an expired lease, and queued jobs that no worker started
+    within JOB_LEASE_SECONDS, are re-submitted to this process's worker pool and
+    continue from their checkpoints. Abandoned jobs whose cancellation was
+    requested are marked canceled instead. When the scheduler runs as its own
+    process, the resumed jobs run there; their progress reaches the browser by
+    polling (or through SOCKETIO_MESSAGE_QUEUE).
+
+    Returns:
+        Counts of resumed and canceled jobs
+    """
+    counts = {'resumed': 0, 'canceled': 0}
+    db = get_firestore_db()
+    if not db:
+        return counts
+
+    queued_before = _now() - timedelta(seconds=JOB_LEASE_SECONDS)
+    query = db.collection(IMPORT_JOBS_COLLECTION).where('status', 'in', [STATUS_QUEUED, STATUS_RUNNING])
+    for doc in query.stream():
+        job = doc.to_dict() or {}
+        job['id'] = doc.id
+        if job.get('status') == STATUS_QUEUED:
+            created_at = job.get('createdAt')
+            if job.get('cancelRequested') or not created_at or created_at > queued_before:
+                continue
+        elif not is_job_stale(job):
+            continue
+
+        if job.get('cancelRequested'):
+            _update_job(job['id'], {'status': STATUS_CANCELED, 'leaseExpiresAt': None})
+            _emit(job['id'], {'type': 'canceled', 'status': STATUS_CANCELED})
+            counts['canceled'] += 1
+        else:
+            logger.info(f"Resuming abandoned import job {job['id']} ({job.get('status')})")
+            submit_import_job(job['id'])
+            counts['resumed'] += 1
+    return counts
+
+
+# === Job execution ===
+
+def _run_import_job_safely(job_id: str) -> None:
+    try:
+        _run_import_job(job_id)
+    except LeaseLostError as e:
+        logger.warning(f"{e}; stopping (the job continues from its last checkpoint under the lease holder)")
+    except Exception as e:
+        logger.error(f"Import job {job_id} crashed: {e}", exc_info=True)
+        try:
+            _update_owned_job(job_id, {'status': STATUS_FAILED, 'error': str(e), 'leaseExpiresAt': None})
+        except LeaseLostError:
+            return
+        _emit(job_id, {'type': 'failed', 'status': STATUS_FAILED, 'error': 'Import failed'})
+
+
+def _is_cancel_requested(job_id: str) -> bool:
+    job = get_import_job(job_id)
+    return bool(job and job.get('cancelRequested'))
+
+
+def _save_host_info(scraper, user_id: str, user_url: str) -> None:
+    """Save the Airbnb user link and host info to the user profile if not already saved."""
+    user_data = get_user(user_id) or {}
+    if user_data.get('airbnbUserLink'):
+        return
+
+    update_data = {'airbnbUserLink': user_url}
+    try:
+        host_info = scraper.extract_host_info(user_url)
+        if host_info.get('name'):
+            update_data['displayName'] = host_info['name']
+            logger.info(f"Extracted host name: {host_info['name']}")
+        if host_info.get('location'):
+            update_data['hostLocation'] = host_info['location']
+    except Exception as e:
+        logger.error(f"Error extracting host info: {e}")
+
+    try:
+        update_user(user_id, update_data)
+        logger.info(f"Updated user profile with: {update_data}")
+    except Exception as e:
+        logger.error(f"Error updating user profile: {e}")
+
+
+def _start_lease_heartbeat(job_id: str):
+    """
+    Renew the job's lease every LEASE_HEARTBEAT_SECONDS until stopped.
+
+    Returns:
+        (stop, lost) events: set `stop` when the job is done; `lost` is set when
+        the lease was taken over or could not be renewed before it expired
+    """
+    stop = threading.Event()
+    lost = threading.Event()
+
+    def renew():
+        renewed_at = time.monotonic()
+        while not stop.wait(LEASE_HEARTBEAT_SECONDS):
+            try:
+                _update_owned_job(job_id, {'leaseExpiresAt': _lease_expiry()})
+                renewed_at = time.monotonic()
+            except LeaseUnconfirmedError as e:
+                # The lease is still ours until it expires; keep trying until then
+                if time.monotonic() - renewed_at < JOB_LEASE_SECONDS:
+                    logger.warning(f"Could not renew the lease of import job {job_id}, retrying: {e}")
+                    continue
+                lost.set()
+                return
+            except LeaseLostError as e:
+                if not stop.is_set():
+                    logger.warning(f"{e}; stopping after the current step")
+                lost.set()
+                return
+
+    threading.Thread(target=renew, name=f"import-job-lease-{job_id}", daemon=True).start()
+    return stop, lost
+
+
+def _run_import_job(job_id: str) -> None:
+    """Run (or resume) an import job, checkpointing after every listing."""
+    job = _claim_job(job_id)
+    if job is None:
+        logger.info(f"Import job {job_id} is not claimable by {WORKER_ID}; skipping")
+        return
+
+    stop_heartbeat, lease_lost = _start_lease_heartbeat(job_id)
+    try:
+        _run_claimed_import_job(job_id, job, lease_lost)
+    finally:
+        stop_heartbeat.set()
+
+
+def _run_claimed_import_job(job_id: str, job: Dict[str, Any], lease_lost: threading.Event) -> None:
+    """Process the remaining listings of a job this worker has claimed."""
+    from concierge.utils.airbnb_scraper import AirbnbScraper
+
+    user_id = job['userId']
+    listings = job.get('listings', [])
+    checkpoints = job.get('checkpoints', {})
+    total = len(listings)
+    completed = sum(1 for cp in checkpoints.values() if cp.get('status') in (STEP_DONE, STEP_SKIPPED, STEP_FAILED))
+
+    _emit(job_id, {'type': 'started', 'status': STATUS_RUNNING, 'completed': completed, 'total': total})
+
+    scraper = AirbnbScraper(use_selenium=False)
+    _save_host_info(scraper, user_id, job.get('userUrl', ''))
+
+    for index, listing_url in enumerate(listings):
+        key = str(index)
+        if checkpoints.get(key, {}).get('status') in (STEP_DONE, STEP_SKIPPED, STEP_FAILED):
+            continue
+        if lease_lost.is_set():
+            raise LeaseLostError(f"Import job {job_id} lease lost by {WORKER_ID}")
+
+        # Cancellation is read from the job document so any worker can request it
+        if _is_cancel_requested(job_id):
+            logger.info(f"Import job {job_id} was canceled; stopping with partial results")
+            _update_owned_job(job_id, {'status': STATUS_CANCELED, 'leaseExpiresAt': None})
+            _emit(job_id, {'type': 'canceled', 'status': STATUS_CANCELED, 'completed': completed, 'total': total})
+            return
+
+        _update_owned_job(job_id, {
+            f'checkpoints.{key}.status': STEP_RUNNING,
+            f'checkpoints.{key}.startedAt': _now(),
+            'leaseExpiresAt': _lease_expiry(),
+        })
+        _emit(job_id, {'type': 'listing_started', 'index': index, 'url': listing_url,
+                       'completed': completed, 'total': total, 'step': 'Extracting listing details...'})
+
+        listing_details = scraper.extract_listing_details(listing_url)
+        if not listing_details:
+            logger.warning(f"Could not extract basic details for listing: {listing_url}")
+            completed += 1
+            _update_owned_job(job_id, {f'checkpoints.{key}.status': STEP_SKIPPED, 'completedCount': completed})
+            _emit(job_id, {'type': 'listing_skipped', 'index': index, 'url': listing_url,
+                           'completed': completed, 'total': total})
+            continue
+
+        _emit(job_id, {'type': 'listing_step', 'index': index, 'completed': completed, 'total': total,
+                       'step': 'Extracting amenities, house rules and safety information...'})
+        try:
+            extracted_data = scraper.extract_deep_property_data(listing_url)
+        except Exception as e:
+            # Deep extraction failures (e.g., 503 from Airbnb) stop the job, as the synchronous import did
+            logger.error(f"Deep extraction failed for {listing_url}: {e}")
+            _update_owned_job(job_id, {
+                f'checkpoints.{key}.status': STEP_FAILED,
+                f'checkpoints.{key}.error': str(e),
+                'status': STATUS_FAILED,
+                'error': f"Deep extraction failed for {listing_url}: {str(e)}",
+                'leaseExpiresAt': None,
+            })
+            _emit(job_id, {'type': 'failed', 'status': STATUS_FAILED,
+                           'error': f"Deep extraction failed for {listing_url}"})
+            return
+
+        # Reserve the property ID in the checkpoint before creating the property. This also confirms
+        # the job is still ours after the slow deep extraction; a resumed step reuses the reserved ID.
+        property_id = checkpoints.get(key, {}).get('propertyId') or str(uuid.uuid4())
+        _update_owned_job(job_id, {f'checkpoints.{key}.propertyId': property_id, 'leaseExpiresAt': _lease_expiry()})
+        _emit(job_id, {'type': 'listing_step', 'index': index, 'completed': completed, 'total': total,
+                       'step': 'Saving property to database...'})
+        property_id = scraper.create_property_from_extraction(user_id, listing_details, extracted_data,
+                                                              property_id=property_id)
+
+        completed += 1
+        if property_id:
+            created = {
+                'id': property_id,
+                'name': listing_details.get('title', 'Imported Property'),
+                'address': listing_details.get('location', ''),
+                'status': 'inactive',  # New properties start inactive
+                'new': True  # Flag for setup requirement
+            }
+            _update_owned_job(job_id, {
+                f'checkpoints.{key}.status': STEP_DONE,
+                f'checkpoints.{key}.propertyId': property_id,
+                'createdProperties': firestore.ArrayUnion([created]),
+                'completedCount': completed,
+                'leaseExpiresAt': _lease_expiry(),
+            })
+            logger.info(f"Import job {job_id}: imported property {property_id} ({completed}/{total})")
+            _emit(job_id, {'type': 'listing_done', 'index': index, 'property': created,
+                           'completed': completed, 'total': total})
+        else:
+            logger.error(f"Failed to create property for listing: {listing_url}")
+            _update_owned_job(job_id, {
+                f'checkpoints.{key}.status': STEP_FAILED,
+                f'checkpoints.{key}.error': 'Failed to create property',
+                'completedCount': completed,
+            })
+            _emit(job_id, {'type': 'listing_failed', 'index': index, 'url': listing_url,
+                           'completed': completed, 'total': total})
+
+    _update_owned_job(job_id, {'status': STATUS_COMPLETED, 'leaseExpiresAt': None, 'finishedAt': _now()})
+    final_job = get_import_job(job_id) or {}
+    _emit(job_id, {
+        'type': 'completed',
+        'status': STATUS_COMPLETED,
+        'created_properties': final_job.get('createdProperties', []),
+        'total_imported': len(final_job.get('createdProperties', [])),
+        'completed': completed,
+        'total': total,
+    })
+    logger.info(f"Import job {job_id} completed: {completed}/{total} listings processed")
+
+
+def serialize_import_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the client-facing view of an import job."""
+    created = job.get('createdProperties', [])
+    return {
+        'job_id': job.get('id'),
+        'status': job.get('status'),
+        'completed': job.get('completedCount', 0),
+        'total': job.get('totalCount', len(job.get('listings', []))),
+        'created_properties': created,
+        'total_imported': len(created),
+        'canceled': job.get('status') == STATUS_CANCELED,
+        'error': job.get('error'),
+    }
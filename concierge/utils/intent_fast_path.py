@@ -0,0 +1,352 @@
+"""
+Fast path for guest messages that do not need retrieval or the model.
+
+Every guest message used to pay for an embedding and a vector search (voice
+and RAG chat) or a full Gemini call (text chat), including "thanks" and "ok".
+The only shortcuts were first aid and coffee answers hardcoded for a single
+property. This module classifies a message before any of that happens:
+
+- Small talk (greetings, thanks, acknowledgements, goodbyes) is recognized by
+  whole-utterance patterns in SMALL_TALK_PATTERNS. Retrieval is skipped, and
+  text chat can answer with a canned reply.
+- Known FAQs are answered from a per-property index built from the property's
+  approved Q&A knowledge items (one projected query, no embeddings). Guest
+  questions are compared with the item questions by content-word overlap,
+  narrowed by the topic keyword tables in ai_helpers (WiFi, check-out,
+  parking, ...) so a parking question never matches a trash FAQ. A match of
+  at least INTENT_FAQ_MIN_SCORE is added to the vector search results.
+  Word overlap ignores order and small words ("turn on" vs "turn off" the
+  heater overlap almost fully), so an answer is only sent to the guest as is
+  when the message asks the FAQ's question itself: the same words in the
+  same order, ignoring articles, politeness and contractions.
+
+FAQ indexes are kept in memory, dropped by mark_context_bundle_stale whenever
+the property's knowledge changes, and rebuilt after
+INTENT_FAQ_INDEX_TTL_SECONDS to pick up writes made by other processes.
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+INTENT_FAST_PATH_ENABLED = os.getenv('INTENT_FAST_PATH_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# Content-word overlap (Dice coefficient, 0-1) for an FAQ to be added to the retrieved context
+INTENT_FAQ_MIN_SCORE = float(os.getenv('INTENT_FAQ_MIN_SCORE', '0.6'))
+INTENT_FAQ_INDEX_TTL_SECONDS = int(os.getenv('INTENT_FAQ_INDEX_TTL_SECONDS', '300'))
+
+# Small talk intents
+INTENT_GREETING = 'greeting'
+INTENT_THANKS = 'thanks'
+INTENT_ACKNOWLEDGEMENT = 'acknowledgement'
+INTENT_GOODBYE = 'goodbye'
+INTENT_FAQ = 'faq'
+
+# Whole-utterance patterns, matched against the normalized message
+SMALL_TALK_PATTERNS = {
+    INTENT_GREETING: r"(hi|hello|hey|hiya|howdy|greetings|good (morning|afternoon|evening))( there)?( staycee)?",
+    INTENT_THANKS: r"((ok|okay|great|perfect|awesome|cool|got it|nice) )?"
+                   r"(thanks|thank you|thx|ty|many thanks|much appreciated|appreciate it)"
+                   r"( (so much|very much|a lot|again))?( staycee)?",
+    INTENT_ACKNOWLEDGEMENT: r"(ok|okay|k|kk|ok cool|cool|great|perfect|awesome|nice|sounds good|got it|gotcha|"
+                            r"understood|alright|all right|noted|will do|makes sense|no worries)",
+    INTENT_GOODBYE: r"(bye|goodbye|bye bye|see you|see ya|good night|goodnight|have a (good|great|nice) (one|day|night))",
+}
+
+SMALL_TALK_REPLIES = {
+    INTENT_GREETING: "Hi{name}! How can I help you with your stay?",
+    INTENT_THANKS: "You're welcome{name}! Let me know if there's anything else I can help with.",
+    INTENT_ACKNOWLEDGEMENT: "Great! Let me know if you need anything else.",
+    INTENT_GOODBYE: "Goodbye{name}, enjoy your stay!",
+}
+
+# Words that carry no meaning for FAQ matching
+_STOPWORDS = frozenset("""
+a an the is are was were be been am do does did i me my we our you your it its this that these those
+of to in on at for from with by about into as and or but if so can could would should will shall may might
+must what where when which who whom how why there here please tell know any some get got have has had
+hi hello hey thanks thank just also need want like let s t theres whats wheres hows im
+""".split())
+
+# Spellings folded into one token before matching
+_COMPOUNDS = [
+    (re.compile(r'\bwi[\s-]?fi\b'), 'wifi'),
+    (re.compile(r'\bcheck[\s-]out\b'), 'checkout'),
+    (re.compile(r'\bcheck[\s-]in\b'), 'checkin'),
+    (re.compile(r'\bfirst[\s-]aid\b'), 'firstaid'),
+    (re.compile(r'\bpass[\s-]?code\b'), 'passcode'),
+]
+# Words dropped when comparing a message with an FAQ question word for word
+_QUESTION_FILLERS = frozenset("a an the please pls plz hi hello hey thanks staycee".split())
+# Contractions expanded (after apostrophes are removed) so negations stay visible
+_CONTRACTIONS = {
+    'whats': 'what is', 'wheres': 'where is', 'hows': 'how is', 'whens': 'when is', 'theres': 'there is',
+    'im': 'i am', 'dont': 'do not', 'doesnt': 'does not', 'cant': 'can not', 'cannot': 'can not',
+    'isnt': 'is not', 'arent': 'are not', 'wont': 'will not', 'shouldnt': 'should not',
+}
+_NON_WORD = re.compile(r"[^\w\s]+")
+_WORD = re.compile(r'\w+')
+
+_small_talk = {intent: re.compile(f"^(?:{pattern})$") for intent, pattern in SMALL_TALK_PATTERNS.items()}
+_topic_patterns: Optional[Dict[str, "re.Pattern"]] = None
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and emoji, fold compounds and collapse whitespace."""
+    text = (text or '').lower().replace("'", '').replace('’', '')
+    text = ' '.join(_NON_WORD.sub(' ', text).replace('_', ' ').split())
+    for pattern, replacement in _COMPOUNDS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def content_words(text: str) -> Set[str]:
+    """Distinct content words of a text, with simple plurals folded."""
+    words = set()
+    for word in _WORD.findall(normalize(text)):
+        if word in _STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        words.add(word)
+    return words
+
+
+def question_key(text: str) -> str:
+    """A question reduced to its words in order, without articles, politeness or contractions."""
+    words = []
+    for word in normalize(text).split():
+        words.extend(_CONTRACTIONS.get(word, word).split())
+    return ' '.join(word for word in words if word not in _QUESTION_FILLERS)
+
+
+def _topics():
+    """Topic keyword tables compiled into one pattern per topic (on first use)."""
+    global _topic_patterns
+    if _topic_patterns is None:
+        from concierge.utils.ai_helpers import (
+            WIFI_RELATED_TERMS, CONTACT_RELATED_TERMS, CHECKOUT_RELATED_TERMS, CHECKIN_RELATED_TERMS,
+            PARKING_RELATED_TERMS, TRASH_RELATED_TERMS, COFFEE_RELATED_TERMS, FIRST_AID_RELATED_TERMS
+        )
+        tables = {
+            'wifi': WIFI_RELATED_TERMS,
+            'contact': CONTACT_RELATED_TERMS,
+            'checkout': CHECKOUT_RELATED_TERMS,
+            'checkin': CHECKIN_RELATED_TERMS,
+            'parking': PARKING_RELATED_TERMS,
+            'trash': TRASH_RELATED_TERMS,
+            'coffee': COFFEE_RELATED_TERMS,
+            'first_aid': FIRST_AID_RELATED_TERMS,
+        }
+        _topic_patterns = {
+            topic: re.compile(r'\b(?:' + '|'.join(sorted({re.escape(normalize(term)) for term in terms},
+                                                         key=len, reverse=True)) + r')s?\b')
+            for topic, terms in tables.items()
+        }
+    return _topic_patterns
+
+
+def topics(text: str) -> Set[str]:
+    """Topics (keys of the keyword tables) mentioned in a text."""
+    normalized = normalize(text)
+    return {topic for topic, pattern in _topics().items() if pattern.search(normalized)}
+
+
+def classify_small_talk(text: str) -> Optional[str]:
+    """Return the small talk intent of a whole message, or None."""
+    normalized = normalize(text)
+    if not normalized or len(normalized) > 60:
+        return None
+    for intent, pattern in _small_talk.items():
+        if pattern.match(normalized):
+            return intent
+    return None
+
+
+def small_talk_reply(intent: str, guest_name: str = '') -> Optional[str]:
+    """Canned reply for a small talk intent."""
+    template = SMALL_TALK_REPLIES.get(intent)
+    if template is None:
+        return None
+    first_name = (guest_name or '').strip().split(' ')[0]
+    return template.format(name=f" {first_name}" if first_name else '')
+
+
+class FastPathMatch:
+    """Outcome of classifying one guest message."""
+
+    def __init__(self, intent: str, item: Optional[Dict] = None, score: float = 1.0, answerable: bool = False):
+        self.intent = intent
+        self.item = item
+        self.score = score
+        self.answerable = answerable
+
+    @property
+    def is_small_talk(self) -> bool:
+        return self.intent != INTENT_FAQ
+
+    @property
+    def answer(self) -> Optional[str]:
+        return self.item.get('answer') if self.item else None
+
+    @property
+    def text(self) -> Optional[str]:
+        """The FAQ as a retrieval result text."""
+        if not self.item:
+            return None
+        return f"Question: {self.item['question']}\nAnswer: {self.item['answer']}"
+
+
+class FaqIndex:
+    """
+    Keyword index over the approved Q&A knowledge items of one property.
+    """
+
+    def __init__(self, property_id: str):
+        """
+        Initialize an empty index.
+
+        Args:
+            property_id: Property the index belongs to
+        """
+        self.property_id = property_id
+        self.built_at = time.time()
+        # item_id -> (item, question words, question topics, question key)
+        self._entries: Dict[str, Tuple[Dict, Set[str], Set[str], str]] = {}
+        self._by_word: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, item: Dict) -> None:
+        """Index a Q&A knowledge item (items without question or answer are ignored)."""
+        question, answer = item.get('question'), item.get('answer')
+        if not question or not answer or not item.get('id'):
+            return
+        words = content_words(question)
+        if not words:
+            return
+        entry = {'id': item['id'], 'question': question, 'answer': answer}
+        self._entries[item['id']] = (entry, words, topics(question), question_key(question))
+        for word in words:
+            self._by_word.setdefault(word, set()).add(item['id'])
+
+    def match(self, text: str) -> Optional[Tuple[Dict, float, bool, bool]]:
+        """
+        Find the FAQ whose question best matches a guest message.
+
+        Returns:
+            (item, score, ambiguous, exact) for the best match, or None.
+            `ambiguous` is True when another FAQ with a different answer scores
+            the same; `exact` when the message asks the FAQ's question itself
+            (same question_key).
+        """
+        words = content_words(text)
+        if not words:
+            return None
+        query_topics = topics(text)
+        key = question_key(text)
+        candidates = set()
+        for word in words:
+            candidates.update(self._by_word.get(word, ()))
+
+        scored = []
+        for item_id in candidates:
+            item, item_words, item_topics, item_key = self._entries[item_id]
+            if query_topics and item_topics and not query_topics & item_topics:
+                continue
+            score = 2 * len(words & item_words) / (len(words) + len(item_words))
+            scored.append((score, item_key == key, item))
+        if not scored:
+            return None
+
+        # Exact questions first, then by overlap
+        scored.sort(key=lambda entry: (entry[1], entry[0]), reverse=True)
+        best_score, exact, best = scored[0]
+        ambiguous = any(score == best_score and same == exact and item['answer'] != best['answer']
+                        for score, same, item in scored[1:])
+        return best, best_score, ambiguous, exact
+
+
+_indexes: Dict[str, FaqIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def _build_index(property_id: str) -> FaqIndex:
+    """Build a property's FAQ index from its (projected, embedding-free) knowledge item listing."""
+    from concierge.utils.firestore_client import list_knowledge_items_by_property
+    from concierge.utils.context_bundle import PROMPT_KNOWLEDGE_STATUSES
+
+    index = FaqIndex(property_id)
+    for item in list_knowledge_items_by_property(property_id):
+        if (item.get('status') or '').lower() in PROMPT_KNOWLEDGE_STATUSES:
+            index.add(item)
+    logger.info(f"Built FAQ index for property {property_id} with {len(index)} questions")
+    return index
+
+
+def get_faq_index(property_id: str) -> Optional[FaqIndex]:
+    """Get the FAQ index for a property, building it on first use and after the TTL."""
+    with _indexes_lock:
+        index = _indexes.get(property_id)
+    if index is not None and time.time() - index.built_at < INTENT_FAQ_INDEX_TTL_SECONDS:
+        return index
+
+    try:
+        index = _build_index(property_id)
+    except Exception as e:
+        logger.error(f"Error building FAQ index for property {property_id}: {e}")
+        return None
+    with _indexes_lock:
+        _indexes[property_id] = index
+    return index
+
+
+def drop_index(property_id: str) -> None:
+    """Discard a property's FAQ index (it is rebuilt on the next message)."""
+    with _indexes_lock:
+        _indexes.pop(property_id, None)
+
+
+def classify(text: str, property_id: Optional[str] = None) -> Optional[FastPathMatch]:
+    """
+    Classify a guest message for the fast path.
+
+    Args:
+        text: The guest's message
+        property_id: Property whose FAQs to match (small talk only if omitted)
+
+    Returns:
+        FastPathMatch for small talk or a matching FAQ, or None. An FAQ match is
+        `answerable` (can be sent without the model) only when the message asks
+        the FAQ's question itself.
+    """
+    if not INTENT_FAST_PATH_ENABLED or not text or not text.strip():
+        return None
+
+    intent = classify_small_talk(text)
+    if intent:
+        return FastPathMatch(intent)
+
+    if not property_id:
+        return None
+    index = get_faq_index(property_id)
+    found = index.match(text) if index is not None else None
+    if not found:
+        return None
+    item, score, ambiguous, exact = found
+    if score < INTENT_FAQ_MIN_SCORE and not exact:
+        return None
+    return FastPathMatch(INTENT_FAQ, item=item, score=score, answerable=exact and not ambiguous)
+
+
+def last_assistant_message(conversation_history: Optional[List[Dict]]) -> str:
+    """Text of the most recent assistant message in a role/text history."""
+    for message in reversed(conversation_history or []):
+        if (message.get('role') or '').lower() in ('assistant', 'model', 'ai'):
+            return message.get('text') or message.get('content') or ''
+    return ''
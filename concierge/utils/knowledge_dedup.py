@@ -0,0 +1,233 @@
+"""
+Per-property duplicate detection index for knowledge items.
+
+check_duplicate_content used to load every knowledge item of the property
+(embeddings included) and compare lowercased strings one by one, so a bulk
+import of n items did O(n^2) work and missed duplicates that differ by a word
+or some punctuation. Each property now has an index that answers "is this
+content already in the knowledge base?" in constant time:
+
+- Exact duplicates: a SHA-256 of the content, lowercased and with whitespace
+  collapsed, looked up in a dict. Punctuation is kept: "Press # then 1234"
+  and "Press * then 1234" are different instructions.
+- Near duplicates: a MinHash signature of the content's set of words, split
+  into KNOWLEDGE_DEDUP_BANDS locality-sensitive buckets. Only items sharing a
+  bucket are compared, and an item counts as a duplicate when the estimated
+  word overlap (Jaccard similarity) is at least KNOWLEDGE_DEDUP_MIN_SIMILARITY.
+
+An index is built from one projected query (content only, no embeddings)
+the first time a property is checked, is updated in place by the knowledge
+item writes in firestore_client, and is rebuilt after
+KNOWLEDGE_DEDUP_INDEX_TTL_SECONDS to pick up writes made by other processes.
+"""
+
+import os
+import re
+import time
+import random
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_DEDUP_MIN_SIMILARITY = float(os.getenv('KNOWLEDGE_DEDUP_MIN_SIMILARITY', '0.8'))
+KNOWLEDGE_DEDUP_INDEX_TTL_SECONDS = int(os.getenv('KNOWLEDGE_DEDUP_INDEX_TTL_SECONDS', '300'))
+# Texts with fewer distinct words are only matched exactly
+KNOWLEDGE_DEDUP_MIN_WORDS = 5
+
+# 16 bands of 4 rows: items with 80% word overlap share a band with ~99.9% probability
+KNOWLEDGE_DEDUP_BANDS = 16
+_BAND_ROWS = 4
+_NUM_PERMUTATIONS = KNOWLEDGE_DEDUP_BANDS * _BAND_ROWS
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(1729)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+                 for _ in range(_NUM_PERMUTATIONS)]
+_WORD = re.compile(r'\w+')
+
+# Duplicate kinds returned by find_duplicate
+DUPLICATE_EXACT = 'exact'
+DUPLICATE_NEAR = 'near'
+
+
+def _words(content: str) -> List[str]:
+    return _WORD.findall((content or '').lower())
+
+
+def content_hash(content: str) -> str:
+    """SHA-256 of the content with case and whitespace normalized (punctuation is significant)."""
+    return hashlib.sha256(' '.join((content or '').lower().split()).encode('utf-8')).hexdigest()
+
+
+def minhash(content: str) -> Optional[Tuple[int, ...]]:
+    """MinHash signature of the content's distinct words, or None for texts too short to compare."""
+    words = set(_words(content))
+    if len(words) < KNOWLEDGE_DEDUP_MIN_WORDS:
+        return None
+    hashes = [int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'big')
+              for word in words]
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def _bands(signature: Tuple[int, ...]):
+    return [(band, signature[band * _BAND_ROWS:(band + 1) * _BAND_ROWS]) for band in range(KNOWLEDGE_DEDUP_BANDS)]
+
+
+def _similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / _NUM_PERMUTATIONS
+
+
+class KnowledgeDedupIndex:
+    """
+    Exact and near-duplicate lookup for the knowledge items of one property.
+    """
+
+    def __init__(self, property_id: str, min_similarity: float = KNOWLEDGE_DEDUP_MIN_SIMILARITY):
+        """
+        Initialize an empty index.
+
+        Args:
+            property_id: Property the index belongs to
+            min_similarity: Minimum estimated word overlap (0-1) for a near duplicate
+        """
+        self.property_id = property_id
+        self.built_at = time.time()
+        self._min_similarity = min_similarity
+        self._by_hash: Dict[str, Set[str]] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[str]] = {}
+        # item_id -> (content hash, MinHash signature or None)
+        self._items: Dict[str, Tuple[str, Optional[Tuple[int, ...]]]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, item_id: str, content: str) -> None:
+        """Add an item, or replace it after its content changed."""
+        if not content:
+            return
+        digest, signature = content_hash(content), minhash(content)
+        with self._lock:
+            self._remove(item_id)
+            self._items[item_id] = (digest, signature)
+            self._by_hash.setdefault(digest, set()).add(item_id)
+            if signature is not None:
+                for band in _bands(signature):
+                    self._buckets.setdefault(band, set()).add(item_id)
+
+    def remove(self, item_id: str) -> None:
+        """Remove an item from the index."""
+        with self._lock:
+            self._remove(item_id)
+
+    def _remove(self, item_id: str) -> None:
+        entry = self._items.pop(item_id, None)
+        if entry is None:
+            return
+        digest, signature = entry
+        self._by_hash.get(digest, set()).discard(item_id)
+        if signature is not None:
+            for band in _bands(signature):
+                self._buckets.get(band, set()).discard(item_id)
+
+    def find_duplicate(self, content: str, near: bool = True) -> Optional[Tuple[str, str]]:
+        """
+        Find an indexed item with the same or nearly the same content.
+
+        Returns:
+            (item_id, DUPLICATE_EXACT or DUPLICATE_NEAR), or None
+        """
+        digest = content_hash(content)
+        signature = minhash(content) if near else None
+        with self._lock:
+            exact = self._by_hash.get(digest)
+            if exact:
+                return next(iter(exact)), DUPLICATE_EXACT
+            if signature is None:
+                return None
+
+            candidates = set()
+            for band in _bands(signature):
+                candidates.update(self._buckets.get(band, ()))
+            best = None
+            for item_id in candidates:
+                similarity = _similarity(signature, self._items[item_id][1])
+                if similarity >= self._min_similarity and (best is None or similarity > best[1]):
+                    best = (item_id, similarity)
+        return (best[0], DUPLICATE_NEAR) if best else None
+
+
+_indexes: Dict[str, KnowledgeDedupIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def _build_index(property_id: str) -> Optional[KnowledgeDedupIndex]:
+    """Build a property's index from one query that skips embeddings."""
+    from concierge.utils.firestore_client import initialize_firebase, get_firestore_db
+
+    if not initialize_firebase():
+        return None
+    db = get_firestore_db()
+    index = KnowledgeDedupIndex(property_id)
+    query = (db.collection('knowledge_items')
+             .where('propertyId', '==', property_id)
+             .select(['content']))
+    for doc in query.stream():
+        index.add(doc.id, (doc.to_dict() or {}).get('content'))
+    logger.info(f"Built knowledge dedup index for property {property_id} with {len(index)} items")
+    return index
+
+
+def get_dedup_index(property_id: str) -> Optional[KnowledgeDedupIndex]:
+    """Get the dedup index for a property, building it on first use and after the TTL."""
+    with _indexes_lock:
+        index = _indexes.get(property_id)
+    if index is not None and time.time() - index.built_at < KNOWLEDGE_DEDUP_INDEX_TTL_SECONDS:
+        return index
+
+    try:
+        index = _build_index(property_id)
+    except Exception as e:
+        logger.error(f"Error building knowledge dedup index for property {property_id}: {e}")
+        return None
+    if index is not None:
+        with _indexes_lock:
+            _indexes[property_id] = index
+    return index
+
+
+def find_duplicate(property_id: str, content: str, near: bool = True) -> Optional[Tuple[str, str]]:
+    """
+    Find a knowledge item of the property whose content duplicates `content`.
+
+    Returns:
+        (item_id, DUPLICATE_EXACT or DUPLICATE_NEAR), or None
+    """
+    if not property_id or not content or not content.strip():
+        return None
+    index = get_dedup_index(property_id)
+    return index.find_duplicate(content, near=near) if index is not None else None
+
+
+def record_item(property_id: str, item_id: str, content: str) -> None:
+    """Add a written knowledge item to its property's index, if that index is loaded."""
+    with _indexes_lock:
+        index = _indexes.get(property_id)
+    if index is not None:
+        index.add(item_id, content)
+
+
+def forget_item(property_id: str, item_id: str) -> None:
+    """Remove a deleted knowledge item from its property's index, if that index is loaded."""
+    with _indexes_lock:
+        index = _indexes.get(property_id)
+    if index is not None:
+        index.remove(item_id)
+
+
+def drop_index(property_id: str) -> None:
+    """Discard a property's index (it is rebuilt on the next check)."""
+    with _indexes_lock:
+        _indexes.pop(property_id, None)
@@ -0,0 +1,86 @@
+"""
+Init-phase helpers shared by the Lambda handlers.
+
+A Lambda execution environment serves many invocations one at a time, so
+anything created during init (module import) or on first use is reused by
+every warm invocation that follows. The handlers use these helpers instead of
+creating clients per call:
+
+- `get_dynamodb_resource` / `get_table`: one boto3 DynamoDB resource and one
+  Table object per table name.
+- `get_apigw_management_client`: one API Gateway management client per
+  endpoint URL (the endpoint is only known from the first event).
+- `run_async`: runs the handler coroutine on one event loop kept for the life
+  of the environment. asyncio.run would create and close a loop per
+  invocation, discarding loop-bound clients such as the async Firestore client.
+- `record_invocation`: logs how long init took and whether the invocation was
+  a cold start, per route.
+
+Heavy SDKs (google-genai, firebase_admin, numpy via ai_helpers, telnyx) are
+imported by the handlers only on the routes that need them.
+"""
+
+import time
+import asyncio
+import logging
+from typing import Any, Coroutine, Dict, Optional
+
+import boto3
+
+logger = logging.getLogger(__name__)
+
+_dynamodb = None
+_tables: Dict[str, Any] = {}
+_apigw_clients: Dict[str, Any] = {}
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_cold_start = True
+
+
+def get_dynamodb_resource():
+    """Get the boto3 DynamoDB resource shared by all invocations."""
+    global _dynamodb
+    if _dynamodb is None:
+        _dynamodb = boto3.resource('dynamodb')
+    return _dynamodb
+
+
+def get_table(table_name: str):
+    """Get a DynamoDB Table object, created once per table name."""
+    table = _tables.get(table_name)
+    if table is None:
+        table = _tables[table_name] = get_dynamodb_resource().Table(table_name)
+    return table
+
+
+def get_apigw_management_client(endpoint_url: str):
+    """Get the API Gateway management client for a WebSocket API endpoint."""
+    client = _apigw_clients.get(endpoint_url)
+    if client is None:
+        client = _apigw_clients[endpoint_url] = boto3.client('apigatewaymanagementapi', endpoint_url=endpoint_url)
+    return client
+
+
+def run_async(coro: Coroutine) -> Any:
+    """Run a coroutine to completion on the environment's long-lived event loop."""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop.run_until_complete(coro)
+
+
+def record_invocation(handler_name: str, route: str, init_started_at: float) -> bool:
+    """
+    Log the init duration on a cold start and return whether this invocation was one.
+
+    Args:
+        handler_name: Name of the Lambda handler module
+        route: Route or event type being served
+        init_started_at: time.perf_counter() value taken at the top of the handler module
+    """
+    global _cold_start
+    cold_start, _cold_start = _cold_start, False
+    if cold_start:
+        init_ms = (time.perf_counter() - init_started_at) * 1000
+        logger.info(f"{handler_name} cold start on route {route}: init {init_ms:.0f} ms")
+    return cold_start
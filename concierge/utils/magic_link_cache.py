@@ -0,0 +1,101 @@
+"""
+Short-lived cache of resolved magic link tokens.
+
+Every step of the guest onboarding flow (/magic/<token>, phone verification,
+name entry, reservation selection, the dashboard) resolves the token again:
+a query on properties.magicLinkToken for property links, then a read of the
+magic_links document for legacy reservation links. A successful resolution
+is now kept in process for MAGIC_LINK_CACHE_TTL_SECONDS:
+
+- Entries are keyed by the SHA-256 of the token (hash_magic_link_token), so
+  raw tokens are never kept as keys.
+- Only valid links are cached. Unknown, inactive and revoked tokens are
+  resolved again on every request, so reactivating a property or issuing a
+  new link takes effect immediately.
+- Hits are revocation-checked, not just TTL-bound: firestore_client re-reads
+  the fields that can revoke a link (the property's status and
+  magicLinkToken, or the legacy link's is_active/status/expires_at) with a
+  projected read on every hit. A link revoked or deactivated by any process
+  stops resolving at once. The TTL only bounds how stale the other cached
+  fields can get.
+- Writes in this process (revoke_magic_link, update_magic_link, property
+  updates) also drop the entries they affect.
+
+Callers get a deep copy, so the routes can annotate the returned dict.
+"""
+
+import os
+import copy
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC_LINK_CACHE_TTL_SECONDS = int(os.getenv('MAGIC_LINK_CACHE_TTL_SECONDS', '60'))
+MAGIC_LINK_CACHE_MAX_ENTRIES = 5000
+
+# Resolution kinds
+RESOLVED_PROPERTY = 'property'
+RESOLVED_LEGACY = 'legacy'
+
+MISSING = object()
+
+# (token hash, kind) -> (expires at, resolved document)
+_entries: Dict[Tuple[str, str], Tuple[float, Dict]] = {}
+# property_id -> token hashes resolved to it
+_by_property: Dict[str, Set[str]] = {}
+_lock = threading.Lock()
+
+
+def get_resolved(token_hash: str, kind: str) -> Any:
+    """Return a copy of the cached resolution, or MISSING."""
+    if MAGIC_LINK_CACHE_TTL_SECONDS <= 0:
+        return MISSING
+    with _lock:
+        entry = _entries.get((token_hash, kind))
+        if entry is None:
+            return MISSING
+        if entry[0] <= time.time():
+            del _entries[(token_hash, kind)]
+            return MISSING
+        return copy.deepcopy(entry[1])
+
+
+def remember(token_hash: str, kind: str, resolved: Optional[Dict], property_id: Optional[str] = None) -> None:
+    """Cache a valid resolution (tokens that resolve to nothing are not cached)."""
+    if MAGIC_LINK_CACHE_TTL_SECONDS <= 0 or not resolved:
+        return
+    with _lock:
+        if len(_entries) >= MAGIC_LINK_CACHE_MAX_ENTRIES:
+            now = time.time()
+            for key in [key for key, entry in _entries.items() if entry[0] <= now]:
+                del _entries[key]
+            if len(_entries) >= MAGIC_LINK_CACHE_MAX_ENTRIES:
+                _entries.clear()
+                _by_property.clear()
+        _entries[(token_hash, kind)] = (time.time() + MAGIC_LINK_CACHE_TTL_SECONDS, copy.deepcopy(resolved))
+        if property_id:
+            _by_property.setdefault(property_id, set()).add(token_hash)
+
+
+def forget(token_hash: str) -> None:
+    """Drop every cached resolution of a token (after it was revoked, updated or created)."""
+    with _lock:
+        for kind in (RESOLVED_PROPERTY, RESOLVED_LEGACY):
+            _entries.pop((token_hash, kind), None)
+
+
+def forget_property(property_id: str) -> None:
+    """Drop the cached resolutions of every token that resolved to a property."""
+    with _lock:
+        for token_hash in _by_property.pop(property_id, set()):
+            _entries.pop((token_hash, RESOLVED_PROPERTY), None)
+
+
+def clear() -> None:
+    """Drop the whole cache."""
+    with _lock:
+        _entries.clear()
+        _by_property.clear()
@@ -6,14 +6,25 @@ This module provides functions to:
 - Get accurate distances and travel times
 - Retrieve detailed place information (hours, ratings, reviews, price level)
 - Calculate routes with different travel modes (walking, driving, transit, biking)
+
+Geocodes, nearby searches, place details and distances are served from
+places_cache when possible, so repeated guest questions about the same
+property do not call Google again.
 """
 
 import os
+import time
 import logging
 import requests
 from typing import Dict, List, Optional, Tuple
 from functools import lru_cache
 
+from concierge.utils.places_cache import (
+    cache_key, get_cached, set_cached, geohash,
+    PLACES_GEOCODE_TTL_SECONDS, PLACES_NEARBY_TTL_SECONDS, PLACES_DETAILS_TTL_SECONDS,
+    PLACES_DISTANCE_TTL_SECONDS, PLACES_OPEN_NOW_TTL_SECONDS
+)
+
 logger = logging.getLogger(__name__)
 
 # Google Places API configuration
@@ -22,6 +33,9 @@ PLACES_API_BASE_URL = "https://maps.googleapis.com/maps/api/place"
 DISTANCE_MATRIX_API_URL = "https://maps.googleapis.com/maps/api/distancematrix/json"
 DIRECTIONS_API_URL = "https://maps.googleapis.com/maps/api/directions/json"
 
+# Distance Matrix accepts at most 25 destinations per request
+DISTANCE_MATRIX_MAX_DESTINATIONS = 25
+
 # Place type mappings for better categorization
 PLACE_TYPE_MAP = {
     'restaurant': 'restaurant',
@@ -59,6 +73,11 @@ def get_coordinates_from_address(address: str) -> Optional[Tuple[float, float]]:
     if not GOOGLE_PLACES_API_KEY:
         logger.warning("Google Places API key not configured")
         return None
+
+    key = cache_key('geocode', address)
+    cached = get_cached(key)
+    if cached:
+        return (cached['lat'], cached['lng'])
     
     try:
         url = "https://maps.googleapis.com/maps/api/geocode/json"
@@ -73,6 +92,7 @@ def get_coordinates_from_address(address: str) -> Optional[Tuple[float, float]]:
         
         if data.get('status') == 'OK' and data.get('results'):
             location = data['results'][0]['geometry']['location']
+            set_cached(key, {'lat': location['lat'], 'lng': location['lng']}, PLACES_GEOCODE_TTL_SECONDS)
             return (location['lat'], location['lng'])
         else:
             logger.warning(f"Geocoding failed for address: {address}, status: {data.get('status')}")
@@ -120,7 +140,7 @@ def search_nearby_places(
         # Get coordinates from address if needed
         if ',' in location and location.replace(',', '').replace('.', '').replace('-', '').replace(' ', '').isdigit():
             # Already coordinates
-            coordinates = location
+            lat, lng = (float(part) for part in location.split(',')[:2])
         else:
             # Convert address to coordinates
             coords = get_coordinates_from_address(location)
@@ -130,68 +150,42 @@ def search_nearby_places(
                     'error': f'Could not geocode location: {location}',
                     'places': []
                 }
-            coordinates = f"{coords[0]},{coords[1]}"
-        
-        # Build request parameters
-        url = f"{PLACES_API_BASE_URL}/nearbysearch/json"
-        params = {
-            'location': coordinates,
-            'radius': radius,
-            'key': GOOGLE_PLACES_API_KEY
-        }
-        
+            lat, lng = coords
+
         # Map place type to Google's format
-        if place_type:
-            mapped_type = PLACE_TYPE_MAP.get(place_type.lower(), place_type)
-            params['type'] = mapped_type
-        
-        if keyword:
-            params['keyword'] = keyword
-        
-        if open_now:
-            params['opennow'] = 'true'
-        
-        # Make API request
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        if data.get('status') != 'OK':
-            logger.warning(f"Places API returned status: {data.get('status')}")
-            if data.get('status') == 'ZERO_RESULTS':
-                return {
-                    'success': True,
-                    'places': [],
-                    'message': 'No places found matching your criteria'
-                }
+        mapped_type = PLACE_TYPE_MAP.get(place_type.lower(), place_type) if place_type else None
+
+        search = _nearby_search(lat, lng, mapped_type, keyword, radius, open_now)
+        if 'error' in search:
             return {
                 'success': False,
-                'error': f"Places API error: {data.get('status')}",
+                'error': search['error'],
                 'places': []
             }
-        
+        if not search['places']:
+            return {
+                'success': True,
+                'places': [],
+                'message': 'No places found matching your criteria'
+            }
+
+        # open_now of an older cached search may no longer hold
+        stale_open_now = time.time() - search['fetched_at'] > PLACES_OPEN_NOW_TTL_SECONDS
+
         # Process results
         places = []
-        for result in data.get('results', [])[:max_results]:
+        for result in search['places'][:max_results]:
             # Filter by rating if specified
-            if min_rating and result.get('rating', 0) < min_rating:
+            if min_rating and (result.get('rating') or 0) < min_rating:
                 continue
             
             # Filter by price level if specified
-            if price_level and result.get('price_level', 0) != price_level:
+            if price_level and (result.get('price_level') or 0) != price_level:
                 continue
             
-            place_info = {
-                'name': result.get('name'),
-                'place_id': result.get('place_id'),
-                'address': result.get('vicinity'),
-                'rating': result.get('rating'),
-                'user_ratings_total': result.get('user_ratings_total'),
-                'price_level': result.get('price_level'),
-                'types': result.get('types', []),
-                'open_now': result.get('opening_hours', {}).get('open_now'),
-                'location': result.get('geometry', {}).get('location')
-            }
+            place_info = dict(result)
+            if stale_open_now:
+                place_info['open_now'] = None
             places.append(place_info)
         
         return {
@@ -209,6 +203,62 @@ def search_nearby_places(
         }
 
 
+def _nearby_search(lat: float, lng: float, mapped_type: Optional[str], keyword: Optional[str],
+                   radius: int, open_now: bool) -> Dict:
+    """
+    Run a Places nearby search, or serve it from the cache of the geohash cell around (lat, lng).
+
+    Returns:
+        Dictionary with 'places' (all results, unfiltered) and 'fetched_at', or 'error'
+    """
+    key = cache_key('nearby', geohash(lat, lng), mapped_type, keyword, radius, bool(open_now))
+    cached = get_cached(key)
+    if cached is not None:
+        return cached
+
+    # Build request parameters
+    url = f"{PLACES_API_BASE_URL}/nearbysearch/json"
+    params = {
+        'location': f"{lat},{lng}",
+        'radius': radius,
+        'key': GOOGLE_PLACES_API_KEY
+    }
+    if mapped_type:
+        params['type'] = mapped_type
+    if keyword:
+        params['keyword'] = keyword
+    if open_now:
+        params['opennow'] = 'true'
+
+    # Make API request
+    response = requests.get(url, params=params, timeout=10)
+    response.raise_for_status()
+    data = response.json()
+
+    status = data.get('status')
+    if status not in ('OK', 'ZERO_RESULTS'):
+        logger.warning(f"Places API returned status: {status}")
+        return {'error': f"Places API error: {status}"}
+
+    search = {
+        'fetched_at': time.time(),
+        'places': [{
+            'name': result.get('name'),
+            'place_id': result.get('place_id'),
+            'address': result.get('vicinity'),
+            'rating': result.get('rating'),
+            'user_ratings_total': result.get('user_ratings_total'),
+            'price_level': result.get('price_level'),
+            'types': result.get('types', []),
+            'open_now': result.get('opening_hours', {}).get('open_now'),
+            'location': result.get('geometry', {}).get('location')
+        } for result in data.get('results', [])]
+    }
+    # Searches restricted to open places go stale as soon as opening hours change
+    set_cached(key, search, PLACES_OPEN_NOW_TTL_SECONDS if open_now else PLACES_NEARBY_TTL_SECONDS)
+    return search
+
+
 def get_place_details(place_id: str, fields: Optional[List[str]] = None) -> Dict:
     """
     Get detailed information about a specific place.
@@ -234,6 +284,14 @@ def get_place_details(place_id: str, fields: Optional[List[str]] = None) -> Dict
                 'website', 'rating', 'user_ratings_total', 'price_level',
                 'opening_hours', 'reviews', 'photos', 'types', 'geometry'
             ]
+
+        key = cache_key('details', place_id, ','.join(sorted(fields)))
+        cached = get_cached(key)
+        if cached is not None:
+            place_details = dict(cached['details'])
+            if place_details.get('opening_hours') and time.time() - cached['fetched_at'] > PLACES_OPEN_NOW_TTL_SECONDS:
+                place_details['opening_hours'] = dict(place_details['opening_hours'], open_now=None)
+            return place_details
         
         url = f"{PLACES_API_BASE_URL}/details/json"
         params = {
@@ -289,7 +347,8 @@ def get_place_details(place_id: str, fields: Optional[List[str]] = None) -> Dict
             'types': result.get('types', []),
             'location': result.get('geometry', {}).get('location')
         }
-        
+
+        set_cached(key, {'fetched_at': time.time(), 'details': place_details}, PLACES_DETAILS_TTL_SECONDS)
         return place_details
         
     except Exception as e:
@@ -316,58 +375,92 @@ def calculate_distance_and_duration(
     Returns:
         Dictionary with distance and duration information
     """
+    return calculate_distances(origin, [destination], mode)[0]
+
+
+def calculate_distances(origin: str, destinations: List[str], mode: str = 'walking') -> List[Dict]:
+    """
+    Calculate distance and travel time from one origin to several destinations.
+
+    Cached pairs are served from places_cache; the rest are resolved with one
+    Distance Matrix request per DISTANCE_MATRIX_MAX_DESTINATIONS destinations.
+
+    Args:
+        origin: Starting address or coordinates
+        destinations: Destination addresses or coordinates
+        mode: Travel mode (walking, driving, transit, bicycling)
+
+    Returns:
+        One result dictionary per destination, in order (see calculate_distance_and_duration)
+    """
     if not GOOGLE_PLACES_API_KEY:
-        return {
+        return [{
             'success': False,
             'error': 'Google Places API not configured'
-        }
-    
-    try:
-        params = {
-            'origins': origin,
-            'destinations': destination,
-            'mode': mode,
-            'key': GOOGLE_PLACES_API_KEY
-        }
-        
-        response = requests.get(DISTANCE_MATRIX_API_URL, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        if data.get('status') != 'OK':
-            return {
-                'success': False,
-                'error': f"Distance Matrix API error: {data.get('status')}"
-            }
-        
-        # Extract result
-        element = data['rows'][0]['elements'][0]
-        
-        if element.get('status') != 'OK':
-            return {
-                'success': False,
-                'error': f"No route found: {element.get('status')}"
+        } for _ in destinations]
+
+    results: List[Optional[Dict]] = [None] * len(destinations)
+    pending = []
+    for i, destination in enumerate(destinations):
+        cached = get_cached(cache_key('distance', origin, destination, mode))
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.append(i)
+
+    for batch_start in range(0, len(pending), DISTANCE_MATRIX_MAX_DESTINATIONS):
+        batch = pending[batch_start:batch_start + DISTANCE_MATRIX_MAX_DESTINATIONS]
+        try:
+            params = {
+                'origins': origin,
+                'destinations': '|'.join(destinations[i] for i in batch),
+                'mode': mode,
+                'key': GOOGLE_PLACES_API_KEY
             }
-        
-        return {
-            'success': True,
-            'distance': {
-                'text': element['distance']['text'],
-                'meters': element['distance']['value']
-            },
-            'duration': {
-                'text': element['duration']['text'],
-                'seconds': element['duration']['value']
-            },
-            'mode': mode
-        }
-        
-    except Exception as e:
-        logger.error(f"Error calculating distance: {e}")
-        return {
-            'success': False,
-            'error': str(e)
-        }
+            
+            response = requests.get(DISTANCE_MATRIX_API_URL, params=params, timeout=10)
+            response.raise_for_status()
+            data = response.json()
+            
+            if data.get('status') != 'OK':
+                for i in batch:
+                    results[i] = {
+                        'success': False,
+                        'error': f"Distance Matrix API error: {data.get('status')}"
+                    }
+                continue
+            
+            for i, element in zip(batch, data['rows'][0]['elements']):
+                if element.get('status') != 'OK':
+                    results[i] = {
+                        'success': False,
+                        'error': f"No route found: {element.get('status')}"
+                    }
+                    continue
+
+                results[i] = {
+                    'success': True,
+                    'distance': {
+                        'text': element['distance']['text'],
+                        'meters': element['distance']['value']
+                    },
+                    'duration': {
+                        'text': element['duration']['text'],
+                        'seconds': element['duration']['value']
+                    },
+                    'mode': mode
+                }
+                set_cached(cache_key('distance', origin, destinations[i], mode), results[i], PLACES_DISTANCE_TTL_SECONDS)
+            
+        except Exception as e:
+            logger.error(f"Error calculating distance: {e}")
+            for i in batch:
+                results[i] = {
+                    'success': False,
+                    'error': str(e)
+                }
+
+    return [result or {'success': False, 'error': 'No route found'} for result in results]
 
 
 def get_directions(
@@ -500,25 +593,20 @@ def find_nearby_with_details(
                 'message': f'No places found matching "{query}" within {radius}m'
             }
         
-        # Enrich each place with distance and duration
-        enriched_places = []
-        for place in places[:max_results]:
-            # Calculate distance and duration
-            if place.get('location'):
-                destination = f"{place['location']['lat']},{place['location']['lng']}"
-                distance_info = calculate_distance_and_duration(
-                    origin=property_location,
-                    destination=destination,
-                    mode=travel_mode
-                )
-                
-                if distance_info.get('success'):
-                    place['distance'] = distance_info['distance']['text']
-                    place['duration'] = distance_info['duration']['text']
-                    place['distance_meters'] = distance_info['distance']['meters']
-                    place['walkable'] = distance_info['distance']['meters'] <= 1600  # ~1 mile
-            
-            enriched_places.append(place)
+        # Enrich each place with distance and duration (one Distance Matrix request for all of them)
+        enriched_places = places[:max_results]
+        located = [place for place in enriched_places if place.get('location')]
+        distances = calculate_distances(
+            origin=property_location,
+            destinations=[f"{place['location']['lat']},{place['location']['lng']}" for place in located],
+            mode=travel_mode
+        )
+        for place, distance_info in zip(located, distances):
+            if distance_info.get('success'):
+                place['distance'] = distance_info['distance']['text']
+                place['duration'] = distance_info['duration']['text']
+                place['distance_meters'] = distance_info['distance']['meters']
+                place['walkable'] = distance_info['distance']['meters'] <= 1600  # ~1 mile
         
         # Sort by distance
         enriched_places.sort(key=lambda x: x.get('distance_meters', float('inf')))
@@ -0,0 +1,170 @@
+"""
+Persistent cache for Google Geocoding, Places and Distance Matrix results.
+
+Every search_nearby_places tool call used to geocode the property address,
+run a nearby search and one Distance Matrix request per result, although the
+property never moves and the places around it change slowly. Results are now
+kept in two tiers:
+
+- an in-process LRU of up to PLACES_CACHE_MEMORY_ENTRIES entries, and
+- the `places_cache` Firestore collection, shared by all processes and
+  Lambdas (one document per key; `expiresAt` can back a Firestore TTL policy
+  so expired documents are removed automatically).
+
+Keys are built by the callers in places_api:
+
+- geocode: the normalized address. A property's address maps to one entry,
+  and editing the address simply produces a new key.
+- nearby: the geohash cell of the search center plus type, keyword, radius
+  and open_now, so guests of one property (and of neighbouring properties in
+  the same cell) share searches.
+- details: place_id plus the requested fields.
+- distance: origin, destination and travel mode.
+
+Lookups and writes never raise: if Firestore is unavailable the caller just
+calls Google.
+
+TTLs follow the Google Maps Platform terms, which only allow temporary
+caching of Google Maps content. Latitude/longitude may be cached for at most
+30 consecutive days, so the geocode TTL is capped at that. Place IDs may be
+kept indefinitely. Other Places content (names, ratings, opening hours,
+distances) is kept for short periods to serve repeated searches. Check the
+current service-specific terms before raising those TTLs.
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+PLACES_CACHE_COLLECTION = 'places_cache'
+PLACES_CACHE_ENABLED = os.getenv('PLACES_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+PLACES_CACHE_MEMORY_ENTRIES = int(os.getenv('PLACES_CACHE_MEMORY_ENTRIES', '2000'))
+
+# Time to live per kind of result (see the terms note above)
+# Google Maps Platform terms: coordinates may be cached for at most 30 days
+PLACES_GEOCODE_MAX_TTL_SECONDS = 30 * 24 * 3600
+PLACES_GEOCODE_TTL_SECONDS = min(int(os.getenv('PLACES_GEOCODE_TTL_SECONDS', str(PLACES_GEOCODE_MAX_TTL_SECONDS))),
+                                 PLACES_GEOCODE_MAX_TTL_SECONDS)
+# Places content is cached temporarily only; keep these short
+PLACES_NEARBY_TTL_SECONDS = int(os.getenv('PLACES_NEARBY_TTL_SECONDS', str(24 * 3600)))
+PLACES_DETAILS_TTL_SECONDS = int(os.getenv('PLACES_DETAILS_TTL_SECONDS', str(24 * 3600)))
+PLACES_DISTANCE_TTL_SECONDS = int(os.getenv('PLACES_DISTANCE_TTL_SECONDS', str(7 * 24 * 3600)))
+# Cached open_now flags older than this are dropped rather than shown to guests
+PLACES_OPEN_NOW_TTL_SECONDS = int(os.getenv('PLACES_OPEN_NOW_TTL_SECONDS', '900'))
+
+# Precision 7 cells are about 150 m x 150 m
+NEARBY_GEOHASH_PRECISION = 7
+
+_GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+_memory: "OrderedDict[str, tuple]" = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def geohash(lat: float, lng: float, precision: int = NEARBY_GEOHASH_PRECISION) -> str:
+    """Encode coordinates as a geohash of `precision` characters."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        value, bounds = (lng, lng_range) if even else (lat, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            bounds[0] = mid
+        else:
+            bounds[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def cache_key(kind: str, *parts: Any) -> str:
+    """Build a document-ID-safe key from a result kind and its normalized parameters."""
+    normalized = '|'.join('' if part is None else ' '.join(str(part).lower().split()) for part in parts)
+    return f"{kind}_{hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:40]}"
+
+
+def _remember(key: str, value: Any, expires_at: float) -> None:
+    with _memory_lock:
+        _memory[key] = (expires_at, value)
+        _memory.move_to_end(key)
+        while len(_memory) > PLACES_CACHE_MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def _collection():
+    from concierge.utils.firestore_client import initialize_firebase, get_firestore_client
+
+    if not initialize_firebase():
+        return None
+    client = get_firestore_client()
+    return client.collection(PLACES_CACHE_COLLECTION) if client is not None else None
+
+
+def get_cached(key: str) -> Optional[Any]:
+    """Return the cached value for a key, or None if it is missing or expired."""
+    if not PLACES_CACHE_ENABLED:
+        return None
+
+    now = time.time()
+    with _memory_lock:
+        entry = _memory.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                _memory.move_to_end(key)
+                return entry[1]
+            del _memory[key]
+
+    try:
+        collection = _collection()
+        if collection is None:
+            return None
+        doc = collection.document(key).get()
+        if not doc.exists:
+            return None
+        data = doc.to_dict() or {}
+        expires_at = data.get('expiresAt')
+        if not expires_at or expires_at.timestamp() <= now:
+            return None
+        _remember(key, data.get('value'), expires_at.timestamp())
+        return data.get('value')
+    except Exception as e:
+        logger.warning(f"Error reading places cache entry {key}: {e}")
+        return None
+
+
+def set_cached(key: str, value: Any, ttl_seconds: int) -> None:
+    """Store a value in memory and in Firestore for ttl_seconds."""
+    if not PLACES_CACHE_ENABLED:
+        return
+
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
+    _remember(key, value, expires_at.timestamp())
+    try:
+        collection = _collection()
+        if collection is not None:
+            collection.document(key).set({
+                'kind': key.split('_', 1)[0],
+                'value': value,
+                'createdAt': datetime.now(timezone.utc),
+                'expiresAt': expires_at,
+            })
+    except Exception as e:
+        logger.warning(f"Error writing places cache entry {key}: {e}")
+
+
+def clear_memory_cache() -> None:
+    """Drop the in-process tier (Firestore entries expire on their own)."""
+    with _memory_lock:
+        _memory.clear()
@@ -1,184 +1,387 @@
 import time
 import logging
 import threading
-from collections import deque
+import hashlib
+import sqlite3
 import os
-from datetime import datetime, timedelta
-from typing import Optional, Callable, Any
+from datetime import datetime
+from typing import Optional, Callable, Any, Dict, Tuple
 import asyncio
 
 logger = logging.getLogger(__name__)
 
+# Priority classes. Interactive work (live guest chat) is never queued behind batch
+# work (conversation summaries, scraping): batch callers leave a reserved share of
+# each bucket untouched and yield while interactive callers are waiting.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+DEFAULT_MODEL = 'default'
+
+
+def _api_key_fingerprint(api_key: Optional[str]) -> str:
+    """Short, non-reversible identifier for an API key (keys are never stored)."""
+    if not api_key:
+        return 'nokey'
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:12]
+
+
+class LocalBucketStore:
+    """In-process token bucket state."""
+
+    def __init__(self):
+        self._state: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, name: str, capacity: float, rate: float, floor: float) -> float:
+        """
+        Refill the bucket and take one token if more than `floor` tokens are available.
+
+        Returns:
+            0.0 if a token was taken, otherwise the seconds until one will be available
+        """
+        with self._lock:
+            now = time.time()
+            tokens, updated = self._state.get(name, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens - 1 >= floor:
+                self._state[name] = (tokens - 1, now)
+                return 0.0
+            self._state[name] = (tokens, now)
+            return max((floor + 1 - tokens) / rate, 0.01)
+
+    def peek(self, name: str, capacity: float, rate: float) -> float:
+        """Return the current number of tokens in a bucket."""
+        with self._lock:
+            now = time.time()
+            tokens, updated = self._state.get(name, (capacity, now))
+            return min(capacity, tokens + (now - updated) * rate)
+
+
+class SQLiteBucketStore:
+    """
+    Token bucket state shared by all processes on the host through a local SQLite file,
+    so gunicorn workers and background jobs draw from the same budget.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections are per thread and per process (never shared across a fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, name: str, capacity: float, rate: float, floor: float) -> float:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens - 1 >= floor:
+                tokens -= 1
+            else:
+                wait = max((floor + 1 - tokens) / rate, 0.01)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                (name, tokens, now)
+            )
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def peek(self, name: str, capacity: float, rate: float) -> float:
+        row = self._connection().execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+        if not row:
+            return capacity
+        tokens, updated = row
+        return min(capacity, tokens + (time.time() - updated) * rate)
+
+
 class GeminiRateLimiter:
     """
     Rate limiter for Gemini API to handle per-minute rate limits.
-    Implements sliding window with automatic backoff.
+
+    Implements token buckets keyed by API key and model, with priority classes.
+    Waiting happens outside of any lock, so threads only serialize on the
+    bucket bookkeeping, and an async acquire path is available for asyncio callers.
     """
-    
-    def __init__(self, requests_per_minute: int = 15, safety_margin: float = 0.8):
+
+    def __init__(self, requests_per_minute: int = 15, safety_margin: float = 0.8,
+                 model_limits: Optional[Dict[str, int]] = None, interactive_reserve: float = 0.25,
+                 store=None):
         """
         Initialize rate limiter.
-        
+
         Args:
-            requests_per_minute: Maximum requests per minute (default 15 for gemini-2.5-flash-lite)
+            requests_per_minute: Default maximum requests per minute per model (default 15 for gemini-2.5-flash-lite)
             safety_margin: Safety factor to avoid hitting limits (0.8 = use 80% of limit)
+            model_limits: Optional per-model requests-per-minute overrides
+            interactive_reserve: Share of each bucket that batch work may not consume
+            store: Bucket state store (LocalBucketStore by default, SQLiteBucketStore for cross-process limits)
         """
         self.requests_per_minute = requests_per_minute
+        self.safety_margin = safety_margin
         self.effective_limit = int(requests_per_minute * safety_margin)  # 12 requests with default
-        self.request_timestamps = deque()
+        self.model_limits = dict(model_limits or {})
+        self.interactive_reserve = interactive_reserve
+        self.store = store or LocalBucketStore()
+        self.default_api_key = None
+
+        # Interactive callers currently waiting, per bucket; batch callers yield to them
+        self._interactive_waiting: Dict[str, int] = {}
         self.lock = threading.Lock()
-        
-        logger.info(f"Initialized Gemini rate limiter: {self.effective_limit}/{requests_per_minute} RPM")
-    
-    def _cleanup_old_requests(self):
-        """Remove request timestamps older than 1 minute."""
-        current_time = time.time()
-        minute_ago = current_time - 60
-        
-        while self.request_timestamps and self.request_timestamps[0] < minute_ago:
-            self.request_timestamps.popleft()
-    
-    def _get_current_request_count(self) -> int:
-        """Get current number of requests in the last minute."""
-        self._cleanup_old_requests()
-        return len(self.request_timestamps)
-    
-    def _calculate_wait_time(self) -> float:
-        """Calculate how long to wait before making next request."""
-        current_count = self._get_current_request_count()
-        
-        if current_count < self.effective_limit:
-            return 0.0
-        
-        # If we're at the limit, wait until the oldest request expires
-        if self.request_timestamps:
-            oldest_request = self.request_timestamps[0]
-            wait_time = 60 - (time.time() - oldest_request) + 1  # Add 1 second buffer
-            return max(0.0, wait_time)
-        
-        return 60.0  # Fallback: wait a full minute
-    
-    def wait_if_needed(self):
-        """Wait if necessary to respect rate limits."""
+
+        logger.info(f"Initialized Gemini rate limiter: {self.effective_limit}/{requests_per_minute} RPM per model "
+                    f"({type(self.store).__name__})")
+
+    def _limit_for(self, model: str) -> int:
+        rpm = self.model_limits.get(model, self.requests_per_minute)
+        return max(1, int(rpm * self.safety_margin))
+
+    def _bucket(self, model: Optional[str], api_key: Optional[str]) -> Tuple[str, float, float]:
+        """Return (bucket name, capacity, refill rate per second)."""
+        model = model or DEFAULT_MODEL
+        capacity = float(self._limit_for(model))
+        name = f"{_api_key_fingerprint(api_key or self.default_api_key)}:{model}"
+        return name, capacity, capacity / 60.0
+
+    def _try_acquire(self, name: str, capacity: float, rate: float, priority: int) -> float:
+        """Attempt to take a token; returns seconds to wait (0.0 if acquired)."""
+        if priority == PRIORITY_INTERACTIVE:
+            return self.store.take(name, capacity, rate, floor=0.0)
+
+        # Batch work keeps a reserve for interactive requests and yields while they wait
+        with self.lock:
+            interactive_waiting = self._interactive_waiting.get(name, 0)
+        if interactive_waiting:
+            return 0.25
+        # Small buckets (capacity * reserve close to capacity) must still leave batch work one token
+        floor = min(capacity * self.interactive_reserve, max(0.0, capacity - 1))
+        return self.store.take(name, capacity, rate, floor=floor)
+
+    def _mark_waiting(self, name: str, priority: int, delta: int) -> None:
+        if priority != PRIORITY_INTERACTIVE:
+            return
         with self.lock:
-            wait_time = self._calculate_wait_time()
-            
-            if wait_time > 0:
-                logger.warning(f"Rate limit approached. Waiting {wait_time:.1f} seconds...")
-                time.sleep(wait_time)
-            
-            # Record this request
-            self.request_timestamps.append(time.time())
-            current_count = len(self.request_timestamps)
-            
-            logger.debug(f"Request recorded. Current count: {current_count}/{self.effective_limit}")
-    
-    def get_status(self) -> dict:
+            self._interactive_waiting[name] = max(0, self._interactive_waiting.get(name, 0) + delta)
+
+    def acquire(self, model: Optional[str] = None, api_key: Optional[str] = None,
+                priority: int = PRIORITY_INTERACTIVE) -> float:
+        """
+        Block until a request slot is available for the model/key bucket.
+
+        Returns:
+            Seconds spent waiting
+        """
+        name, capacity, rate = self._bucket(model, api_key)
+        waited = 0.0
+        wait_time = self._try_acquire(name, capacity, rate, priority)
+        if wait_time <= 0:
+            return waited
+
+        self._mark_waiting(name, priority, 1)
+        try:
+            logger.warning(f"Rate limit approached for {name} (priority {priority}). Waiting up to {wait_time:.1f} seconds...")
+            while wait_time > 0:
+                # Sleep in short slices so higher-priority callers are not starved
+                delay = min(wait_time, 1.0)
+                time.sleep(delay)
+                waited += delay
+                wait_time = self._try_acquire(name, capacity, rate, priority)
+        finally:
+            self._mark_waiting(name, priority, -1)
+        return waited
+
+    async def acquire_async(self, model: Optional[str] = None, api_key: Optional[str] = None,
+                            priority: int = PRIORITY_INTERACTIVE) -> float:
+        """Async variant of acquire() that waits with asyncio.sleep instead of blocking the loop."""
+        name, capacity, rate = self._bucket(model, api_key)
+        waited = 0.0
+        wait_time = self._try_acquire(name, capacity, rate, priority)
+        if wait_time <= 0:
+            return waited
+
+        self._mark_waiting(name, priority, 1)
+        try:
+            while wait_time > 0:
+                delay = min(wait_time, 1.0)
+                await asyncio.sleep(delay)
+                waited += delay
+                wait_time = self._try_acquire(name, capacity, rate, priority)
+        finally:
+            self._mark_waiting(name, priority, -1)
+        return waited
+
+    def wait_if_needed(self, model: Optional[str] = None, api_key: Optional[str] = None,
+                       priority: int = PRIORITY_INTERACTIVE):
+        """Wait if necessary to respect rate limits."""
+        self.acquire(model=model, api_key=api_key, priority=priority)
+
+    def get_status(self, model: Optional[str] = None, api_key: Optional[str] = None) -> dict:
         """Get current rate limiter status for monitoring."""
+        name, capacity, rate = self._bucket(model, api_key)
+        tokens = self.store.peek(name, capacity, rate)
+        current_count = int(round(capacity - tokens))
+        next_reset = None
+        if tokens < capacity:
+            next_reset = datetime.fromtimestamp(time.time() + (capacity - tokens) / rate).isoformat()
+
         with self.lock:
-            current_count = self._get_current_request_count()
-            next_reset = None
-            
-            if self.request_timestamps:
-                oldest_request = self.request_timestamps[0]
-                next_reset = datetime.fromtimestamp(oldest_request + 60).isoformat()
-            
-            return {
-                "current_requests": current_count,
-                "limit": self.effective_limit,
-                "max_limit": self.requests_per_minute,
-                "next_reset": next_reset,
-                "capacity_remaining": self.effective_limit - current_count
-            }
+            interactive_waiting = sum(self._interactive_waiting.values())
+
+        return {
+            "bucket": name,
+            "current_requests": current_count,
+            "limit": int(capacity),
+            "max_limit": self.model_limits.get(model or DEFAULT_MODEL, self.requests_per_minute),
+            "next_reset": next_reset,
+            "capacity_remaining": int(tokens),
+            "interactive_reserve": int(capacity * self.interactive_reserve),
+            "interactive_waiting": interactive_waiting,
+            "store": type(self.store).__name__
+        }
 
 # Global rate limiter instance
 _gemini_rate_limiter = None
+_gemini_rate_limiter_lock = threading.Lock()
 
 def get_gemini_rate_limiter() -> GeminiRateLimiter:
     """Get or create the global Gemini rate limiter instance."""
     global _gemini_rate_limiter
     if _gemini_rate_limiter is None:
-        # Select limits based on environment / key tier
-        env = os.getenv('DEPLOYMENT_ENV', '').lower()
-        # Defaults per Gemini docs: free tier is lower; paid tier substantially higher
-        # We'll use conservative defaults and can tune as needed
-        if env == 'production':
-            # Paid plan: allow higher RPM, e.g., 60 RPM with 80% safety -> 48
-            _gemini_rate_limiter = GeminiRateLimiter(requests_per_minute=60, safety_margin=0.8)
-        else:
-            # Free plan: conservative limit 15 RPM with 80% safety -> 12
-            _gemini_rate_limiter = GeminiRateLimiter(requests_per_minute=15, safety_margin=0.8)
+        with _gemini_rate_limiter_lock:
+            if _gemini_rate_limiter is None:
+                _gemini_rate_limiter = _create_gemini_rate_limiter()
     return _gemini_rate_limiter
 
-def with_rate_limiting(func: Callable) -> Callable:
+def _create_gemini_rate_limiter() -> GeminiRateLimiter:
+    # Optional cross-process state: point GEMINI_RATE_LIMIT_STORE at a local SQLite file
+    store = None
+    store_path = os.getenv('GEMINI_RATE_LIMIT_STORE')
+    if store_path:
+        try:
+            store = SQLiteBucketStore(store_path)
+        except Exception as e:
+            logger.error(f"Could not open shared rate limit store {store_path}, using in-process limits: {e}")
+
+    # Select limits based on environment / key tier
+    env = os.getenv('DEPLOYMENT_ENV', '').lower()
+    # Defaults per Gemini docs: free tier is lower; paid tier substantially higher
+    # We'll use conservative defaults and can tune as needed
+    if env == 'production':
+        # Paid plan: allow higher RPM, e.g., 60 RPM with 80% safety -> 48
+        limiter = GeminiRateLimiter(requests_per_minute=60, safety_margin=0.8, store=store)
+        limiter.default_api_key = os.getenv('GEMINI_API_KEY_PAID') or os.getenv('GEMINI_API_KEY')
+    else:
+        # Free plan: conservative limit 15 RPM with 80% safety -> 12
+        limiter = GeminiRateLimiter(requests_per_minute=15, safety_margin=0.8, store=store)
+        limiter.default_api_key = os.getenv('GEMINI_API_KEY')
+    return limiter
+
+def _is_rate_limit_error(e: Exception) -> bool:
+    return "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e)
+
+def with_rate_limiting(func: Callable = None, *, model: Optional[str] = None,
+                       priority: int = PRIORITY_INTERACTIVE) -> Callable:
     """
     Decorator to add rate limiting to Gemini API calls.
-    
+
     Usage:
         @with_rate_limiting
         def my_gemini_call():
             return client.models.generate_content(...)
+
+        @with_rate_limiting(model='gemini-2.5-flash-lite', priority=PRIORITY_BATCH)
+        def my_batch_call():
+            ...
     """
-    def wrapper(*args, **kwargs):
-        rate_limiter = get_gemini_rate_limiter()
-        rate_limiter.wait_if_needed()
-        
-        try:
-            result = func(*args, **kwargs)
-            logger.debug("Gemini API call successful")
-            return result
-        except Exception as e:
-            # Check if it's a rate limit error
-            if "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e):
-                logger.error(f"Rate limit error despite rate limiting: {e}")
-                # Force a longer wait and retry once
-                time.sleep(65)  # Wait just over a minute
-                rate_limiter.wait_if_needed()
-                return func(*args, **kwargs)
-            else:
-                raise
-    
-    return wrapper
+    def decorator(inner: Callable) -> Callable:
+        def wrapper(*args, **kwargs):
+            rate_limiter = get_gemini_rate_limiter()
+            rate_limiter.acquire(model=model, priority=priority)
 
-def rate_limited_gemini_call(func: Callable, *args, max_retries: int = 3, **kwargs) -> Any:
+            try:
+                result = inner(*args, **kwargs)
+                logger.debug("Gemini API call successful")
+                return result
+            except Exception as e:
+                # Check if it's a rate limit error
+                if _is_rate_limit_error(e):
+                    logger.error(f"Rate limit error despite rate limiting: {e}")
+                    # Force a longer wait and retry once
+                    time.sleep(65 if priority == PRIORITY_BATCH else 5)
+                    rate_limiter.acquire(model=model, priority=priority)
+                    return inner(*args, **kwargs)
+                else:
+                    raise
+
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+def rate_limited_gemini_call(func: Callable, *args, max_retries: int = 3, model: Optional[str] = None,
+                             api_key: Optional[str] = None, priority: int = PRIORITY_INTERACTIVE,
+                             **kwargs) -> Any:
     """
     Execute a Gemini API call with rate limiting and retry logic.
-    
+
     Args:
         func: The function to call
         *args: Arguments to pass to func
         max_retries: Maximum number of retries on rate limit errors
+        model: Model name used to pick the rate limit bucket
+        api_key: API key used to pick the rate limit bucket (defaults to the configured key)
+        priority: PRIORITY_INTERACTIVE for live guest traffic, PRIORITY_BATCH for background work
         **kwargs: Keyword arguments to pass to func
-    
+
     Returns:
         Result of the function call
-    
+
     Raises:
         The last exception if all retries fail
     """
     rate_limiter = get_gemini_rate_limiter()
     last_exception = None
-    
+    # Interactive callers back off briefly; batch work can afford to wait out the window
+    backoff_base = 2 if priority == PRIORITY_INTERACTIVE else 30
+
     for attempt in range(max_retries + 1):
         try:
             # Wait according to rate limiting
-            rate_limiter.wait_if_needed()
-            
+            rate_limiter.acquire(model=model, api_key=api_key, priority=priority)
+
             # Make the API call
             result = func(*args, **kwargs)
-            
+
             if attempt > 0:
                 logger.info(f"Gemini API call succeeded on attempt {attempt + 1}")
-            
+
             return result
-            
+
         except Exception as e:
             last_exception = e
-            
+
             # Check if it's a rate limit error
-            if "429" in str(e) or "RESOURCE_EXHAUSTED" in str(e):
+            if _is_rate_limit_error(e):
                 if attempt < max_retries:
-                    wait_time = (2 ** attempt) * 30  # Exponential backoff: 30s, 60s, 120s
+                    wait_time = (2 ** attempt) * backoff_base  # Exponential backoff: 30s, 60s, 120s for batch
                     logger.warning(f"Rate limit hit on attempt {attempt + 1}. Retrying in {wait_time}s...")
                     time.sleep(wait_time)
                     continue
@@ -188,6 +391,40 @@ def rate_limited_gemini_call(func: Callable, *args, max_retries: int = 3, **kwar
                 # Non-rate-limit error, don't retry
                 logger.error(f"Non-rate-limit error in Gemini API call: {e}")
                 break
-    
+
     # If we get here, all retries failed
-    raise last_exception 
\ No newline at end of file
+    raise last_exception
+
+async def rate_limited_gemini_call_async(func: Callable, *args, max_retries: int = 3, model: Optional[str] = None,
+                                         api_key: Optional[str] = None, priority: int = PRIORITY_INTERACTIVE,
+                                         **kwargs) -> Any:
+    """
+    Async variant of rate_limited_gemini_call for coroutine functions (e.g. client.aio calls).
+    Waiting and backoff use asyncio.sleep, so the event loop keeps serving other tasks.
+    """
+    rate_limiter = get_gemini_rate_limiter()
+    last_exception = None
+    backoff_base = 2 if priority == PRIORITY_INTERACTIVE else 30
+
+    for attempt in range(max_retries + 1):
+        try:
+            await rate_limiter.acquire_async(model=model, api_key=api_key, priority=priority)
+            result = await func(*args, **kwargs)
+            if attempt > 0:
+                logger.info(f"Gemini API call succeeded on attempt {attempt + 1}")
+            return result
+        except Exception as e:
+            last_exception = e
+            if _is_rate_limit_error(e):
+                if attempt < max_retries:
+                    wait_time = (2 ** attempt) * backoff_base
+                    logger.warning(f"Rate limit hit on attempt {attempt + 1}. Retrying in {wait_time}s...")
+                    await asyncio.sleep(wait_time)
+                    continue
+                else:
+                    logger.error(f"Rate limit error after {max_retries + 1} attempts: {e}")
+            else:
+                logger.error(f"Non-rate-limit error in Gemini API call: {e}")
+                break
+
+    raise last_exception
@@ -0,0 +1,210 @@
+"""
+Request-scoped identity map for Firestore reads.
+
+A single page or API call often reads the same documents several times: the
+view checks property ownership, a helper loads the property again for its
+name, a template helper loads it a third time. Decorated read functions in
+firestore_client consult a per-request map stored on `flask.g` first, so each
+document (and each list query) is read from Firestore at most once per request.
+
+- Outside a request context (scheduler jobs, import workers, socket handlers
+  running outside a request), nothing is cached and every call reads Firestore.
+- Callers get a shallow copy of the cached dict, so top-level changes such as
+  `property_data['name'] = ...` do not leak into later reads. Nested values are
+  shared and must not be mutated in place.
+- Write helpers decorated with `invalidates(...)` drop every cached document
+  and list of the collections they touch, so a read after a write within the
+  same request sees fresh data.
+"""
+
+import functools
+import logging
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from flask import g, has_request_context
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def _identity_map() -> Optional[Dict[str, Any]]:
+    """Return the identity map for the current request, or None outside a request."""
+    if not has_request_context():
+        return None
+    store = g.get('_firestore_identity_map')
+    if store is None:
+        store = {'docs': {}, 'lists': {}, 'hits': 0, 'misses': 0}
+        g._firestore_identity_map = store
+    return store
+
+
+def _copy(value: Any) -> Any:
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, list):
+        return [dict(item) if isinstance(item, dict) else item for item in value]
+    return value
+
+
+def _hashable(value: Any) -> Any:
+    """Convert a query argument to a hashable equivalent (lists, dicts and sets can be arguments)."""
+    if isinstance(value, dict):
+        return ('__dict__', tuple(sorted((str(k), _hashable(v)) for k, v in value.items())))
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_hashable(item) for item in value)
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+def get_cached_document(collection: str, doc_id: str) -> Any:
+    """Return the cached document for this request, None if known missing, or _MISSING."""
+    store = _identity_map()
+    if store is None or not doc_id:
+        return _MISSING
+    value = store['docs'].get((collection, doc_id), _MISSING)
+    if value is _MISSING:
+        store['misses'] += 1
+        return _MISSING
+    store['hits'] += 1
+    return _copy(value)
+
+
+def remember_document(collection: str, doc_id: str, value: Optional[Dict]) -> None:
+    """Record a document (or None for a known-missing one) in the request's identity map."""
+    store = _identity_map()
+    if store is not None and doc_id:
+        store['docs'][(collection, doc_id)] = _copy(value)
+
+
+def invalidate(*collections: str) -> None:
+    """Drop cached documents and list results for the given collections."""
+    store = _identity_map()
+    if store is None:
+        return
+    names = set(collections)
+    for key in [key for key in store['docs'] if key[0] in names]:
+        del store['docs'][key]
+    for name in names:
+        store['lists'].pop(name, None)
+
+
+def cached_document(collection: str) -> Callable:
+    """
+    Memoize a single-document getter `func(doc_id, ...)` for the current request.
+
+    Only documents that were found are cached; a None result (not found or
+    read error) is retried on the next call.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(doc_id, *args, **kwargs):
+            cached = get_cached_document(collection, doc_id)
+            if cached is not _MISSING:
+                return cached
+            value = func(doc_id, *args, **kwargs)
+            if value is not None:
+                remember_document(collection, doc_id, value)
+            return value
+        return wrapper
+    return decorator
+
+
+def cached_list(collection: str, id_field: Optional[str] = 'id',
+                partial: Optional[Callable[..., bool]] = None) -> Callable:
+    """
+    Memoize a list query for the current request, keyed by its arguments.
+
+    Each returned document is also recorded in the identity map under
+    `id_field`, so a later single-document read is served from the map. Pass
+    id_field=None for queries that always return partial documents, or a
+    `partial` predicate, called with the query's arguments, for queries that
+    return partial documents only for some arguments (e.g. a field projection).
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            store = _identity_map()
+            if store is None:
+                return func(*args, **kwargs)
+
+            key = (func.__name__, _hashable(args),
+                   tuple(sorted((name, _hashable(value)) for name, value in kwargs.items())))
+            lists = store['lists'].setdefault(collection, {})
+            if key in lists:
+                store['hits'] += 1
+                return _copy(lists[key])
+
+            store['misses'] += 1
+            value = func(*args, **kwargs)
+            if isinstance(value, list):
+                lists[key] = _copy(value)
+                if id_field and not (partial and partial(*args, **kwargs)):
+                    for item in value:
+                        if isinstance(item, dict) and item.get(id_field):
+                            store['docs'][(collection, item[id_field])] = dict(item)
+            return value
+        return wrapper
+    return decorator
+
+
+def invalidates(*collections: str) -> Callable:
+    """Decorate a write helper so it invalidates the collections it modifies."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                invalidate(*collections)
+        return wrapper
+    return decorator
+
+
+def get_many_cached(collection: str, doc_ids: Iterable[str],
+                    fetch_many: Callable[[list], Dict[str, Optional[Dict]]]) -> Dict[str, Optional[Dict]]:
+    """
+    Resolve several document IDs, reading only the ones not yet in the identity map.
+
+    Args:
+        collection: Firestore collection name
+        doc_ids: Document IDs to resolve (duplicates and empty IDs are ignored)
+        fetch_many: Function that reads a list of IDs and returns {id: document or None}
+
+    Returns:
+        Dictionary mapping each requested ID to its document, or None if it does not exist
+    """
+    results: Dict[str, Optional[Dict]] = {}
+    pending = []
+    for doc_id in dict.fromkeys(doc_id for doc_id in doc_ids if doc_id):
+        cached = get_cached_document(collection, doc_id)
+        if cached is _MISSING:
+            pending.append(doc_id)
+        else:
+            results[doc_id] = cached
+
+    if pending:
+        fetched = fetch_many(pending)
+        for doc_id in pending:
+            value = fetched.get(doc_id)
+            remember_document(collection, doc_id, value)
+            results[doc_id] = value
+    return results
+
+
+def get_request_cache_stats() -> Dict[str, int]:
+    """Identity map statistics for the current request (empty outside a request)."""
+    store = _identity_map()
+    if store is None:
+        return {}
+    return {
+        'documents': len(store['docs']),
+        'lists': sum(len(entries) for entries in store['lists'].values()),
+        'hits': store['hits'],
+        'misses': store['misses'],
+    }
@@ -0,0 +1,427 @@
+"""
+Background scheduler with single-leader execution.
+
+Each gunicorn worker or instance used to start its own APScheduler, so the
+periodic jobs (reservation sync, magic link expiry, missing summaries) could run
+once per process. Now:
+
+- scheduler processes compete for a leader lease stored in Firestore
+  ('scheduler_locks/leader'); only the current leader runs jobs,
+- every job run takes a per-job lock, so a slow run never overlaps the next
+  one and a run is not repeated within the same interval after a failover,
+- each run is recorded in the 'scheduler_runs' collection,
+- SCHEDULER_MODE=external keeps web workers request-only; the scheduler then
+  runs as its own process via `python -m concierge.utils.scheduler`.
+"""
+
+import os
+import sys
+import uuid
+import socket
+import signal
+import logging
+import threading
+import traceback
+from datetime import datetime, timezone, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from firebase_admin import firestore
+
+from concierge.utils.firestore_client import get_firestore_db, initialize_firebase
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_LOCKS_COLLECTION = 'scheduler_locks'
+SCHEDULER_RUNS_COLLECTION = 'scheduler_runs'
+LEADER_LOCK_ID = 'leader'
+
+# 'embedded' runs the scheduler inside the web app (leader election still applies),
+# 'external' leaves it to the separate scheduler process, 'off' disables it.
+SCHEDULER_MODE = os.getenv('SCHEDULER_MODE', 'embedded').lower()
+
+LEADER_LEASE_SECONDS = int(os.getenv('SCHEDULER_LEADER_LEASE_SECONDS', '90'))
+HEARTBEAT_SECONDS = int(os.getenv('SCHEDULER_HEARTBEAT_SECONDS', '30'))
+
+# Run statuses
+RUN_RUNNING = 'running'
+RUN_SUCCEEDED = 'succeeded'
+RUN_FAILED = 'failed'
+
+# Identity of this scheduler process for lease ownership
+HOLDER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _job_lock_id(job_id: str) -> str:
+    return f"job_{job_id}"
+
+
+class LeaderElector:
+    """Lease-based leader election on a Firestore lock document."""
+
+    def __init__(self, lock_id: str = LEADER_LOCK_ID, lease_seconds: int = LEADER_LEASE_SECONDS):
+        self.lock_id = lock_id
+        self.lease_seconds = lease_seconds
+        self._lease_expires_at: Optional[datetime] = None
+
+    @property
+    def is_leader(self) -> bool:
+        # Leadership is only trusted until our own view of the lease runs out
+        return self._lease_expires_at is not None and self._lease_expires_at > _now()
+
+    def acquire_or_renew(self) -> bool:
+        """Take the lease if it is free or expired, or extend it if we hold it."""
+        db = get_firestore_db()
+        if not db:
+            self._lease_expires_at = None
+            return False
+        ref = db.collection(SCHEDULER_LOCKS_COLLECTION).document(self.lock_id)
+
+        @firestore.transactional
+        def _acquire(transaction):
+            snapshot = ref.get(transaction=transaction)
+            now = _now()
+            if snapshot.exists:
+                lock = snapshot.to_dict()
+                expires_at = lock.get('expiresAt')
+                if lock.get('holder') != HOLDER_ID and expires_at and expires_at > now:
+                    return None
+            expires_at = now + timedelta(seconds=self.lease_seconds)
+            transaction.set(ref, {
+                'holder': HOLDER_ID,
+                'expiresAt': expires_at,
+                'renewedAt': now,
+            }, merge=True)
+            return expires_at
+
+        was_leader = self.is_leader
+        try:
+            self._lease_expires_at = _acquire(db.transaction())
+        except Exception as e:
+            logger.error(f"Error acquiring scheduler leader lease: {e}")
+            self._lease_expires_at = None
+
+        if self.is_leader and not was_leader:
+            logger.info(f"Scheduler {HOLDER_ID} became leader")
+        elif was_leader and not self.is_leader:
+            logger.warning(f"Scheduler {HOLDER_ID} lost leadership")
+        return self.is_leader
+
+    def release(self) -> None:
+        """Give up the lease so another process can take over immediately."""
+        if not self.is_leader:
+            return
+        db = get_firestore_db()
+        self._lease_expires_at = None
+        if not db:
+            return
+        try:
+            ref = db.collection(SCHEDULER_LOCKS_COLLECTION).document(self.lock_id)
+            snapshot = ref.get()
+            if snapshot.exists and snapshot.to_dict().get('holder') == HOLDER_ID:
+                ref.update({'expiresAt': _now()})
+        except Exception as e:
+            logger.warning(f"Error releasing scheduler leader lease: {e}")
+
+
+def _acquire_job_lock(job_id: str, interval_seconds: int, max_runtime_seconds: int) -> bool:
+    """
+    Mark a job as running unless it is already running or already ran this interval.
+
+    A running lock older than max_runtime_seconds is treated as abandoned.
+    """
+    db = get_firestore_db()
+    if not db:
+        return False
+    ref = db.collection(SCHEDULER_LOCKS_COLLECTION).document(_job_lock_id(job_id))
+
+    @firestore.transactional
+    def _acquire(transaction):
+        snapshot = ref.get(transaction=transaction)
+        now = _now()
+        if snapshot.exists:
+            lock = snapshot.to_dict()
+            lock_expires_at = lock.get('lockExpiresAt')
+            if lock.get('running') and lock_expires_at and lock_expires_at > now:
+                return False
+            last_started_at = lock.get('lastStartedAt')
+            # Allow a little jitter between scheduler processes' triggers
+            if last_started_at and (now - last_started_at).total_seconds() < interval_seconds * 0.9:
+                return False
+        transaction.set(ref, {
+            'jobId': job_id,
+            'running': True,
+            'runningBy': HOLDER_ID,
+            'lockExpiresAt': now + timedelta(seconds=max_runtime_seconds),
+            'lastStartedAt': now,
+        }, merge=True)
+        return True
+
+    try:
+        return _acquire(db.transaction())
+    except Exception as e:
+        logger.error(f"Error acquiring lock for scheduled job {job_id}: {e}")
+        return False
+
+
+def _release_job_lock(job_id: str, status: str) -> None:
+    db = get_firestore_db()
+    if not db:
+        return
+    try:
+        db.collection(SCHEDULER_LOCKS_COLLECTION).document(_job_lock_id(job_id)).set({
+            'running': False,
+            'runningBy': None,
+            'lastFinishedAt': _now(),
+            'lastStatus': status,
+        }, merge=True)
+    except Exception as e:
+        logger.error(f"Error releasing lock for scheduled job {job_id}: {e}")
+
+
+def _summarize_result(result: Any) -> Any:
+    """Keep run history small: store dict/number/bool results, stringify the rest."""
+    if result is None or isinstance(result, (bool, int, float)):
+        return result
+    if isinstance(result, dict):
+        return {str(k): v if isinstance(v, (bool, int, float, str)) or v is None else str(v)
+                for k, v in list(result.items())[:20]}
+    return str(result)[:500]
+
+
+class LeaderScheduler:
+    """APScheduler wrapper that only executes jobs while holding the leader lease."""
+
+    def __init__(self):
+        self.elector = LeaderElector()
+        self.scheduler = BackgroundScheduler(daemon=True)
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._started = False
+
+    def add_interval_job(self, job_id: str, name: str, func: Callable[[], Any], hours: float,
+                         max_runtime_seconds: Optional[int] = None) -> None:
+        """Register a job that runs every `hours` on the leader only."""
+        interval_seconds = int(hours * 3600)
+        self.jobs[job_id] = {
+            'name': name,
+            'interval_seconds': interval_seconds,
+            'max_runtime_seconds': max_runtime_seconds or interval_seconds,
+        }
+        self.scheduler.add_job(
+            func=self._run_job,
+            args=[job_id, func],
+            trigger='interval',
+            hours=hours,
+            id=job_id,
+            name=name,
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+
+    def _run_job(self, job_id: str, func: Callable[[], Any]) -> None:
+        if not self.elector.is_leader:
+            logger.debug(f"Skipping scheduled job {job_id}: {HOLDER_ID} is not the leader")
+            return
+
+        config = self.jobs[job_id]
+        if not _acquire_job_lock(job_id, config['interval_seconds'], config['max_runtime_seconds']):
+            logger.info(f"Skipping scheduled job {job_id}: already running or already ran this interval")
+            return
+
+        db = get_firestore_db()
+        run_ref = db.collection(SCHEDULER_RUNS_COLLECTION).document() if db else None
+        started_at = _now()
+        if run_ref is not None:
+            try:
+                run_ref.set({
+                    'jobId': job_id,
+                    'name': config['name'],
+                    'holder': HOLDER_ID,
+                    'status': RUN_RUNNING,
+                    'startedAt': started_at,
+                })
+            except Exception as e:
+                logger.warning(f"Could not record start of scheduled job {job_id}: {e}")
+
+        status = RUN_SUCCEEDED
+        update: Dict[str, Any] = {}
+        try:
+            logger.info(f"Running scheduled job {job_id}")
+            update['result'] = _summarize_result(func())
+        except Exception as e:
+            status = RUN_FAILED
+            update['error'] = str(e)[:1000]
+            logger.error(f"Scheduled job {job_id} failed: {e}")
+            traceback.print_exc()
+        finally:
+            finished_at = _now()
+            _release_job_lock(job_id, status)
+            if run_ref is not None:
+                update.update({
+                    'status': status,
+                    'finishedAt': finished_at,
+                    'durationSeconds': (finished_at - started_at).total_seconds(),
+                })
+                try:
+                    run_ref.update(update)
+                except Exception as e:
+                    logger.warning(f"Could not record end of scheduled job {job_id}: {e}")
+
+    def start(self) -> None:
+        if self._started:
+            return
+        self.elector.acquire_or_renew()
+        self.scheduler.add_job(
+            func=self.elector.acquire_or_renew,
+            trigger='interval',
+            seconds=HEARTBEAT_SECONDS,
+            id='scheduler_leader_heartbeat',
+            name='Scheduler Leader Heartbeat',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        self.scheduler.start()
+        self._started = True
+        logger.info(f"Scheduler {HOLDER_ID} started with jobs: {', '.join(self.jobs)}")
+
+    def shutdown(self) -> None:
+        if not self._started:
+            return
+        try:
+            self.scheduler.shutdown(wait=False)
+        finally:
+            self.elector.release()
+            self._started = False
+
+
+def _register_default_jobs(leader_scheduler: LeaderScheduler) -> None:
+    from concierge.utils.reservations import update_all_reservations
+    from concierge.utils.firestore_client import expire_old_magic_links
+    from concierge.utils.dynamodb_client import run_missing_conversation_summaries_job
+    from concierge.utils.import_jobs import resume_stale_import_jobs
+
+    leader_scheduler.add_interval_job(
+        'update_reservations_job',
+        'Update Reservations Every 6 Hours',
+        update_all_reservations,
+        hours=6
+    )
+    leader_scheduler.add_interval_job(
+        'expire_magic_links_job',
+        'Expire Old Magic Links Daily',
+        expire_old_magic_links,
+        hours=24
+    )
+    leader_scheduler.add_interval_job(
+        'generate_missing_conversation_summaries_job',
+        'Generate Missing Conversation Summaries Hourly',
+        lambda: run_missing_conversation_summaries_job(max_items=60),
+        hours=1
+    )
+    leader_scheduler.add_interval_job(
+        'resume_stale_import_jobs_job',
+        'Resume Abandoned Import Jobs Every Minute',
+        resume_stale_import_jobs,
+        hours=1 / 60
+    )
+
+
+def create_scheduler() -> Optional[LeaderScheduler]:
+    """Create a LeaderScheduler with the application's periodic jobs registered."""
+    if not initialize_firebase():
+        logger.warning("Firestore initialization failed. Background scheduler will NOT run.")
+        return None
+    leader_scheduler = LeaderScheduler()
+    _register_default_jobs(leader_scheduler)
+    return leader_scheduler
+
+
+def start_embedded_scheduler() -> Optional[LeaderScheduler]:
+    """Start the scheduler inside the web app unless SCHEDULER_MODE says otherwise."""
+    if SCHEDULER_MODE != 'embedded':
+        logger.info(f"SCHEDULER_MODE={SCHEDULER_MODE}: background jobs are not run in the web process")
+        return None
+    try:
+        leader_scheduler = create_scheduler()
+        if leader_scheduler is None:
+            return None
+        leader_scheduler.start()
+        import atexit
+        atexit.register(leader_scheduler.shutdown)
+        return leader_scheduler
+    except Exception as e:
+        logger.error(f"Could not start background scheduler: {e}")
+        return None
+
+
+def get_recent_runs(job_id: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Return the most recent scheduler runs, newest first.
+
+    Filtering by job needs the (jobId ASC, startedAt DESC) composite index on
+    scheduler_runs:
+
+        gcloud firestore indexes composite create --collection-group=scheduler_runs \
+            --field-config field-path=jobId,order=ascending \
+            --field-config field-path=startedAt,order=descending
+
+    Until it exists, the job's runs are sorted in memory instead.
+    """
+    db = get_firestore_db()
+    if not db:
+        return []
+    collection = db.collection(SCHEDULER_RUNS_COLLECTION)
+    if not job_id:
+        docs = collection.order_by('startedAt', direction=firestore.Query.DESCENDING).limit(limit).stream()
+    else:
+        query = collection.where('jobId', '==', job_id)
+        try:
+            docs = list(query.order_by('startedAt', direction=firestore.Query.DESCENDING).limit(limit).stream())
+        except Exception as e:
+            logger.warning(f"Scheduler runs query for {job_id} failed (missing composite index?), sorting in memory: {e}")
+            oldest = datetime.min.replace(tzinfo=timezone.utc)
+            docs = sorted(query.stream(), key=lambda doc: doc.to_dict().get('startedAt') or oldest, reverse=True)[:limit]
+    runs = []
+    for doc in docs:
+        run = doc.to_dict()
+        run['id'] = doc.id
+        runs.append(run)
+    return runs
+
+
+def main() -> int:
+    """Entry point for the standalone scheduler process."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    leader_scheduler = create_scheduler()
+    if leader_scheduler is None:
+        return 1
+
+    stop_event = threading.Event()
+
+    def _stop(signum, frame):
+        logger.info(f"Scheduler received signal {signum}, shutting down")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    leader_scheduler.start()
+    try:
+        while not stop_event.is_set():
+            stop_event.wait(1)
+    finally:
+        leader_scheduler.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
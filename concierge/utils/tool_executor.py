@@ -0,0 +1,166 @@
+"""
+Concurrent execution of model function calls.
+
+When the model asks for several tools in one turn (say the current time and
+two Places searches), the text chat loop used to run them one after another on
+the request thread. ToolExecutor runs all calls of a turn at once on a shared
+thread pool, so a turn costs as much as its slowest tool:
+
+- each tool has its own timeout; a call that does not finish in time (or
+  raises) yields an error result instead of failing the whole turn,
+- tools registered with a memo key (pure lookups such as the current time at
+  a property, which only changes every minute) are served from a small
+  in-process memo while the key stays the same,
+- results come back in the order of the calls, so they can be shown to the
+  model in the order it asked for them.
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOOL_EXECUTOR_WORKERS = int(os.getenv('TOOL_EXECUTOR_WORKERS', '8'))
+DEFAULT_TOOL_TIMEOUT_SECONDS = float(os.getenv('TOOL_TIMEOUT_SECONDS', '10'))
+# Memoized tool results kept per process
+TOOL_MEMO_MAX_ENTRIES = 1000
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=TOOL_EXECUTOR_WORKERS, thread_name_prefix='tool')
+        return _pool
+
+
+class ToolCallResult:
+    """Outcome of one function call."""
+
+    def __init__(self, name: str, args: Dict[str, Any], result: Any = None, error: Optional[str] = None,
+                 elapsed_ms: float = 0.0, memoized: bool = False):
+        self.name = name
+        self.args = args
+        self.result = result
+        self.error = error
+        self.elapsed_ms = elapsed_ms
+        self.memoized = memoized
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'args': self.args, 'error': self.error,
+                'elapsed_ms': round(self.elapsed_ms, 1), 'memoized': self.memoized}
+
+
+class ToolExecutor:
+    """
+    Registry of tools that runs the function calls of one model turn concurrently.
+    """
+
+    def __init__(self, default_timeout: float = DEFAULT_TOOL_TIMEOUT_SECONDS):
+        """
+        Initialize an empty registry.
+
+        Args:
+            default_timeout: Seconds a tool may run when registered without a timeout
+        """
+        self._default_timeout = default_timeout
+        self._tools: Dict[str, Tuple[Callable, float, Optional[Callable]]] = {}
+        self._memo: Dict[Tuple, Any] = {}
+        self._memo_lock = threading.Lock()
+
+    def register(self, name: str, func: Callable[[Dict[str, Any], Optional[Dict]], Any],
+                 timeout: Optional[float] = None,
+                 memo_key: Optional[Callable[[Dict[str, Any], Optional[Dict]], Optional[Tuple]]] = None) -> None:
+        """
+        Register a tool.
+
+        Args:
+            name: Function name the model uses
+            func: Called with (args, context); returns the tool result
+            timeout: Seconds the tool may run (default: the executor's default)
+            memo_key: For pure tools, called with (args, context); calls with the same
+                      non-None key share one result
+        """
+        self._tools[name] = (func, timeout or self._default_timeout, memo_key)
+
+    def has_tool(self, name: str) -> bool:
+        return name in self._tools
+
+    def run(self, calls: List[Tuple[str, Dict[str, Any]]], context: Optional[Dict] = None) -> List[ToolCallResult]:
+        """
+        Run function calls concurrently.
+
+        Args:
+            calls: (name, args) pairs in the order the model asked for them
+            context: Request context passed to every tool (e.g. the property context)
+
+        Returns:
+            One ToolCallResult per call, in the same order
+        """
+        results: List[Optional[ToolCallResult]] = [None] * len(calls)
+        pending = []
+        for i, (name, args) in enumerate(calls):
+            if name not in self._tools:
+                results[i] = ToolCallResult(name, args, error=f"Unknown tool: {name}")
+                continue
+            func, timeout, memo_key = self._tools[name]
+            key = self._memo_key(name, memo_key, args, context)
+            if key is not None:
+                with self._memo_lock:
+                    if key in self._memo:
+                        results[i] = ToolCallResult(name, args, result=self._memo[key], memoized=True)
+                        continue
+            started = time.perf_counter()
+            pending.append((i, name, args, key, timeout, started, _get_pool().submit(func, args, context)))
+
+        for i, name, args, key, timeout, started, future in pending:
+            remaining = max(0.0, timeout - (time.perf_counter() - started))
+            try:
+                value = future.result(timeout=remaining)
+                results[i] = ToolCallResult(name, args, result=value,
+                                            elapsed_ms=(time.perf_counter() - started) * 1000)
+                if key is not None:
+                    self._remember(key, value)
+            except FutureTimeoutError:
+                logger.warning(f"Tool {name} timed out after {timeout:.1f}s")
+                results[i] = ToolCallResult(name, args, error=f"{name} timed out",
+                                            elapsed_ms=(time.perf_counter() - started) * 1000)
+            except Exception as e:
+                logger.warning(f"Tool {name} failed: {e}")
+                results[i] = ToolCallResult(name, args, error=str(e),
+                                            elapsed_ms=(time.perf_counter() - started) * 1000)
+
+        if pending:
+            logger.info("Ran tools " + ", ".join(
+                f"{r.name} ({'memo' if r.memoized else f'{r.elapsed_ms:.0f} ms'}{'' if r.ok else ', failed'})"
+                for r in results))
+        return results
+
+    def _memo_key(self, name: str, memo_key: Optional[Callable], args: Dict[str, Any],
+                  context: Optional[Dict]) -> Optional[Tuple]:
+        if memo_key is None:
+            return None
+        try:
+            key = memo_key(args, context)
+        except Exception as e:
+            logger.warning(f"Could not build memo key for tool {name}: {e}")
+            return None
+        return (name,) + tuple(key) if key is not None else None
+
+    def _remember(self, key: Tuple, value: Any) -> None:
+        with self._memo_lock:
+            if len(self._memo) >= TOOL_MEMO_MAX_ENTRIES:
+                # Keys embed their validity window (e.g. the minute), so old entries are simply dropped
+                self._memo.clear()
+            self._memo[key] = value
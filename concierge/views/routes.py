@@ -33,7 +33,8 @@ from concierge.utils.date_utils import (
     format_date_for_display,
     normalize_reservation_dates,
     to_date_only,
-    ensure_date_only_format
+    ensure_date_only_format,
+    get_current_date_string
 )
 
 # Import Firebase setup functions from lambda_src
@@ -722,9 +723,8 @@ def property_conversations(property_id):
     user_id = getattr(g, 'user_id', None)
 
     # Import required functions
-    from concierge.utils.dynamodb_client import get_property, list_property_conversations
-    from concierge.utils.firestore_client import get_property as get_firestore_property
-    from concierge.utils.firestore_client import list_property_reservations as list_reservations_by_property
+    from concierge.utils.dynamodb_client import list_property_conversations
+    from concierge.utils.firestore_client import get_property, list_property_reservations
     from concierge.utils.ai_helpers import generate_conversation_summary
     import traceback
 
@@ -734,13 +734,9 @@ def property_conversations(property_id):
 
     try:
         # --- Verify Ownership & Fetch Property Data ---
-        # Try DynamoDB first
+        # Properties live in Firestore (read once per request via the identity map)
         raw_property_data = get_property(property_id)
 
-        # If not found in DynamoDB, try Firestore as fallback
-        if not raw_property_data:
-            raw_property_data = get_firestore_property(property_id)
-
         if not raw_property_data:
             print(f"Conversation history access attempt for non-existent property {property_id} by user {user_id}")
             flash('Property not found.', 'danger')
@@ -764,14 +760,8 @@ def property_conversations(property_id):
 
         # Fetch all reservations for this property to link conversations to guests
         try:
-            # Try to get reservations from DynamoDB first
-            from concierge.utils.dynamodb_client import list_property_reservations
             all_reservations = list_property_reservations(property_id)
 
-            # If no reservations found in DynamoDB, try Firestore as fallback
-            if not all_reservations:
-                all_reservations = list_reservations_by_property(property_id)
-
             # Create a lookup dictionary by guest name, phone, and reservation ID
             for reservation in all_reservations:
                 # Normalize field names (handle both Firestore and DynamoDB formats)
@@ -1043,15 +1033,9 @@ def render_conversation(property_id, conversation_id):
                     
                     # Fallback to property-scoped lookup (EXISTING APPROACH)
                     # Get all reservations for this property and create lookup dictionary (same as property_conversations)
-                    from concierge.utils.dynamodb_client import list_property_reservations
-                    from concierge.utils.firestore_client import list_property_reservations as list_reservations_by_property
-                    
-                    # Try to get reservations from DynamoDB first
-                    all_reservations = list_property_reservations(property_id)
+                    from concierge.utils.firestore_client import list_property_reservations
 
-                    # If no reservations found in DynamoDB, try Firestore as fallback
-                    if not all_reservations:
-                        all_reservations = list_reservations_by_property(property_id)
+                    all_reservations = list_property_reservations(property_id)
 
                     # Create a lookup dictionary by reservation ID
                     reservations_lookup = {}
@@ -1104,22 +1088,10 @@ def render_conversation(property_id, conversation_id):
             try:
                 # Import required functions
                 from concierge.utils.firestore_client import list_property_reservations as list_firestore_reservations
-                from concierge.utils.dynamodb_client import list_property_reservations as list_dynamodb_reservations
-                import traceback
 
-                # Get all reservations for this property from both sources
+                # Reservations live in Firestore; repeated listings in this request hit the identity map
                 all_reservations = list_firestore_reservations(property_id)
 
-                # Also try DynamoDB
-                try:
-                    dynamodb_reservations = list_dynamodb_reservations(property_id)
-                    if dynamodb_reservations:
-                        print(f"Found {len(dynamodb_reservations)} reservations in DynamoDB")
-                        all_reservations.extend(dynamodb_reservations)
-                except Exception as ddb_err:
-                    print(f"Error listing DynamoDB reservations: {ddb_err}")
-                    traceback.print_exc()
-
                 print(f"Found total of {len(all_reservations)} reservations for property {property_id}")
 
                 # Try to match by guest name
@@ -1363,59 +1335,22 @@ def knowledge_upload(property_id):
             mime_type = mime.from_file(file_path)
             print(f"Detected MIME type: {mime_type}")
 
-            # Process based on file type
-            extracted_text = ""
-            if mime_type == 'text/plain':
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    extracted_text = f.read()
-            elif mime_type == 'application/pdf':
-                try:
-                    import pypdf
-                    reader = pypdf.PdfReader(file_path)
-                    for page in reader.pages:
-                        page_text = page.extract_text() or ""
-                        extracted_text += page_text + "\n\n"
-                except Exception as pdf_err:
-                    print(f"Error extracting PDF text: {pdf_err}")
-                    flash('Error processing PDF file.', 'danger')
-                    os.remove(file_path)  # Clean up file
-                    return redirect(url_for('views.knowledge_base', property_id=property_id))
-            elif mime_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
-                try:
-                    import docx
-                    doc = docx.Document(file_path)
-                    for para in doc.paragraphs:
-                        extracted_text += para.text + "\n"
-                except Exception as docx_err:
-                    print(f"Error extracting DOCX text: {docx_err}")
-                    flash('Error processing Word document.', 'danger')
-                    os.remove(file_path)  # Clean up file
-                    return redirect(url_for('views.knowledge_base', property_id=property_id))
-            elif mime_type == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet':
-                try:
-                    import openpyxl
-                    # Load the workbook
-                    wb = openpyxl.load_workbook(file_path, data_only=True)
-                    # Process each sheet
-                    for sheet_name in wb.sheetnames:
-                        ws = wb[sheet_name]
-                        extracted_text += f"Sheet: {sheet_name}\n"
-                        # Process each row
-                        for row in ws.iter_rows():
-                            row_text = ""
-                            # Process each cell in the row
-                            for cell in row:
-                                if cell.value is not None:
-                                    row_text += str(cell.value) + "\t"
-                            if row_text:
-                                extracted_text += row_text + "\n"
-                        extracted_text += "\n\n"  # Separate sheets
-                except Exception as xlsx_err:
-                    print(f"Error extracting XLSX text: {xlsx_err}")
-                    flash('Error processing Excel document.', 'danger')
-                    os.remove(file_path)  # Clean up file
-                    return redirect(url_for('views.knowledge_base', property_id=property_id))
-            else:
+            # Extract the text (PDF pages and workbook sheets are read in parallel)
+            from concierge.utils.file_helpers import extract_document_text, MIME_TYPE_PDF, MIME_TYPE_DOCX, MIME_TYPE_XLSX
+            extraction_errors = {
+                MIME_TYPE_PDF: 'Error processing PDF file.',
+                MIME_TYPE_DOCX: 'Error processing Word document.',
+                MIME_TYPE_XLSX: 'Error processing Excel document.',
+            }
+            try:
+                extracted_text = extract_document_text(file_path, mime_type)
+            except Exception as extract_err:
+                print(f"Error extracting text ({mime_type}): {extract_err}")
+                flash(extraction_errors.get(mime_type, 'Error processing file.'), 'danger')
+                os.remove(file_path)  # Clean up file
+                return redirect(url_for('views.knowledge_base', property_id=property_id))
+
+            if extracted_text is None:
                 print(f"Unsupported MIME type: {mime_type}")
                 flash('Unsupported file type.', 'danger')
                 os.remove(file_path)  # Clean up file
@@ -1449,9 +1384,10 @@ def knowledge_upload(property_id):
                     update_status = {'status': 'processing', 'updatedAt': datetime.now(timezone.utc)}
                     update_knowledge_source(source_id, update_status)
 
-                    # Generate knowledge items using Gemini with new schema
-                    from concierge.api.utils import generate_knowledge_items_with_gemini
-                    generated_items = generate_knowledge_items_with_gemini(extracted_text, property_details)
+                    # Generate knowledge items using Gemini with new schema; long documents
+                    # are split into chunks that are processed concurrently
+                    from concierge.api.utils import generate_knowledge_items_for_document
+                    generated_items = generate_knowledge_items_for_document(extracted_text, property_details)
 
                     if not generated_items:
                         # No items generated
@@ -1459,8 +1395,9 @@ def knowledge_upload(property_id):
                         flash('File uploaded, but no knowledge items could be generated.', 'warning')
                         return redirect(url_for('views.knowledge_base', property_id=property_id))
 
-                    # Import check_duplicate_content function
-                    from concierge.utils.firestore_client import check_duplicate_content
+                    # Import duplicate detection
+                    from concierge.utils.firestore_client import find_duplicate_content
+                    from concierge.utils.knowledge_dedup import DUPLICATE_EXACT
 
                     # Create knowledge items in Firestore
                     item_count = 0
@@ -1468,11 +1405,11 @@ def knowledge_upload(property_id):
 
                     for item in generated_items:
                         if isinstance(item, dict) and item.get('content'):
-                            # Check for duplicate content
+                            # Skip exact duplicates only; near matches are created as pending items for review
                             content = item.get('content', '')
-                            duplicate = check_duplicate_content(property_id, content)
+                            duplicate = find_duplicate_content(property_id, content)
 
-                            if duplicate:
+                            if duplicate and duplicate[1] == DUPLICATE_EXACT:
                                 # Skip this item as it's a duplicate
                                 print(f"Skipping duplicate content: {content[:50]}...")
                                 duplicate_count += 1
@@ -1492,6 +1429,9 @@ def knowledge_upload(property_id):
                                 'createdAt': datetime.now(timezone.utc),
                                 'updatedAt': datetime.now(timezone.utc)
                             }
+                            if duplicate:
+                                # Nearly the same as an existing item, possibly a changed fact
+                                item_data['possibleDuplicateOf'] = duplicate[0]['id']
 
                             item_success = create_knowledge_item(item_id, item_data)
                             if item_success:
@@ -1628,9 +1568,9 @@ def knowledge_add_text(property_id):
                 if not update_success and 'dynamo_update_source' in locals():
                     dynamo_update_source(source_id, {'Status': 'processing'})
 
-                # Generate knowledge items using Gemini with new schema
-                from concierge.api.utils import generate_knowledge_items_with_gemini
-                generated_items = generate_knowledge_items_with_gemini(knowledge_text, property_details)
+                # Generate knowledge items using Gemini with new schema (chunked for long text)
+                from concierge.api.utils import generate_knowledge_items_for_document
+                generated_items = generate_knowledge_items_for_document(knowledge_text, property_details)
 
                 if not generated_items:
                     # No items generated
@@ -1644,8 +1584,9 @@ def knowledge_add_text(property_id):
                     flash('Knowledge text added, but no items could be generated.', 'warning')
                     return redirect(url_for('views.knowledge_base', property_id=property_id))
 
-                # Import check_duplicate_content function
-                from concierge.utils.firestore_client import check_duplicate_content
+                # Import duplicate detection
+                from concierge.utils.firestore_client import find_duplicate_content
+                from concierge.utils.knowledge_dedup import DUPLICATE_EXACT
 
                 # Create knowledge items in Firestore
                 item_count = 0
@@ -1653,11 +1594,11 @@ def knowledge_add_text(property_id):
 
                 for item in generated_items:
                     if isinstance(item, dict) and item.get('content'):
-                        # Check for duplicate content
+                        # Skip exact duplicates only; near matches are created as pending items for review
                         content = item.get('content', '')
-                        duplicate = check_duplicate_content(property_id, content)
+                        duplicate = find_duplicate_content(property_id, content)
 
-                        if duplicate:
+                        if duplicate and duplicate[1] == DUPLICATE_EXACT:
                             # Skip this item as it's a duplicate
                             print(f"Skipping duplicate content: {content[:50]}...")
                             duplicate_count += 1
@@ -1677,6 +1618,9 @@ def knowledge_add_text(property_id):
                             'createdAt': datetime.now(timezone.utc),
                             'updatedAt': datetime.now(timezone.utc)
                         }
+                        if duplicate:
+                            # Nearly the same as an existing item, possibly a changed fact
+                            item_data['possibleDuplicateOf'] = duplicate[0]['id']
 
                         item_success = create_knowledge_item(item_id, item_data)
                         if item_success:
@@ -2549,38 +2493,35 @@ def get_active_reservations():
 
     try:
         # Get properties from Firestore
-        from concierge.utils.firestore_client import list_properties_by_host, list_property_reservations
+        from concierge.utils.firestore_client import list_properties_by_host, list_reservations_for_properties
         host_properties = list_properties_by_host(user_id)
 
-        # Extract property IDs from Firestore properties
-        property_ids = [prop.get('id') for prop in host_properties if prop.get('id')]
+        # Property names by ID for the response rows
+        property_names = {
+            prop.get('id'): prop.get('name', 'Unknown Property')
+            for prop in host_properties if prop.get('id')
+        }
 
-        if not property_ids:
+        if not property_names:
             print(f"No properties found in Firestore for user {user_id}")
             return jsonify({'success': True, 'reservations': []})
 
-        # Get active reservations for all properties
-        active_reservations = []
-
-        # Get reservations from Firestore
-        for property_id in property_ids:
-            # Get reservations for this property from Firestore
-            property_reservations = list_property_reservations(property_id)
+        # Only include active reservations (current or future): the stay must end today or later.
+        # Reservations for the whole portfolio are loaded with batched, date-filtered queries.
+        today = get_current_date_string()
+        reservations_by_property = list_reservations_for_properties(list(property_names), end_date_from=today)
 
-            # Find corresponding property for name
-            property_name = 'Unknown Property'
-            for prop in host_properties:
-                if prop.get('id') == property_id:
-                    property_name = prop.get('name', 'Unknown Property')
-                    break
+        active_reservations = []
+        for property_id, property_reservations in reservations_by_property.items():
+            property_name = property_names[property_id]
 
             # Process each reservation
             for res in property_reservations:
                 # Normalize dates first
                 normalized_res = normalize_reservation_dates(res)
-
-                # Only include active reservations (current or future)
-                # TODO: Add date filtering logic here
+                end_date = normalized_res.get('endDate')
+                if end_date and end_date < today:
+                    continue
 
                 # Format the reservation data
                 res_data = {
@@ -2594,6 +2535,8 @@ def get_active_reservations():
                 }
                 active_reservations.append(res_data)
 
+        active_reservations.sort(key=lambda r: r.get('startDate') or '')
+
         return jsonify({
             'success': True,
             'reservations': active_reservations
@@ -2797,32 +2740,33 @@ def get_property_knowledge_items():
     """Get knowledge items for a property from Firestore."""
     try:
         property_id = request.args.get('propertyId')
-        status = request.args.get('status')  # Optional status filter
+        status = request.args.get('status') or None  # Optional status filter
+        limit = request.args.get('limit', type=int)  # Optional page size
+        cursor = request.args.get('cursor') or None
 
         if not property_id:
             return jsonify({'success': False, 'error': 'Property ID is required'}), 400
 
-        # Get knowledge items from Firestore
-        from concierge.utils.firestore_client import list_knowledge_items_by_property
+        # Get knowledge items from Firestore, projected without the embedding
+        # field (Vector objects are not JSON serializable and not needed here)
+        from concierge.utils.firestore_client import list_knowledge_items_by_property, list_knowledge_items_page
 
-        # If status is provided, filter by status
-        if status:
-            items = list_knowledge_items_by_property(property_id, status)
+        next_cursor = None
+        if limit:
+            page = list_knowledge_items_page(property_id, status, page_size=min(max(limit, 1), 500), cursor=cursor)
+            items, next_cursor = page['items'], page['next_cursor']
         else:
-            items = list_knowledge_items_by_property(property_id)
-
-        # Remove embedding field from items before returning as JSON
-        # because Vector objects are not JSON serializable
-        for item in items:
-            if 'embedding' in item:
-                del item['embedding']
+            items = list_knowledge_items_by_property(property_id, status)
 
         logger.info(f"Returning {len(items)} knowledge items for property {property_id}")
 
-        return jsonify({
+        response = {
             'success': True,
             'items': items
-        })
+        }
+        if limit:
+            response['next_cursor'] = next_cursor
+        return jsonify(response)
 
     except Exception as e:
         logger.error(f"Error fetching knowledge items from Firestore: {str(e)}")
@@ -3926,7 +3870,7 @@ def process_approved_knowledge_drafts(property_id, wizard_data):
 def generate_wizard_knowledge_drafts(wizard_data):
     """Generate knowledge drafts using Gemini AI from all wizard data"""
     try:
-        from concierge.api.utils import generate_knowledge_items_with_gemini
+        from concierge.api.utils import generate_knowledge_items_for_document
         import uuid
         
         logger.info(f"Starting knowledge generation for wizard data with {len(wizard_data)} sections")
@@ -3950,8 +3894,8 @@ def generate_wizard_knowledge_drafts(wizard_data):
         
         logger.info(f"Calling AI generation with {len(wizard_text)} characters of text")
         
-        # Use existing knowledge generation function
-        generated_items = generate_knowledge_items_with_gemini(wizard_text, property_details)
+        # Same chunked generation as document uploads, so long wizard data is split and processed in parallel
+        generated_items = generate_knowledge_items_for_document(wizard_text, property_details)
         
         logger.info(f"AI returned {len(generated_items)} generated items")
         
@@ -388,10 +388,10 @@ async def _handle_telnyx_connection(websocket, path):
                     # Use Firestore to look up property based on caller's phone number
                     try:
                         # Import the Firestore client
-                        from firestore_client import list_reservations_by_phone, get_firestore_db
+                        from firestore_client import list_reservations_by_phone
 
-                        # Get reservations for this phone number
-                        reservations = list_reservations_by_phone(caller_number)
+                        # Get reservations for this phone number off the event loop, so other calls keep streaming
+                        reservations = await asyncio.to_thread(list_reservations_by_phone, caller_number)
 
                         if reservations:
                             # Sort reservations by check-in date (most recent first)
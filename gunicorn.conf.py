@@ -1,19 +1,37 @@
 """
 Gunicorn configuration file.
+
+The worker type follows SOCKETIO_ASYNC_MODE (see concierge/utils/async_runtime.py):
+threading (default) uses sync workers with a thread pool; gevent/eventlet use
+async workers that hold each guest connection in a greenlet instead of a thread.
 """
 
+import os
+
+async_mode = os.getenv('SOCKETIO_ASYNC_MODE', 'threading').strip().lower()
+
 # The socket to bind
 bind = "0.0.0.0:8080"
 
 # The number of worker processes
-workers = 2
+# Async mode uses one worker per instance: Socket.IO needs sticky sessions, so scale out with
+# more instances behind nginx ip_hash plus SOCKETIO_MESSAGE_QUEUE (see concierge/utils/async_runtime.py)
+workers = int(os.getenv('GUNICORN_WORKERS', '2' if async_mode == 'threading' else '1'))
 
 # The type of workers to use
-worker_class = "sync"
-
-# The number of threads for handling requests
+if async_mode == 'gevent':
+    worker_class = "geventwebsocket.gunicorn.workers.GeventWebSocketWorker"
+elif async_mode == 'eventlet':
+    worker_class = "eventlet"
+else:
+    worker_class = "sync"
+
+# The number of threads for handling requests (sync workers only)
 threads = 4
 
+# Maximum concurrent connections per async worker
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+
 # The maximum number of requests a worker will process before restarting
 max_requests = 1000
 
@@ -21,15 +39,20 @@ max_requests = 1000
 max_requests_jitter = 100
 
 # Timeout for graceful workers restart
-timeout = 1800
+# Long-running property imports run on the background import job pool
+# (concierge/utils/import_jobs.py), so requests no longer need a long timeout.
+timeout = 120
 
 # Keep alive timeout
 keepalive = 5
 
 # Preload the application
-preload_app = True
+# Async workers monkey-patch the standard library after fork, so modules must be
+# imported inside the worker rather than in the master
+preload_app = async_mode == 'threading'
 
 # Logging
 accesslog = "/var/log/gunicorn_access.log"
 errorlog = "/var/log/gunicorn_error.log"
 loglevel = "info"
+
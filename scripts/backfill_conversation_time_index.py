@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Add the time index keys (GSI2PK/GSI2SK) used by the paginated conversation list to existing conversations and voice sessions")
+    parser.add_argument('--property-id', default=None, help='Only backfill this property (default: all properties)')
+    args = parser.parse_args()
+
+    try:
+        # Lazy import to ensure repo path is on sys.path
+        sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+        from concierge.utils.dynamodb_client import backfill_conversation_time_index
+    except Exception as e:
+        print(f"Failed to import DynamoDB client: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    updated = backfill_conversation_time_index(args.property_id)
+    print(f"Updated {updated} conversation items")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Add the indexed propertyId/guestPhoneLast4/endDate/activeUntil fields used by the reservation lookups to existing reservations")
+    parser.add_argument('--property-id', default=None, help='Only backfill this property (default: all reservations)')
+    args = parser.parse_args()
+
+    try:
+        # Lazy import to ensure repo path is on sys.path
+        sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+        from concierge.utils.firestore_client import backfill_reservation_lookup_fields
+    except Exception as e:
+        print(f"Failed to import Firestore client: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    updated = backfill_reservation_lookup_fields(args.property_id)
+    print(f"Updated {updated} reservations")
+
+
+if __name__ == '__main__':
+    main()
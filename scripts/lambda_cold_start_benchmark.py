@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Cold/warm start benchmark for the WebSocket Lambda handlers.
+
+Each run starts a fresh Python process (a cold start), imports the handler
+module, invokes one route once (cold invocation) and then --warm more times
+(warm invocations). DynamoDB and the API Gateway management API are replaced
+with in-memory stubs, so no AWS account is needed; everything else (boto3,
+google-genai, firebase_admin, ai_helpers) is imported for real, which is what
+dominates init time. The report shows, per handler and route, the median
+init (module import) time, cold and warm invocation times, and which heavy
+modules ended up loaded.
+
+Example:
+    python scripts/lambda_cold_start_benchmark.py --runs 5
+    python scripts/lambda_cold_start_benchmark.py --handler websocket_lambda_function --routes connect ping
+
+The message route loads the AI modules and initializes Firebase; set
+GOOGLE_APPLICATION_CREDENTIALS to a service account key to keep credential
+discovery local. GEMINI_API_KEY is cleared so no model call is made.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDA_SRC = os.path.join(REPO_ROOT, 'concierge', 'lambda_src')
+
+HANDLERS = ['websocket_lambda_function', 'consolidated_call_handler']
+HEAVY_MODULES = ['google.genai', 'google.generativeai', 'firebase_admin', 'numpy', 'telnyx']
+
+ROUTES = {
+    'connect': ('$connect', None),
+    'disconnect': ('$disconnect', None),
+    'auth': ('$default', {'type': 'auth', 'payload': {'token': 'benchmark-token', 'property_id': 'benchmark-property'}}),
+    'ping': ('$default', {'type': 'ping', 'payload': {}}),
+    'message': ('$default', {'type': 'message', 'payload': {'message': 'Hello', 'property_id': 'benchmark-property'}}),
+}
+
+
+def build_event(route):
+    route_key, body = ROUTES[route]
+    event = {
+        'requestContext': {
+            'connectionId': 'benchmark-connection',
+            'routeKey': route_key,
+            'apiId': 'benchmark',
+            'stage': 'local',
+        }
+    }
+    if body is not None:
+        event['body'] = json.dumps(body)
+    return event
+
+
+class _StubTable:
+    def __init__(self, name):
+        self.name = name
+        self.items = {}
+
+    def load(self):
+        pass
+
+    def put_item(self, Item, **_):
+        self.items[json.dumps(Item, sort_keys=True, default=str)] = Item
+        return {}
+
+    def get_item(self, Key, **_):
+        return {}
+
+    def update_item(self, **_):
+        return {}
+
+    def delete_item(self, **_):
+        return {}
+
+    def query(self, **_):
+        return {'Items': []}
+
+
+class _StubResource:
+    def __init__(self):
+        self.tables = {}
+
+    def Table(self, name):
+        return self.tables.setdefault(name, _StubTable(name))
+
+
+class _StubApiGateway:
+    class exceptions:
+        class GoneException(Exception):
+            pass
+
+    def post_to_connection(self, ConnectionId, Data):
+        return {}
+
+
+def _install_aws_stubs():
+    """Import boto3 for real (its import cost is part of init) and stub its network clients."""
+    import boto3
+
+    resource = _StubResource()
+    boto3.resource = lambda service_name, *args, **kwargs: resource
+    boto3.client = lambda service_name, *args, **kwargs: _StubApiGateway()
+
+
+def run_child(handler, route, warm):
+    """Measure one cold start of a handler on a route; prints a JSON result."""
+    os.environ.update({
+        'CONNECTIONS_TABLE_NAME': 'benchmark-connections',
+        'DYNAMODB_TABLE_NAME': 'benchmark-data',
+        'AWS_REGION': 'us-east-2',
+    })
+    os.environ.pop('GEMINI_API_KEY', None)
+    sys.path[:0] = [LAMBDA_SRC, os.path.join(REPO_ROOT, 'concierge'), REPO_ROOT]
+
+    started = time.perf_counter()
+    _install_aws_stubs()
+    module = __import__(handler)
+    init_ms = (time.perf_counter() - started) * 1000
+
+    event = build_event(route)
+    timings = []
+    status = None
+    for _ in range(1 + warm):
+        started = time.perf_counter()
+        result = module.lambda_handler(event, None)
+        timings.append((time.perf_counter() - started) * 1000)
+        status = (result or {}).get('statusCode')
+
+    print(json.dumps({
+        'init_ms': init_ms,
+        'cold_ms': timings[0],
+        'warm_ms': statistics.median(timings[1:]) if warm else None,
+        'status': status,
+        'heavy_modules': [name for name in HEAVY_MODULES if name in sys.modules],
+    }))
+
+
+def measure(handler, route, warm):
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', handler, route, '--warm', str(warm)]
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=REPO_ROOT)
+    for line in reversed(proc.stdout.strip().splitlines()):
+        try:
+            return json.loads(line)
+        except ValueError:
+            continue
+    return {'error': (proc.stderr.strip().splitlines() or ['no output'])[-1]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--handler', choices=HANDLERS, action='append', help='Handler module (default: all)')
+    parser.add_argument('--routes', nargs='+', choices=sorted(ROUTES), default=list(ROUTES))
+    parser.add_argument('--runs', type=int, default=3, help='Cold starts per handler and route')
+    parser.add_argument('--warm', type=int, default=5, help='Warm invocations after each cold start')
+    parser.add_argument('--child', nargs=2, metavar=('HANDLER', 'ROUTE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], args.child[1], args.warm)
+        return 0
+
+    print(f"{'handler':<28} {'route':<11} {'init ms':>8} {'cold ms':>8} {'warm ms':>8}  status  heavy modules loaded")
+    for handler in args.handler or HANDLERS:
+        for route in args.routes:
+            results = [measure(handler, route, args.warm) for _ in range(args.runs)]
+            ok = [r for r in results if 'error' not in r]
+            if not ok:
+                print(f"{handler:<28} {route:<11} failed: {results[0]['error']}")
+                continue
+            warm_values = [r['warm_ms'] for r in ok if r['warm_ms'] is not None]
+            print(f"{handler:<28} {route:<11} "
+                  f"{statistics.median(r['init_ms'] for r in ok):>8.0f} "
+                  f"{statistics.median(r['cold_ms'] for r in ok):>8.1f} "
+                  f"{statistics.median(warm_values) if warm_values else 0:>8.1f}  "
+                  f"{str(ok[-1]['status']):>6}  {', '.join(ok[-1]['heavy_modules']) or '-'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
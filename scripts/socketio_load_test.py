@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Socket.IO load test for the guest text chat.
+
+Opens many concurrent guest connections against one server, keeps them all
+connected, optionally sends chat messages from each, and reports how many
+connections the server held at once and the reply latency.
+
+Example (compare worker modes against the same server port):
+    SOCKETIO_ASYNC_MODE=gevent gunicorn -c gunicorn.conf.py concierge.app:app
+    python scripts/socketio_load_test.py --url http://localhost:8080 \\
+        --user-id <guest user id> --property-id <property id> --clients 300 --messages 1
+
+Requires the Socket.IO client extras: pip install "python-socketio[client]"
+"""
+import argparse
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import socketio
+
+
+class GuestClient:
+    """One simulated guest with its own Socket.IO connection."""
+
+    def __init__(self, index, args):
+        self.index = index
+        self.args = args
+        self.client = socketio.Client(reconnection=False)
+        self.connected = False
+        self.error = None
+        self.latencies = []
+        self._reply = threading.Event()
+        self.client.on('text_message_from_ai', self._on_reply)
+        self.client.on('connection_error', self._on_connection_error)
+
+    def _on_reply(self, data):
+        self._reply.set()
+
+    def _on_connection_error(self, data):
+        self.error = (data or {}).get('error', 'connection_error')
+
+    def connect(self):
+        query = f"user_id={self.args.user_id}&guest_name=LoadTest{self.index}"
+        if self.args.property_id:
+            query += f"&property_id={self.args.property_id}"
+        try:
+            self.client.connect(f"{self.args.url}?{query}", transports=[self.args.transport],
+                                wait_timeout=self.args.timeout)
+            self.connected = True
+        except Exception as e:
+            self.error = str(e)
+
+    def chat(self):
+        for n in range(self.args.messages):
+            self._reply.clear()
+            started = time.monotonic()
+            self.client.emit('text_message_from_user', {
+                'payload': {'message': self.args.message, 'property_id': self.args.property_id}
+            })
+            if not self._reply.wait(self.args.timeout):
+                self.error = f"no reply to message {n + 1} within {self.args.timeout}s"
+                return
+            self.latencies.append(time.monotonic() - started)
+
+    def close(self):
+        if self.connected:
+            try:
+                self.client.disconnect()
+            except Exception:
+                pass
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test concurrent guest Socket.IO connections")
+    parser.add_argument('--url', default='http://localhost:8080', help='Server base URL (default: http://localhost:8080)')
+    parser.add_argument('--user-id', required=True, help='Existing guest user ID used to authenticate connections')
+    parser.add_argument('--property-id', default=None, help='Property ID sent with the connection and messages')
+    parser.add_argument('--clients', type=int, default=100, help='Number of concurrent guest connections (default: 100)')
+    parser.add_argument('--messages', type=int, default=0, help='Chat messages sent per client after connecting (default: 0)')
+    parser.add_argument('--message', default='What is the WiFi password?', help='Chat message text')
+    parser.add_argument('--hold', type=float, default=10.0, help='Seconds to hold all connections open (default: 10)')
+    parser.add_argument('--ramp', type=float, default=5.0, help='Seconds over which connections are opened (default: 5)')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Connect / reply timeout in seconds (default: 60)')
+    parser.add_argument('--transport', default='websocket', choices=['websocket', 'polling'], help='Socket.IO transport')
+    args = parser.parse_args()
+
+    guests = [GuestClient(i, args) for i in range(args.clients)]
+    delay = args.ramp / max(1, args.clients)
+
+    print(f"Connecting {args.clients} guests to {args.url} over {args.ramp:.0f}s...")
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=min(args.clients, 200)) as executor:
+        futures = []
+        for guest in guests:
+            futures.append(executor.submit(guest.connect))
+            time.sleep(delay)
+        for future in futures:
+            future.result()
+    connect_seconds = time.monotonic() - started
+
+    connected = [g for g in guests if g.connected]
+    print(f"Connected {len(connected)}/{args.clients} guests in {connect_seconds:.1f}s")
+
+    if args.messages and connected:
+        print(f"Sending {args.messages} message(s) from each connected guest...")
+        chat_started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=min(len(connected), 200)) as executor:
+            list(executor.map(lambda g: g.chat(), connected))
+        chat_seconds = time.monotonic() - chat_started
+        latencies = [lat for g in connected for lat in g.latencies]
+        print(f"Replies: {len(latencies)}/{len(connected) * args.messages} in {chat_seconds:.1f}s")
+        if latencies:
+            print(f"Reply latency: p50={percentile(latencies, 50):.2f}s "
+                  f"p95={percentile(latencies, 95):.2f}s max={max(latencies):.2f}s "
+                  f"mean={statistics.mean(latencies):.2f}s")
+
+    if args.hold > 0:
+        print(f"Holding connections for {args.hold:.0f}s...")
+        time.sleep(args.hold)
+    still_connected = sum(1 for g in connected if g.client.connected)
+    print(f"Still connected after hold: {still_connected}/{args.clients}")
+
+    errors = {}
+    for guest in guests:
+        if guest.error:
+            errors[guest.error] = errors.get(guest.error, 0) + 1
+    for error, count in sorted(errors.items(), key=lambda item: -item[1])[:10]:
+        print(f"  {count} x {error}")
+
+    for guest in guests:
+        guest.close()
+
+    sys.exit(0 if still_connected == args.clients and not errors else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -26,13 +26,14 @@ from dotenv import load_dotenv
 # Import Firebase and Firestore
 try:
     import firebase_admin
-    from firebase_admin import credentials, firestore
+    from firebase_admin import credentials, firestore, firestore_async
     logger = logging.getLogger(__name__)
     logger.info("Firebase Admin SDK imported successfully")
 except ImportError:
     logger.warning("Firebase Admin SDK not installed. Context retrieval will not work.")
     firebase_admin = None
     firestore = None
+    firestore_async = None
 
 # Import our modules
 try:
@@ -86,12 +87,13 @@ except ImportError:
 # Import Firebase and Firestore
 try:
     import firebase_admin
-    from firebase_admin import credentials, firestore
+    from firebase_admin import credentials, firestore, firestore_async
     logger.info("Firebase Admin SDK imported successfully")
 except ImportError:
     logger.warning("Firebase Admin SDK not installed. Context retrieval will not work.")
     firebase_admin = None
     firestore = None
+    firestore_async = None
 
 # Import audio processing libraries
 try:
@@ -961,6 +963,37 @@ async def _use_gemini_fallback(stream_id, call_control_id):
     # Return immediately without doing anything
     return
 
+# Precomputed property context bundles written by the concierge app (concierge/utils/context_bundle.py)
+CONTEXT_BUNDLE_COLLECTION = 'property_context_bundles'
+CONTEXT_BUNDLE_FORMAT = 1
+
+async def _stream_docs(query):
+    """Run a query on the async Firestore client and return its document snapshots."""
+    return [doc async for doc in query.stream()]
+
+async def _read_context_bundle(db, property_id):
+    """
+    Read a property's precomputed context bundle.
+
+    Returns:
+        The bundle dictionary, or None if it is missing, stale or in an older format
+    """
+    try:
+        doc = await db.collection(CONTEXT_BUNDLE_COLLECTION).document(property_id).get()
+        if not doc.exists:
+            return None
+        bundle = doc.to_dict()
+        if not bundle.get('version') or bundle.get('formatVersion') != CONTEXT_BUNDLE_FORMAT:
+            return None
+        stale_at = bundle.get('staleAt')
+        sources_read_at = bundle.get('sourcesReadAt')
+        if stale_at and (not sources_read_at or stale_at >= sources_read_at):
+            return None
+        return bundle
+    except Exception as e:
+        logger.warning(f"[CONTEXT-DEBUG] Error reading context bundle for property {property_id}: {e}")
+        return None
+
 async def _get_context_for_caller(phone_number):
     """
     Get context for a call based on the caller's phone number.
@@ -1037,57 +1070,61 @@ async def _get_context_for_caller(phone_number):
                 logger.error(f"[CONTEXT-DEBUG] Error initializing Firebase: {e}", exc_info=True)
                 return "", None, None
 
-        # Get Firestore client
-        db = firestore.client()
-        logger.info("[CONTEXT-DEBUG] Got Firestore client")
+        # Get the async Firestore client, so lookups for one call do not stall the others on this loop
+        db = firestore_async.client()
+        logger.info("[CONTEXT-DEBUG] Got async Firestore client")
 
         # Look up reservations where the phone number matches
         reservations_ref = db.collection('reservations')
 
-        # Query for reservations where the main contact's phone number ends with the last 4 digits
-        # Improved query to better match phone numbers ending with the last 4 digits
-        logger.info(f"[CONTEXT-DEBUG] Querying for reservations with mainContactPhone ending in {last_four_digits}")
+        async def fetch_recent_reservations():
+            # Get all recent reservations (limit to a reasonable number)
+            # Try with startDate field first
+            try:
+                all_reservations = await _stream_docs(reservations_ref.order_by('startDate', direction='DESCENDING').limit(100))
+                logger.info(f"[CONTEXT-DEBUG] Fetched {len(all_reservations)} recent reservations using startDate field")
+                return all_reservations
+            except Exception as e:
+                logger.warning(f"[CONTEXT-DEBUG] Error fetching reservations with startDate: {e}")
+            try:
+                # Fall back to checkIn field if startDate fails
+                all_reservations = await _stream_docs(reservations_ref.order_by('checkIn', direction='DESCENDING').limit(100))
+                logger.info(f"[CONTEXT-DEBUG] Fetched {len(all_reservations)} recent reservations using checkIn field")
+                return all_reservations
+            except Exception as e2:
+                logger.warning(f"[CONTEXT-DEBUG] Error fetching reservations with checkIn: {e2}")
+            # If both fail, just get all reservations without ordering
+            all_reservations = await _stream_docs(reservations_ref.limit(100))
+            logger.info(f"[CONTEXT-DEBUG] Fetched {len(all_reservations)} recent reservations without ordering")
+            return all_reservations
+
+        # The queries are independent, so they run concurrently:
+        # - main contact's phone number ending with the last 4 digits
+        # - exact additional contact match (camelCase and underscore field names)
+        # - recent reservations, filtered manually for additional contacts below
+        logger.info(f"[CONTEXT-DEBUG] Querying reservations for phone number ending in {last_four_digits}")
         main_contact_query = reservations_ref.where('mainContactPhone', '>=', f'...{last_four_digits}').where('mainContactPhone', '<=', f'...{last_four_digits}\uf8ff').limit(10)
-        main_contact_results = list(main_contact_query.stream())
-        logger.info(f"[CONTEXT-DEBUG] Found {len(main_contact_results)} potential reservations matching main contact phone")
-
-        # For additional contacts, we need to fetch all reservations with additionalContacts field
-        # and then manually filter them
-        logger.info(f"[CONTEXT-DEBUG] Querying for reservations with additionalContacts field")
-
-        # First try to query with the exact structure (camelCase field)
         additional_contact_query1 = reservations_ref.where('additionalContacts', 'array_contains', {'phone': phone_number}).limit(10)
-        additional_contact_results1 = list(additional_contact_query1.stream())
-        logger.info(f"[CONTEXT-DEBUG] Found {len(additional_contact_results1)} reservations with exact additionalContacts match")
-
-        # Try with underscore field name
         additional_contact_query2 = reservations_ref.where('additional_contacts', 'array_contains', {'phone': phone_number}).limit(10)
-        additional_contact_results2 = list(additional_contact_query2.stream())
+        main_contact_results, additional_contact_results1, additional_contact_results2, all_reservations = await asyncio.gather(
+            _stream_docs(main_contact_query),
+            _stream_docs(additional_contact_query1),
+            _stream_docs(additional_contact_query2),
+            fetch_recent_reservations(),
+            return_exceptions=True
+        )
+        for result in (main_contact_results, additional_contact_results1, additional_contact_results2):
+            if isinstance(result, Exception):
+                raise result
+        logger.info(f"[CONTEXT-DEBUG] Found {len(main_contact_results)} potential reservations matching main contact phone")
+        logger.info(f"[CONTEXT-DEBUG] Found {len(additional_contact_results1)} reservations with exact additionalContacts match")
         logger.info(f"[CONTEXT-DEBUG] Found {len(additional_contact_results2)} reservations with exact additional_contacts match")
 
-        # Then try a more general approach - get all reservations
-        # and manually filter them
+        # Then try a more general approach - filter the recent reservations manually
         additional_contact_results3 = []
         try:
-            # Get all recent reservations (limit to a reasonable number)
-            # Try with startDate field first
-            try:
-                all_reservations_query = reservations_ref.order_by('startDate', direction='DESCENDING').limit(100)
-                all_reservations = list(all_reservations_query.stream())
-                logger.info(f"[CONTEXT-DEBUG] Fetched {len(all_reservations)} recent reservations using startDate field")
-            except Exception as e:
-                logger.warning(f"[CONTEXT-DEBUG] Error fetching reservations with startDate: {e}")
-                try:
-                    # Fall back to checkIn field if startDate fails
-                    all_reservations_query = reservations_ref.order_by('checkIn', direction='DESCENDING').limit(100)
-                    all_reservations = list(all_reservations_query.stream())
-                    logger.info(f"[CONTEXT-DEBUG] Fetched {len(all_reservations)} recent reservations using checkIn field")
-                except Exception as e2:
-                    logger.warning(f"[CONTEXT-DEBUG] Error fetching reservations with checkIn: {e2}")
-                    # If both fail, just get all reservations without ordering
-                    all_reservations_query = reservations_ref.limit(100)
-                    all_reservations = list(all_reservations_query.stream())
-                    logger.info(f"[CONTEXT-DEBUG] Fetched {len(all_reservations)} recent reservations without ordering")
+            if isinstance(all_reservations, Exception):
+                raise all_reservations
 
             # Manually filter reservations with matching additional contacts
             for doc in all_reservations:
@@ -1214,77 +1251,86 @@ async def _get_context_for_caller(phone_number):
             logger.warning("[CONTEXT-DEBUG] No property ID found in the matching reservation")
             return "", None, None
 
-        # Get property details
-        logger.info(f"[CONTEXT-DEBUG] Getting property details for property ID: {property_id}")
-        property_ref = db.collection('properties').document(property_id)
-        property_doc = property_ref.get()
+        # Prefer the precomputed context bundle: one read instead of the property and its knowledge
+        knowledge_prompt = ""
+        bundle = await _read_context_bundle(db, property_id)
+        if bundle:
+            property_data = dict(bundle.get('propertyContext') or {})
+            knowledge_prompt = bundle.get('knowledgePrompt', '')
+            knowledge_items = []
+            logger.info(f"[CONTEXT-DEBUG] Using context bundle {bundle.get('version')} for property {property_id}")
+        else:
+            # Get property details
+            logger.info(f"[CONTEXT-DEBUG] Getting property details for property ID: {property_id}")
+            property_ref = db.collection('properties').document(property_id)
+            property_doc = await property_ref.get()
 
-        if not property_doc.exists:
-            logger.warning(f"[CONTEXT-DEBUG] Property {property_id} not found in Firestore")
-            return "", property_id, None
+            if not property_doc.exists:
+                logger.warning(f"[CONTEXT-DEBUG] Property {property_id} not found in Firestore")
+                return "", property_id, None
 
-        property_data = property_doc.to_dict()
-        property_data['id'] = property_doc.id  # Add document ID
-        logger.info(f"[CONTEXT-DEBUG] Retrieved property: {property_data.get('name', 'Unknown')}")
+            property_data = property_doc.to_dict()
+            property_data['id'] = property_doc.id  # Add document ID
+            logger.info(f"[CONTEXT-DEBUG] Retrieved property: {property_data.get('name', 'Unknown')}")
 
-        # Get knowledge items for the property
-        logger.info(f"[CONTEXT-DEBUG] Getting knowledge items for property ID: {property_id}")
-        knowledge_items = []
+            # Get knowledge items for the property
+            logger.info(f"[CONTEXT-DEBUG] Getting knowledge items for property ID: {property_id}")
+            knowledge_items = []
 
-        # Try to get knowledge items from various collections
-        try:
-            # First try the knowledge_items collection (new format)
-            logger.info(f"[CONTEXT-DEBUG] Checking knowledge_items collection for property {property_id}")
-            knowledge_items_ref = db.collection('knowledge_items')
-            knowledge_items_query = knowledge_items_ref.where('propertyId', '==', property_id).limit(50)
-            knowledge_items_docs = list(knowledge_items_query.stream())
-
-            if knowledge_items_docs:
-                logger.info(f"[CONTEXT-DEBUG] Found {len(knowledge_items_docs)} knowledge items in knowledge_items collection")
-                for doc in knowledge_items_docs:
-                    item = doc.to_dict()
-                    item['id'] = doc.id  # Add document ID
-                    knowledge_items.append(item)
-            else:
-                # If no items found, try the knowledge collection (old format)
-                logger.info(f"[CONTEXT-DEBUG] No items in knowledge_items collection, trying knowledge collection")
-                knowledge_ref = db.collection('knowledge')
-                knowledge_query = knowledge_ref.where('propertyId', '==', property_id).limit(50)
-                knowledge_docs = list(knowledge_query.stream())
-
-                if knowledge_docs:
-                    logger.info(f"[CONTEXT-DEBUG] Found {len(knowledge_docs)} knowledge items in knowledge collection")
-                    for doc in knowledge_docs:
+            # Try to get knowledge items from various collections
+            try:
+                # First try the knowledge_items collection (new format)
+                logger.info(f"[CONTEXT-DEBUG] Checking knowledge_items collection for property {property_id}")
+                knowledge_items_ref = db.collection('knowledge_items')
+                knowledge_items_query = knowledge_items_ref.where('propertyId', '==', property_id).limit(50)
+                knowledge_items_docs = await _stream_docs(knowledge_items_query)
+
+                if knowledge_items_docs:
+                    logger.info(f"[CONTEXT-DEBUG] Found {len(knowledge_items_docs)} knowledge items in knowledge_items collection")
+                    for doc in knowledge_items_docs:
                         item = doc.to_dict()
                         item['id'] = doc.id  # Add document ID
                         knowledge_items.append(item)
                 else:
-                    # If still no items found, try the subcollection approach
-                    logger.info(f"[CONTEXT-DEBUG] No items in knowledge collection, trying subcollection")
-                    subcollection_ref = db.collection('properties').document(property_id).collection('knowledge')
-                    subcollection_docs = list(subcollection_ref.stream())
-
-                    if subcollection_docs:
-                        logger.info(f"[CONTEXT-DEBUG] Found {len(subcollection_docs)} knowledge items in subcollection")
-                        for doc in subcollection_docs:
+                    # If no items found, try the knowledge collection (old format)
+                    logger.info(f"[CONTEXT-DEBUG] No items in knowledge_items collection, trying knowledge collection")
+                    knowledge_ref = db.collection('knowledge')
+                    knowledge_query = knowledge_ref.where('propertyId', '==', property_id).limit(50)
+                    knowledge_docs = await _stream_docs(knowledge_query)
+
+                    if knowledge_docs:
+                        logger.info(f"[CONTEXT-DEBUG] Found {len(knowledge_docs)} knowledge items in knowledge collection")
+                        for doc in knowledge_docs:
                             item = doc.to_dict()
                             item['id'] = doc.id  # Add document ID
                             knowledge_items.append(item)
                     else:
-                        # Finally, check if there's a knowledge field in the property document
-                        logger.info(f"[CONTEXT-DEBUG] No items in subcollection, checking property document")
-                        property_doc = db.collection('properties').document(property_id).get()
-                        property_data = property_doc.to_dict()
-
-                        if 'knowledge' in property_data and isinstance(property_data['knowledge'], list):
-                            logger.info(f"[CONTEXT-DEBUG] Found {len(property_data['knowledge'])} knowledge items in property document")
-                            for item in property_data['knowledge']:
-                                if isinstance(item, dict):
-                                    knowledge_items.append(item)
+                        # If still no items found, try the subcollection approach
+                        logger.info(f"[CONTEXT-DEBUG] No items in knowledge collection, trying subcollection")
+                        subcollection_ref = db.collection('properties').document(property_id).collection('knowledge')
+                        subcollection_docs = await _stream_docs(subcollection_ref)
+
+                        if subcollection_docs:
+                            logger.info(f"[CONTEXT-DEBUG] Found {len(subcollection_docs)} knowledge items in subcollection")
+                            for doc in subcollection_docs:
+                                item = doc.to_dict()
+                                item['id'] = doc.id  # Add document ID
+                                knowledge_items.append(item)
                         else:
-                            logger.warning(f"[CONTEXT-DEBUG] No knowledge items found for property {property_id}")
-        except Exception as knowledge_error:
-            logger.error(f"[CONTEXT-DEBUG] Error retrieving knowledge items: {knowledge_error}", exc_info=True)
+                            # Finally, check if there's a knowledge field in the property document
+                            logger.info(f"[CONTEXT-DEBUG] No items in subcollection, checking property document")
+                            property_doc = await db.collection('properties').document(property_id).get()
+                            property_data = property_doc.to_dict()
+
+                            if 'knowledge' in property_data and isinstance(property_data['knowledge'], list):
+                                logger.info(f"[CONTEXT-DEBUG] Found {len(property_data['knowledge'])} knowledge items in property document")
+                                for item in property_data['knowledge']:
+                                    if isinstance(item, dict):
+                                        knowledge_items.append(item)
+                            else:
+                                logger.warning(f"[CONTEXT-DEBUG] No knowledge items found for property {property_id}")
+            except Exception as knowledge_error:
+                logger.error(f"[CONTEXT-DEBUG] Error retrieving knowledge items: {knowledge_error}", exc_info=True)
 
         # Get guest name
         guest_name = first_reservation.get('mainContactName', '')
@@ -1370,7 +1416,9 @@ async def _get_context_for_caller(phone_number):
             context += f"\n\nCheck-in date: {check_in}\nCheck-out date: {check_out}"
 
         # Add knowledge items
-        if knowledge_items:
+        if knowledge_prompt:
+            context += f"\n\n{knowledge_prompt}\n"
+        elif knowledge_items:
             context += "\n\nHere is some important information about the property:\n"
 
             # Group knowledge items by type